@@ -1,7 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, Iterator, Optional
+from datetime import datetime
+import itertools
+import json
 import logging
+import math
 
+from app.core.resilience.circuit_breaker import CircuitOpenError
+from app.core.resilience.deadline import DeadlineExceeded
+from app.db.history import encode_cursor
 from app.models.schemas import ChatRequest, ChatResponse, ErrorResponse
 from app.services.chat_service import ChatService
 from app.utils.dependencies import get_chat_service
@@ -10,7 +19,9 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.post("/chat", response_model=ChatResponse, responses={
-    500: {"model": ErrorResponse, "description": "Internal server error"}
+    500: {"model": ErrorResponse, "description": "Internal server error"},
+    503: {"model": ErrorResponse, "description": "A model dependency is unavailable"},
+    504: {"model": ErrorResponse, "description": "No answer could be generated in time"}
 })
 async def chat(
     request: ChatRequest,
@@ -20,28 +31,79 @@ async def chat(
     Process a chat request through the RAG system
     """
     try:
-        # Run the chat service directly in the async context
-        # This avoids the event loop issue with ThreadPoolExecutor
-        result = chat_service.process_question(
+        # The graph is synchronous; run it in the threadpool so the event loop
+        # keeps serving other requests and WebSockets meanwhile
+        result = await run_in_threadpool(
+            chat_service.process_question,
             request.question,
-            request.session_id
+            request.session_id,
+            request.latency_budget_ms
         )
         return ChatResponse(**result)
+    except CircuitOpenError as e:
+        logger.warning(f"Chat request rejected: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
+    except DeadlineExceeded as e:
+        logger.warning(f"Chat request timed out: {str(e)}")
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing chat request: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/chat/sessions/{session_id}", response_model=Dict[str, Any])
+def _json_default(value: Any) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+def _stream_history(
+    session_id: str,
+    first: Optional[Dict[str, Any]],
+    messages: Iterator[Dict[str, Any]],
+    limit: int
+) -> Iterator[str]:
+    """JSON body of a history page, written one message at a time"""
+    try:
+        yield f'{{"session_id": {json.dumps(session_id)}, "history": ['
+        next_cursor = None
+        last = None
+        for count, message in enumerate(itertools.chain([first] if first else [], messages)):
+            if count == limit:
+                # An extra message was fetched, so there is a next page
+                next_cursor = encode_cursor((last["timestamp"], last["id"]))
+                break
+            yield ("," if count else "") + json.dumps(message, default=_json_default)
+            last = message
+        yield f'], "next_cursor": {json.dumps(next_cursor)}}}'
+    finally:
+        messages.close()
+
+@router.get("/chat/sessions/{session_id}", responses={
+    200: {"description": "A page of the session history, oldest first", "content": {"application/json": {}}},
+    400: {"model": ErrorResponse, "description": "Invalid cursor"},
+    500: {"model": ErrorResponse, "description": "Internal server error"}
+})
 def get_session(
     session_id: str,
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of messages"),
+    after: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    include_sources: bool = Query(True, description="Include the source documents of each message"),
     chat_service: ChatService = Depends(get_chat_service)
 ):
     """
-    Get chat session history
+    Get chat session history, keyset-paginated and streamed
     """
     try:
-        history = chat_service.get_session_history(session_id)
-        return {"session_id": session_id, "history": history}
+        messages = chat_service.iter_session_history(session_id, after, limit + 1, include_sources)
+        # Start the query here so database errors still produce an error status
+        first = next(messages, None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error retrieving session: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        _stream_history(session_id, first, messages, limit),
+        media_type="application/json"
+    )
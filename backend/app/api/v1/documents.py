@@ -1,7 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, WebSocket, WebSocketDisconnect
+from starlette.datastructures import UploadFile
+from typing import Dict, List
+import asyncio
+import json
 import logging
+import os
+import shutil
+import tempfile
+import uuid
 
-from app.models.schemas import DocumentIngestionRequest, DocumentIngestionResponse, ErrorResponse
+from app.core.ingestion.loaders import SUPPORTED_EXTENSIONS
+
+from app.models.schemas import (
+    DocumentIngestionRequest,
+    DocumentIngestionResponse,
+    ErrorResponse,
+    IngestionJobResponse,
+)
 from app.services.document_service import DocumentService
 from app.utils.dependencies import get_document_service
 
@@ -28,6 +43,163 @@ async def ingest_documents(
         logger.error(f"Error ingesting documents: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/documents/jobs", response_model=IngestionJobResponse, status_code=202, responses={
+    500: {"model": ErrorResponse, "description": "Internal server error"}
+})
+async def submit_ingestion_job(
+    request: DocumentIngestionRequest,
+    document_service: DocumentService = Depends(get_document_service)
+) -> IngestionJobResponse:
+    """
+    Queue a background ingestion job and return its id immediately
+    """
+    if not request.urls and not request.texts:
+        raise HTTPException(status_code=400, detail="Provide at least one of 'urls' or 'texts'")
+    try:
+        job = document_service.submit_ingestion_job(urls=request.urls, texts=request.texts)
+        return IngestionJobResponse(**document_service.jobs.snapshot(job))
+    except Exception as e:
+        logger.error(f"Error submitting ingestion job: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Bytes copied per read when spooling uploads to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+@router.post("/documents/upload", response_model=IngestionJobResponse, status_code=202, responses={
+    400: {"model": ErrorResponse, "description": "No supported files in upload"},
+    500: {"model": ErrorResponse, "description": "Internal server error"}
+})
+async def upload_documents(
+    request: Request,
+    document_service: DocumentService = Depends(get_document_service)
+) -> IngestionJobResponse:
+    """
+    Bulk-ingest uploaded files as a background job.
+
+    Accepts either multipart/form-data with one or more files (.txt, .md,
+    .html, .jsonl) or a raw application/x-ndjson body. Uploads are streamed
+    to a temporary directory, never held in memory as a whole.
+    """
+    upload_dir = tempfile.mkdtemp(prefix="rag-upload-")
+    try:
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("multipart/form-data"):
+            saved = await _save_multipart_upload(request, upload_dir)
+        elif content_type.startswith(("application/x-ndjson", "application/jsonl")):
+            saved = await _save_stream_upload(request, upload_dir, "upload.jsonl")
+        else:
+            raise HTTPException(
+                status_code=415,
+                detail="Use multipart/form-data or application/x-ndjson"
+            )
+
+        if not saved:
+            raise HTTPException(status_code=400, detail="No supported files in upload")
+
+        # Chunks are attributed to the uploaded names, not the temporary copies
+        job = document_service.submit_path_ingestion_job([upload_dir], cleanup_dir=upload_dir, sources=saved)
+        return IngestionJobResponse(**document_service.jobs.snapshot(job))
+    except HTTPException:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        raise
+    except Exception as e:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        logger.error(f"Error uploading documents: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _save_multipart_upload(request: Request, upload_dir: str) -> Dict[str, str]:
+    """Copy uploaded files with supported extensions into ``upload_dir``; maps each copy to its upload name"""
+    saved = {}
+    async with request.form() as form:
+        for _, value in form.multi_items():
+            if not isinstance(value, UploadFile) or not value.filename:
+                continue
+            name = os.path.basename(value.filename)
+            if os.path.splitext(name)[1].lower() not in SUPPORTED_EXTENSIONS:
+                logger.warning(f"Skipping unsupported upload: {name}")
+                continue
+            # Prefix avoids collisions between files with the same name
+            target = os.path.join(upload_dir, f"{uuid.uuid4().hex[:8]}-{name}")
+            with open(target, "wb") as f:
+                while chunk := await value.read(UPLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+            saved[target] = name
+    return saved
+
+async def _save_stream_upload(request: Request, upload_dir: str, name: str) -> Dict[str, str]:
+    """Stream the raw request body into a file in ``upload_dir``; maps it to ``name`` unless empty"""
+    size = 0
+    target = os.path.join(upload_dir, name)
+    with open(target, "wb") as f:
+        async for chunk in request.stream():
+            f.write(chunk)
+            size += len(chunk)
+    return {target: name} if size else {}
+
+@router.get("/documents/jobs", response_model=List[IngestionJobResponse])
+async def list_ingestion_jobs(
+    document_service: DocumentService = Depends(get_document_service)
+) -> List[IngestionJobResponse]:
+    """
+    List queued, running and recently finished ingestion jobs
+    """
+    jobs = document_service.jobs
+    return [IngestionJobResponse(**jobs.snapshot(job)) for job in jobs.list_jobs()]
+
+@router.get("/documents/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(
+    job_id: str,
+    document_service: DocumentService = Depends(get_document_service)
+) -> IngestionJobResponse:
+    """
+    Get status and per-stage progress of an ingestion job
+    """
+    job = document_service.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return IngestionJobResponse(**document_service.jobs.snapshot(job))
+
+@router.delete("/documents/jobs/{job_id}", response_model=IngestionJobResponse)
+async def cancel_ingestion_job(
+    job_id: str,
+    document_service: DocumentService = Depends(get_document_service)
+) -> IngestionJobResponse:
+    """
+    Cancel an ingestion job. Running jobs stop at the next progress checkpoint.
+    """
+    job = document_service.jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return IngestionJobResponse(**document_service.jobs.snapshot(job))
+
+@router.websocket("/documents/jobs/{job_id}/ws")
+async def ingestion_job_websocket(websocket: WebSocket, job_id: str):
+    """
+    WebSocket endpoint streaming progress updates for an ingestion job
+    """
+    document_service = get_document_service()
+    await websocket.accept()
+
+    job = document_service.jobs.get(job_id)
+    if job is None:
+        await websocket.send_text(json.dumps({"type": "error", "detail": f"Job {job_id} not found"}))
+        await websocket.close()
+        return
+
+    last_version = -1
+    try:
+        while True:
+            if job.version != last_version:
+                last_version = job.version
+                payload = IngestionJobResponse(**document_service.jobs.snapshot(job)).model_dump_json()
+                await websocket.send_text(payload)
+            if job.finished:
+                break
+            await asyncio.sleep(0.5)
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info(f"Job progress WebSocket disconnected for job: {job_id}")
+
 @router.delete("/documents/clear")
 async def clear_documents(
     document_service: DocumentService = Depends(get_document_service)
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse, Response
+from functools import lru_cache
+import logging
+
+from app.core.graph.graph import render_graph_mermaid, render_graph_png
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=1)
+def _graph_png() -> bytes:
+    return render_graph_png()
+
+@router.get("/graph", response_class=PlainTextResponse)
+def get_graph_mermaid():
+    """
+    Mermaid source of the RAG graph
+    """
+    return render_graph_mermaid()
+
+@router.get("/graph.png", responses={200: {"content": {"image/png": {}}}})
+def get_graph_png():
+    """
+    The RAG graph as PNG, rendered on first request by the remote Mermaid renderer
+    """
+    try:
+        return Response(content=_graph_png(), media_type="image/png")
+    except Exception as e:
+        logger.error(f"Error rendering graph: {str(e)}")
+        raise HTTPException(status_code=502, detail=f"Graph rendering failed: {str(e)}")
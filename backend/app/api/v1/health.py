@@ -1,6 +1,12 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 from datetime import datetime
 
+from app.core.models.model import get_governor_stats
+from app.core.resilience.circuit_breaker import CircuitState, breaker_states
+from app.core.resilience.deadline import step_executor
+from app.services.warmup import warmup
+
 router = APIRouter()
 
 @router.get("/health")
@@ -14,9 +20,35 @@ async def health_check():
 
 @router.get("/health/ready")
 async def readiness_check():
-    """Readiness check endpoint"""
-    # TODO: Add actual readiness checks (DB connection, model loading, etc.)
+    """
+    Readiness check endpoint: 503 until warmup has finished, degraded while a
+    dependency's circuit breaker is open
+    """
+    breakers = breaker_states()
+    degraded = any(breaker["state"] == CircuitState.OPEN.value for breaker in breakers.values())
+    warmup_state = warmup.snapshot()
+    if not warmup.ready:
+        status = "warming_up"
+    else:
+        status = "degraded" if degraded else "ready"
+    return JSONResponse(
+        status_code=200 if warmup.ready else 503,
+        content={
+            "status": status,
+            "warmup": warmup_state,
+            "breakers": breakers,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    )
+
+@router.get("/health/models")
+async def model_governors():
+    """
+    Queue depth, limits, queue-wait and 429 retry statistics of the model
+    clients, and the queued, running and abandoned graph step calls
+    """
     return {
-        "status": "ready",
+        "governors": get_governor_stats(),
+        "graph_steps": step_executor.stats(),
         "timestamp": datetime.utcnow().isoformat()
-    }
\ No newline at end of file
+    }
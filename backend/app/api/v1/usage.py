@@ -0,0 +1,28 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from datetime import datetime
+from typing import Optional
+import logging
+
+from app.models.schemas import UsageReport
+from app.services.chat_service import ChatService
+from app.utils.dependencies import get_chat_service
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/usage", response_model=UsageReport)
+def get_usage(
+    session_id: Optional[str] = Query(None, description="Only messages of this session"),
+    start: Optional[datetime] = Query(None, description="Window start (inclusive)"),
+    end: Optional[datetime] = Query(None, description="Window end (exclusive)"),
+    limit: int = Query(10, ge=1, le=100, description="Number of top sessions and messages"),
+    chat_service: ChatService = Depends(get_chat_service)
+):
+    """
+    Token usage and estimated cost by session and time window
+    """
+    try:
+        return chat_service.get_usage_report(session_id, start, end, limit)
+    except Exception as e:
+        logger.error(f"Error building usage report: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
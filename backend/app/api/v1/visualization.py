@@ -1,34 +1,72 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Depends, Header, Query
+from fastapi.responses import Response, StreamingResponse
+from datetime import datetime
+from typing import List, Optional, Tuple
 import logging
 import json
 
-from app.core.visualization import process_manager, ProcessEvent
+from app.core.visualization import event_bus, process_manager, EventLevel, ProcessEvent
+from app.core.visualization.encoding import WireFormat, encode_events_message
+from app.core.visualization.events import RESET_MESSAGE
+from app.core.visualization.fanout import StreamChannel
+from app.models.schemas import ProcessAnalyticsReport, VisualizationLevelRequest
+from app.services.chat_service import ChatService
 from app.utils.dependencies import get_chat_service
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Seconds between SSE comments that keep idle connections and proxies open
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def _sse_frame(data: str, cursor: Optional[str] = None) -> str:
+    if cursor is None:
+        return f"data: {data}\n\n"
+    return f"id: {cursor}\ndata: {data}\n\n"
+
+
+def _parse_cursor(value: str) -> Tuple[Optional[str], int]:
+    """``epoch:seq`` (an SSE event id) or a bare sequence number"""
+    epoch, _, seq = value.rpartition(":")
+    return epoch or None, int(seq)
+
 
 @router.websocket("/visualization/ws/{session_id}")
-async def visualization_websocket(websocket: WebSocket, session_id: str):
+async def visualization_websocket(websocket: WebSocket, session_id: str, since: Optional[int] = None,
+                                  epoch: Optional[str] = None, format: WireFormat = WireFormat.JSON):
     """
-    WebSocket endpoint for real-time process visualization events
+    WebSocket endpoint for real-time process visualization events.
+    With ``?since=<seq>&epoch=<epoch>`` only events after that sequence number
+    are replayed; if the session was renumbered since, a ``reset`` message
+    comes first and the whole session is replayed.
+    ``?format=compact`` or ``?format=msgpack`` (binary frames) selects a
+    smaller encoding; control messages such as pongs are always JSON text.
     """
     await websocket.accept()
     logger.info(f"WebSocket connection opened for session: {session_id}")
     
-    # Add this connection to the process manager
-    process_manager.add_websocket_connection(session_id, websocket)
+    # Add this connection to the process manager; new events are queued from here on
+    sender = process_manager.add_websocket_connection(session_id, websocket, wire_format=format)
     
     try:
-        # Send any existing events for this session
-        existing_events = process_manager.get_session_events(session_id)
+        # Send the events this client has not seen before the queued ones;
+        # queued copies of the replayed events are skipped by the sender
+        if since is None:
+            existing_events = process_manager.get_session_events(session_id)
+        else:
+            renumbered, existing_events = process_manager.resume_session_events(session_id, since, epoch)
+            if renumbered:
+                await sender.send(RESET_MESSAGE)
+        replayed = None
         for event in existing_events:
             try:
-                await websocket.send_text(event.model_dump_json())
+                await sender.send(event.encoded())
+                replayed = event.encoded()
             except Exception as e:
                 logger.error(f"Error sending existing event: {e}")
+        # From now on only the sender's writer task sends on this socket
+        sender.start(replayed)
         
         # Keep the connection alive and handle incoming messages
         while True:
@@ -38,15 +76,19 @@ async def visualization_websocket(websocket: WebSocket, session_id: str):
                 message = json.loads(data)
                 
                 if message.get("type") == "ping":
-                    await websocket.send_text(json.dumps({"type": "pong"}))
+                    sender.offer(json.dumps({"type": "pong"}))
                 elif message.get("type") == "get_events":
-                    # Send all events for this session
-                    events = process_manager.get_session_events(session_id)
-                    response = {
-                        "type": "session_events",
-                        "events": [event.model_dump() for event in events]
-                    }
-                    await websocket.send_text(json.dumps(response, default=str))
+                    # Send the session's events, or only those after "since"
+                    since = message.get("since")
+                    if isinstance(since, int):
+                        renumbered, events = process_manager.resume_session_events(
+                            session_id, since, message.get("epoch")
+                        )
+                        if renumbered:
+                            sender.offer(RESET_MESSAGE)
+                    else:
+                        events = process_manager.get_session_events(session_id)
+                    sender.offer(encode_events_message([event.encoded() for event in events], format))
                     
             except WebSocketDisconnect:
                 break
@@ -63,14 +105,72 @@ async def visualization_websocket(websocket: WebSocket, session_id: str):
         process_manager.remove_websocket_connection(session_id, websocket)
 
 
-@router.get("/visualization/events/{session_id}")
-async def get_session_events(session_id: str) -> List[ProcessEvent]:
+@router.get("/visualization/stream/{session_id}")
+async def stream_session_events(
+    session_id: str,
+    since: Optional[int] = Query(None, ge=0),
+    epoch: Optional[str] = None,
+    format: WireFormat = WireFormat.JSON,
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Server-Sent Events stream of process events for a session. Each event's
+    id is its cursor (``epoch:seq``), so a reconnecting EventSource resumes
+    after the last event it received (Last-Event-ID) instead of replaying the
+    session. If the session was renumbered since, a ``reset`` message comes
+    first and the whole session is replayed.
+    ``?format=compact`` drops empty fields; msgpack is not available over SSE.
+    """
+    if format == WireFormat.MSGPACK:
+        raise HTTPException(status_code=400, detail="Server-Sent Events carry text; use json or compact")
+    if last_event_id is not None:
+        try:
+            epoch, since = _parse_cursor(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be an event cursor (epoch:seq)")
+    
+    channel = StreamChannel()
+    sender = process_manager.add_websocket_connection(session_id, channel, render=_sse_frame, wire_format=format)
+    renumbered = False
+    if since is None:
+        missed = process_manager.get_session_events(session_id)
+    else:
+        renumbered, missed = process_manager.resume_session_events(session_id, since, epoch)
+    
+    async def stream():
+        try:
+            if renumbered:
+                yield _sse_frame(RESET_MESSAGE)
+            replayed = None
+            for event in missed:
+                replayed = event.encoded()
+                yield _sse_frame(replayed.encode(format), replayed.cursor)
+            # Events queued since the subscription may repeat the replayed ones
+            sender.start(replayed)
+            while True:
+                frame = await channel.receive(SSE_KEEPALIVE_SECONDS)
+                yield frame if frame is not None else ": keep-alive\n\n"
+        finally:
+            process_manager.remove_websocket_connection(session_id, channel)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/visualization/events/{session_id}", response_model=List[ProcessEvent])
+async def get_session_events(session_id: str, since: Optional[int] = Query(None, ge=0)):
     """
-    Get all process events for a specific session (REST endpoint fallback)
+    Get the process events for a specific session, or only those after
+    sequence number ``since`` (REST endpoint fallback)
     """
     try:
-        events = process_manager.get_session_events(session_id)
-        return events
+        events = process_manager.get_session_events(session_id, since)
+        # Reuse each event's cached JSON instead of validating and serializing again
+        return Response("[" + ",".join(event.encoded().json for event in events) + "]",
+                        media_type="application/json")
     except Exception as e:
         logger.error(f"Error retrieving events for session {session_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -95,8 +195,43 @@ async def get_active_sessions():
     Get all active sessions with process events
     """
     try:
-        sessions = list(process_manager.active_sessions.keys())
+        sessions = process_manager.get_active_sessions()
         return {"active_sessions": sessions}
     except Exception as e:
         logger.error(f"Error retrieving active sessions: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.put("/visualization/sessions/{session_id}/level")
+async def set_session_level(session_id: str, request: VisualizationLevelRequest):
+    """
+    Set how much process detail a session emits: off, summary (step outcomes
+    without previews) or full
+    """
+    process_manager.set_session_level(session_id, EventLevel(request.level) if request.level else None)
+    return {"session_id": session_id, "level": process_manager.session_level(session_id).value}
+
+
+@router.get("/visualization/stats")
+async def get_event_store_stats():
+    """
+    Resident events, evictions, WebSocket send queues and event bus counters
+    """
+    return {**process_manager.stats(), "bus": event_bus.stats()}
+
+
+@router.get("/visualization/analytics", response_model=ProcessAnalyticsReport)
+def get_process_analytics(
+    start: Optional[datetime] = Query(None, description="Window start (inclusive)"),
+    end: Optional[datetime] = Query(None, description="Window end (exclusive)"),
+    chat_service: ChatService = Depends(get_chat_service)
+):
+    """
+    Step latency percentiles, retry-loop frequency and web-search fallback
+    rate from the persisted process event log (PROCESS_EVENT_LOG)
+    """
+    try:
+        return chat_service.get_process_analytics(start, end)
+    except Exception as e:
+        logger.error(f"Error building process analytics: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
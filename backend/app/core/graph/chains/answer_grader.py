@@ -1,7 +1,9 @@
+from functools import lru_cache
+
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableSequence, RunnableLambda
 from pydantic import BaseModel, Field
-from ...models.model import get_chat_model
+from ...models.model import Priority, get_chat_model, governed
 
 
 class GradeAnswer(BaseModel):
@@ -10,10 +12,6 @@ class GradeAnswer(BaseModel):
         description="Answer addresses the question, 'yes' or 'no'"
     )
 
-llm =  get_chat_model()
-
-structured_llm_grader = llm.with_structured_output(GradeAnswer)
-
 system = """You are a grader assessing whether an answer addresses / resolves a question \n 
      Give a binary score 'yes' or 'no'. 'Yes' means that the answer resolves the question.
      Empty or blank answers should always be graded as 'no' (not addressing the question)."""
@@ -30,14 +28,23 @@ def preprocess_answer(inputs):
         return GradeAnswer(binary_score=False)
     return None
 
-# Create chain with preprocessing
-chain_with_llm = answer_prompt | structured_llm_grader
+@lru_cache(maxsize=None)
+def get_structured_llm_grader():
+    llm = get_chat_model("answer_grader")
+    return governed(llm.with_structured_output(GradeAnswer), Priority.GRADING, "answer_grader")
+
+@lru_cache(maxsize=None)
+def get_chain_with_llm():
+    return answer_prompt | get_structured_llm_grader()
 
 def grade_with_preprocessing(inputs):
     """Grade answer with preprocessing for edge cases."""
     preprocessed = preprocess_answer(inputs)
     if preprocessed:
         return preprocessed
-    return chain_with_llm.invoke(inputs)
+    return get_chain_with_llm().invoke(inputs)
 
-answer_grader = RunnableLambda(grade_with_preprocessing)
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_answer_grader():
+    """Answer grader chain, built on first use"""
+    return RunnableLambda(grade_with_preprocessing)
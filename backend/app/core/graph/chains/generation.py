@@ -1,9 +1,9 @@
+from functools import lru_cache
+
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnableSequence
-from ...models.model import get_chat_model
-
-llm = get_chat_model()
+from ...models.model import Priority, get_chat_model, governed
 
 rag_prompt = ChatPromptTemplate.from_messages([
     ("system", """You are an AI assistant specialized in answering questions using provided context documents.
@@ -21,4 +21,8 @@ Context Documents:
     ("human", "Question: {question}")
 ])
 
-generation_chain: RunnableSequence = rag_prompt | llm | StrOutputParser()
+@lru_cache(maxsize=None)
+def get_generation_chain() -> RunnableSequence:
+    """Answer generation chain, built on first use"""
+    llm = get_chat_model("generation")
+    return rag_prompt | governed(llm, Priority.GENERATION, "generation") | StrOutputParser()
@@ -1,9 +1,9 @@
+from functools import lru_cache
+
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableSequence, RunnableLambda
 from pydantic import BaseModel, Field
-from ...models.model import get_chat_model
-
-llm =  get_chat_model()
+from ...models.model import Priority, get_chat_model, governed
 
 class GradeHallucinations(BaseModel):
     """Binary score for hallucination present in generation answer."""
@@ -13,8 +13,6 @@ class GradeHallucinations(BaseModel):
     )
 
 
-structured_llm_grader = llm.with_structured_output(GradeHallucinations)
-
 system = """You are a grader assessing whether an LLM generation is grounded in / supported by a set of retrieved facts. \n 
      Give a binary score 'yes' or 'no'. 'Yes' means that the answer is grounded in / supported by the set of facts.
      Empty or blank generations should always be graded as 'no' (not grounded)."""
@@ -32,14 +30,23 @@ def preprocess_hallucination(inputs):
         return GradeHallucinations(binary_score=False)
     return None
 
-# Create chain with preprocessing
-chain_with_llm = hallucination_prompt | structured_llm_grader
+@lru_cache(maxsize=None)
+def get_structured_llm_grader():
+    llm = get_chat_model("hallucination_grader")
+    return governed(llm.with_structured_output(GradeHallucinations), Priority.GRADING, "hallucination_grader")
+
+@lru_cache(maxsize=None)
+def get_chain_with_llm():
+    return hallucination_prompt | get_structured_llm_grader()
 
 def grade_with_preprocessing(inputs):
     """Grade hallucinations with preprocessing for edge cases."""
     preprocessed = preprocess_hallucination(inputs)
     if preprocessed:
         return preprocessed
-    return chain_with_llm.invoke(inputs)
+    return get_chain_with_llm().invoke(inputs)
 
-hallucination_grader = RunnableLambda(grade_with_preprocessing)
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_hallucination_grader():
+    """Hallucination grader chain, built on first use"""
+    return RunnableLambda(grade_with_preprocessing)
@@ -1,9 +1,9 @@
+from functools import lru_cache
+
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableSequence, RunnableLambda
 from pydantic import BaseModel, Field
-from ...models.model import get_chat_model
-
-llm = get_chat_model()
+from ...models.model import Priority, get_chat_model, governed
 
 class GradeDocuments(BaseModel):
     """Binary score for relevance check on retrieved documents."""
@@ -13,8 +13,6 @@ class GradeDocuments(BaseModel):
     )
 
 
-structured_llm_grader = llm.with_structured_output(GradeDocuments)
-
 system = """You are a grader assessing relevance of a retrieved document to a user question. \n 
     If the document contains keyword(s) or semantic meaning related to the question, grade it as relevant. \n
     Empty or blank documents should always be graded as 'no'. \n
@@ -35,13 +33,24 @@ def preprocess_grading(inputs):
 
 # Create chain with preprocessing
 chain_with_preprocessing = RunnableLambda(preprocess_grading)
-chain_with_llm = grade_prompt | structured_llm_grader
+
+@lru_cache(maxsize=None)
+def get_structured_llm_grader():
+    llm = get_chat_model("retrieval_grader")
+    return governed(llm.with_structured_output(GradeDocuments), Priority.GRADING, "retrieval_grader")
+
+@lru_cache(maxsize=None)
+def get_chain_with_llm():
+    return grade_prompt | get_structured_llm_grader()
 
 def grade_with_preprocessing(inputs):
     """Grade documents with preprocessing for edge cases."""
     preprocessed = preprocess_grading(inputs)
     if preprocessed:
         return preprocessed
-    return chain_with_llm.invoke(inputs)
+    return get_chain_with_llm().invoke(inputs)
 
-retrieval_grader = RunnableLambda(grade_with_preprocessing)
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_retrieval_grader():
+    """Document relevance grader chain, built on first use"""
+    return RunnableLambda(grade_with_preprocessing)
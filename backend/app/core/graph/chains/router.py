@@ -1,9 +1,10 @@
+from functools import lru_cache
 from typing import Literal
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableSequence
 from pydantic import BaseModel, Field
-from ...models.model import get_chat_model
+from ...models.model import Priority, get_chat_model, governed
 
 class RouteQuery(BaseModel):
     """Route a user query to the most relevant datasource."""
@@ -13,10 +14,6 @@ class RouteQuery(BaseModel):
         description="Given a user question choose to route it to web search or a vectorstore.",
     )
 
-llm = get_chat_model()
-
-structured_llm_router = llm.with_structured_output(RouteQuery)
-
 system = """You are an expert at routing a user question to a vectorstore or web search.
 The vectorstore contains documents related to agents, prompt engineering, adversarial attacks, and general AI/ML concepts.
 Use the vectorstore for questions about AI, machine learning, agents, prompt engineering, LLMs, or adversarial attacks.
@@ -28,4 +25,12 @@ route_prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-question_router: RunnableSequence = route_prompt | structured_llm_router
\ No newline at end of file
+@lru_cache(maxsize=None)
+def get_structured_llm_router():
+    llm = get_chat_model("router")
+    return governed(llm.with_structured_output(RouteQuery), Priority.INTERACTIVE, "router")
+
+@lru_cache(maxsize=None)
+def get_question_router() -> RunnableSequence:
+    """Question router chain, built on first use"""
+    return route_prompt | get_structured_llm_router()
@@ -1,30 +1,56 @@
-import asyncio
 import time
+from functools import lru_cache
+from typing import Optional
 from dotenv import load_dotenv
 from langgraph.graph import END, StateGraph
 
-from .chains.answer_grader import answer_grader
-from .chains.hallucination_grader import hallucination_grader
-from .chains.router import RouteQuery, question_router
+from .chains.answer_grader import get_answer_grader
+from .chains.hallucination_grader import get_hallucination_grader
+from .chains.router import RouteQuery, get_question_router
 from .consts import GENERATE, GRADE_DOCUMENTS, RETRIEVE, WEBSEARCH
 from .nodes.generate import generate
 from .nodes.grade_documents import grade_documents
 from .nodes.retrieve import retrieve
 from .nodes.web_search import web_search
 from .state import GraphState
+from ..models.usage import usage_metadata
+from ..resilience.circuit_breaker import WEB_SEARCH, CircuitOpenError, CircuitState, get_breaker
+from ..resilience.deadline import (
+    ANSWER_GRADING,
+    HALLUCINATION_CHECK,
+    ROUTING,
+    DeadlineExceeded,
+    can_afford,
+    cycle_estimate_ms,
+    node_timeout,
+    remaining_ms,
+    run_with_timeout
+)
 from ..visualization import (
     emit_routing_started,
     emit_routing_completed,
     emit_hallucination_check,
-    emit_answer_grading
+    emit_answer_grading,
+    emit_step_skipped,
+    ProcessStepType
 )
 
 load_dotenv()
 
+def web_search_available() -> bool:
+    """False while the web search breaker is open; half-open lets a probe through"""
+    return get_breaker(WEB_SEARCH).state != CircuitState.OPEN
+
 def decide_to_generate(state):
     print("---ASSESS GRADED DOCUMENTS---")
 
-    if state["web_search"]:
+    if state["web_search"] and not web_search_available():
+        print("---DECISION: WEB SEARCH UNAVAILABLE, GENERATE---")
+        return GENERATE
+    elif state["web_search"] and not can_afford(state, cycle_estimate_ms(state)):
+        print("---DECISION: NO BUDGET LEFT FOR WEB SEARCH, GENERATE---")
+        return GENERATE
+    elif state["web_search"]:
         print(
             "---DECISION: NOT ALL DOCUMENTS ARE NOT RELEVANT TO QUESTION, INCLUDE WEB SEARCH---"
         )
@@ -42,14 +68,6 @@ def grade_generation_grounded_in_documents_and_question(state: GraphState) -> st
     web_search_attempts = state.get("web_search_attempts", 0)
     session_id = state.get("session_id", "default")
     
-    # Create event loop if needed for async event emission
-    loop = None
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    
     # Check if we've hit max retries
     MAX_GENERATION_ATTEMPTS = 3
     MAX_WEB_SEARCH_ATTEMPTS = 2
@@ -58,33 +76,61 @@ def grade_generation_grounded_in_documents_and_question(state: GraphState) -> st
         print(f"---MAX GENERATION ATTEMPTS ({MAX_GENERATION_ATTEMPTS}) REACHED, ENDING---")
         return "max_retries"
     
+    remaining = remaining_ms(state)
+    if remaining is not None and remaining <= 0:
+        print("---LATENCY BUDGET EXHAUSTED, ACCEPTING GENERATION---")
+        return "out_of_budget"
+    
     start_time = time.time()
     # Format documents for hallucination checking - extract only page_content
     formatted_docs = "\n\n---\n\n".join([doc.page_content for doc in documents])
-    score = hallucination_grader.invoke(
-        {"documents": formatted_docs, "generation": generation}
-    )
+    try:
+        score = run_with_timeout(
+            lambda: get_hallucination_grader().invoke({"documents": formatted_docs, "generation": generation}),
+            node_timeout(state, HALLUCINATION_CHECK),
+            HALLUCINATION_CHECK
+        )
+    except (CircuitOpenError, DeadlineExceeded) as e:
+        # The grader model is unavailable or out of time: accept the generation ungraded
+        print(f"---GRADING SKIPPED: {e}, ACCEPTING GENERATION---")
+        emit_step_skipped(
+            session_id, ProcessStepType.HALLUCINATION_CHECK, question, str(e)
+        )
+        return "out_of_budget" if isinstance(e, DeadlineExceeded) else "useful"
     duration_ms = int((time.time() - start_time) * 1000)
+    grading_ms = duration_ms
 
     # Emit hallucination check event
-    if loop:
-        loop.create_task(emit_hallucination_check(
-            session_id, question, "yes" if score.binary_score else "no", duration_ms
-        ))
+    emit_hallucination_check(
+        session_id, question, "yes" if score.binary_score else "no", duration_ms,
+        usage_metadata("hallucination_grader")
+    )
 
     if hallucination_grade := score.binary_score:
         print("---DECISION: GENERATION IS GROUNDED IN DOCUMENTS---")
         print("---GRADE GENERATION vs QUESTION---")
         
         start_time = time.time()
-        score = answer_grader.invoke({"question": question, "generation": generation})
+        try:
+            score = run_with_timeout(
+                lambda: get_answer_grader().invoke({"question": question, "generation": generation}),
+                node_timeout(state, ANSWER_GRADING),
+                ANSWER_GRADING
+            )
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            print(f"---GRADING SKIPPED: {e}, ACCEPTING GENERATION---")
+            emit_step_skipped(
+                session_id, ProcessStepType.ANSWER_GRADING, question, str(e)
+            )
+            return "out_of_budget" if isinstance(e, DeadlineExceeded) else "useful"
         duration_ms = int((time.time() - start_time) * 1000)
+        grading_ms += duration_ms
         
         # Emit answer grading event
-        if loop:
-            loop.create_task(emit_answer_grading(
-                session_id, question, "yes" if score.binary_score else "no", duration_ms
-            ))
+        emit_answer_grading(
+            session_id, question, "yes" if score.binary_score else "no", duration_ms,
+            usage_metadata("answer_grader")
+        )
         
         if answer_grade := score.binary_score:
             print("---DECISION: GENERATION ADDRESSES QUESTION---")
@@ -94,9 +140,18 @@ def grade_generation_grounded_in_documents_and_question(state: GraphState) -> st
             if web_search_attempts >= MAX_WEB_SEARCH_ATTEMPTS:
                 print(f"---MAX WEB SEARCH ATTEMPTS ({MAX_WEB_SEARCH_ATTEMPTS}) REACHED, ENDING---")
                 return "max_retries"
+            if not web_search_available():
+                print("---WEB SEARCH UNAVAILABLE, ENDING---")
+                return "max_retries"
+            if not can_afford(state, cycle_estimate_ms(state, grading_ms)):
+                print("---NO BUDGET LEFT FOR ANOTHER CYCLE, ENDING WITH BEST ANSWER---")
+                return "out_of_budget"
             return "not useful"
     else:
         print("---DECISION: GENERATION IS NOT GROUNDED IN DOCUMENTS, RE-TRY---")
+        if not can_afford(state, cycle_estimate_ms(state, grading_ms)):
+            print("---NO BUDGET LEFT FOR ANOTHER CYCLE, ENDING WITH BEST ANSWER---")
+            return "out_of_budget"
         return "not supported"
 
 
@@ -115,20 +170,21 @@ def route_question(state: GraphState) -> str:
     question = state["question"]
     session_id = state.get("session_id", "default")
     
-    # Create event loop if needed for async event emission
-    loop = None
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    
     # Emit routing started event
-    if loop:
-        loop.create_task(emit_routing_started(session_id, question))
+    emit_routing_started(session_id, question)
     
     start_time = time.time()
-    source: RouteQuery = question_router.invoke({"question": question})
+    try:
+        source: RouteQuery = run_with_timeout(
+            lambda: get_question_router().invoke({"question": question}),
+            node_timeout(state, ROUTING),
+            ROUTING
+        )
+    except (CircuitOpenError, DeadlineExceeded) as e:
+        # The router model is unavailable or too slow: use the vector store
+        print(f"---ROUTING SKIPPED: {e}, ROUTE QUESTION TO RAG---")
+        emit_step_skipped(session_id, ProcessStepType.ROUTING, question, str(e))
+        return RETRIEVE
     duration_ms = int((time.time() - start_time) * 1000)
     
     decision = source.datasource
@@ -136,12 +192,15 @@ def route_question(state: GraphState) -> str:
     reasoning = f"Question contains {'general/web' if decision == WEBSEARCH else 'AI/ML'} keywords"
     
     # Emit routing completed event
-    if loop:
-        loop.create_task(emit_routing_completed(
-            session_id, question, decision, confidence, reasoning, duration_ms
-        ))
+    emit_routing_completed(
+        session_id, question, decision, confidence, reasoning, duration_ms,
+        usage_metadata("router")
+    )
 
-    if source.datasource == WEBSEARCH:
+    if source.datasource == WEBSEARCH and not web_search_available():
+        print("---WEB SEARCH UNAVAILABLE, ROUTE QUESTION TO RAG---")
+        return RETRIEVE
+    elif source.datasource == WEBSEARCH:
         print("---ROUTE QUESTION TO WEB SEARCH---")
         return WEBSEARCH
     elif source.datasource == "vectorstore":
@@ -149,49 +208,66 @@ def route_question(state: GraphState) -> str:
         return RETRIEVE
 
 
-workflow = StateGraph(GraphState)
+def build_workflow() -> StateGraph:
+    """Assemble the adaptive RAG state graph"""
+    workflow = StateGraph(GraphState)
 
-workflow.add_node(RETRIEVE, retrieve)
-workflow.add_node(GRADE_DOCUMENTS, grade_documents)
-workflow.add_node(GENERATE, generate)
-workflow.add_node(WEBSEARCH, web_search)
+    workflow.add_node(RETRIEVE, retrieve)
+    workflow.add_node(GRADE_DOCUMENTS, grade_documents)
+    workflow.add_node(GENERATE, generate)
+    workflow.add_node(WEBSEARCH, web_search)
 
-workflow.set_conditional_entry_point(
-    route_question,
-    {
-        WEBSEARCH: WEBSEARCH,
-        RETRIEVE: RETRIEVE,
-    },
-)
+    workflow.set_conditional_entry_point(
+        route_question,
+        {
+            WEBSEARCH: WEBSEARCH,
+            RETRIEVE: RETRIEVE,
+        },
+    )
 
-# workflow.set_entry_point(RETRIEVE)
+    # workflow.set_entry_point(RETRIEVE)
 
-workflow.add_edge(RETRIEVE, GRADE_DOCUMENTS)
-workflow.add_conditional_edges(
-    GRADE_DOCUMENTS,
-    decide_to_generate,
-    {
-        WEBSEARCH: WEBSEARCH,
-        GENERATE: GENERATE,
-    },
-)
+    workflow.add_edge(RETRIEVE, GRADE_DOCUMENTS)
+    workflow.add_conditional_edges(
+        GRADE_DOCUMENTS,
+        decide_to_generate,
+        {
+            WEBSEARCH: WEBSEARCH,
+            GENERATE: GENERATE,
+        },
+    )
+
+    workflow.add_conditional_edges(
+        GENERATE,
+        grade_generation_grounded_in_documents_and_question,
+        {
+            "not supported": GENERATE,
+            "useful": END,
+            "not useful": WEBSEARCH,
+            "max_retries": END,
+            "out_of_budget": END,
+        },
+    )
+    workflow.add_edge(WEBSEARCH, GENERATE)
+    workflow.add_edge(GENERATE, END)
+    return workflow
+
+
+@lru_cache(maxsize=None)
+def get_graph_app():
+    """The compiled graph, built on first use"""
+    app = build_workflow().compile()
+
+    # Set recursion limit to prevent infinite loops
+    app.recursion_limit = 15
+    return app
 
-workflow.add_conditional_edges(
-    GENERATE,
-    grade_generation_grounded_in_documents_and_question,
-    {
-        "not supported": GENERATE,
-        "useful": END,
-        "not useful": WEBSEARCH,
-        "max_retries": END,
-    },
-)
-workflow.add_edge(WEBSEARCH, GENERATE)
-workflow.add_edge(GENERATE, END)
 
-app = workflow.compile()
+def render_graph_mermaid() -> str:
+    """Mermaid source of the graph (rendered locally)"""
+    return get_graph_app().get_graph().draw_mermaid()
 
-# Set recursion limit to prevent infinite loops
-app.recursion_limit = 15
 
-app.get_graph().draw_mermaid_png(output_file_path="graph.png")
\ No newline at end of file
+def render_graph_png(output_file_path: Optional[str] = None) -> bytes:
+    """Render the graph as PNG (uses the remote Mermaid renderer)"""
+    return get_graph_app().get_graph().draw_mermaid_png(output_file_path=output_file_path)
@@ -1,13 +1,15 @@
-import asyncio
 import time
 from typing import Any, Dict
 
-from ..chains.generation import generation_chain
+from ..chains.generation import get_generation_chain
 from ..state import GraphState
+from ...models.usage import usage_metadata
+from ...resilience.deadline import GENERATE, DeadlineExceeded, node_timeout, run_with_timeout
 from ...visualization import (
     emit_generation_started,
     emit_generation_completed,
     emit_step_failed,
+    emit_step_skipped,
     ProcessStepType
 )
 
@@ -17,54 +19,70 @@ def generate(state: GraphState) -> Dict[str, Any]:
     question = state["question"]
     documents = state["documents"]
     generation_attempts = state.get("generation_attempts", 0)
+    previous_generation = state.get("generation", "")
     session_id = state.get("session_id", "default")
     
-    # Create event loop if needed for async event emission
-    loop = None
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    
     start_time = time.time()
     attempt = generation_attempts + 1
     
     # Emit started event
-    if loop:
-        loop.create_task(emit_generation_started(session_id, question, attempt))
+    emit_generation_started(session_id, question, attempt)
 
     try:
         # Format documents properly - extract only page_content
         formatted_docs = "\n\n---\n\n".join([doc.page_content for doc in documents])
-        generation = generation_chain.invoke({"context": formatted_docs, "question": question})
+        # The first answer may use the whole node timeout; retries must fit the remaining budget
+        generation = run_with_timeout(
+            lambda: get_generation_chain().invoke({"context": formatted_docs, "question": question}),
+            node_timeout(state, GENERATE, required=not previous_generation),
+            GENERATE
+        )
         
         duration_ms = int((time.time() - start_time) * 1000)
         
         # Emit completed event
-        if loop:
-            loop.create_task(emit_generation_completed(
-                session_id, 
-                question, 
-                attempt,
-                generation,
-                duration_ms
-            ))
+        emit_generation_completed(
+            session_id, 
+            question, 
+            attempt,
+            generation,
+            duration_ms,
+            usage_metadata("generation")
+        )
         
         return {
             "documents": documents, 
             "question": question, 
             "generation": generation,
+            "generation_attempts": attempt,
+            "generation_ms": duration_ms
+        }
+    
+    except DeadlineExceeded as e:
+        if not previous_generation:
+            emit_step_failed(
+                session_id, ProcessStepType.GENERATE, question, str(e), usage_metadata("generation")
+            )
+            raise
+        # Out of budget for a retry: keep the previous answer
+        print(f"---GENERATION SKIPPED: {e}, KEEPING PREVIOUS ANSWER---")
+        emit_step_skipped(
+            session_id, ProcessStepType.GENERATE, question, str(e), usage_metadata("generation")
+        )
+        return {
+            "documents": documents,
+            "question": question,
+            "generation": previous_generation,
             "generation_attempts": attempt
         }
     
     except Exception as e:
         # Emit failed event
-        if loop:
-            loop.create_task(emit_step_failed(
-                session_id, 
-                ProcessStepType.GENERATE, 
-                question, 
-                str(e)
-            ))
+        emit_step_failed(
+            session_id, 
+            ProcessStepType.GENERATE, 
+            question, 
+            str(e),
+            usage_metadata("generation")
+        )
         raise e
\ No newline at end of file
@@ -1,12 +1,15 @@
-import asyncio
 import time
 from typing import Any, Dict
 
-from ..chains.retrieval_grader import retrieval_grader
+from ..chains.retrieval_grader import get_retrieval_grader
 from ..state import GraphState
+from ...models.usage import usage_metadata
+from ...resilience.circuit_breaker import CircuitOpenError
+from ...resilience.deadline import GRADE_DOCUMENTS, DeadlineExceeded, node_timeout, run_with_timeout
 from ...visualization import (
     DocumentGrade,
     emit_grading_started,
+    emits_details,
     emit_grading_completed,
     emit_step_failed,
     ProcessStepType
@@ -30,38 +33,45 @@ def grade_documents(state: GraphState) -> Dict[str, Any]:
     documents = state["documents"]
     session_id = state.get("session_id", "default")
     
-    # Create event loop if needed for async event emission
-    loop = None
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    
     start_time = time.time()
     
     # Emit started event
-    if loop:
-        loop.create_task(emit_grading_started(session_id, question))
+    emit_grading_started(session_id, question)
 
     try:
         filtered_docs = []
         web_search = False
         document_grades = []
+        degraded = None
+        retrieval_grader = get_retrieval_grader()
+        timeout = node_timeout(state, GRADE_DOCUMENTS)
+        # Per-document previews are only built when the visualization shows them
+        collect_grades = emits_details(session_id)
         
-        for d in documents:
-            score = retrieval_grader.invoke(
-                {"question": question, "document": d.page_content}
-            )
+        for i, d in enumerate(documents):
+            try:
+                score = run_with_timeout(
+                    lambda: retrieval_grader.invoke({"question": question, "document": d.page_content}),
+                    timeout - (time.time() - start_time),
+                    GRADE_DOCUMENTS
+                )
+            except (CircuitOpenError, DeadlineExceeded) as e:
+                # The grader model is unavailable or out of time: keep the remaining documents ungraded
+                print(f"---GRADING SKIPPED: {e}---")
+                degraded = str(e)
+                filtered_docs.extend(documents[i:])
+                web_search = False
+                break
             grade = score.binary_score
             
             # Create document grade info for visualization
-            doc_grade = DocumentGrade(
-                content_preview=d.page_content[:150] + "..." if len(d.page_content) > 150 else d.page_content,
-                relevance_score=grade,
-                source=getattr(d, 'metadata', {}).get('source', 'Unknown') if hasattr(d, 'metadata') else 'Unknown'
-            )
-            document_grades.append(doc_grade)
+            if collect_grades:
+                doc_grade = DocumentGrade(
+                    content_preview=d.page_content[:150] + "..." if len(d.page_content) > 150 else d.page_content,
+                    relevance_score=grade,
+                    source=getattr(d, 'metadata', {}).get('source', 'Unknown') if hasattr(d, 'metadata') else 'Unknown'
+                )
+                document_grades.append(doc_grade)
             
             if grade.lower() == "yes":
                 print("---GRADE: DOCUMENT RELEVANT---")
@@ -72,26 +82,29 @@ def grade_documents(state: GraphState) -> Dict[str, Any]:
                 continue
         
         duration_ms = int((time.time() - start_time) * 1000)
+        metadata = usage_metadata("retrieval_grader")
+        if degraded:
+            metadata = {**(metadata or {}), "degraded": degraded}
         
         # Emit completed event
-        if loop:
-            loop.create_task(emit_grading_completed(
-                session_id,
-                question,
-                document_grades,
-                len(filtered_docs),
-                duration_ms
-            ))
+        emit_grading_completed(
+            session_id,
+            question,
+            document_grades,
+            len(filtered_docs),
+            duration_ms,
+            metadata
+        )
         
         return {"documents": filtered_docs, "question": question, "web_search": web_search}
     
     except Exception as e:
         # Emit failed event
-        if loop:
-            loop.create_task(emit_step_failed(
-                session_id, 
-                ProcessStepType.GRADE_DOCUMENTS, 
-                question, 
-                str(e)
-            ))
+        emit_step_failed(
+            session_id, 
+            ProcessStepType.GRADE_DOCUMENTS, 
+            question, 
+            str(e),
+            usage_metadata("retrieval_grader")
+        )
         raise e
\ No newline at end of file
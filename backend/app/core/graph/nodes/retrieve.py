@@ -1,13 +1,15 @@
-import asyncio
 import time
 from typing import Any, Dict
 
 from ..state import GraphState
-from ...ingestion.ingestion import get_retriever
+from ...ingestion.ingestion import active_retriever
+from ...resilience.circuit_breaker import CircuitOpenError
+from ...resilience.deadline import RETRIEVE, DeadlineExceeded, node_timeout, run_with_timeout
 from ...visualization import (
     emit_retrieve_started,
     emit_retrieve_completed,
     emit_step_failed,
+    emit_step_skipped,
     ProcessStepType
 )
 
@@ -17,44 +19,49 @@ def retrieve(state: GraphState) -> Dict[str, Any]:
     question = state["question"]
     session_id = state.get("session_id", "default")
     
-    # Create event loop if needed for async event emission
-    loop = None
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    
     start_time = time.time()
     
     # Emit started event
-    if loop:
-        loop.create_task(emit_retrieve_started(session_id, question))
+    emit_retrieve_started(session_id, question)
 
     try:
-        retriever = get_retriever()
-        documents = retriever.invoke(question)
+        def search():
+            # Pin the active index generation so a concurrent re-ingestion
+            # cannot swap it out from under this query
+            with active_retriever() as retriever:
+                return retriever.invoke(question) if retriever else []
+
+        documents = run_with_timeout(search, node_timeout(state, RETRIEVE), RETRIEVE)
         
         duration_ms = int((time.time() - start_time) * 1000)
         
         # Emit completed event
-        if loop:
-            loop.create_task(emit_retrieve_completed(
-                session_id, 
-                question, 
-                len(documents), 
-                duration_ms
-            ))
+        emit_retrieve_completed(
+            session_id, 
+            question, 
+            len(documents), 
+            duration_ms
+        )
         
         return {"documents": documents, "question": question}
     
+    except (CircuitOpenError, DeadlineExceeded) as e:
+        # Embeddings are unavailable or too slow: continue without retrieved context
+        print(f"---RETRIEVE SKIPPED: {e}---")
+        emit_step_skipped(
+            session_id,
+            ProcessStepType.RETRIEVE,
+            question,
+            str(e)
+        )
+        return {"documents": [], "question": question}
+    
     except Exception as e:
         # Emit failed event
-        if loop:
-            loop.create_task(emit_step_failed(
-                session_id, 
-                ProcessStepType.RETRIEVE, 
-                question, 
-                str(e)
-            ))
+        emit_step_failed(
+            session_id, 
+            ProcessStepType.RETRIEVE, 
+            question, 
+            str(e)
+        )
         raise e
\ No newline at end of file
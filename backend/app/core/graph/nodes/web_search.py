@@ -1,14 +1,16 @@
 from typing import Any, Dict
-import asyncio
 import time
 from dotenv import load_dotenv
 from langchain.schema import Document
 from langchain_tavily import TavilySearch
 from ..state import GraphState
+from ...resilience.circuit_breaker import WEB_SEARCH, CircuitOpenError, get_breaker
+from ...resilience.deadline import WEBSEARCH, DeadlineExceeded, node_timeout, run_with_timeout
 from ...visualization import (
     emit_websearch_started,
     emit_websearch_completed,
     emit_step_failed,
+    emit_step_skipped,
     ProcessStepType
 )
 
@@ -29,22 +31,10 @@ def web_search(state: GraphState) -> Dict[str, Any]:
     web_search_attempts = state.get("web_search_attempts", 0)
     session_id = state.get("session_id", "default")
 
-    # Create event loop if needed for async event emission
-    loop = None
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_closed():
-            raise RuntimeError("Event loop is closed")
-    except RuntimeError:
-        # Create new event loop for this thread
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
     start_time = time.time()
     
     # Emit started event
-    if loop:
-        loop.create_task(emit_websearch_started(session_id, question, question))
+    emit_websearch_started(session_id, question, question)
 
     try:
         # Get the search tool
@@ -59,7 +49,11 @@ def web_search(state: GraphState) -> Dict[str, Any]:
             sources_found = 0
         else:
             # Perform the web search
-            tavily_results = web_search_tool.invoke({"query": question})["results"]
+            tavily_results = run_with_timeout(
+                lambda: get_breaker(WEB_SEARCH).call(lambda: web_search_tool.invoke({"query": question})),
+                node_timeout(state, WEBSEARCH),
+                WEBSEARCH
+            )["results"]
             sources_found = len(tavily_results)
             joined_tavily_result = "\n".join(
                 [tavily_result["content"] for tavily_result in tavily_results]
@@ -74,14 +68,13 @@ def web_search(state: GraphState) -> Dict[str, Any]:
         duration_ms = int((time.time() - start_time) * 1000)
         
         # Emit completed event
-        if loop:
-            loop.create_task(emit_websearch_completed(
-                session_id,
-                question,
-                question,  # query
-                sources_found,
-                duration_ms
-            ))
+        emit_websearch_completed(
+            session_id,
+            question,
+            question,  # query
+            sources_found,
+            duration_ms
+        )
 
         return {
             "documents": documents, 
@@ -89,17 +82,31 @@ def web_search(state: GraphState) -> Dict[str, Any]:
             "web_search_attempts": web_search_attempts + 1
         }
 
+    except (CircuitOpenError, DeadlineExceeded) as e:
+        # Tavily is failing or too slow: answer from the documents we already have
+        print(f"---WEB SEARCH SKIPPED: {e}---")
+        emit_step_skipped(
+            session_id,
+            ProcessStepType.WEBSEARCH,
+            question,
+            str(e)
+        )
+        return {
+            "documents": documents or [],
+            "question": question,
+            "web_search_attempts": web_search_attempts + 1
+        }
+
     except Exception as e:
         print(f"Error in web search: {e}")
         
         # Emit failed event
-        if loop:
-            loop.create_task(emit_step_failed(
-                session_id, 
-                ProcessStepType.WEBSEARCH, 
-                question, 
-                str(e)
-            ))
+        emit_step_failed(
+            session_id, 
+            ProcessStepType.WEBSEARCH, 
+            question, 
+            str(e)
+        )
         
         # Return a fallback response
         fallback_doc = Document(
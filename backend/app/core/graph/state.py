@@ -1,6 +1,6 @@
 # State Management System
 
-from typing import List, TypedDict
+from typing import List, Optional, TypedDict
 
 
 class GraphState(TypedDict):
@@ -15,6 +15,8 @@ class GraphState(TypedDict):
         generation_attempts: number of generation attempts
         web_search_attempts: number of web search attempts
         session_id: session identifier for process visualization
+        deadline: wall-clock time (epoch seconds) by which the run should answer
+        generation_ms: duration of the last generation, to estimate another cycle
     """
 
     question: str
@@ -23,4 +25,6 @@ class GraphState(TypedDict):
     documents: List[str]
     generation_attempts: int
     web_search_attempts: int
-    session_id: str
\ No newline at end of file
+    session_id: str
+    deadline: Optional[float]
+    generation_ms: int
\ No newline at end of file
@@ -0,0 +1,33 @@
+"""
+Stable chunk ids.
+
+A chunk's id is derived from its source and text, so re-ingesting unchanged
+content yields the same ids and chat messages can reference chunks by id
+across index generations. Ids are assigned at ingestion and stored in the
+chunk's metadata and as its vectorstore id; documents without one (web
+search results, indexes built before ids were assigned) get the same id
+computed on the fly.
+"""
+
+from typing import Any, Dict, List, Optional
+import hashlib
+
+from langchain.schema import Document
+
+
+def chunk_id(content: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """The chunk's assigned id, or the id its source and text hash to"""
+    metadata = metadata or {}
+    if metadata.get("chunk_id"):
+        return metadata["chunk_id"]
+    key = f"{metadata.get('source', '')}\x00{content}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def assign_chunk_ids(chunks: List[Document]) -> List[Document]:
+    """Set ``metadata["chunk_id"]`` on each chunk, dropping exact repeats of an earlier one"""
+    unique: Dict[str, Document] = {}
+    for chunk in chunks:
+        chunk.metadata["chunk_id"] = chunk_id(chunk.page_content, chunk.metadata)
+        unique.setdefault(chunk.metadata["chunk_id"], chunk)
+    return list(unique.values())
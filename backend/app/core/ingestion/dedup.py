@@ -0,0 +1,175 @@
+"""
+Near-duplicate chunk detection with MinHash and locality-sensitive hashing.
+
+Web pages from the same publisher repeat navigation, reference lists and
+licensing footers, which survive chunking as near-identical chunks. Each
+chunk is fingerprinted with a MinHash signature over word shingles; LSH
+banding finds candidate matches in roughly constant time per chunk, and
+candidates are confirmed by their estimated Jaccard similarity.
+
+Kept chunks count the duplicates merged into them in ``metadata["duplicates"]``.
+``filter`` returns copies carrying the counts of their own batch, and never
+changes a chunk it has already returned: a duplicate of an earlier batch's
+chunk, which may be indexed by then, is collected for ``take_updates``.
+"""
+
+import re
+import zlib
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def _lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) so the LSH S-curve threshold (1/b)^(1/r) sits a bit
+    below ``threshold``. Candidates are verified afterwards, so erring towards
+    recall only costs a few extra comparisons.
+    """
+    target = max(0.05, threshold - 0.1)
+    best = (num_perm, 1)
+    best_error = float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1.0 / bands) ** (1.0 / rows) - target)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class ChunkDeduplicator:
+    """
+    Drops chunks whose estimated Jaccard similarity to an already kept chunk
+    is at or above ``threshold``. State persists across calls so duplicates
+    are caught across batches of the same ingestion run.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128,
+                 shingle_size: int = 5, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+
+        self._signatures: List[np.ndarray] = []
+        self._kept: List[Document] = []
+        self._buckets: List[Dict[bytes, List[int]]] = [defaultdict(list) for _ in range(self.bands)]
+        # Duplicates found for chunks returned by earlier calls, by kept index
+        self._late: Dict[int, int] = defaultdict(int)
+        self.removed = 0
+
+    def _shingles(self, text: str) -> np.ndarray:
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        if len(tokens) <= self.shingle_size:
+            grams = {" ".join(tokens)}
+        else:
+            grams = {
+                " ".join(tokens[i:i + self.shingle_size])
+                for i in range(len(tokens) - self.shingle_size + 1)
+            }
+        return np.fromiter(
+            (zlib.crc32(gram.encode("utf-8")) for gram in grams),
+            dtype=np.uint64,
+            count=len(grams),
+        )
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of the text's word shingles."""
+        hashes = self._shingles(text)
+        # Universal hashing (a*x + b) mod p; uint64 overflow is intentional
+        with np.errstate(over="ignore"):
+            permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return np.bitwise_and(permuted, _MAX_HASH).min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def find_duplicate(self, signature: np.ndarray) -> Optional[int]:
+        """Index of a kept chunk similar to ``signature``, if any."""
+        seen = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                similarity = float(np.mean(self._signatures[candidate] == signature))
+                if similarity >= self.threshold:
+                    return candidate
+        return None
+
+    def _keep(self, chunk: Document, signature: np.ndarray) -> None:
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        self._kept.append(chunk)
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].append(index)
+
+    def filter(self, chunks: List[Document]) -> List[Document]:
+        """
+        Return ``chunks`` without near-duplicates. A surviving chunk is returned
+        as a copy recording how many duplicates of this call were merged into it
+        in ``metadata["duplicates"]``; the input chunks are not changed.
+        """
+        first = len(self._kept)
+        merged: Dict[int, int] = defaultdict(int)
+        unique = []
+        for chunk in chunks:
+            if not chunk.page_content.strip():
+                unique.append(chunk)
+                continue
+            signature = self.signature(chunk.page_content)
+            match = self.find_duplicate(signature)
+            if match is None:
+                self._keep(chunk, signature)
+                unique.append(len(self._kept) - 1)
+            else:
+                if match >= first:
+                    merged[match] += 1
+                else:
+                    self._late[match] += 1
+                self.removed += 1
+        # Counted in full before anything is handed out for indexing
+        for index in range(first, len(self._kept)):
+            self._kept[index] = _with_duplicates(self._kept[index], merged.get(index, 0))
+        return [self._kept[item] if isinstance(item, int) else item for item in unique]
+
+    def take_updates(self) -> List[Document]:
+        """
+        Chunks returned earlier that have since absorbed duplicates, as copies
+        with their new counts; the caller writes them to the store. Chunks
+        without a ``chunk_id`` are not indexed yet and are updated in place.
+        """
+        updated = []
+        for index, count in self._late.items():
+            kept = self._kept[index]
+            if kept.metadata.get("chunk_id"):
+                self._kept[index] = _with_duplicates(kept, count)
+                updated.append(self._kept[index])
+            else:
+                kept.metadata["duplicates"] = kept.metadata.get("duplicates", 0) + count
+        self._late.clear()
+        return updated
+
+
+def _with_duplicates(chunk: Document, count: int) -> Document:
+    """Copy of ``chunk`` with ``count`` more duplicates merged into it"""
+    metadata = dict(chunk.metadata)
+    if count:
+        metadata["duplicates"] = metadata.get("duplicates", 0) + count
+    return Document(page_content=chunk.page_content, metadata=metadata)
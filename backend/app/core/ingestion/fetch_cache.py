@@ -0,0 +1,139 @@
+"""
+HTTP fetch cache with conditional requests for URL ingestion.
+
+Response bodies are stored on disk together with their ``ETag`` and
+``Last-Modified`` validators. Later fetches send ``If-None-Match`` /
+``If-Modified-Since``; a ``304 Not Modified`` answer means the cached body is
+still current, so the caller can skip parsing, chunking and embedding.
+"""
+
+import os
+import json
+import uuid
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import httpx
+from bs4 import BeautifulSoup
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = "adaptive-rag/1.0"
+
+
+@dataclass
+class FetchResult:
+    """Outcome of a conditional fetch"""
+    url: str
+    body: str
+    not_modified: bool
+    content_type: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class FetchCache:
+    """Disk-backed cache of URL responses keyed by URL"""
+
+    def __init__(self, cache_dir: str = "./.fetch_cache", timeout: float = 30.0,
+                 client: Optional[httpx.Client] = None):
+        self.cache_dir = cache_dir
+        self.client = client or httpx.Client(
+            timeout=timeout,
+            follow_redirects=True,
+            headers={"User-Agent": os.getenv("USER_AGENT", DEFAULT_USER_AGENT)},
+        )
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return f"{base}.json", f"{base}.body"
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Cached entry for ``url`` with its body, or None if not cached."""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                entry = json.load(f)
+            with open(body_path, encoding="utf-8") as f:
+                entry["body"] = f.read()
+            return entry
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, url: str, body: str, headers: httpx.Headers) -> None:
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        entry = {
+            "url": url,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "content_type": headers.get("content-type"),
+            "fetched_at": datetime.utcnow().isoformat(),
+        }
+        # Body first, then metadata, each replaced atomically
+        for path, content in ((body_path, body), (meta_path, json.dumps(entry))):
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+    def fetch(self, url: str) -> FetchResult:
+        """
+        Fetch ``url``, revalidating a cached copy with conditional headers.
+
+        Raises ``httpx.HTTPError`` on network errors and non-success status codes.
+        """
+        entry = self.get(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = self.client.get(url, headers=headers)
+
+        if response.status_code == 304 and entry:
+            logger.info(f"Not modified: {url}")
+            return FetchResult(
+                url=url,
+                body=entry["body"],
+                not_modified=True,
+                content_type=entry.get("content_type"),
+                etag=entry.get("etag"),
+                last_modified=entry.get("last_modified"),
+            )
+
+        response.raise_for_status()
+        body = response.text
+        # Only responses with validators can be revalidated later
+        if response.headers.get("etag") or response.headers.get("last-modified"):
+            self._store(url, body, response.headers)
+        return FetchResult(
+            url=url,
+            body=body,
+            not_modified=False,
+            content_type=response.headers.get("content-type"),
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+        )
+
+
+def html_to_document(url: str, html: str) -> Document:
+    """Parse an HTML page into a Document, with the same metadata WebBaseLoader produces."""
+    soup = BeautifulSoup(html, "html.parser")
+    metadata = {"source": url}
+    if soup.title and soup.title.string:
+        metadata["title"] = soup.title.string.strip()
+    description = soup.find("meta", attrs={"name": "description"})
+    if description and description.get("content"):
+        metadata["description"] = description.get("content")
+    html_tag = soup.find("html")
+    if html_tag and html_tag.get("lang"):
+        metadata["language"] = html_tag.get("lang")
+    return Document(page_content=soup.get_text(), metadata=metadata)
@@ -0,0 +1,188 @@
+"""
+Blue/green index generations for the vectorstore.
+
+Each ingestion run builds a complete index in its own generation directory
+under ``<root>/generations``. Once the build succeeds, the ``ACTIVE`` pointer
+file is replaced atomically so new queries switch to the new generation while
+in-flight queries finish against the old one. Retired generations are removed
+once no local reader holds them and a grace period has passed, which gives
+other worker processes time to drain.
+"""
+
+import os
+import shutil
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Name used for an index stored directly in the root directory (pre-generation layout)
+LEGACY_GENERATION = "legacy"
+
+
+class IndexGenerations:
+    """Tracks index generation directories and the active generation pointer."""
+
+    POINTER_FILE = "ACTIVE"
+    GENERATIONS_DIR = "generations"
+    RETIRED_MARKER = "RETIRED"
+
+    def __init__(self, root: str = "./.chroma", grace_period_seconds: float = 60.0):
+        self.root = root
+        self.grace_period_seconds = grace_period_seconds
+        self._readers: Counter = Counter()
+        self._lock = threading.Lock()
+        # Called with a generation path before its directory is deleted
+        self.on_remove: Optional[Callable[[str], None]] = None
+
+    @property
+    def generations_dir(self) -> str:
+        return os.path.join(self.root, self.GENERATIONS_DIR)
+
+    @property
+    def pointer_path(self) -> str:
+        return os.path.join(self.root, self.POINTER_FILE)
+
+    def path(self, generation: str) -> str:
+        """Directory holding the given generation."""
+        if generation == LEGACY_GENERATION:
+            return self.root
+        return os.path.join(self.generations_dir, generation)
+
+    def active(self) -> Optional[str]:
+        """Name of the active generation, or None if no index exists yet."""
+        try:
+            with open(self.pointer_path) as f:
+                generation = f.read().strip()
+            if generation:
+                return generation
+        except FileNotFoundError:
+            pass
+
+        if os.path.exists(os.path.join(self.root, "chroma.sqlite3")):
+            return LEGACY_GENERATION
+        return None
+
+    def active_path(self) -> Optional[str]:
+        generation = self.active()
+        return self.path(generation) if generation else None
+
+    def list(self) -> List[str]:
+        """All generation names present on disk, oldest first."""
+        generations = []
+        if os.path.isdir(self.generations_dir):
+            generations = sorted(os.listdir(self.generations_dir))
+        if os.path.exists(os.path.join(self.root, "chroma.sqlite3")):
+            generations.insert(0, LEGACY_GENERATION)
+        return generations
+
+    def create(self) -> str:
+        """Create an empty generation directory and return its name."""
+        generation = f"gen-{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:6]}"
+        os.makedirs(self.path(generation), exist_ok=False)
+        logger.info(f"Created index generation {generation}")
+        return generation
+
+    def activate(self, generation: str) -> None:
+        """Atomically point readers at ``generation`` and retire the previous one."""
+        previous = self.active()
+        os.makedirs(self.root, exist_ok=True)
+
+        tmp_path = f"{self.pointer_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(generation)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.pointer_path)
+        logger.info(f"Activated index generation {generation}")
+
+        if previous and previous != generation:
+            self._mark_retired(previous)
+
+    def discard(self, generation: str) -> None:
+        """Delete a generation that was never activated (e.g. a failed build)."""
+        if generation != self.active():
+            self._remove(generation)
+
+    @contextmanager
+    def reader(self) -> Iterator[Tuple[Optional[str], Optional[str]]]:
+        """
+        Pin the active generation for the duration of a read.
+
+        Yields ``(generation, path)``; both are None if no index exists.
+        """
+        with self._lock:
+            generation = self.active()
+            if generation:
+                self._readers[generation] += 1
+        try:
+            yield generation, self.path(generation) if generation else None
+        finally:
+            if generation:
+                with self._lock:
+                    self._readers[generation] -= 1
+                    if self._readers[generation] <= 0:
+                        del self._readers[generation]
+
+    def collect_garbage(self) -> List[str]:
+        """Remove retired generations with no local readers past the grace period."""
+        removed = []
+        active = self.active()
+        for generation in self.list():
+            if generation == active:
+                continue
+            retired_at = self._retired_at(generation)
+            if retired_at is None or time.time() - retired_at < self.grace_period_seconds:
+                continue
+            with self._lock:
+                if self._readers.get(generation):
+                    continue
+            self._remove(generation)
+            removed.append(generation)
+        return removed
+
+    def _mark_retired(self, generation: str) -> None:
+        marker = self._retired_marker_path(generation)
+        try:
+            with open(marker, "w") as f:
+                f.write(str(time.time()))
+        except OSError as e:
+            logger.warning(f"Could not mark generation {generation} retired: {e}")
+
+    def _retired_marker_path(self, generation: str) -> str:
+        if generation == LEGACY_GENERATION:
+            return os.path.join(self.root, f"{LEGACY_GENERATION}.{self.RETIRED_MARKER}")
+        return os.path.join(self.path(generation), self.RETIRED_MARKER)
+
+    def _retired_at(self, generation: str) -> Optional[float]:
+        try:
+            with open(self._retired_marker_path(generation)) as f:
+                return float(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def _remove(self, generation: str) -> None:
+        path = self.path(generation)
+        if self.on_remove:
+            self.on_remove(path)
+
+        if generation == LEGACY_GENERATION:
+            # Legacy index files live next to the generations dir and pointer
+            keep = {self.GENERATIONS_DIR, self.POINTER_FILE}
+            for entry in os.listdir(self.root):
+                if entry in keep or entry.startswith(f"{self.POINTER_FILE}."):
+                    continue
+                entry_path = os.path.join(self.root, entry)
+                if os.path.isdir(entry_path):
+                    shutil.rmtree(entry_path, ignore_errors=True)
+                else:
+                    os.remove(entry_path)
+        else:
+            shutil.rmtree(path, ignore_errors=True)
+        logger.info(f"Removed index generation {generation}")
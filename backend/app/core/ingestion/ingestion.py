@@ -1,27 +1,78 @@
 import os
-import shutil
 import logging
-from typing import List
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+from chromadb.api.shared_system_client import SharedSystemClient
 from dotenv import load_dotenv
 from langchain.schema import Document
 from langchain_chroma import Chroma
-from langchain_community.document_loaders import WebBaseLoader
+from langchain_core.vectorstores import VectorStoreRetriever
 from langchain_experimental.text_splitter import SemanticChunker
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from ..models.model import get_embedding_model
+from .chunk_ids import assign_chunk_ids
+from .dedup import ChunkDeduplicator
+from .fetch_cache import FetchCache, html_to_document
+from .generations import IndexGenerations
 from .healthcare_data import get_healthcare_urls
+from .loaders import find_files, iter_file_documents
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 load_dotenv()
 
+VECTORSTORE_PATH = os.getenv("VECTORSTORE_PATH", "./.chroma")
+COLLECTION_NAME = os.getenv("COLLECTION_NAME", "rag-chroma")
+
+# Response bodies and ETag/Last-Modified validators for conditional re-crawls
+FETCH_CACHE_DIR = os.getenv("FETCH_CACHE_DIR", "./.fetch_cache")
+
+# Near-duplicate chunk removal
+DEDUP_ENABLED = os.getenv("INGESTION_DEDUP", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("INGESTION_DEDUP_THRESHOLD", "0.85"))
+
+# Blue/green index generations under VECTORSTORE_PATH
+index_generations = IndexGenerations(
+    VECTORSTORE_PATH,
+    grace_period_seconds=float(os.getenv("INDEX_GC_GRACE_SECONDS", "60")),
+)
+
+# Read handles on index generations, keyed by directory
+_vectorstores: Dict[str, Chroma] = {}
+_vectorstores_lock = threading.Lock()
+
+# Called with (stage, done, total) as an ingestion run makes progress
+ProgressCallback = Callable[[str, int, int], None]
+
+# Number of chunks embedded and written per vectorstore call
+INDEX_BATCH_SIZE = 64
+
+# Number of streamed file segments chunked and indexed together in bulk ingestion
+BULK_DOCUMENT_BATCH_SIZE = 32
+
+
+class IngestionCancelled(Exception):
+    """Raised when an ingestion run is cancelled between steps."""
+
+
 class DocumentIngestion:
     """Simple document ingestion with semantic chunking."""
 
-    def __init__(self, collection_name: str = "rag-chroma", persist_directory: str = "./.chroma"):
+    def __init__(
+        self,
+        collection_name: str = COLLECTION_NAME,
+        persist_directory: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        cancel_event: Optional[threading.Event] = None,
+        deduplicate: bool = DEDUP_ENABLED,
+    ):
         self.embed_model = get_embedding_model()
         self.collection_name = collection_name
-        self.persist_directory = persist_directory
+        # Default to the active index generation
+        self.persist_directory = persist_directory or _active_or_new_generation_path()
+        self.progress = progress
+        self.cancel_event = cancel_event
 
         # Semantic chunker - the main improvement
         self.semantic_splitter = SemanticChunker(
@@ -36,8 +87,23 @@ class DocumentIngestion:
             chunk_overlap=50
         )
 
+        # Drops near-identical boilerplate chunks across the whole run
+        self.deduplicator = ChunkDeduplicator(threshold=DEDUP_THRESHOLD) if deduplicate else None
+        self.stats = {"chunks": 0, "duplicates_removed": 0, "sources_unchanged": 0}
+        self.fetch_cache = FetchCache(FETCH_CACHE_DIR)
+
         self.vectorstore = self._get_vectorstore()
 
+    def _report(self, stage: str, done: int, total: int) -> None:
+        """Forward progress to the registered callback, if any."""
+        if self.progress:
+            self.progress(stage, done, total)
+
+    def _check_cancelled(self) -> None:
+        """Abort the run if cancellation was requested."""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise IngestionCancelled("Ingestion cancelled")
+
     def _get_vectorstore(self) -> Chroma:
         """Get or create vectorstore."""
         if os.path.exists(self.persist_directory):
@@ -55,23 +121,63 @@ class DocumentIngestion:
                 persist_directory=self.persist_directory
             )
 
-    def load_documents(self, urls: List[str]) -> List[Document]:
-        """Load documents from URLs."""
+    def load_documents(self, urls: List[str], reuse_from: Optional[str] = None) -> List[Document]:
+        """
+        Load documents from URLs with conditional requests against the fetch cache.
+
+        When a URL answers 304 Not Modified and ``reuse_from`` names an index
+        directory holding its chunks, those chunks and their embeddings are
+        copied into this vectorstore and the URL is not parsed or chunked again.
+        """
         docs = []
-        for url in urls:
+        self._report("loading", 0, len(urls))
+        for i, url in enumerate(urls, start=1):
+            self._check_cancelled()
             try:
                 logger.info(f"Loading: {url}")
-                loader = WebBaseLoader(url)
-                docs.extend(loader.load())
+                result = self.fetch_cache.fetch(url)
+                if result.not_modified and reuse_from and self._reuse_chunks(reuse_from, url):
+                    self.stats["sources_unchanged"] += 1
+                else:
+                    docs.append(html_to_document(url, result.body))
             except Exception as e:
                 logger.error(f"Failed to load {url}: {e}")
+            self._report("loading", i, len(urls))
         return docs
 
+    def _reuse_chunks(self, source_path: str, url: str) -> bool:
+        """Copy a source's chunks and embeddings from another index; False if it has none."""
+        existing = _open_vectorstore(source_path).get(
+            where={"source": url},
+            include=["embeddings", "documents", "metadatas"],
+        )
+        if not existing["ids"]:
+            return False
+
+        self.vectorstore._collection.upsert(
+            ids=existing["ids"],
+            embeddings=existing["embeddings"],
+            documents=existing["documents"],
+            metadatas=existing["metadatas"],
+        )
+        if self.deduplicator:
+            # Register reused chunks so new chunks that duplicate them are dropped
+            self.deduplicator.filter([
+                Document(page_content=text, metadata=metadata)
+                for text, metadata in zip(existing["documents"], existing["metadatas"])
+            ])
+            self._store_duplicate_counts()
+        self.stats["chunks"] += len(existing["ids"])
+        logger.info(f"Reused {len(existing['ids'])} unchanged chunks from {url}")
+        return True
+
     def chunk_documents(self, documents: List[Document]) -> List[Document]:
-        """Chunk documents using semantic chunking with fallback."""
+        """Chunk documents using semantic chunking with fallback, then drop near-duplicates."""
         all_chunks = []
+        self._report("chunking", 0, len(documents))
 
-        for doc in documents:
+        for i, doc in enumerate(documents, start=1):
+            self._check_cancelled()
             try:
                 # Try semantic chunking first
                 chunks = self.semantic_splitter.split_documents([doc])
@@ -90,106 +196,276 @@ class DocumentIngestion:
             except Exception as e:
                 logger.error(f"Semantic chunking failed: {e}, using fallback")
                 all_chunks.extend(self.fallback_splitter.split_documents([doc]))
+            self._report("chunking", i, len(documents))
+
+        if self.deduplicator:
+            removed_before = self.deduplicator.removed
+            all_chunks = self.deduplicator.filter(all_chunks)
+            removed = self.deduplicator.removed - removed_before
+            self.stats["duplicates_removed"] += removed
+            self._store_duplicate_counts()
+            if removed:
+                logger.info(f"Removed {removed} near-duplicate chunks")
 
+        self.stats["chunks"] += len(all_chunks)
         return all_chunks
 
+    def _store_duplicate_counts(self) -> None:
+        """Write the new duplicate counts of chunks indexed by earlier batches"""
+        updated = self.deduplicator.take_updates()
+        if updated:
+            self.vectorstore._collection.update(
+                ids=[chunk.metadata["chunk_id"] for chunk in updated],
+                metadatas=[chunk.metadata for chunk in updated],
+            )
+
     def add_to_vectorstore(self, chunks: List[Document]) -> None:
-        """Add chunks to vectorstore."""
-        if chunks:
-            self.vectorstore.add_documents(chunks)
-            logger.info(f"Added {len(chunks)} chunks to vectorstore")
+        """Add chunks to vectorstore in batches so progress can be reported."""
+        # Stable ids, so chat messages can reference chunks across re-ingestion
+        chunks = assign_chunk_ids(chunks)
+        if not chunks:
+            return
+        self._report("indexing", 0, len(chunks))
+        for start in range(0, len(chunks), INDEX_BATCH_SIZE):
+            self._check_cancelled()
+            batch = chunks[start:start + INDEX_BATCH_SIZE]
+            self.vectorstore.add_documents(batch, ids=[chunk.metadata["chunk_id"] for chunk in batch])
+            self._report("indexing", start + len(batch), len(chunks))
+        logger.info(f"Added {len(chunks)} chunks to vectorstore")
 
     def get_retriever(self):
         """Get retriever for the vectorstore."""
         return self.vectorstore.as_retriever()
 
-def create_vectorstore(urls: List[str] = None) -> DocumentIngestion:
-    """Create and populate vectorstore with documents."""
+def create_vectorstore(
+    urls: List[str] = None,
+    progress: Optional[ProgressCallback] = None,
+    cancel_event: Optional[threading.Event] = None,
+) -> DocumentIngestion:
+    """
+    Build a new index generation from URLs and make it active.
+
+    The new generation is built side by side with the active one, so
+    retrieval keeps serving the previous index until the swap.
+    """
 
     # Default URLs if none provided - AI in Healthcare focus
     if urls is None:
         urls = get_healthcare_urls()
 
-    # Create ingestion system
-    ingestion = DocumentIngestion()
+    generation = index_generations.create()
+    try:
+        # Create ingestion system
+        ingestion = DocumentIngestion(
+            persist_directory=index_generations.path(generation),
+            progress=progress,
+            cancel_event=cancel_event,
+        )
 
-    # Load and process documents
-    logger.info("🚀 Starting document ingestion")
-    documents = ingestion.load_documents(urls)
+        # Load and process documents; unchanged sources reuse the active index
+        logger.info("🚀 Starting document ingestion")
+        with index_generations.reader() as (_, active_path):
+            documents = ingestion.load_documents(urls, reuse_from=active_path)
 
-    if not documents:
-        logger.error("No documents loaded!")
-        return ingestion
+        if ingestion.stats["sources_unchanged"]:
+            logger.info(f"{ingestion.stats['sources_unchanged']} sources unchanged since last crawl")
 
-    logger.info(f"Loaded {len(documents)} documents")
+        if not documents and not ingestion.stats["sources_unchanged"]:
+            logger.error("No documents loaded!")
+            # Never replace a populated index with an empty one
+            if index_generations.active() is None:
+                index_generations.activate(generation)
+            else:
+                index_generations.discard(generation)
+            return ingestion
 
-    # Chunk documents
-    chunks = ingestion.chunk_documents(documents)
-    logger.info(f"Created {len(chunks)} chunks")
+        logger.info(f"Loaded {len(documents)} documents")
 
-    # Add to vectorstore
-    ingestion.add_to_vectorstore(chunks)
+        # Chunk documents
+        chunks = ingestion.chunk_documents(documents)
+        logger.info(
+            f"Created {len(chunks)} chunks "
+            f"({ingestion.stats['duplicates_removed']} near-duplicates removed)"
+        )
+
+        # Add to vectorstore
+        ingestion.add_to_vectorstore(chunks)
+    except BaseException:
+        index_generations.discard(generation)
+        raise
+
+    index_generations.activate(generation)
     logger.info("✅ Ingestion complete!")
 
     return ingestion
 
 # Simple access functions
+def _open_vectorstore(path: str) -> Chroma:
+    """Open (and cache) a read-only handle on the vectorstore at ``path``."""
+    with _vectorstores_lock:
+        vectorstore = _vectorstores.get(path)
+        if vectorstore is None:
+            vectorstore = Chroma(
+                collection_name=COLLECTION_NAME,
+                embedding_function=get_embedding_model(),
+                persist_directory=path
+            )
+            _vectorstores[path] = vectorstore
+        return vectorstore
+
+def _release_vectorstore(path: str) -> None:
+    """Drop cached handles for a generation that is about to be deleted."""
+    with _vectorstores_lock:
+        _vectorstores.pop(path, None)
+    # chromadb keeps one System per persist directory in a private class-level map
+    # (checked against chromadb 0.5.23). clear_system_cache() would also drop the
+    # systems of generations still in use, so only this path's entry is released.
+    systems = getattr(SharedSystemClient, "_identifier_to_system", None)
+    if not isinstance(systems, dict):
+        logger.warning(f"Cannot release vectorstore at {path}: unsupported chromadb version")
+        return
+    try:
+        system = systems.pop(path, None)
+        if system is not None:
+            system.stop()
+    except Exception as e:
+        logger.warning(f"Could not release vectorstore at {path}: {e}")
+
+index_generations.on_remove = _release_vectorstore
+
 def get_retriever():
-    """Get the default retriever from existing vectorstore."""
-    # Just load existing vectorstore without re-ingesting
-    ingestion = DocumentIngestion()
-    return ingestion.get_retriever()
-
-def clear_vectorstore(persist_directory: str = "./.chroma"):
-    """Clear the existing vectorstore."""
-    if os.path.exists(persist_directory):
-        try:
-            shutil.rmtree(persist_directory)
-            logger.info(f"Cleared vectorstore at {persist_directory}")
-        except OSError as e:
-            # In Docker, the directory might be mounted, so just clear contents
-            logger.warning(f"Cannot remove directory {persist_directory}: {e}")
-            logger.info("Clearing directory contents instead...")
-            for root, dirs, files in os.walk(persist_directory):
-                for file in files:
-                    try:
-                        os.remove(os.path.join(root, file))
-                    except Exception as e:
-                        logger.warning(f"Could not remove {file}: {e}")
-            logger.info("Cleared vectorstore contents")
-    else:
+    """Get a retriever for the currently active index generation."""
+    path = _active_or_new_generation_path()
+    return _open_vectorstore(path).as_retriever()
+
+@contextmanager
+def active_retriever() -> Iterator[Optional[VectorStoreRetriever]]:
+    """
+    Retriever pinned to the active generation for the duration of the block,
+    so the generation is not garbage-collected mid-query. Yields None if no
+    index has been built yet.
+    """
+    with index_generations.reader() as (generation, path):
+        yield _open_vectorstore(path).as_retriever() if path else None
+
+def _active_or_new_generation_path() -> str:
+    """Path of the active generation, creating an empty one if none exists."""
+    path = index_generations.active_path()
+    if path is None:
+        generation = index_generations.create()
+        index_generations.activate(generation)
+        path = index_generations.path(generation)
+    return path
+
+def clear_vectorstore(persist_directory: str = VECTORSTORE_PATH):
+    """
+    Clear the existing vectorstore by activating an empty generation.
+
+    Old generations are removed by garbage collection once their readers
+    have drained.
+    """
+    generations = (
+        index_generations
+        if os.path.abspath(persist_directory) == os.path.abspath(index_generations.root)
+        else IndexGenerations(persist_directory)
+    )
+    if generations.active() is None:
         logger.info("No existing vectorstore to clear")
+        return
+    generations.activate(generations.create())
+    generations.collect_garbage()
+    logger.info(f"Cleared vectorstore at {persist_directory}")
 
-def ingest_urls(urls: List[str]) -> None:
-    """Ingest documents from URLs."""
-    clear_vectorstore()
-    create_vectorstore(urls)
+def ingest_urls(
+    urls: List[str],
+    progress: Optional[ProgressCallback] = None,
+    cancel_event: Optional[threading.Event] = None,
+) -> Dict[str, int]:
+    """Rebuild the index from URLs without taking retrieval offline."""
+    # Sweep generations retired by earlier runs whose grace period has passed
+    index_generations.collect_garbage()
+    ingestion = create_vectorstore(urls, progress=progress, cancel_event=cancel_event)
+    index_generations.collect_garbage()
+    return ingestion.stats
 
-def ingest_texts(texts: List[str]) -> None:
-    """Ingest documents from raw texts."""
+def ingest_texts(
+    texts: List[str],
+    progress: Optional[ProgressCallback] = None,
+    cancel_event: Optional[threading.Event] = None,
+) -> Dict[str, int]:
+    """Ingest documents from raw texts into the active index generation."""
     # Create Document objects from texts
     documents = [Document(page_content=text) for text in texts]
     
     # Create ingestion system
-    ingestion = DocumentIngestion()
+    ingestion = DocumentIngestion(progress=progress, cancel_event=cancel_event)
     
     # Chunk documents
     chunks = ingestion.chunk_documents(documents)
     
     # Add to vectorstore
     ingestion.add_to_vectorstore(chunks)
+    return ingestion.stats
+
+def ingest_paths(
+    paths: List[str],
+    progress: Optional[ProgressCallback] = None,
+    cancel_event: Optional[threading.Event] = None,
+    sources: Optional[Dict[str, str]] = None,
+) -> Dict[str, int]:
+    """
+    Ingest local files and directories into the active index generation.
+
+    Files are parsed as streams and indexed in small batches, so memory use
+    stays bounded regardless of file size. ``sources`` gives the source
+    recorded for a file instead of its path, so chunk ids stay stable for
+    files ingested from temporary copies.
+    """
+    files = find_files(paths)
+    sources = sources or {}
+    ingestion = DocumentIngestion(progress=progress, cancel_event=cancel_event)
+    documents = 0
+
+    def index(batch: List[Document]) -> None:
+        nonlocal documents
+        chunks = ingestion.chunk_documents(batch)
+        ingestion.add_to_vectorstore(chunks)
+        documents += len(batch)
+
+    batch: List[Document] = []
+    if progress:
+        progress("loading", 0, len(files))
+    for i, path in enumerate(files, start=1):
+        try:
+            for document in iter_file_documents(path, sources.get(path)):
+                batch.append(document)
+                if len(batch) >= BULK_DOCUMENT_BATCH_SIZE:
+                    index(batch)
+                    batch = []
+        except (OSError, UnicodeError, ValueError) as e:
+            logger.error(f"Failed to load {path}: {e}")
+        if progress:
+            progress("loading", i, len(files))
+    if batch:
+        index(batch)
+
+    stats = {"files": len(files), "documents": documents, **ingestion.stats}
+    logger.info(
+        f"Ingested {stats['files']} files as {stats['documents']} documents "
+        f"and {stats['chunks']} chunks ({stats['duplicates_removed']} duplicates removed)"
+    )
+    return stats
 
 def ensure_vectorstore_exists() -> None:
     """Ensure the vectorstore exists, create if not."""
-    if not os.path.exists("./.chroma"):
+    if index_generations.active() is None:
         logger.info("No vectorstore found, creating with default documents...")
         create_vectorstore()
+    index_generations.collect_garbage()
 
 if __name__ == "__main__":
-    # Clear existing vectorstore to ensure no duplicates
-    clear_vectorstore()
-    
-    # Create fresh vectorstore
+    # Build a fresh generation; the previous one is retired on activation
     ingestion = create_vectorstore()
+    index_generations.collect_garbage()
     retriever = ingestion.get_retriever()
     print(f"Retriever ready with vectorstore: {ingestion.vectorstore}")
\ No newline at end of file
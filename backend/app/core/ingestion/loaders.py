@@ -0,0 +1,237 @@
+"""
+Streaming loaders for local files and directories.
+
+Files are read incrementally and emitted as bounded-size Documents, so bulk
+ingestion never holds a whole file in memory. Supported formats are plain
+text, Markdown, HTML and JSON Lines.
+"""
+
+import os
+import json
+import logging
+from html.parser import HTMLParser
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+# Target size of each emitted Document; chunking happens downstream
+MAX_SEGMENT_CHARS = 20_000
+
+# Bytes read per call when feeding incremental parsers
+READ_SIZE = 64 * 1024
+
+TEXT_EXTENSIONS = {".txt", ".text"}
+MARKDOWN_EXTENSIONS = {".md", ".markdown"}
+HTML_EXTENSIONS = {".html", ".htm"}
+JSONL_EXTENSIONS = {".jsonl", ".ndjson"}
+SUPPORTED_EXTENSIONS = TEXT_EXTENSIONS | MARKDOWN_EXTENSIONS | HTML_EXTENSIONS | JSONL_EXTENSIONS
+
+# Keys checked, in order, for the document body of a JSON Lines record
+JSONL_TEXT_KEYS = ("page_content", "text", "content", "body")
+
+
+class _SegmentBuffer:
+    """Accumulates text pieces and yields Documents of roughly bounded size."""
+
+    def __init__(self, source: str, metadata: Optional[Dict[str, Any]] = None,
+                 max_chars: int = MAX_SEGMENT_CHARS):
+        self.source = source
+        self.metadata = metadata or {}
+        self.max_chars = max_chars
+        self.parts: List[str] = []
+        self.size = 0
+        self.segment = 0
+
+    def add(self, text: str) -> None:
+        self.parts.append(text)
+        self.size += len(text)
+
+    @property
+    def full(self) -> bool:
+        return self.size >= self.max_chars
+
+    def flush(self) -> Optional[Document]:
+        text = "".join(self.parts).strip()
+        self.parts = []
+        self.size = 0
+        if not text:
+            return None
+        metadata = {**self.metadata, "source": self.source, "segment": self.segment}
+        self.segment += 1
+        return Document(page_content=text, metadata=metadata)
+
+
+def iter_text_documents(stream: IO[str], source: str, markdown: bool = False,
+                        max_chars: int = MAX_SEGMENT_CHARS) -> Iterator[Document]:
+    """
+    Yield Documents from a text or Markdown stream, line by line.
+
+    Segments are cut at paragraph breaks once they reach ``max_chars``; for
+    Markdown they are also cut before headings so sections stay together.
+    Overlong paragraphs are cut at twice the limit regardless.
+    """
+    buffer = _SegmentBuffer(source, {"format": "markdown" if markdown else "text"}, max_chars)
+    for line in stream:
+        at_heading = markdown and line.startswith("#") and buffer.size >= max_chars // 4
+        at_paragraph = not line.strip() and buffer.full
+        if at_heading or at_paragraph or buffer.size >= 2 * max_chars:
+            doc = buffer.flush()
+            if doc:
+                yield doc
+        buffer.add(line)
+
+    doc = buffer.flush()
+    if doc:
+        yield doc
+
+
+class _StreamingHTMLTextParser(HTMLParser):
+    """Collects visible text from HTML fed incrementally."""
+
+    SKIP_TAGS = {"script", "style", "noscript", "template", "svg"}
+    BLOCK_TAGS = {
+        "p", "div", "section", "article", "li", "ul", "ol", "table", "tr",
+        "h1", "h2", "h3", "h4", "h5", "h6", "br", "pre", "blockquote",
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces: List[str] = []
+        self.title: Optional[str] = None
+        self._skip_depth = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in self.BLOCK_TAGS:
+            self.pieces.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == "title":
+            self._in_title = False
+        elif tag in self.BLOCK_TAGS:
+            self.pieces.append("\n")
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._in_title:
+            self.title = (self.title or "") + data.strip()
+            return
+        if data.strip():
+            self.pieces.append(data)
+
+    def drain(self) -> List[str]:
+        pieces, self.pieces = self.pieces, []
+        return pieces
+
+
+def iter_html_documents(stream: IO[str], source: str,
+                        max_chars: int = MAX_SEGMENT_CHARS) -> Iterator[Document]:
+    """Yield Documents with the visible text of an HTML stream, parsed incrementally."""
+    parser = _StreamingHTMLTextParser()
+    buffer = _SegmentBuffer(source, {"format": "html"}, max_chars)
+
+    def drain() -> Iterator[Document]:
+        for piece in parser.drain():
+            if piece == "\n" and buffer.full:
+                doc = buffer.flush()
+                if doc:
+                    yield doc
+            buffer.add(piece)
+            if parser.title:
+                buffer.metadata["title"] = parser.title
+
+    while True:
+        data = stream.read(READ_SIZE)
+        if not data:
+            break
+        parser.feed(data)
+        yield from drain()
+
+    parser.close()
+    yield from drain()
+    doc = buffer.flush()
+    if doc:
+        yield doc
+
+
+def iter_jsonl_documents(stream: IO[str], source: str) -> Iterator[Document]:
+    """
+    Yield one Document per JSON Lines record.
+
+    The body is taken from the first of ``page_content``, ``text``,
+    ``content`` or ``body``; a ``metadata`` object and other scalar fields
+    become Document metadata. Malformed lines are skipped.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping invalid JSON on line {line_number} of {source}: {e}")
+            continue
+        if not isinstance(record, dict):
+            continue
+
+        text = next((record[key] for key in JSONL_TEXT_KEYS if isinstance(record.get(key), str)), None)
+        if not text or not text.strip():
+            continue
+
+        metadata = {
+            key: value for key, value in record.items()
+            if key not in JSONL_TEXT_KEYS and isinstance(value, (str, int, float, bool))
+        }
+        if isinstance(record.get("metadata"), dict):
+            metadata.update({
+                key: value for key, value in record["metadata"].items()
+                if isinstance(value, (str, int, float, bool))
+            })
+        metadata.setdefault("source", source)
+        metadata.update({"format": "jsonl", "line": line_number})
+        yield Document(page_content=text, metadata=metadata)
+
+
+def iter_file_documents(path: str, source: Optional[str] = None) -> Iterator[Document]:
+    """Yield Documents from a single supported file, dispatching on its extension."""
+    source = source or path
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding="utf-8", errors="replace") as stream:
+        if extension in JSONL_EXTENSIONS:
+            yield from iter_jsonl_documents(stream, source)
+        elif extension in HTML_EXTENSIONS:
+            yield from iter_html_documents(stream, source)
+        elif extension in MARKDOWN_EXTENSIONS:
+            yield from iter_text_documents(stream, source, markdown=True)
+        elif extension in TEXT_EXTENSIONS:
+            yield from iter_text_documents(stream, source)
+        else:
+            raise ValueError(f"Unsupported file type: {path}")
+
+
+def find_files(paths: List[str]) -> List[str]:
+    """Expand files and directories into a sorted list of supported files."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                for name in sorted(names):
+                    if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                        files.append(os.path.join(root, name))
+        elif os.path.isfile(path):
+            if os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS:
+                files.append(path)
+            else:
+                logger.warning(f"Skipping unsupported file: {path}")
+        else:
+            logger.warning(f"Path not found: {path}")
+    return files
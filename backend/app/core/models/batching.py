@@ -0,0 +1,225 @@
+"""
+Micro-batching for embedding calls.
+
+Concurrent requests each embed a single question. ``BatchingEmbeddings``
+queues those calls and a dispatcher thread merges them into one provider call
+of up to ``max_batch_size`` texts, then hands each caller its own vectors.
+A batch is sent when it is full, when its oldest call has waited
+``max_wait_ms``, or straight away when no batch is in flight, so a lone request
+is not delayed. Queries and documents are batched separately because
+providers embed them differently (``RETRIEVAL_QUERY`` vs ``RETRIEVAL_DOCUMENT``
+for Gemini). Queries are dispatched first.
+"""
+
+import time
+import asyncio
+import inspect
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from ..resilience.circuit_breaker import CircuitBreaker
+from ..resilience.governor import Governor, Priority, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def _supports_task_type(embeddings: Embeddings) -> bool:
+    try:
+        return "task_type" in inspect.signature(embeddings.embed_documents).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+@dataclass
+class _Call:
+    texts: List[str]
+    future: Future = field(default_factory=Future)
+    enqueued: float = field(default_factory=time.monotonic)
+
+
+class _BatchQueue:
+    """Pending calls of one kind (queries or documents)"""
+
+    def __init__(self, name: str, priority: Priority, embed: Callable[[List[str]], List[List[float]]]):
+        self.name = name
+        self.priority = priority
+        self.embed = embed
+        self.calls: Deque[_Call] = deque()
+        self.pending_texts = 0
+
+
+class BatchingEmbeddings(Embeddings):
+    """Embeddings client that coalesces concurrent calls into batched provider calls"""
+
+    def __init__(self, embeddings: Embeddings, governor: Optional[Governor] = None,
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0, max_concurrent_batches: int = 4,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.embeddings = embeddings
+        self.governor = governor
+        self.breaker = breaker
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_concurrent_batches = max_concurrent_batches
+        self.batches_sent = 0
+        self.texts_embedded = 0
+
+        self._queries = _BatchQueue("queries", Priority.INTERACTIVE, self._embed_query_batch)
+        self._documents = _BatchQueue("documents", Priority.BACKGROUND, self.embeddings.embed_documents)
+        self._query_task_type = _supports_task_type(embeddings)
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._closed = False
+        self._dispatcher: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_batches, thread_name_prefix="embedding-batch"
+        )
+
+    def _embed_query_batch(self, texts: List[str]) -> List[List[float]]:
+        # embed_query on Gemini uses the RETRIEVAL_QUERY task type; keep that for batched queries
+        if self._query_task_type:
+            return self.embeddings.embed_documents(texts, task_type="RETRIEVAL_QUERY")
+        if len(texts) == 1:
+            return [self.embeddings.embed_query(texts[0])]
+        return self.embeddings.embed_documents(texts)
+
+    # Caller side
+
+    def _submit(self, queue: _BatchQueue, texts: List[str]) -> Future:
+        call = _Call(texts)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("BatchingEmbeddings is closed")
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(
+                    target=self._dispatch_loop, name="embedding-dispatcher", daemon=True
+                )
+                self._dispatcher.start()
+            queue.calls.append(call)
+            queue.pending_texts += len(texts)
+            self._condition.notify()
+        return call.future
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # Calls that fill a batch on their own skip the queue
+        if len(texts) >= self.max_batch_size:
+            return self._governed(self._documents, texts)
+        return self._submit(self._documents, list(texts)).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._submit(self._queries, [text]).result()[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if len(texts) >= self.max_batch_size:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self._governed, self._documents, texts
+            )
+        return await asyncio.wrap_future(self._submit(self._documents, list(texts)))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vectors = await asyncio.wrap_future(self._submit(self._queries, [text]))
+        return vectors[0]
+
+    # Dispatcher side
+
+    def _ready(self, queue: _BatchQueue, now: float) -> Optional[float]:
+        """0 if the queue should be flushed now, else seconds until it should; None if empty"""
+        if not queue.calls:
+            return None
+        if queue.pending_texts >= self.max_batch_size or self._in_flight == 0:
+            return 0.0
+        return max(0.0, queue.calls[0].enqueued + self.max_wait - now)
+
+    def _take_batch(self, queue: _BatchQueue) -> List[_Call]:
+        batch, size = [], 0
+        while queue.calls and (not batch or size + len(queue.calls[0].texts) <= self.max_batch_size):
+            call = queue.calls.popleft()
+            batch.append(call)
+            size += len(call.texts)
+        queue.pending_texts -= size
+        return batch
+
+    def _dispatch_loop(self) -> None:
+        with self._condition:
+            while not self._closed:
+                if self._in_flight >= self.max_concurrent_batches:
+                    self._condition.wait()
+                    continue
+                now = time.monotonic()
+                timeout = None
+                flushed = False
+                for queue in (self._queries, self._documents):
+                    delay = self._ready(queue, now)
+                    if delay is None:
+                        continue
+                    if delay == 0.0:
+                        self._in_flight += 1
+                        self._executor.submit(self._run_batch, queue, self._take_batch(queue))
+                        flushed = True
+                        break
+                    timeout = delay if timeout is None else min(timeout, delay)
+                if not flushed:
+                    self._condition.wait(timeout)
+
+    def _governed(self, queue: _BatchQueue, texts: List[str]) -> List[List[float]]:
+        def call():
+            if self.governor is None:
+                return queue.embed(texts)
+            return self.governor.call(
+                lambda: queue.embed(texts), priority=queue.priority, tokens=estimate_tokens(texts)
+            )
+        return self.breaker.call(call) if self.breaker else call()
+
+    def _run_batch(self, queue: _BatchQueue, batch: List[_Call]) -> None:
+        texts = [text for call in batch for text in call.texts]
+        try:
+            vectors = self._governed(queue, texts)
+            if len(vectors) != len(texts):
+                raise ValueError(f"Embedding provider returned {len(vectors)} vectors for {len(texts)} texts")
+        except Exception as e:
+            for call in batch:
+                call.future.set_exception(e)
+        else:
+            offset = 0
+            for call in batch:
+                call.future.set_result(vectors[offset:offset + len(call.texts)])
+                offset += len(call.texts)
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self.batches_sent += 1
+                self.texts_embedded += len(texts)
+                self._condition.notify()
+
+    def stats(self) -> Dict[str, float]:
+        with self._condition:
+            return {
+                "batches_sent": self.batches_sent,
+                "texts_embedded": self.texts_embedded,
+                "mean_batch_size": round(self.texts_embedded / self.batches_sent, 2) if self.batches_sent else 0.0,
+                "queued_queries": self._queries.pending_texts,
+                "queued_documents": self._documents.pending_texts,
+            }
+
+    def close(self) -> None:
+        """Stop the dispatcher after completing the calls still queued"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            remaining = []
+            for queue in (self._queries, self._documents):
+                while queue.calls:
+                    remaining.append((queue, self._take_batch(queue)))
+                    self._in_flight += 1
+        for queue, batch in remaining:
+            self._run_batch(queue, batch)
+        self._executor.shutdown(wait=True)
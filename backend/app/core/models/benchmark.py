@@ -0,0 +1,164 @@
+"""
+Model tier benchmark.
+
+Runs every chat role's chain on the sample queries twice, once with the role's
+configured model and once with a reference model using the same settings, and
+reports latency and how often the structured decisions agree. Generation has
+no discrete decision, so only its latency is compared; its reference answers
+are reused as input for the hallucination and answer graders.
+"""
+
+import time
+import logging
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from langchain.schema import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
+
+from .model import CHAT_ROLES, ModelManager, model_manager
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TierResult:
+    """Latency and agreement of one role's model against the reference"""
+    role: str
+    model: str
+    reference: str
+    latencies_ms: List[float] = field(default_factory=list)
+    reference_latencies_ms: List[float] = field(default_factory=list)
+    agreements: List[bool] = field(default_factory=list)
+    errors: int = 0
+
+    @staticmethod
+    def _percentile(values: List[float], q: float) -> Optional[float]:
+        if not values:
+            return None
+        ordered = sorted(values)
+        return round(ordered[int(q * (len(ordered) - 1))], 1)
+
+    @property
+    def agreement(self) -> Optional[float]:
+        if not self.agreements:
+            return None
+        return sum(self.agreements) / len(self.agreements)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "role": self.role,
+            "model": self.model,
+            "reference": self.reference,
+            "samples": len(self.latencies_ms),
+            "p50_ms": self._percentile(self.latencies_ms, 0.5),
+            "p95_ms": self._percentile(self.latencies_ms, 0.95),
+            "reference_p50_ms": self._percentile(self.reference_latencies_ms, 0.5),
+            "reference_p95_ms": self._percentile(self.reference_latencies_ms, 0.95),
+            "agreement": self.agreement,
+            "errors": self.errors,
+        }
+
+
+def _role_chain(role: str, model: Runnable) -> Runnable:
+    """The role's prompt and output schema bound to a specific model, without the governor"""
+    from ..graph.chains import answer_grader, generation, hallucination_grader, retrieval_grader, router
+
+    if role == "generation":
+        return generation.rag_prompt | model | StrOutputParser()
+    prompt, schema = {
+        "router": (router.route_prompt, router.RouteQuery),
+        "retrieval_grader": (retrieval_grader.grade_prompt, retrieval_grader.GradeDocuments),
+        "hallucination_grader": (hallucination_grader.hallucination_prompt, hallucination_grader.GradeHallucinations),
+        "answer_grader": (answer_grader.answer_prompt, answer_grader.GradeAnswer),
+    }[role]
+    return prompt | model.with_structured_output(schema)
+
+
+def _timed(chain: Runnable, inputs: Dict[str, Any]):
+    start = time.perf_counter()
+    output = chain.invoke(inputs)
+    return output, (time.perf_counter() - start) * 1000
+
+
+def _active_retrieve(question: str) -> List[Document]:
+    from ..ingestion.ingestion import active_retriever
+
+    with active_retriever() as retriever:
+        return retriever.invoke(question) if retriever else []
+
+
+def _reference_generation(manager: ModelManager, reference_name: str) -> Runnable:
+    settings = replace(manager.role_config("generation"), model=reference_name)
+    return _role_chain("generation", manager.build_chat_model(settings))
+
+
+def run_benchmark(
+    queries: Sequence[str],
+    reference_model: Optional[str] = None,
+    roles: Sequence[str] = CHAT_ROLES,
+    documents_per_query: int = 2,
+    retrieve: Optional[Callable[[str], List[Document]]] = None,
+    manager: ModelManager = model_manager,
+) -> List[TierResult]:
+    """
+    Benchmark each role's model against ``reference_model`` (default: the default chat model).
+
+    ``retrieve`` supplies documents for the grader inputs; it defaults to the active index.
+    """
+    retrieve = retrieve or _active_retrieve
+    reference_name = reference_model or manager.config.chat_model
+    results: Dict[str, TierResult] = {}
+    chains: Dict[str, tuple] = {}
+    for role in roles:
+        settings = manager.role_config(role)
+        reference_settings = replace(settings, model=reference_name)
+        chains[role] = (
+            _role_chain(role, manager.build_chat_model(settings)),
+            _role_chain(role, manager.build_chat_model(reference_settings)),
+        )
+        results[role] = TierResult(role=role, model=settings.model, reference=reference_name)
+
+    def compare(role: str, inputs: Dict[str, Any]) -> Optional[Any]:
+        """Run both chains; return the reference output (None on failure)"""
+        tier_chain, reference_chain = chains[role]
+        result = results[role]
+        try:
+            output, latency = _timed(tier_chain, inputs)
+            reference_output, reference_latency = _timed(reference_chain, inputs)
+        except Exception as e:
+            logger.warning(f"Benchmark call failed for {role}: {e}")
+            result.errors += 1
+            return None
+        result.latencies_ms.append(latency)
+        result.reference_latencies_ms.append(reference_latency)
+        if role != "generation":
+            result.agreements.append(output.model_dump() == reference_output.model_dump())
+        return reference_output
+
+    for question in queries:
+        documents = retrieve(question)[:documents_per_query]
+        context = "\n\n".join(doc.page_content for doc in documents)
+
+        if "router" in results:
+            compare("router", {"question": question})
+        if "retrieval_grader" in results:
+            for doc in documents:
+                compare("retrieval_grader", {"question": question, "document": doc.page_content})
+
+        generation_inputs = {"context": context, "question": question}
+        if "generation" in results:
+            answer = compare("generation", generation_inputs)
+        elif "hallucination_grader" in results or "answer_grader" in results:
+            answer = _reference_generation(manager, reference_name).invoke(generation_inputs)
+        else:
+            answer = None
+        if answer is None:
+            continue
+        if "hallucination_grader" in results:
+            compare("hallucination_grader", {"documents": context, "generation": answer})
+        if "answer_grader" in results:
+            compare("answer_grader", {"question": question, "generation": answer})
+
+    return list(results.values())
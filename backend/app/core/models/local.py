@@ -0,0 +1,212 @@
+"""
+Deterministic offline stand-ins for the chat and embedding models.
+
+Selected with ``MODEL_PROVIDER=local``. The chat model answers structured
+output requests (routing and the binary graders) with schema-valid values
+chosen deterministically from the prompt, and free-text requests with an
+answer assembled from the prompt's context, after a configurable simulated
+latency. The embeddings are hashed bag-of-words vectors, so retrieval still
+ranks documents by lexical overlap. Together they let the graph and the API
+be profiled and load-tested without network access.
+"""
+
+import os
+import re
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+from typing import Any, Dict, List, Literal, Optional, Type
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable, RunnableLambda
+from pydantic import BaseModel, Field, PrivateAttr
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def _stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class LatencyDistribution(BaseModel):
+    """Simulated call latency in milliseconds"""
+    kind: Literal["fixed", "uniform", "normal", "lognormal"] = "fixed"
+    mean_ms: float = 0.0
+    # Half-width for uniform, standard deviation for normal and lognormal
+    spread_ms: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        """Parse ``kind:mean_ms[:spread_ms]``, e.g. ``lognormal:800:300``"""
+        parts = spec.split(":")
+        return cls(
+            kind=parts[0],
+            mean_ms=float(parts[1]) if len(parts) > 1 else 0.0,
+            spread_ms=float(parts[2]) if len(parts) > 2 else 0.0,
+        )
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw a latency in seconds"""
+        if self.kind == "uniform":
+            ms = rng.uniform(self.mean_ms - self.spread_ms, self.mean_ms + self.spread_ms)
+        elif self.kind == "normal":
+            ms = rng.gauss(self.mean_ms, self.spread_ms)
+        elif self.kind == "lognormal" and self.mean_ms > 0:
+            # Parameterised so the distribution has the requested mean and stddev
+            variance = math.log(1 + (self.spread_ms / self.mean_ms) ** 2)
+            ms = rng.lognormvariate(math.log(self.mean_ms) - variance / 2, math.sqrt(variance))
+        else:
+            ms = self.mean_ms
+        return max(0.0, ms) / 1000.0
+
+
+class LocalChatModel(BaseChatModel):
+    """Offline chat model with deterministic, schema-valid outputs"""
+
+    generation_latency: LatencyDistribution = Field(default_factory=LatencyDistribution)
+    structured_latency: LatencyDistribution = Field(default_factory=LatencyDistribution)
+    # Share of structured decisions that come out positive ("yes", True, first choice)
+    positive_rate: float = 0.85
+    seed: int = 0
+    model_name: str = "local"
+
+    _rng: random.Random = PrivateAttr()
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._rng = random.Random(self.seed)
+
+    @classmethod
+    def from_env(cls, model_name: Optional[str] = None) -> "LocalChatModel":
+        return cls(
+            model_name=model_name or "local",
+            generation_latency=LatencyDistribution.parse(
+                os.getenv("LOCAL_LLM_GENERATION_LATENCY", "fixed:0")
+            ),
+            structured_latency=LatencyDistribution.parse(
+                os.getenv("LOCAL_LLM_STRUCTURED_LATENCY", "fixed:0")
+            ),
+            positive_rate=float(os.getenv("LOCAL_LLM_POSITIVE_RATE", "0.85")),
+            seed=int(os.getenv("LOCAL_LLM_SEED", "0")),
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "local"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name}
+
+    def with_structured_output(self, schema: Type[BaseModel], *, include_raw: bool = False,
+                               **kwargs: Any) -> Runnable:
+        """Bind a pydantic schema; the reply is JSON that validates against it"""
+        def parse(message: AIMessage) -> BaseModel:
+            return schema.model_validate_json(message.content)
+
+        return self.bind(structured_output=schema.model_json_schema()) | RunnableLambda(parse)
+
+    def _respond(self, messages: List[BaseMessage],
+                 structured_output: Optional[Dict[str, Any]]) -> AIMessage:
+        prompt = "\n".join(str(message.content) for message in messages)
+        if structured_output is not None:
+            content = json.dumps(self._structured_values(prompt, structured_output))
+        else:
+            content = self._answer(messages)
+        input_tokens = _estimate_tokens(prompt)
+        output_tokens = _estimate_tokens(content)
+        return AIMessage(
+            content=content,
+            response_metadata={"model_name": self.model_name},
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+
+    def _structured_values(self, prompt: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+        values = {}
+        for name, spec in schema.get("properties", {}).items():
+            decision = (_stable_hash(f"{schema.get('title')}:{name}:{prompt}") % 10_000) / 10_000
+            positive = decision < self.positive_rate
+            if "enum" in spec:
+                choices = spec["enum"]
+                values[name] = choices[0] if positive or len(choices) == 1 else choices[1]
+            elif spec.get("type") == "boolean":
+                values[name] = positive
+            elif spec.get("type") in ("integer", "number"):
+                values[name] = 1 if positive else 0
+            else:
+                values[name] = "yes" if positive else "no"
+        return values
+
+    @staticmethod
+    def _answer(messages: List[BaseMessage]) -> str:
+        question = str(messages[-1].content) if messages else ""
+        context = " ".join(str(message.content) for message in messages[:-1])
+        sentences = re.split(r"(?<=[.!?])\s+", context)
+        summary = " ".join(sentences[-3:])[:600]
+        return f"{question.strip()} Based on the provided context: {summary.strip()}"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None,
+                  **kwargs: Any) -> ChatResult:
+        structured_output = kwargs.get("structured_output")
+        latency = self.structured_latency if structured_output is not None else self.generation_latency
+        time.sleep(latency.sample(self._rng))
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages, structured_output))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                         **kwargs: Any) -> ChatResult:
+        structured_output = kwargs.get("structured_output")
+        latency = self.structured_latency if structured_output is not None else self.generation_latency
+        await asyncio.sleep(latency.sample(self._rng))
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages, structured_output))])
+
+
+class LocalHashEmbeddings(Embeddings):
+    """Deterministic hashed bag-of-words embeddings (unigrams and bigrams)"""
+
+    def __init__(self, dimensions: int = 768, latency: Optional[LatencyDistribution] = None,
+                 seed: int = 0):
+        self.dimensions = dimensions
+        self.latency = latency or LatencyDistribution()
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def from_env(cls) -> "LocalHashEmbeddings":
+        return cls(
+            dimensions=int(os.getenv("LOCAL_EMBEDDING_DIMENSIONS", "768")),
+            latency=LatencyDistribution.parse(os.getenv("LOCAL_EMBEDDING_LATENCY", "fixed:0")),
+        )
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        tokens = _TOKEN_PATTERN.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            h = _stable_hash(feature)
+            vector[h % self.dimensions] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector] if norm else vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency.sample(self._rng))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency.sample(self._rng))
+        return self._embed(text)
@@ -1,48 +1,230 @@
+import os
 import logging
-from typing import Optional
-from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+from dataclasses import dataclass, field
 from dotenv import load_dotenv
 
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.runnables import Runnable
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 
+from .batching import BatchingEmbeddings
+from ..resilience.circuit_breaker import CHAT, EMBEDDINGS, get_breaker
+from ..resilience.governor import Governor, GovernorConfig, GovernedEmbeddings, GovernedRunnable, Priority
+
 logger = logging.getLogger(__name__)
 load_dotenv()
 
+# Chains that get their own chat model settings
+CHAT_ROLES = ("router", "retrieval_grader", "hallucination_grader", "answer_grader", "generation")
+
+@dataclass(frozen=True)
+class RoleConfig:
+    """Chat model settings for one role; None falls back to the ModelConfig defaults."""
+    model: Optional[str] = None
+    temperature: Optional[float] = None
+    timeout: Optional[float] = None
+    max_tokens: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, role: str, defaults: "RoleConfig") -> "RoleConfig":
+        """Read ``<ROLE>_MODEL``, ``<ROLE>_TEMPERATURE``, ``<ROLE>_TIMEOUT`` and ``<ROLE>_MAX_TOKENS``."""
+        prefix = role.upper()
+        temperature = os.getenv(f"{prefix}_TEMPERATURE")
+        timeout = os.getenv(f"{prefix}_TIMEOUT")
+        max_tokens = os.getenv(f"{prefix}_MAX_TOKENS")
+        return cls(
+            model=os.getenv(f"{prefix}_MODEL", defaults.model),
+            temperature=float(temperature) if temperature else defaults.temperature,
+            timeout=float(timeout) if timeout else defaults.timeout,
+            max_tokens=int(max_tokens) if max_tokens else defaults.max_tokens,
+        )
+
+# Routing and the binary graders only emit a few tokens, so they default to the lite tier
+_GRADER_TIER = RoleConfig(model="gemini-2.0-flash-lite", timeout=20.0, max_tokens=256)
+_ROLE_DEFAULTS = {
+    "router": _GRADER_TIER,
+    "retrieval_grader": _GRADER_TIER,
+    "hallucination_grader": _GRADER_TIER,
+    "answer_grader": _GRADER_TIER,
+    "generation": RoleConfig(timeout=60.0),
+}
+
+def _roles_from_env() -> Dict[str, RoleConfig]:
+    return {role: RoleConfig.from_env(role, _ROLE_DEFAULTS[role]) for role in CHAT_ROLES}
+
 @dataclass
 class ModelConfig:
+    provider: str = field(default_factory=lambda: os.getenv("MODEL_PROVIDER", "google"))
     chat_model: str = "gemini-2.0-flash"
     embedding_model: str = "models/text-embedding-004"
     temperature: float = 0.0
+    roles: Dict[str, RoleConfig] = field(default_factory=_roles_from_env)
+    chat_limits: GovernorConfig = field(default_factory=lambda: GovernorConfig.from_env("LLM"))
+    embedding_limits: GovernorConfig = field(default_factory=lambda: GovernorConfig.from_env("EMBEDDING"))
+    # Concurrent embedding calls are merged into batches of up to this many texts (1 disables batching)
+    embedding_batch_max_size: int = field(default_factory=lambda: int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32")))
+    embedding_batch_max_wait_ms: float = field(
+        default_factory=lambda: float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+    )
+
+@dataclass
+class ModelProvider:
+    """Factories that build the chat and embedding clients for a provider."""
+    chat: Callable[[RoleConfig], BaseChatModel]
+    embeddings: Callable[[ModelConfig], Embeddings]
+
+_providers: Dict[str, ModelProvider] = {}
+
+def register_provider(
+    name: str,
+    chat: Callable[[RoleConfig], BaseChatModel],
+    embeddings: Callable[[ModelConfig], Embeddings]
+) -> None:
+    """Register a model provider selectable through ModelConfig.provider."""
+    _providers[name] = ModelProvider(chat=chat, embeddings=embeddings)
+
+def get_provider(name: str) -> ModelProvider:
+    if name not in _providers:
+        raise ValueError(
+            f"Unknown model provider '{name}'. Available providers: {', '.join(sorted(_providers))}"
+        )
+    return _providers[name]
+
+def _google_chat(settings: RoleConfig) -> BaseChatModel:
+    options = {}
+    if settings.timeout is not None:
+        options["timeout"] = settings.timeout
+    if settings.max_tokens is not None:
+        options["max_output_tokens"] = settings.max_tokens
+    return ChatGoogleGenerativeAI(
+        model=settings.model,
+        temperature=settings.temperature,
+        **options
+    )
+
+def _google_embeddings(config: ModelConfig) -> Embeddings:
+    return GoogleGenerativeAIEmbeddings(model=config.embedding_model)
+
+def _local_chat(settings: RoleConfig) -> BaseChatModel:
+    from .local import LocalChatModel
+    return LocalChatModel.from_env(model_name=settings.model)
+
+def _local_embeddings(config: ModelConfig) -> Embeddings:
+    from .local import LocalHashEmbeddings
+    return LocalHashEmbeddings.from_env()
+
+register_provider("google", _google_chat, _google_embeddings)
+register_provider("local", _local_chat, _local_embeddings)
 
 class ModelManager:
     def __init__(self, config: Optional[ModelConfig] = None):
         self.config = config or ModelConfig()
         self._chat_model = None
+        self._role_models: Dict[RoleConfig, BaseChatModel] = {}
         self._embedding_model = None
+        self._chat_governor = None
+        self._embedding_governor = None
+        self._governed_embeddings = None
+
+    @property
+    def provider(self) -> ModelProvider:
+        return get_provider(self.config.provider)
 
     @property
     def chat_model(self):
         if self._chat_model is None:
-            self._chat_model = ChatGoogleGenerativeAI(
-                model=self.config.chat_model,
-                temperature=self.config.temperature
+            self._chat_model = self.provider.chat(
+                RoleConfig(model=self.config.chat_model, temperature=self.config.temperature)
             )
         return self._chat_model
 
+    def role_config(self, role: str) -> RoleConfig:
+        """Settings for a role with the ModelConfig defaults filled in."""
+        if role not in CHAT_ROLES:
+            raise ValueError(f"Unknown model role '{role}'. Available roles: {', '.join(CHAT_ROLES)}")
+        settings = self.config.roles.get(role, RoleConfig())
+        return RoleConfig(
+            model=settings.model or self.config.chat_model,
+            temperature=self.config.temperature if settings.temperature is None else settings.temperature,
+            timeout=settings.timeout,
+            max_tokens=settings.max_tokens,
+        )
+
+    def build_chat_model(self, settings: RoleConfig) -> BaseChatModel:
+        """Chat model for fully resolved settings; roles with equal settings share an instance."""
+        if settings not in self._role_models:
+            self._role_models[settings] = self.provider.chat(settings)
+        return self._role_models[settings]
+
+    def role_model(self, role: str) -> BaseChatModel:
+        return self.build_chat_model(self.role_config(role))
+
     @property
     def embedding_model(self):
         if self._embedding_model is None:
-            self._embedding_model = GoogleGenerativeAIEmbeddings(
-                model=self.config.embedding_model
-            )
+            self._embedding_model = self.provider.embeddings(self.config)
         return self._embedding_model
 
+    @property
+    def chat_governor(self) -> Governor:
+        if self._chat_governor is None:
+            self._chat_governor = Governor(self.config.chat_limits, name="chat")
+        return self._chat_governor
+
+    @property
+    def embedding_governor(self) -> Governor:
+        if self._embedding_governor is None:
+            self._embedding_governor = Governor(self.config.embedding_limits, name="embeddings")
+        return self._embedding_governor
+
+    @property
+    def governed_embeddings(self) -> Embeddings:
+        if self._governed_embeddings is None:
+            if self.config.embedding_batch_max_size > 1:
+                self._governed_embeddings = BatchingEmbeddings(
+                    self.embedding_model,
+                    self.embedding_governor,
+                    max_batch_size=self.config.embedding_batch_max_size,
+                    max_wait_ms=self.config.embedding_batch_max_wait_ms,
+                    max_concurrent_batches=self.config.embedding_limits.max_in_flight or 4,
+                    breaker=get_breaker(EMBEDDINGS),
+                )
+            else:
+                self._governed_embeddings = GovernedEmbeddings(
+                    self.embedding_model, self.embedding_governor, get_breaker(EMBEDDINGS)
+                )
+        return self._governed_embeddings
+
+    def close(self) -> None:
+        """Stop background workers of the model clients."""
+        if isinstance(self._governed_embeddings, BatchingEmbeddings):
+            self._governed_embeddings.close()
+        self._governed_embeddings = None
+
 model_manager = ModelManager()
 
-def get_chat_model() -> ChatGoogleGenerativeAI:
-    """Get the default chat model."""
-    return model_manager.chat_model
+def get_chat_model(role: Optional[str] = None) -> BaseChatModel:
+    """Get the chat model for a role (see CHAT_ROLES), or the default chat model."""
+    if role is None:
+        return model_manager.chat_model
+    return model_manager.role_model(role)
+
+def get_embedding_model() -> Embeddings:
+    """Get the default embedding model, admitted through the embedding governor."""
+    return model_manager.governed_embeddings
+
+def governed(runnable: Runnable, priority: Priority, role: Optional[str] = None) -> Runnable:
+    """Route calls of a chat model runnable through the shared chat governor and breaker."""
+    return GovernedRunnable(runnable, model_manager.chat_governor, priority, role, get_breaker(CHAT))
 
-def get_embedding_model() -> GoogleGenerativeAIEmbeddings:
-    """Get the default embedding model."""
-    return model_manager.embedding_model
\ No newline at end of file
+def get_governor_stats() -> Dict[str, Dict]:
+    """Queue, limit and retry statistics of the model governors."""
+    stats = {
+        "chat": model_manager.chat_governor.stats(),
+        "embeddings": model_manager.embedding_governor.stats(),
+    }
+    if isinstance(model_manager._governed_embeddings, BatchingEmbeddings):
+        stats["embeddings"]["batching"] = model_manager._governed_embeddings.stats()
+    return stats
@@ -0,0 +1,203 @@
+"""
+Token usage and cost accounting for LLM calls.
+
+``track_usage()`` installs a callback handler for the current context, so every
+chat model call made while it is active (graph nodes, conditional edges and
+chains called directly) is recorded in one ``RunUsage``. Calls are grouped by
+step: the model role of the chain (router, graders, generation) or, for calls
+outside the role chains, the LangGraph node that made them. The nodes read
+``usage_metadata()`` to attach the running totals to their process events,
+and the chat service stores the final totals on the ``ChatMessage``.
+"""
+
+import os
+import json
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+
+# USD per million (input, output) tokens; override or extend with MODEL_PRICES as JSON
+DEFAULT_MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-flash-8b": (0.0375, 0.15),
+    "gemini-1.5-pro": (1.25, 5.00),
+}
+
+
+def _load_prices() -> Dict[str, Tuple[float, float]]:
+    prices = dict(DEFAULT_MODEL_PRICES)
+    overrides = os.getenv("MODEL_PRICES")
+    if overrides:
+        prices.update({model: tuple(price) for model, price in json.loads(overrides).items()})
+    return prices
+
+
+MODEL_PRICES = _load_prices()
+
+
+def estimate_cost(model: Optional[str], input_tokens: int, output_tokens: int) -> float:
+    """Cost in USD of a call; models without a price count as free"""
+    if not model:
+        return 0.0
+    price = MODEL_PRICES.get(model.removeprefix("models/"))
+    if price is None:
+        return 0.0
+    return (input_tokens * price[0] + output_tokens * price[1]) / 1_000_000
+
+
+@dataclass
+class UsageTotals:
+    """Token counts and cost of a group of LLM calls"""
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    total_tokens: int = 0
+    cost_usd: float = 0.0
+
+    def add(self, input_tokens: int, output_tokens: int, total_tokens: int, cost_usd: float) -> None:
+        self.calls += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.total_tokens += total_tokens
+        self.cost_usd += cost_usd
+
+    def merge(self, other: Dict[str, Any]) -> None:
+        self.calls += other.get("calls", 0)
+        self.input_tokens += other.get("input_tokens", 0)
+        self.output_tokens += other.get("output_tokens", 0)
+        self.total_tokens += other.get("total_tokens", 0)
+        self.cost_usd += other.get("cost_usd", 0.0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.total_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+
+class RunUsage:
+    """Usage of one graph run, in total and per step"""
+
+    def __init__(self):
+        self.total = UsageTotals()
+        self.by_step: Dict[str, UsageTotals] = {}
+        self.by_model: Dict[str, UsageTotals] = {}
+        self._lock = threading.Lock()
+
+    def record(self, step: str, model: Optional[str], input_tokens: int, output_tokens: int,
+               total_tokens: int) -> None:
+        cost = estimate_cost(model, input_tokens, output_tokens)
+        with self._lock:
+            self.total.add(input_tokens, output_tokens, total_tokens, cost)
+            self.by_step.setdefault(step, UsageTotals()).add(input_tokens, output_tokens, total_tokens, cost)
+            self.by_model.setdefault(model or "unknown", UsageTotals()).add(
+                input_tokens, output_tokens, total_tokens, cost
+            )
+
+    def totals(self) -> Dict[str, Any]:
+        with self._lock:
+            return self.total.to_dict()
+
+    def step(self, step: str) -> Dict[str, Any]:
+        with self._lock:
+            return self.by_step.get(step, UsageTotals()).to_dict()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.total.to_dict(),
+                "by_step": {name: totals.to_dict() for name, totals in self.by_step.items()},
+                "by_model": {name: totals.to_dict() for name, totals in self.by_model.items()},
+            }
+
+
+def _token_counts(response: LLMResult) -> Tuple[int, int, int]:
+    input_tokens = output_tokens = total_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+                total_tokens += usage.get("total_tokens", 0)
+    return input_tokens, output_tokens, total_tokens
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """Records token usage of chat model calls into a RunUsage"""
+
+    def __init__(self, usage: RunUsage):
+        self.usage = usage
+        self._calls: Dict[UUID, Tuple[str, Optional[str]]] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID,
+                            metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        metadata = metadata or {}
+        params = kwargs.get("invocation_params") or {}
+        step = metadata.get("model_role") or metadata.get("langgraph_node") or "unknown"
+        model = metadata.get("ls_model_name") or params.get("model") or params.get("model_name")
+        self._calls[run_id] = (step, model)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        step, model = self._calls.pop(run_id, ("unknown", None))
+        self.usage.record(step, model, *_token_counts(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._calls.pop(run_id, None)
+
+
+_usage_handler: ContextVar[Optional[UsageCallbackHandler]] = ContextVar("usage_handler", default=None)
+register_configure_hook(_usage_handler, inheritable=True)
+
+
+@contextmanager
+def track_usage() -> Iterator[RunUsage]:
+    """Record the usage of every LLM call made in this context"""
+    usage = RunUsage()
+    token = _usage_handler.set(UsageCallbackHandler(usage))
+    try:
+        yield usage
+    finally:
+        _usage_handler.reset(token)
+
+
+def current_usage() -> Optional[RunUsage]:
+    handler = _usage_handler.get()
+    return handler.usage if handler else None
+
+
+def usage_metadata(step: str) -> Optional[Dict[str, Any]]:
+    """Event metadata with the usage of ``step`` and of the run so far, if usage is tracked"""
+    usage = current_usage()
+    if usage is None:
+        return None
+    return {"usage": {"step": step, **usage.step(step), "run": usage.totals()}}
+
+
+def aggregate_usage(records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine stored per-message usage (``total`` keys plus ``by_step``) into one report"""
+    total = UsageTotals()
+    by_step: Dict[str, UsageTotals] = {}
+    messages = 0
+    for record in records:
+        messages += 1
+        total.merge(record)
+        for step, totals in (record.get("by_step") or {}).items():
+            by_step.setdefault(step, UsageTotals()).merge(totals)
+    return {
+        "messages": messages,
+        **total.to_dict(),
+        "by_step": {step: totals.to_dict() for step, totals in by_step.items()},
+    }
@@ -0,0 +1,272 @@
+"""
+Circuit breakers for the chat model, the embedding model and web search.
+
+A breaker watches the outcome of calls to one dependency over a sliding time
+window. Once at least ``minimum_calls`` were made and the failure rate reaches
+``failure_rate_threshold``, the breaker opens and every call fails immediately
+with ``CircuitOpenError`` for ``cooldown_seconds``. It then goes half-open and
+lets a few probe calls through: a successful probe closes it again, a failed
+one re-opens it, and so does a probe still running after
+``probe_timeout_seconds``. Callers catch ``CircuitOpenError`` to degrade on
+purpose (skip a grader, skip web search) instead of waiting on a failing
+provider.
+
+Only errors that say the dependency is unavailable count as failures:
+connection errors, timeouts, 5xx responses and 429s (``is_dependency_failure``).
+Other errors, such as a rejected request or an unparsable answer, mean the
+dependency responded and count as successful calls.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """Whether an exception is a provider 429 / quota error"""
+    for attribute in ("status_code", "code", "status"):
+        if getattr(exc, attribute, None) in (429, "429", "RESOURCE_EXHAUSTED"):
+            return True
+    response = getattr(exc, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    if type(exc).__name__ in ("ResourceExhausted", "RateLimitError", "TooManyRequests"):
+        return True
+    message = str(exc)
+    if "RESOURCE_EXHAUSTED" in message:
+        return True
+    return "429" in message and ("rate" in message.lower() or "quota" in message.lower())
+
+
+# Transport and timeout errors of the provider clients that do not derive from OSError
+_UNAVAILABLE_ERRORS = (
+    "TransportError", "TimeoutException", "APIConnectionError", "APITimeoutError",
+    "ServiceUnavailable", "InternalServerError", "DeadlineExceeded",
+)
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for source in (exc, getattr(exc, "response", None)):
+        for attribute in ("status_code", "status"):
+            value = getattr(source, attribute, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def is_dependency_failure(exc: BaseException) -> bool:
+    """Whether an exception means the dependency is down or overloaded, not that the call was wrong"""
+    if isinstance(exc, (OSError, TimeoutError)):
+        return True
+    if any(cls.__name__ in _UNAVAILABLE_ERRORS for cls in type(exc).__mro__):
+        return True
+    status = _status_code(exc)
+    if status is not None and status >= 500:
+        return True
+    return is_rate_limit_error(exc)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose breaker is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable (circuit open, retry in {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+@dataclass
+class BreakerConfig:
+    failure_rate_threshold: float = 0.5
+    minimum_calls: int = 5
+    window_seconds: float = 30.0
+    cooldown_seconds: float = 15.0
+    half_open_max_calls: int = 1
+    probe_timeout_seconds: float = 30.0
+    is_failure: Callable[[BaseException], bool] = is_dependency_failure
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "BreakerConfig":
+        """Read ``<PREFIX>_BREAKER_FAILURE_RATE``, ``<PREFIX>_BREAKER_MIN_CALLS`` etc."""
+        defaults = cls()
+        return cls(
+            failure_rate_threshold=float(
+                os.getenv(f"{prefix}_BREAKER_FAILURE_RATE", defaults.failure_rate_threshold)
+            ),
+            minimum_calls=int(os.getenv(f"{prefix}_BREAKER_MIN_CALLS", defaults.minimum_calls)),
+            window_seconds=float(os.getenv(f"{prefix}_BREAKER_WINDOW_SECONDS", defaults.window_seconds)),
+            cooldown_seconds=float(os.getenv(f"{prefix}_BREAKER_COOLDOWN_SECONDS", defaults.cooldown_seconds)),
+            half_open_max_calls=int(
+                os.getenv(f"{prefix}_BREAKER_HALF_OPEN_CALLS", defaults.half_open_max_calls)
+            ),
+            probe_timeout_seconds=float(
+                os.getenv(f"{prefix}_BREAKER_PROBE_TIMEOUT_SECONDS", defaults.probe_timeout_seconds)
+            ),
+        )
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker for one dependency; thread-safe"""
+
+    def __init__(self, name: str, config: Optional[BreakerConfig] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.config = config or BreakerConfig()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_started = 0.0
+        self.times_opened = 0
+
+    def _trim(self, now: float) -> None:
+        while self._outcomes and self._outcomes[0][0] < now - self.config.window_seconds:
+            self._outcomes.popleft()
+
+    def _current_state(self, now: float) -> CircuitState:
+        if self._state == CircuitState.OPEN and now - self._opened_at >= self.config.cooldown_seconds:
+            self._state = CircuitState.HALF_OPEN
+            self._probes = 0
+            logger.info(f"Circuit {self.name} half-open, probing")
+        elif (self._state == CircuitState.HALF_OPEN and self._probes
+              and now - self._probe_started >= self.config.probe_timeout_seconds):
+            # A probe that hangs would hold its slot forever: count it as failed
+            logger.warning(f"Circuit {self.name} probe timed out")
+            self._open(now)
+        return self._state
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._current_state(self._clock())
+
+    def _open(self, now: float) -> None:
+        self._state = CircuitState.OPEN
+        self._opened_at = now
+        self.times_opened += 1
+        logger.warning(f"Circuit {self.name} opened for {self.config.cooldown_seconds:.0f}s")
+
+    def before_call(self) -> None:
+        """Admit a call or raise CircuitOpenError"""
+        with self._lock:
+            now = self._clock()
+            state = self._current_state(now)
+            if state == CircuitState.OPEN:
+                raise CircuitOpenError(self.name, self.config.cooldown_seconds - (now - self._opened_at))
+            if state == CircuitState.HALF_OPEN:
+                if self._probes >= self.config.half_open_max_calls:
+                    raise CircuitOpenError(self.name, 0.0)
+                if not self._probes:
+                    self._probe_started = now
+                self._probes += 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            now = self._clock()
+            if self._current_state(now) == CircuitState.HALF_OPEN:
+                self._state = CircuitState.CLOSED
+                self._outcomes.clear()
+                logger.info(f"Circuit {self.name} closed")
+            self._outcomes.append((now, True))
+            self._trim(now)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            now = self._clock()
+            state = self._current_state(now)
+            if state == CircuitState.HALF_OPEN:
+                self._open(now)
+                return
+            if state == CircuitState.OPEN:
+                return
+            self._outcomes.append((now, False))
+            self._trim(now)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if (len(self._outcomes) >= self.config.minimum_calls
+                    and failures / len(self._outcomes) >= self.config.failure_rate_threshold):
+                self._open(now)
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        self.before_call()
+        try:
+            result = fn()
+        except Exception as e:
+            if self.config.is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.before_call()
+        try:
+            result = await fn()
+        except Exception as e:
+            if self.config.is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            now = self._clock()
+            state = self._current_state(now)
+            self._trim(now)
+            calls = len(self._outcomes)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            return {
+                "state": state.value,
+                "calls_in_window": calls,
+                "failure_rate": round(failures / calls, 3) if calls else 0.0,
+                "times_opened": self.times_opened,
+                "retry_after_seconds": round(max(0.0, self.config.cooldown_seconds - (now - self._opened_at)), 1)
+                if state == CircuitState.OPEN else 0.0,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = CircuitState.CLOSED
+            self._outcomes.clear()
+            self._probes = 0
+
+
+# Breakers of the external dependencies, configured with <NAME>_BREAKER_* variables
+CHAT = "chat"
+EMBEDDINGS = "embeddings"
+WEB_SEARCH = "web_search"
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Shared breaker for a dependency, created on first use"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, BreakerConfig.from_env(name.upper()))
+        return _breakers[name]
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every dependency breaker"""
+    return {name: get_breaker(name).snapshot() for name in (CHAT, EMBEDDINGS, WEB_SEARCH)}
@@ -0,0 +1,217 @@
+"""
+Per-node timeouts and an end-to-end latency budget for graph runs.
+
+A run starts with a ``deadline`` in its GraphState (wall-clock seconds). Each
+step runs its model or search call through ``run_with_timeout`` with the
+smaller of its own timeout and the time left until the deadline, and degrades
+when the call does not finish in time, as it does when a circuit breaker is
+open. The conditional edges use ``can_afford`` to stop retrying, returning the
+best answer so far, once the remaining budget cannot cover another
+generate/grade cycle.
+
+Step calls run on a shared pool of ``GRAPH_STEP_WORKERS`` threads. A call
+that times out is abandoned and keeps its worker until the model client's
+own timeout ends it, so under load the pool can fill up. Calls then queue,
+and time spent queued counts against the step's timeout. A call still
+queued when its timeout expires is cancelled rather than run late, and
+counted as ``saturated``. ``step_executor.stats()`` (``/health/models``)
+reports queued, running and abandoned calls; a rising ``saturated`` count
+means the pool is too small for the model clients' concurrency limits.
+"""
+
+import os
+import threading
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Mapping, Optional
+
+# Steps with their own timeout; the names match the process event step types
+ROUTING = "routing"
+RETRIEVE = "retrieve"
+GRADE_DOCUMENTS = "grade_documents"
+GENERATE = "generate"
+WEBSEARCH = "websearch"
+HALLUCINATION_CHECK = "hallucination_check"
+ANSWER_GRADING = "answer_grading"
+
+# Seconds
+DEFAULT_NODE_TIMEOUTS: Dict[str, float] = {
+    ROUTING: 10.0,
+    RETRIEVE: 10.0,
+    GRADE_DOCUMENTS: 30.0,
+    GENERATE: 60.0,
+    WEBSEARCH: 15.0,
+    HALLUCINATION_CHECK: 20.0,
+    ANSWER_GRADING: 20.0,
+}
+
+
+class DeadlineExceeded(TimeoutError):
+    """A step did not finish within its timeout or the run's remaining budget"""
+
+    def __init__(self, step: str, timeout: float):
+        super().__init__(f"{step} did not finish within {timeout:.1f}s")
+        self.step = step
+        self.timeout = timeout
+
+
+@dataclass
+class BudgetConfig:
+    # 0 disables the end-to-end budget; node timeouts still apply
+    latency_budget_ms: int = 45000
+    # Assumed cost of a generate/grade cycle until the run has measured one
+    cycle_estimate_ms: int = 8000
+    node_timeouts: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_NODE_TIMEOUTS))
+    # Threads running step calls, shared by all runs
+    step_workers: int = 32
+
+    @classmethod
+    def from_env(cls) -> "BudgetConfig":
+        """
+        Read ``LATENCY_BUDGET_MS``, ``LATENCY_CYCLE_ESTIMATE_MS``,
+        ``<STEP>_NODE_TIMEOUT`` and ``GRAPH_STEP_WORKERS``
+        """
+        return cls(
+            latency_budget_ms=int(os.getenv("LATENCY_BUDGET_MS", 45000)),
+            cycle_estimate_ms=int(os.getenv("LATENCY_CYCLE_ESTIMATE_MS", 8000)),
+            node_timeouts={
+                step: float(os.getenv(f"{step.upper()}_NODE_TIMEOUT", default))
+                for step, default in DEFAULT_NODE_TIMEOUTS.items()
+            },
+            step_workers=int(os.getenv("GRAPH_STEP_WORKERS", 32)),
+        )
+
+
+class _StepCall:
+    """A submitted call, tracking whether it started and whether its caller gave up on it"""
+
+    def __init__(self, executor: "StepExecutor", fn: Callable[[], Any]):
+        self.executor = executor
+        self.fn = fn
+        self.done = False
+        self.abandoned = False
+
+    def __call__(self) -> Any:
+        executor = self.executor
+        with executor._lock:
+            executor._queued -= 1
+            executor._running += 1
+        try:
+            return self.fn()
+        finally:
+            with executor._lock:
+                executor._running -= 1
+                self.done = True
+                if self.abandoned:
+                    executor._abandoned -= 1
+
+
+class StepExecutor:
+    """Thread pool for step calls that counts queued, running and abandoned calls"""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="graph-step")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._abandoned = 0
+        self.abandoned_total = 0
+        self.saturated = 0
+
+    def run(self, fn: Callable[[], Any], timeout: float, step: str) -> Any:
+        call = _StepCall(self, fn)
+        with self._lock:
+            self._queued += 1
+        future = self._pool.submit(contextvars.copy_context().run, call)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                # Never started: every worker was busy for the whole timeout
+                with self._lock:
+                    self._queued -= 1
+                    self.saturated += 1
+            else:
+                with self._lock:
+                    if not call.done:
+                        call.abandoned = True
+                        self._abandoned += 1
+                        self.abandoned_total += 1
+            raise DeadlineExceeded(step, timeout) from None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queued": self._queued,
+                "running": self._running,
+                # Timed out but still holding a worker
+                "abandoned": self._abandoned,
+                "abandoned_total": self.abandoned_total,
+                "saturated": self.saturated,
+            }
+
+
+budget_config = BudgetConfig.from_env()
+
+step_executor = StepExecutor(budget_config.step_workers)
+
+
+def new_deadline(latency_budget_ms: Optional[int] = None) -> Optional[float]:
+    """Deadline for a run starting now; None when no budget applies"""
+    budget = latency_budget_ms if latency_budget_ms is not None else budget_config.latency_budget_ms
+    if not budget:
+        return None
+    return time.time() + budget / 1000.0
+
+
+def remaining_ms(state: Mapping[str, Any]) -> Optional[float]:
+    """Milliseconds left until the run's deadline (may be negative); None without a deadline"""
+    deadline = state.get("deadline")
+    if deadline is None:
+        return None
+    return (deadline - time.time()) * 1000.0
+
+
+def node_timeout(state: Mapping[str, Any], step: str, required: bool = False) -> float:
+    """
+    Seconds ``step`` may take: its own timeout, capped by the remaining budget.
+
+    ``required`` steps (the first generation) are not cut short by the budget,
+    since the run has no answer to fall back on.
+    """
+    timeout = budget_config.node_timeouts.get(step, DEFAULT_NODE_TIMEOUTS.get(step, 30.0))
+    remaining = remaining_ms(state)
+    if remaining is None or required:
+        return timeout
+    return max(0.0, min(timeout, remaining / 1000.0))
+
+
+def cycle_estimate_ms(state: Mapping[str, Any], grading_ms: float = 0.0) -> float:
+    """Expected duration of another generation plus grading"""
+    generation_ms = state.get("generation_ms") or 0
+    if not generation_ms:
+        return float(budget_config.cycle_estimate_ms)
+    return generation_ms + grading_ms
+
+
+def can_afford(state: Mapping[str, Any], needed_ms: float) -> bool:
+    remaining = remaining_ms(state)
+    return remaining is None or remaining >= needed_ms
+
+
+def run_with_timeout(fn: Callable[[], Any], timeout: float, step: str) -> Any:
+    """
+    Run ``fn`` and wait at most ``timeout`` seconds for it.
+
+    The call runs on a ``step_executor`` worker with the caller's context (so
+    usage tracking still applies). A call that times out while running is
+    abandoned, not cancelled; the model client's own timeout bounds how long
+    it keeps running. A call that times out still queued never runs.
+    """
+    if timeout <= 0:
+        raise DeadlineExceeded(step, 0.0)
+    return step_executor.run(fn, timeout, step)
@@ -0,0 +1,470 @@
+"""
+Client-side rate limiting and concurrency control for model calls.
+
+Every chain shares one chat client and one embedding client, so bursts of
+requests quickly exceed the provider quota and come back as 429s. A
+``Governor`` sits in front of a client and admits calls from a priority queue
+once a concurrency slot is free and the requests-per-minute and
+tokens-per-minute buckets allow it. Generation is admitted ahead of routing and
+grading, and bulk ingestion goes last. Calls rejected with a 429 are retried
+with jittered exponential backoff. Queue waits are recorded per priority class.
+
+The same governor serves synchronous and asynchronous call sites: sync callers
+block on an event, async callers await a future, and the grant is made from
+whichever thread releases a slot or refills a bucket.
+"""
+
+import os
+import time
+import heapq
+import random
+import asyncio
+import logging
+import itertools
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import BaseMessage
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable, RunnableConfig, ensure_config
+
+from .circuit_breaker import CircuitBreaker, is_rate_limit_error
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Admission order; lower values are served first"""
+    GENERATION = 0
+    INTERACTIVE = 1
+    GRADING = 2
+    BACKGROUND = 3
+
+
+@dataclass
+class GovernorConfig:
+    """Limits for one governed client; 0 disables a limit"""
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
+    max_in_flight: int = 8
+    max_retries: int = 4
+    retry_base_delay: float = 1.0
+    retry_max_delay: float = 30.0
+    # Expected completion size, added to the prompt estimate before a call
+    output_tokens_estimate: int = 256
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "GovernorConfig":
+        """Read ``<PREFIX>_MAX_RPM``, ``<PREFIX>_MAX_TPM``, ``<PREFIX>_MAX_IN_FLIGHT`` etc."""
+        defaults = cls()
+        return cls(
+            requests_per_minute=int(os.getenv(f"{prefix}_MAX_RPM", defaults.requests_per_minute)),
+            tokens_per_minute=int(os.getenv(f"{prefix}_MAX_TPM", defaults.tokens_per_minute)),
+            max_in_flight=int(os.getenv(f"{prefix}_MAX_IN_FLIGHT", defaults.max_in_flight)),
+            max_retries=int(os.getenv(f"{prefix}_MAX_RETRIES", defaults.max_retries)),
+            retry_base_delay=float(os.getenv(f"{prefix}_RETRY_BASE_DELAY", defaults.retry_base_delay)),
+            retry_max_delay=float(os.getenv(f"{prefix}_RETRY_MAX_DELAY", defaults.retry_max_delay)),
+            output_tokens_estimate=int(
+                os.getenv(f"{prefix}_OUTPUT_TOKENS_ESTIMATE", defaults.output_tokens_estimate)
+            ),
+        )
+
+
+def estimate_tokens(value: Any) -> int:
+    """Rough token count (4 characters per token) of a prompt, messages or text"""
+    if isinstance(value, PromptValue):
+        text = value.to_string()
+    elif isinstance(value, BaseMessage):
+        text = str(value.content)
+    elif isinstance(value, (list, tuple)):
+        return sum(estimate_tokens(item) for item in value)
+    elif isinstance(value, dict):
+        return sum(estimate_tokens(item) for item in value.values())
+    else:
+        text = str(value)
+    return len(text) // 4
+
+
+class TokenBucket:
+    """Continuously refilling bucket sized to one minute of budget; not thread-safe"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` can be taken (requests above capacity wait for a full bucket)"""
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        return 0.0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount: float) -> None:
+        """Debit the bucket; the level may go negative to account for underestimates"""
+        self.level -= amount
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    sequence: int
+    tokens: int = field(compare=False)
+    enqueued: float = field(compare=False)
+    event: Optional[threading.Event] = field(default=None, compare=False)
+    future: Optional[asyncio.Future] = field(default=None, compare=False)
+    loop: Optional[asyncio.AbstractEventLoop] = field(default=None, compare=False)
+    granted: bool = field(default=False, compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+class Permit:
+    """An admitted call; report actual usage so the token bucket can be corrected"""
+
+    def __init__(self, tokens: int, queue_wait: float):
+        self.tokens = tokens
+        self.queue_wait = queue_wait
+        self.used_tokens: Optional[int] = None
+
+    def record_usage(self, total_tokens: Optional[int]) -> None:
+        if total_tokens is not None:
+            self.used_tokens = total_tokens
+
+
+class GovernorMetrics:
+    """Queue-wait and retry counters, per priority class"""
+
+    def __init__(self, window: int = 1000):
+        self.admitted: Dict[str, int] = {}
+        self.total_wait: Dict[str, float] = {}
+        self.max_wait: Dict[str, float] = {}
+        self._recent: Dict[str, Deque[float]] = {}
+        self._window = window
+        self.rate_limited = 0
+        self.retries = 0
+
+    def record_wait(self, priority: Priority, wait: float) -> None:
+        name = priority.name.lower()
+        self.admitted[name] = self.admitted.get(name, 0) + 1
+        self.total_wait[name] = self.total_wait.get(name, 0.0) + wait
+        self.max_wait[name] = max(self.max_wait.get(name, 0.0), wait)
+        self._recent.setdefault(name, deque(maxlen=self._window)).append(wait)
+
+    def snapshot(self) -> Dict[str, Any]:
+        by_priority = {}
+        for name, count in self.admitted.items():
+            recent = sorted(self._recent[name])
+            by_priority[name] = {
+                "admitted": count,
+                "mean_wait_ms": round(self.total_wait[name] / count * 1000, 2),
+                "p95_wait_ms": round(recent[int(0.95 * (len(recent) - 1))] * 1000, 2),
+                "max_wait_ms": round(self.max_wait[name] * 1000, 2),
+            }
+        return {"rate_limited": self.rate_limited, "retries": self.retries, "queue_wait": by_priority}
+
+
+class Governor:
+    """Priority admission queue with concurrency, RPM and TPM limits and 429 retries"""
+
+    def __init__(self, config: Optional[GovernorConfig] = None, name: str = "llm"):
+        self.config = config or GovernorConfig()
+        self.name = name
+        self.metrics = GovernorMetrics()
+        self._requests = TokenBucket(self.config.requests_per_minute) if self.config.requests_per_minute > 0 else None
+        self._tokens = TokenBucket(self.config.tokens_per_minute) if self.config.tokens_per_minute > 0 else None
+        self._lock = threading.Lock()
+        self._waiters: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._timer: Optional[threading.Timer] = None
+        self._timer_deadline = 0.0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.cancelled)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "in_flight": self._in_flight,
+                "queued": self.queued,
+                "limits": {
+                    "requests_per_minute": self.config.requests_per_minute,
+                    "tokens_per_minute": self.config.tokens_per_minute,
+                    "max_in_flight": self.config.max_in_flight,
+                },
+                **self.metrics.snapshot(),
+            }
+
+    # Admission
+
+    def _rate_delay(self, tokens: int, now: float) -> float:
+        delay = 0.0
+        if self._requests:
+            delay = max(delay, self._requests.delay(1, now))
+        if self._tokens and tokens:
+            delay = max(delay, self._tokens.delay(tokens, now))
+        return delay
+
+    def _dispatch(self) -> None:
+        """Grant slots to the head of the queue while limits allow; caller holds the lock"""
+        while self._waiters:
+            waiter = self._waiters[0]
+            if waiter.cancelled:
+                heapq.heappop(self._waiters)
+                continue
+            if self.config.max_in_flight > 0 and self._in_flight >= self.config.max_in_flight:
+                return
+            now = time.monotonic()
+            delay = self._rate_delay(waiter.tokens, now)
+            if delay > 0:
+                self._schedule(delay, now)
+                return
+            heapq.heappop(self._waiters)
+            if self._requests:
+                self._requests.take(1)
+            if self._tokens:
+                self._tokens.take(waiter.tokens)
+            self._in_flight += 1
+            waiter.granted = True
+            self.metrics.record_wait(Priority(waiter.priority), now - waiter.enqueued)
+            if waiter.event is not None:
+                waiter.event.set()
+            else:
+                waiter.loop.call_soon_threadsafe(_resolve, waiter.future)
+
+    def _schedule(self, delay: float, now: float) -> None:
+        deadline = now + delay
+        if self._timer is not None and self._timer_deadline <= deadline:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer_deadline = deadline
+        self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def _enqueue(self, waiter: _Waiter) -> None:
+        with self._lock:
+            heapq.heappush(self._waiters, waiter)
+            self._dispatch()
+
+    def _release(self, permit: Permit) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if self._tokens and permit.used_tokens is not None:
+                self._tokens.take(permit.used_tokens - permit.tokens)
+            self._dispatch()
+
+    def _new_waiter(self, priority: Priority, tokens: int, **kwargs) -> _Waiter:
+        return _Waiter(
+            priority=int(priority),
+            sequence=next(self._sequence),
+            tokens=tokens,
+            enqueued=time.monotonic(),
+            **kwargs,
+        )
+
+    @contextmanager
+    def slot(self, priority: Priority = Priority.INTERACTIVE, tokens: int = 0) -> Iterator[Permit]:
+        """Block until admitted, hold a slot for the duration of the block"""
+        waiter = self._new_waiter(priority, tokens, event=threading.Event())
+        self._enqueue(waiter)
+        waiter.event.wait()
+        permit = Permit(tokens, time.monotonic() - waiter.enqueued)
+        try:
+            yield permit
+        finally:
+            self._release(permit)
+
+    @asynccontextmanager
+    async def aslot(self, priority: Priority = Priority.INTERACTIVE, tokens: int = 0) -> AsyncIterator[Permit]:
+        """Async variant of :meth:`slot`"""
+        loop = asyncio.get_running_loop()
+        waiter = self._new_waiter(priority, tokens, future=loop.create_future(), loop=loop)
+        self._enqueue(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                waiter.cancelled = not granted
+            if granted:
+                self._release(Permit(tokens, 0.0))
+            raise
+        permit = Permit(tokens, time.monotonic() - waiter.enqueued)
+        try:
+            yield permit
+        finally:
+            self._release(permit)
+
+    # Calls with retry
+
+    def _backoff(self, attempt: int) -> float:
+        ceiling = min(self.config.retry_max_delay, self.config.retry_base_delay * (2 ** attempt))
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    def _should_retry(self, exc: Exception, attempt: int) -> Optional[float]:
+        if not is_rate_limit_error(exc):
+            return None
+        with self._lock:
+            self.metrics.rate_limited += 1
+        if attempt >= self.config.max_retries:
+            return None
+        delay = self._backoff(attempt)
+        with self._lock:
+            self.metrics.retries += 1
+        logger.warning(f"{self.name}: rate limited, retrying in {delay:.2f}s (attempt {attempt + 1})")
+        return delay
+
+    def call(self, fn: Callable[[], Any], priority: Priority = Priority.INTERACTIVE, tokens: int = 0,
+             usage: Optional[Callable[[Any], Optional[int]]] = None) -> Any:
+        """Run ``fn`` once admitted, retrying 429s; ``usage`` extracts actual tokens from the result"""
+        attempt = 0
+        while True:
+            with self.slot(priority, tokens) as permit:
+                try:
+                    result = fn()
+                except Exception as exc:
+                    delay = self._should_retry(exc, attempt)
+                    if delay is None:
+                        raise
+                else:
+                    if usage:
+                        permit.record_usage(usage(result))
+                    return result
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], priority: Priority = Priority.INTERACTIVE,
+                    tokens: int = 0, usage: Optional[Callable[[Any], Optional[int]]] = None) -> Any:
+        """Async variant of :meth:`call`"""
+        attempt = 0
+        while True:
+            async with self.aslot(priority, tokens) as permit:
+                try:
+                    result = await fn()
+                except Exception as exc:
+                    delay = self._should_retry(exc, attempt)
+                    if delay is None:
+                        raise
+                else:
+                    if usage:
+                        permit.record_usage(usage(result))
+                    return result
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _usage_tokens(result: Any) -> Optional[int]:
+    usage = getattr(result, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+
+class GovernedRunnable(Runnable):
+    """Wraps a model runnable so every call is admitted by a governor (and an optional circuit breaker)"""
+
+    def __init__(self, bound: Runnable, governor: Governor, priority: Priority, role: Optional[str] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.bound = bound
+        self.governor = governor
+        self.priority = priority
+        # Exposed to callbacks as the "model_role" metadata key
+        self.role = role
+        self.breaker = breaker
+
+    def _config(self, config: Optional[RunnableConfig]) -> Optional[RunnableConfig]:
+        if self.role is None:
+            return config
+        config = ensure_config(config)
+        return {**config, "metadata": {**config.get("metadata", {}), "model_role": self.role}}
+
+    def _tokens(self, input: Any) -> int:
+        return estimate_tokens(input) + self.governor.config.output_tokens_estimate
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        config = self._config(config)
+
+        def call():
+            return self.governor.call(
+                lambda: self.bound.invoke(input, config, **kwargs),
+                priority=self.priority,
+                tokens=self._tokens(input),
+                usage=_usage_tokens,
+            )
+        return self.breaker.call(call) if self.breaker else call()
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        config = self._config(config)
+
+        def call():
+            return self.governor.acall(
+                lambda: self.bound.ainvoke(input, config, **kwargs),
+                priority=self.priority,
+                tokens=self._tokens(input),
+                usage=_usage_tokens,
+            )
+        return await (self.breaker.acall(call) if self.breaker else call())
+
+
+class GovernedEmbeddings(Embeddings):
+    """Embeddings client whose calls go through a governor; queries are served before bulk documents"""
+
+    def __init__(self, embeddings: Embeddings, governor: Governor, breaker: Optional[CircuitBreaker] = None):
+        self.embeddings = embeddings
+        self.governor = governor
+        self.breaker = breaker
+
+    def _call(self, fn: Callable[[], Any], priority: Priority, tokens: int) -> Any:
+        def call():
+            return self.governor.call(fn, priority=priority, tokens=tokens)
+        return self.breaker.call(call) if self.breaker else call()
+
+    async def _acall(self, fn: Callable[[], Awaitable[Any]], priority: Priority, tokens: int) -> Any:
+        def call():
+            return self.governor.acall(fn, priority=priority, tokens=tokens)
+        return await (self.breaker.acall(call) if self.breaker else call())
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._call(
+            lambda: self.embeddings.embed_documents(texts), Priority.BACKGROUND, estimate_tokens(texts)
+        )
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call(
+            lambda: self.embeddings.embed_query(text), Priority.INTERACTIVE, estimate_tokens(text)
+        )
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._acall(
+            lambda: self.embeddings.aembed_documents(texts), Priority.BACKGROUND, estimate_tokens(texts)
+        )
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self._acall(
+            lambda: self.embeddings.aembed_query(text), Priority.INTERACTIVE, estimate_tokens(text)
+        )
@@ -9,6 +9,9 @@ from .events import (
     DocumentGrade,
     ProcessVisualizationManager,
     process_manager,
+    event_bus,
+    emits_details,
+    process_run,
     # Event emitters
     emit_routing_started,
     emit_routing_completed,
@@ -23,7 +26,12 @@ from .events import (
     emit_hallucination_check,
     emit_answer_grading,
     emit_step_failed,
+    emit_step_skipped,
 )
+from .bus import EventBus
+from .store import EventStoreConfig, SessionEventStore
+from .transport import EventTransport, RedisTransport, UnixSocketTransport
+from .verbosity import EmissionConfig, EventLevel
 
 __all__ = [
     "ProcessEvent",
@@ -32,6 +40,8 @@ __all__ = [
     "DocumentGrade",
     "ProcessVisualizationManager",
     "process_manager",
+    "event_bus",
+    "EventBus",
     "emit_routing_started",
     "emit_routing_completed",
     "emit_retrieve_started", 
@@ -45,4 +55,14 @@ __all__ = [
     "emit_hallucination_check",
     "emit_answer_grading",
     "emit_step_failed",
+    "emit_step_skipped",
+    "EventStoreConfig",
+    "SessionEventStore",
+    "EventTransport",
+    "UnixSocketTransport",
+    "RedisTransport",
+    "EmissionConfig",
+    "EventLevel",
+    "emits_details",
+    "process_run",
 ]
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""
+Thread-safe process event bus.
+
+Graph nodes run synchronously, often in worker threads without an event loop.
+They publish events here instead of scheduling coroutines: ``publish`` only
+appends to a deque (atomic, no lock) and, if the consumer is not already
+signalled, wakes it with one ``call_soon_threadsafe``. A single consumer task
+on the server loop drains the deque and hands the events to the delivery
+callback in batches of up to ``batch_size``. When the queue holds
+``max_queued`` events, new ones are dropped and counted.
+
+Before ``start()`` and after ``stop()`` (CLI runs, scripts, tests) there is no
+consumer, and events are delivered in the publishing thread.
+"""
+
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class EventBus:
+    """Multi-producer, single-consumer event queue drained on an asyncio loop"""
+
+    def __init__(self, deliver: Callable[[List[Any]], None], max_queued: int = 10000,
+                 batch_size: int = 64):
+        self.deliver = deliver
+        self.max_queued = max_queued
+        self.batch_size = batch_size
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.batches = 0
+
+        self._queue: Deque[Any] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._signalled = False
+        self._consumer: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def publish(self, event: Any) -> bool:
+        """Queue an event from any thread without blocking; False if it was dropped"""
+        loop = self._loop
+        if loop is None:
+            self._deliver([event])
+            return True
+        if len(self._queue) >= self.max_queued:
+            self.dropped += 1
+            return False
+        self._queue.append(event)
+        self.published += 1
+        if not self._signalled:
+            self._signalled = True
+            try:
+                loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:
+                # The loop is closing; stop() delivers what is left
+                pass
+        return True
+
+    def start(self) -> None:
+        """Start the consumer task on the running loop"""
+        if self._loop is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._consumer = self._loop.create_task(self._consume())
+
+    async def stop(self) -> None:
+        """Stop the consumer and deliver the events still queued"""
+        if self._loop is None:
+            return
+        self._loop = None
+        self._consumer.cancel()
+        await asyncio.gather(self._consumer, return_exceptions=True)
+        self._consumer = None
+        while self._queue:
+            self._deliver(self._next_batch())
+
+    def _next_batch(self) -> List[Any]:
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+        return batch
+
+    def _deliver(self, batch: List[Any]) -> None:
+        try:
+            self.deliver(batch)
+            self.delivered += len(batch)
+            self.batches += 1
+        except Exception as e:
+            logger.error(f"Delivering {len(batch)} process events failed: {e}")
+
+    async def _consume(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Reset before draining, so events published from here on signal again
+            self._signalled = False
+            while self._queue:
+                self._deliver(self._next_batch())
+                # Let other tasks run between batches of a large backlog
+                await asyncio.sleep(0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": len(self._queue),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "max_queued": self.max_queued,
+        }
+
+
+def bus_config_from_env() -> Dict[str, int]:
+    """``max_queued`` and ``batch_size`` from ``VISUALIZATION_BUS_MAX_QUEUED`` and ``VISUALIZATION_BUS_BATCH_SIZE``"""
+    return {
+        "max_queued": int(os.getenv("VISUALIZATION_BUS_MAX_QUEUED", 10000)),
+        "batch_size": int(os.getenv("VISUALIZATION_BUS_BATCH_SIZE", 64)),
+    }
@@ -0,0 +1,114 @@
+"""
+Wire formats of process events, each encoded at most once per event.
+
+- ``json``: every field, as the model serializes it (the default)
+- ``compact``: JSON without the ``None`` fields, which are most of them
+- ``msgpack``: the compact form as MessagePack, sent in binary frames
+
+In the compact formats each ``documents_graded`` entry carries an ``id``
+derived from its content. Grading steps repeat the same documents across
+retries, so once a connection has sent an entry, later events send only
+``{"id": ...}`` for it and the client reuses the entry it already has. An
+event has two cached forms per format: with all entries in full, and with
+entries as ids when the connection has sent every one of them.
+"""
+
+from enum import Enum
+from typing import Any, Collection, Dict, List, Optional, Tuple, Union
+import hashlib
+import json
+
+import ormsgpack
+
+Encoded = Union[str, bytes]
+
+
+class WireFormat(str, Enum):
+    JSON = "json"
+    COMPACT = "compact"
+    MSGPACK = "msgpack"
+
+
+def grade_id(grade: Dict[str, Any]) -> str:
+    """Content id of a serialized ``DocumentGrade``"""
+    key = json.dumps(grade, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+class EncodedEvent:
+    """Cache of an event's wire forms; create once the event has its sequence number"""
+
+    def __init__(self, event):
+        self.seq: int = event.seq
+        self.epoch: Optional[str] = event.epoch
+        # Where a client resumes after this event (the SSE event id)
+        self.cursor = f"{event.epoch}:{event.seq}"
+        self._event = event
+        self._json: Optional[str] = None
+        self._compact: Optional[Dict[str, Any]] = None
+        self._forms: Dict[Tuple[WireFormat, bool], Encoded] = {}
+        self.grade_ids: Tuple[str, ...] = ()
+        if event.documents_graded:
+            self.grade_ids = tuple(
+                grade_id(grade.model_dump(mode="json", exclude_none=True)) for grade in event.documents_graded
+            )
+
+    @property
+    def json(self) -> str:
+        if self._json is None:
+            self._json = self._event.model_dump_json()
+        return self._json
+
+    def encode(self, wire_format: WireFormat, known: Optional[Collection[str]] = None) -> Encoded:
+        """
+        The event in ``wire_format``; ``documents_graded`` entries are sent as
+        ids only if all of them are in ``known``
+        """
+        if wire_format == WireFormat.JSON:
+            return self.json
+        by_id = bool(self.grade_ids) and known is not None and all(gid in known for gid in self.grade_ids)
+        form = self._forms.get((wire_format, by_id))
+        if form is None:
+            data = self._compact_data(by_id)
+            if wire_format == WireFormat.MSGPACK:
+                form = ormsgpack.packb(data)
+            else:
+                form = json.dumps(data, separators=(",", ":"))
+            self._forms[(wire_format, by_id)] = form
+        return form
+
+    def _compact_data(self, by_id: bool) -> Dict[str, Any]:
+        if self._compact is None:
+            self._compact = self._event.model_dump(mode="json", exclude_none=True)
+        if not self.grade_ids:
+            return self._compact
+        grades = self._compact["documents_graded"]
+        if by_id:
+            grades = [{"id": gid} for gid in self.grade_ids]
+        else:
+            grades = [{"id": gid, **grade} for gid, grade in zip(self.grade_ids, grades)]
+        return {**self._compact, "documents_graded": grades}
+
+
+def encode_events_message(events: List[EncodedEvent], wire_format: WireFormat) -> Encoded:
+    """
+    ``{"type": "session_events", "events": [...]}`` assembled from the events'
+    cached forms (entries in full) rather than by serializing the list again
+    """
+    if wire_format == WireFormat.MSGPACK:
+        # A MessagePack array is its header followed by the packed elements
+        count = len(events)
+        if count < 16:
+            header = bytes([0x90 | count])
+        elif count < 1 << 16:
+            header = b"\xdc" + count.to_bytes(2, "big")
+        else:
+            header = b"\xdd" + count.to_bytes(4, "big")
+        prefix = ormsgpack.packb({"type": "session_events"})
+        # Extend the one-entry map (fixmap 0x81) to two entries
+        return b"\x82" + prefix[1:] + ormsgpack.packb("events") + header + b"".join(
+            event.encode(wire_format) for event in events
+        )
+    return '{"type":"session_events","events":[' + ",".join(
+        event.encode(wire_format) for event in events
+    ) + "]}"
@@ -3,12 +3,39 @@ Process visualization events system.
 Captures detailed information about each step in the RAG workflow for real-time visualization.
 """
 
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime
 from enum import Enum
-from typing import Any, Dict, List, Optional, Union
-from pydantic import BaseModel, Field
-import asyncio
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+from pydantic import BaseModel, Field, PrivateAttr
 import json
+import threading
+import uuid
+
+from .bus import EventBus, bus_config_from_env
+from .encoding import EncodedEvent, WireFormat
+from .fanout import ConnectionSender, FanoutConfig
+from .store import EventStoreConfig, SessionEventStore
+from .transport import EventTransport, transport_from_env
+from .verbosity import EmissionConfig, EventLevel, session_sampled
+
+# Control message: the session was renumbered, clients drop their events and cursor
+RESET_MESSAGE = json.dumps({"type": "reset"})
+
+# The graph run whose events are being emitted in this context (see process_run)
+_current_run: ContextVar[Optional[str]] = ContextVar("process_run", default=None)
+
+
+@contextmanager
+def process_run(run_id: Optional[str] = None) -> Iterator[str]:
+    """Stamp the events emitted in this context with one run id: a question's pass through the graph"""
+    run_id = run_id or str(uuid.uuid4())
+    token = _current_run.set(run_id)
+    try:
+        yield run_id
+    finally:
+        _current_run.reset(token)
 
 
 class ProcessStepType(str, Enum):
@@ -41,7 +68,13 @@ class DocumentGrade(BaseModel):
 class ProcessEvent(BaseModel):
     """A single process event in the RAG workflow"""
     session_id: str
-    event_id: str
+    # Assigned when the event is delivered: numbered from 1 within the session;
+    # the epoch changes whenever the session's numbering restarts
+    seq: int = 0
+    epoch: str = ""
+    event_id: str = ""
+    # The graph run the event belongs to, when emitted within process_run()
+    run_id: Optional[str] = Field(default_factory=lambda: _current_run.get())
     step_type: ProcessStepType
     status: ProcessStepStatus
     timestamp: datetime = Field(default_factory=datetime.now)
@@ -80,140 +113,348 @@ class ProcessEvent(BaseModel):
     
     # Additional metadata
     metadata: Optional[Dict[str, Any]] = None
+    
+    # Wire forms, each encoded on first use (see encoding.py)
+    _encoded: Optional[EncodedEvent] = PrivateAttr(default=None)
+    
+    def encoded(self) -> EncodedEvent:
+        """The event's cached wire forms; call once ``seq`` is assigned"""
+        if self._encoded is None:
+            self._encoded = EncodedEvent(self)
+        return self._encoded
 
 
 class ProcessVisualizationManager:
     """Manages process events and WebSocket broadcasting"""
     
-    def __init__(self):
-        self.active_sessions: Dict[str, List[ProcessEvent]] = {}
-        self.websocket_connections: Dict[str, List] = {}
+    def __init__(self, store: Optional[SessionEventStore] = None,
+                 fanout: Optional[FanoutConfig] = None,
+                 transport: Optional[EventTransport] = None,
+                 emission: Optional[EmissionConfig] = None):
+        # Bounded per session and in total; idle sessions are swept (see store.py)
+        self.events = store or SessionEventStore(EventStoreConfig.from_env())
+        self.fanout = fanout or FanoutConfig.from_env()
+        # Relays events to the managers of other workers (see transport.py)
+        self.transport = transport or transport_from_env()
+        # Global level and history sampling (see verbosity.py); per-session
+        # overrides live in the store, so they are evicted with the session
+        self.emission = emission or EmissionConfig.from_env()
+        # Events not built because of their level (approximate: counted without a lock)
+        self.skipped_events = 0
+        # Anything with add(event) and stats(): persists delivered events (see app/db/event_log.py)
+        self.event_log = None
+        self.websocket_connections: Dict[str, List[ConnectionSender]] = {}
+        self._connections_lock = threading.Lock()
+        # Numbering and storing an event is atomic
+        self._seq_lock = threading.Lock()
+        # Counters of connections that are gone
+        self._closed_totals = {"dropped": 0, "coalesced": 0, "slow_disconnects": 0}
     
-    async def emit_event(self, event: ProcessEvent):
-        """Emit a process event and broadcast to connected WebSocket clients"""
+    def deliver(self, events: List[ProcessEvent]):
+        """
+        Store events and queue them for the sessions' WebSocket clients; never
+        waits on a client (see fanout.py). Called by ``event_bus`` with batches.
+        """
+        for event in events:
+            with self._seq_lock:
+                self._number(event)
+                # Unique across workers: the epoch is this worker's own numbering of the session
+                event.event_id = f"{event.session_id}-{event.epoch}-{event.seq}"
+                self._apply(event)
+            if self.event_log is not None:
+                self.event_log.add(event)
+            if self.transport.remote:
+                self.transport.publish({"op": "event", "event": event.model_dump(mode="json")})
+    
+    def _number(self, event: ProcessEvent):
+        """
+        Number the event in this worker's store; call under ``_seq_lock``.
+        Each worker numbers the events it stores, relayed ones included, in
+        the order it receives them, so ``seq`` and ``epoch`` are per worker
+        while ``event_id`` is the same in all of them.
+        """
+        event.epoch, event.seq = self.events.cursor(event.session_id)
+    
+    def _apply(self, event: ProcessEvent):
         session_id = event.session_id
         
-        # Store event in session history
-        if session_id not in self.active_sessions:
-            self.active_sessions[session_id] = []
-        self.active_sessions[session_id].append(event)
+        # Store event in session history, if the session is sampled
+        self.events.append(session_id, event, event.seq, retain=self.retains(session_id))
         
         # Broadcast to WebSocket connections for this session
-        if session_id in self.websocket_connections:
-            try:
-                event_data = event.model_dump_json()
-                disconnected_connections = []
-                
-                for websocket in self.websocket_connections[session_id]:
-                    try:
-                        await websocket.send_text(event_data)
-                    except Exception as e:
-                        print(f"WebSocket send error: {e}")
-                        disconnected_connections.append(websocket)
-            except Exception as e:
-                print(f"Error serializing event: {e}")
-                return
-            
-            # Clean up disconnected connections
-            for conn in disconnected_connections:
-                self.websocket_connections[session_id].remove(conn)
-    
-    def add_websocket_connection(self, session_id: str, websocket):
-        """Add a WebSocket connection for a session"""
-        if session_id not in self.websocket_connections:
-            self.websocket_connections[session_id] = []
-        self.websocket_connections[session_id].append(websocket)
+        with self._connections_lock:
+            senders = list(self.websocket_connections.get(session_id, ()))
+        if not senders:
+            return
+        # Serialized by the senders, once per wire format for all of them
+        encoded = event.encoded()
+        
+        # A newer event for the same step supersedes a queued one when coalescing
+        for sender in senders:
+            if not sender.offer(encoded, key=event.step_type.value):
+                self._discard(session_id, sender)
+    
+    def _receive(self, message: Dict[str, Any]):
+        """Apply a message relayed from another worker"""
+        with self._seq_lock:
+            if message["op"] == "event":
+                event = ProcessEvent.model_validate(message["event"])
+                self._number(event)
+                self._apply(event)
+            elif message["op"] == "clear":
+                self.events.remove(message["session_id"])
+                self._reset_connections(message["session_id"])
+            elif message["op"] == "level":
+                self._set_level(message["session_id"], message["level"])
+    
+    def set_session_level(self, session_id: str, level: Optional[EventLevel]):
+        """Override the emission level of a session, in every worker; None restores the global level"""
+        self._set_level(session_id, level)
+        if self.transport.remote:
+            self.transport.publish({"op": "level", "session_id": session_id,
+                                    "level": level.value if level else None})
+    
+    def _set_level(self, session_id: str, level: Optional[str]):
+        self.events.set_level(session_id, EventLevel(level) if level is not None else None)
+    
+    def session_level(self, session_id: str) -> EventLevel:
+        return self.events.level(session_id) or self.emission.level
+    
+    def retains(self, session_id: str) -> bool:
+        """Whether the session's events are kept for replay"""
+        return session_sampled(session_id, self.emission.history_sample_rate)
+    
+    def emission_level(self, session_id: str) -> EventLevel:
+        """
+        The level to build the session's events at: OFF when its level is off,
+        or when its history is not kept and no one here could see the events
+        (other workers' watchers are unknown, so relaying transports always emit).
+        If only the event log needs them, SUMMARY: it keeps no previews.
+        """
+        level = self.session_level(session_id)
+        if (
+            level != EventLevel.OFF
+            and not self.retains(session_id)
+            and not self.transport.remote
+            # Read without the lock: a membership test is atomic and a stale answer costs one event
+            and session_id not in self.websocket_connections
+        ):
+            return EventLevel.OFF if self.event_log is None else EventLevel.SUMMARY
+        return level
+    
+    async def emit_event(self, event: ProcessEvent):
+        """Store and broadcast a single event right away"""
+        self.deliver([event])
+    
+    def add_websocket_connection(self, session_id: str, websocket,
+                                 render: Optional[Callable[[str, Optional[str]], str]] = None,
+                                 wire_format: WireFormat = WireFormat.JSON) -> ConnectionSender:
+        """
+        Add a WebSocket connection (or anything with an async ``send_text``) for a
+        session; call from the coroutine serving it. Events are queued from now on
+        and sent once ``sender.start()`` is called. Events are sent in
+        ``wire_format`` and ``render`` wraps each text message and its event
+        cursor (``epoch:seq``) for the connection's protocol.
+        """
+        sender = ConnectionSender(websocket, self.fanout, render=render, wire_format=wire_format)
+        with self._connections_lock:
+            self.websocket_connections.setdefault(session_id, []).append(sender)
+        return sender
+    
+    def _discard(self, session_id: str, sender: ConnectionSender):
+        with self._connections_lock:
+            senders = self.websocket_connections.get(session_id, [])
+            if sender in senders:
+                senders.remove(sender)
+                self._closed_totals["dropped"] += sender.dropped
+                self._closed_totals["coalesced"] += sender.coalesced
+                self._closed_totals["slow_disconnects"] += sender.overflowed
+            if not senders:
+                self.websocket_connections.pop(session_id, None)
     
     def remove_websocket_connection(self, session_id: str, websocket):
-        """Remove a WebSocket connection for a session"""
-        if session_id in self.websocket_connections:
-            try:
-                self.websocket_connections[session_id].remove(websocket)
-                if not self.websocket_connections[session_id]:
-                    del self.websocket_connections[session_id]
-            except ValueError:
-                pass
-    
-    def get_session_events(self, session_id: str) -> List[ProcessEvent]:
-        """Get all events for a session"""
-        return self.active_sessions.get(session_id, [])
+        """Remove a WebSocket connection for a session and stop its writer"""
+        with self._connections_lock:
+            senders = [s for s in self.websocket_connections.get(session_id, ()) if s.websocket is websocket]
+        for sender in senders:
+            sender.close()
+            self._discard(session_id, sender)
+    
+    def get_session_events(self, session_id: str, since: Optional[int] = None) -> List[ProcessEvent]:
+        """Get the retained events for a session, or only those after sequence number ``since``"""
+        if since is None:
+            return self.events.get(session_id)
+        return self.events.since(session_id, since)
+    
+    def resume_session_events(self, session_id: str, since: int,
+                              epoch: Optional[str] = None) -> Tuple[bool, List[ProcessEvent]]:
+        """
+        The events a reconnecting client missed after its cursor (``epoch``,
+        ``since``), and whether the session was renumbered since: then the
+        client must drop its events before taking these (see store.py)
+        """
+        return self.events.resume(session_id, since, epoch)
     
     def clear_session_events(self, session_id: str):
-        """Clear events for a session"""
-        if session_id in self.active_sessions:
-            del self.active_sessions[session_id]
+        """Clear events (and the level override) of a session, in every worker"""
+        with self._seq_lock:
+            self.events.remove(session_id)
+            self._reset_connections(session_id)
+        if self.transport.remote:
+            self.transport.publish({"op": "clear", "session_id": session_id})
+    
+    def _reset_connections(self, session_id: str):
+        """Tell the session's clients that its numbering restarts and their events are gone"""
+        with self._connections_lock:
+            senders = list(self.websocket_connections.get(session_id, ()))
+        for sender in senders:
+            if not sender.offer(RESET_MESSAGE):
+                self._discard(session_id, sender)
+    
+    def get_active_sessions(self) -> List[str]:
+        """Sessions with retained events, least recently active first"""
+        return self.events.sessions()
+    
+    def _watched_sessions(self) -> Set[str]:
+        with self._connections_lock:
+            return set(self.websocket_connections)
+    
+    def start(self):
+        """
+        Start evicting idle sessions (sessions with open WebSockets are kept)
+        and exchanging events with other workers
+        """
+        self.events.start_sweeper(keep=self._watched_sessions)
+        self.transport.start(self._receive)
+    
+    def stop(self):
+        self.transport.stop()
+        self.events.stop_sweeper()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Resident events, eviction counts and WebSocket send queue counters"""
+        with self._connections_lock:
+            senders = [sender for group in self.websocket_connections.values() for sender in group]
+            totals = dict(self._closed_totals)
+        queues = [sender.stats() for sender in senders]
+        store = self.events.stats()
+        overrides = store.pop("level_overrides")
+        return {
+            **store,
+            "websocket_connections": len(senders),
+            "send_queues": {
+                "max_queue_size": self.fanout.max_queue_size,
+                "overflow_policy": self.fanout.overflow_policy.value,
+                "queued": sum(q["queued"] for q in queues),
+                "dropped": totals["dropped"] + sum(q["dropped"] for q in queues),
+                "coalesced": totals["coalesced"] + sum(q["coalesced"] for q in queues),
+                "slow_disconnects": totals["slow_disconnects"],
+            },
+            "transport": self.transport.stats(),
+            "emission": {
+                "level": self.emission.level.value,
+                "history_sample_rate": self.emission.history_sample_rate,
+                "session_overrides": overrides,
+                "skipped_events": self.skipped_events,
+            },
+            "event_log": self.event_log.stats() if self.event_log is not None else None,
+        }
 
 
 # Global instance
 process_manager = ProcessVisualizationManager()
 
+# Emitters publish here; the server drains it into process_manager (see bus.py)
+event_bus = EventBus(process_manager.deliver, **bus_config_from_env())
+
 
 # Helper functions for emitting events
-def create_event_id() -> str:
-    """Create a unique event ID"""
-    return f"event-{datetime.now().timestamp()}-{id(datetime.now())}"
+def _emission_level(session_id: str, status: ProcessStepStatus) -> Optional[EventLevel]:
+    """The level to build an event at, or None to not build it at all"""
+    level = process_manager.emission_level(session_id)
+    if level == EventLevel.OFF or (level == EventLevel.SUMMARY and status == ProcessStepStatus.STARTED):
+        process_manager.skipped_events += 1
+        return None
+    return level
 
 
-async def emit_routing_started(session_id: str, question: str):
+def emits_details(session_id: str) -> bool:
+    """Whether the session's events carry previews; callers skip building them otherwise"""
+    return process_manager.emission_level(session_id) == EventLevel.FULL
+
+
+def _preview(text: str, limit: int = 500) -> str:
+    return text[:limit] + "..." if len(text) > limit else text
+
+
+def emit_routing_started(session_id: str, question: str):
     """Emit routing started event"""
+    if _emission_level(session_id, ProcessStepStatus.STARTED) is None:
+        return
     event = ProcessEvent(
         session_id=session_id,
-        event_id=create_event_id(),
         step_type=ProcessStepType.ROUTING,
         status=ProcessStepStatus.STARTED,
         timestamp=datetime.now(),
         question=question
     )
-    await process_manager.emit_event(event)
+    event_bus.publish(event)
 
 
-async def emit_routing_completed(
+def emit_routing_completed(
     session_id: str, 
     question: str, 
     decision: str, 
     confidence: Optional[float] = None,
     reasoning: Optional[str] = None,
-    duration_ms: Optional[int] = None
+    duration_ms: Optional[int] = None,
+    metadata: Optional[Dict[str, Any]] = None
 ):
     """Emit routing completed event"""
+    level = _emission_level(session_id, ProcessStepStatus.COMPLETED)
+    if level is None:
+        return
+    full = level == EventLevel.FULL
     event = ProcessEvent(
         session_id=session_id,
-        event_id=create_event_id(),
         step_type=ProcessStepType.ROUTING,
         status=ProcessStepStatus.COMPLETED,
         timestamp=datetime.now(),
         question=question,
         routing_decision=decision,
         routing_confidence=confidence,
-        routing_reasoning=reasoning,
-        duration_ms=duration_ms
+        routing_reasoning=reasoning if full else None,
+        duration_ms=duration_ms,
+        metadata=metadata
     )
-    await process_manager.emit_event(event)
+    event_bus.publish(event)
 
 
-async def emit_retrieve_started(session_id: str, question: str):
+def emit_retrieve_started(session_id: str, question: str):
     """Emit retrieve started event"""
+    if _emission_level(session_id, ProcessStepStatus.STARTED) is None:
+        return
     event = ProcessEvent(
         session_id=session_id,
-        event_id=create_event_id(),
         step_type=ProcessStepType.RETRIEVE,
         status=ProcessStepStatus.STARTED,
         timestamp=datetime.now(),
         question=question
     )
-    await process_manager.emit_event(event)
+    event_bus.publish(event)
 
 
-async def emit_retrieve_completed(
+def emit_retrieve_completed(
     session_id: str, 
     question: str, 
     documents_found: int,
     duration_ms: Optional[int] = None
 ):
     """Emit retrieve completed event"""
+    if _emission_level(session_id, ProcessStepStatus.COMPLETED) is None:
+        return
     event = ProcessEvent(
         session_id=session_id,
-        event_id=create_event_id(),
         step_type=ProcessStepType.RETRIEVE,
         status=ProcessStepStatus.COMPLETED,
         timestamp=datetime.now(),
@@ -221,59 +462,66 @@ async def emit_retrieve_completed(
         documents_found=documents_found,
         duration_ms=duration_ms
     )
-    await process_manager.emit_event(event)
+    event_bus.publish(event)
 
 
-async def emit_grading_started(session_id: str, question: str):
+def emit_grading_started(session_id: str, question: str):
     """Emit document grading started event"""
+    if _emission_level(session_id, ProcessStepStatus.STARTED) is None:
+        return
     event = ProcessEvent(
         session_id=session_id,
-        event_id=create_event_id(),
         step_type=ProcessStepType.GRADE_DOCUMENTS,
         status=ProcessStepStatus.STARTED,
         timestamp=datetime.now(),
         question=question
     )
-    await process_manager.emit_event(event)
+    event_bus.publish(event)
 
 
-async def emit_grading_completed(
+def emit_grading_completed(
     session_id: str, 
     question: str, 
     documents_graded: List[DocumentGrade],
     relevant_documents: int,
-    duration_ms: Optional[int] = None
+    duration_ms: Optional[int] = None,
+    metadata: Optional[Dict[str, Any]] = None
 ):
     """Emit document grading completed event"""
+    level = _emission_level(session_id, ProcessStepStatus.COMPLETED)
+    if level is None:
+        return
+    full = level == EventLevel.FULL
     event = ProcessEvent(
         session_id=session_id,
-        event_id=create_event_id(),
         step_type=ProcessStepType.GRADE_DOCUMENTS,
         status=ProcessStepStatus.COMPLETED,
         timestamp=datetime.now(),
         question=question,
-        documents_graded=documents_graded,
+        documents_graded=documents_graded if full else None,
         relevant_documents=relevant_documents,
-        duration_ms=duration_ms
+        duration_ms=duration_ms,
+        metadata=metadata
     )
-    await process_manager.emit_event(event)
+    event_bus.publish(event)
 
 
-async def emit_websearch_started(session_id: str, question: str, query: str):
+def emit_websearch_started(session_id: str, question: str, query: str):
     """Emit web search started event"""
+    if _emission_level(session_id, ProcessStepStatus.STARTED) is None:
+        return
     event = ProcessEvent(
         session_id=session_id,
-        event_id=create_event_id(),
         step_type=ProcessStepType.WEBSEARCH,
         status=ProcessStepStatus.STARTED,
         timestamp=datetime.now(),
         question=question,
         web_search_query=query
     )
-    await process_manager.emit_event(event)
+    event_bus.publish(event)
 
 
-async def emit_websearch_completed(
+def emit_websearch_completed(
     session_id: str, 
     question: str, 
     query: str,
@@ -281,9 +529,10 @@ async def emit_websearch_completed(
     duration_ms: Optional[int] = None
 ):
     """Emit web search completed event"""
+    if _emission_level(session_id, ProcessStepStatus.COMPLETED) is None:
+        return
     event = ProcessEvent(
         session_id=session_id,
-        event_id=create_event_id(),
         step_type=ProcessStepType.WEBSEARCH,
         status=ProcessStepStatus.COMPLETED,
         timestamp=datetime.now(),
@@ -292,103 +541,139 @@ async def emit_websearch_completed(
         web_sources_found=sources_found,
         duration_ms=duration_ms
     )
-    await process_manager.emit_event(event)
+    event_bus.publish(event)
 
 
-async def emit_generation_started(
+def emit_generation_started(
     session_id: str, 
     question: str, 
     attempt: int
 ):
     """Emit generation started event"""
+    if _emission_level(session_id, ProcessStepStatus.STARTED) is None:
+        return
     event = ProcessEvent(
         session_id=session_id,
-        event_id=create_event_id(),
         step_type=ProcessStepType.GENERATE,
         status=ProcessStepStatus.STARTED,
         timestamp=datetime.now(),
         question=question,
         generation_attempt=attempt
     )
-    await process_manager.emit_event(event)
+    event_bus.publish(event)
 
 
-async def emit_generation_completed(
+def emit_generation_completed(
     session_id: str, 
     question: str, 
     attempt: int,
     generation_preview: str,
-    duration_ms: Optional[int] = None
+    duration_ms: Optional[int] = None,
+    metadata: Optional[Dict[str, Any]] = None
 ):
     """Emit generation completed event"""
+    level = _emission_level(session_id, ProcessStepStatus.COMPLETED)
+    if level is None:
+        return
+    full = level == EventLevel.FULL
     event = ProcessEvent(
         session_id=session_id,
-        event_id=create_event_id(),
         step_type=ProcessStepType.GENERATE,
         status=ProcessStepStatus.COMPLETED,
         timestamp=datetime.now(),
         question=question,
         generation_attempt=attempt,
-        generation_preview=generation_preview[:500] + "..." if len(generation_preview) > 500 else generation_preview,
-        duration_ms=duration_ms
+        generation_preview=_preview(generation_preview) if full else None,
+        duration_ms=duration_ms,
+        metadata=metadata
     )
-    await process_manager.emit_event(event)
+    event_bus.publish(event)
 
 
-async def emit_hallucination_check(
+def emit_hallucination_check(
     session_id: str, 
     question: str, 
     score: str,
-    duration_ms: Optional[int] = None
+    duration_ms: Optional[int] = None,
+    metadata: Optional[Dict[str, Any]] = None
 ):
     """Emit hallucination check event"""
+    if _emission_level(session_id, ProcessStepStatus.COMPLETED) is None:
+        return
     event = ProcessEvent(
         session_id=session_id,
-        event_id=create_event_id(),
         step_type=ProcessStepType.HALLUCINATION_CHECK,
         status=ProcessStepStatus.COMPLETED,
         timestamp=datetime.now(),
         question=question,
         hallucination_score=score,
-        duration_ms=duration_ms
+        duration_ms=duration_ms,
+        metadata=metadata
     )
-    await process_manager.emit_event(event)
+    event_bus.publish(event)
 
 
-async def emit_answer_grading(
+def emit_answer_grading(
     session_id: str, 
     question: str, 
     grade: str,
-    duration_ms: Optional[int] = None
+    duration_ms: Optional[int] = None,
+    metadata: Optional[Dict[str, Any]] = None
 ):
     """Emit answer grading event"""
+    if _emission_level(session_id, ProcessStepStatus.COMPLETED) is None:
+        return
     event = ProcessEvent(
         session_id=session_id,
-        event_id=create_event_id(),
         step_type=ProcessStepType.ANSWER_GRADING,
         status=ProcessStepStatus.COMPLETED,
         timestamp=datetime.now(),
         question=question,
         answer_grade=grade,
-        duration_ms=duration_ms
+        duration_ms=duration_ms,
+        metadata=metadata
     )
-    await process_manager.emit_event(event)
+    event_bus.publish(event)
 
 
-async def emit_step_failed(
+def emit_step_failed(
     session_id: str, 
     step_type: ProcessStepType, 
     question: str,
-    error_message: str
+    error_message: str,
+    metadata: Optional[Dict[str, Any]] = None
 ):
     """Emit step failed event"""
+    if _emission_level(session_id, ProcessStepStatus.FAILED) is None:
+        return
     event = ProcessEvent(
         session_id=session_id,
-        event_id=create_event_id(),
         step_type=step_type,
         status=ProcessStepStatus.FAILED,
         timestamp=datetime.now(),
         question=question,
-        error_message=error_message
+        error_message=error_message,
+        metadata=metadata
+    )
+    event_bus.publish(event)
+
+def emit_step_skipped(
+    session_id: str,
+    step_type: ProcessStepType,
+    question: str,
+    reason: str,
+    metadata: Optional[Dict[str, Any]] = None
+):
+    """Emit step skipped event (e.g. a dependency's circuit breaker is open)"""
+    if _emission_level(session_id, ProcessStepStatus.SKIPPED) is None:
+        return
+    event = ProcessEvent(
+        session_id=session_id,
+        step_type=step_type,
+        status=ProcessStepStatus.SKIPPED,
+        timestamp=datetime.now(),
+        question=question,
+        error_message=reason,
+        metadata=metadata
     )
-    await process_manager.emit_event(event)
\ No newline at end of file
+    event_bus.publish(event)
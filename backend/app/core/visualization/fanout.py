@@ -0,0 +1,240 @@
+"""
+Per-connection WebSocket send queues.
+
+Emitting a process event only puts its serialized form on the outbound queue
+of every connection of the session. Each connection has its own writer task
+on the event loop that accepted it, so a slow browser delays only itself and
+the emitter never waits on network I/O. ``offer`` is thread-safe and may be
+called from any thread or event loop. Events are queued as their cached
+encodings and put in the connection's wire format when sent (see encoding.py).
+
+When a queue is full, the connection's overflow policy decides:
+
+- ``drop_oldest``: drop the oldest queued message
+- ``coalesce``: replace a queued message for the same step with the new one
+  (falling back to dropping the oldest)
+- ``disconnect``: close the connection; the client reconnects and replays
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Deque, Dict, Hashable, Optional, Set, Tuple, Union
+import asyncio
+import logging
+import os
+import threading
+
+from .encoding import EncodedEvent, Encoded, WireFormat
+
+logger = logging.getLogger(__name__)
+
+# "Try Again Later": the client fell too far behind
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+# Documents a connection remembers having sent; forgotten ones are sent in full again
+MAX_KNOWN_GRADES = 4096
+
+Message = Union[Encoded, EncodedEvent]
+
+
+class OverflowPolicy(str, Enum):
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"
+
+
+@dataclass
+class FanoutConfig:
+    max_queue_size: int = 100
+    overflow_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST
+
+    @classmethod
+    def from_env(cls) -> "FanoutConfig":
+        """Read ``VISUALIZATION_SEND_QUEUE_SIZE`` and ``VISUALIZATION_OVERFLOW_POLICY``"""
+        defaults = cls()
+        return cls(
+            max_queue_size=int(os.getenv("VISUALIZATION_SEND_QUEUE_SIZE", defaults.max_queue_size)),
+            overflow_policy=OverflowPolicy(
+                os.getenv("VISUALIZATION_OVERFLOW_POLICY", defaults.overflow_policy.value)
+            ),
+        )
+
+
+class ConnectionSender:
+    """Bounded outbound queue of one WebSocket, drained by its own writer task"""
+
+    def __init__(self, websocket, config: Optional[FanoutConfig] = None,
+                 loop: Optional[asyncio.AbstractEventLoop] = None,
+                 render: Optional[Callable[[str, Optional[str]], str]] = None,
+                 wire_format: WireFormat = WireFormat.JSON):
+        self.websocket = websocket
+        self.config = config or FanoutConfig()
+        # Wraps a text message and its event cursor for the protocol
+        self.render = render
+        self.wire_format = wire_format
+        # The loop the WebSocket belongs to; must be running when not given
+        self.loop = loop or asyncio.get_running_loop()
+        self.closed = False
+        # Closed by the disconnect policy
+        self.overflowed = False
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+
+        self._lock = threading.Lock()
+        self._queue: Deque[Tuple[Optional[Hashable], Message]] = deque()
+        # Ids of documents_graded entries already sent on this connection
+        self._known_grades: Set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Last event replayed before start(); queued events up to it are not sent again
+        self._replayed: Optional[EncodedEvent] = None
+
+    def start(self, replayed: Optional[EncodedEvent] = None) -> None:
+        """
+        Start the writer task; call on the WebSocket's loop. ``replayed`` is the
+        last event sent with ``send()`` before, so queued copies are skipped.
+        """
+        self._replayed = replayed
+        if self._task is None:
+            self._task = self.loop.create_task(self._run())
+
+    def _was_replayed(self, message: Message) -> bool:
+        replayed = self._replayed
+        return (replayed is not None and isinstance(message, EncodedEvent)
+                and message.epoch == replayed.epoch and message.seq <= replayed.seq)
+
+    def offer(self, message: Message, key: Optional[Hashable] = None) -> bool:
+        """
+        Queue a message or an encoded event without blocking; ``key`` identifies
+        messages that coalesce. Returns False if the connection is closed or
+        was closed for falling behind.
+        """
+        with self._lock:
+            if self.closed:
+                return False
+            if len(self._queue) >= self.config.max_queue_size and not self._make_room(key):
+                self.closed = True
+                self.overflowed = True
+                logger.warning(
+                    f"Closing slow WebSocket consumer ({len(self._queue)} messages queued)"
+                )
+                self._signal(lambda: self.loop.create_task(self._disconnect()))
+                return False
+            self._queue.append((key, message))
+        self._signal(self._wakeup.set)
+        return True
+
+    def _make_room(self, key: Optional[Hashable]) -> bool:
+        policy = self.config.overflow_policy
+        if policy == OverflowPolicy.DISCONNECT:
+            return False
+        if policy == OverflowPolicy.COALESCE and key is not None:
+            for queued in self._queue:
+                if queued[0] == key:
+                    self._queue.remove(queued)
+                    self.coalesced += 1
+                    return True
+        self._queue.popleft()
+        self.dropped += 1
+        return True
+
+    def _signal(self, callback) -> None:
+        try:
+            self.loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            # The loop has shut down; nothing is left to deliver to
+            self.closed = True
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while True:
+                with self._lock:
+                    if not self._queue:
+                        break
+                    _, message = self._queue.popleft()
+                if self._was_replayed(message):
+                    continue
+                try:
+                    await self.send(message)
+                except Exception as e:
+                    logger.info(f"WebSocket send failed, dropping connection: {e}")
+                    with self._lock:
+                        self.closed = True
+                        self._queue.clear()
+                    return
+
+    async def send(self, message: Message) -> None:
+        """
+        Send right away, bypassing the queue; only for replaying events before
+        ``start()``, afterwards the writer task is the only one sending
+        """
+        cursor = None
+        if isinstance(message, EncodedEvent):
+            cursor = message.cursor
+            grade_ids = message.grade_ids
+            message = message.encode(self.wire_format, self._known_grades)
+            if grade_ids:
+                if len(self._known_grades) > MAX_KNOWN_GRADES:
+                    self._known_grades.clear()
+                # Recorded before the send completes; a failed send closes the connection
+                self._known_grades.update(grade_ids)
+        if isinstance(message, bytes):
+            await self.websocket.send_bytes(message)
+        else:
+            if self.render is not None:
+                message = self.render(message, cursor)
+            await self.websocket.send_text(message)
+        self.sent += 1
+
+    async def _disconnect(self) -> None:
+        self.close()
+        try:
+            await self.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        """Stop the writer and discard queued messages"""
+        with self._lock:
+            self.closed = True
+            self._queue.clear()
+        if self._task is not None:
+            self._signal(self._task.cancel)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queued": len(self._queue),
+                "sent": self.sent,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+                "closed": self.closed,
+            }
+
+
+class StreamChannel:
+    """
+    Stand-in WebSocket for streaming HTTP responses: ``send_text`` hands each
+    message to the response generator, waiting until it has taken the previous
+    one, so a slow client fills its sender's queue like a slow WebSocket would.
+    """
+
+    def __init__(self):
+        self._messages: "asyncio.Queue[str]" = asyncio.Queue(maxsize=1)
+
+    async def send_text(self, text: str) -> None:
+        await self._messages.put(text)
+
+    async def receive(self, timeout: float) -> Optional[str]:
+        """The next message, or None if none arrived within ``timeout`` seconds"""
+        try:
+            return await asyncio.wait_for(self._messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self, code: int = 1000) -> None:
+        pass
@@ -0,0 +1,255 @@
+"""
+Bounded in-memory store of process events per session.
+
+Each session keeps its most recent ``max_events_per_session`` events in a ring
+buffer. Sessions without new events for ``session_ttl_seconds`` are evicted
+by a background sweeper, unless a client is still watching them. The total
+number of resident events, a proxy for their memory, is capped at
+``max_total_events`` by evicting the least recently used sessions first.
+Evictions are counted per cause and reported by ``stats()``.
+
+Events are numbered per session from 1 so clients can resume with
+``since(session_id, seq)`` after reconnecting and receive only what they
+missed. Numbering restarts when a session is evicted or cleared, and after a
+restart. Each numbering has a random ``epoch``, so ``resume`` can tell a
+client whose cursor belongs to an earlier one to drop what it has.
+
+A session can also hold an emission level override (see verbosity.py); it is
+evicted and cleared together with the session's events.
+"""
+
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Collection, Deque, Dict, List, Optional, Tuple
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EventStoreConfig:
+    max_events_per_session: int = 500
+    session_ttl_seconds: float = 1800.0
+    max_total_events: int = 50000
+    sweep_interval_seconds: float = 60.0
+
+    @classmethod
+    def from_env(cls) -> "EventStoreConfig":
+        """Read ``VISUALIZATION_MAX_EVENTS_PER_SESSION``, ``VISUALIZATION_SESSION_TTL_SECONDS`` etc."""
+        defaults = cls()
+        return cls(
+            max_events_per_session=int(
+                os.getenv("VISUALIZATION_MAX_EVENTS_PER_SESSION", defaults.max_events_per_session)
+            ),
+            session_ttl_seconds=float(
+                os.getenv("VISUALIZATION_SESSION_TTL_SECONDS", defaults.session_ttl_seconds)
+            ),
+            max_total_events=int(os.getenv("VISUALIZATION_MAX_TOTAL_EVENTS", defaults.max_total_events)),
+            sweep_interval_seconds=float(
+                os.getenv("VISUALIZATION_SWEEP_INTERVAL_SECONDS", defaults.sweep_interval_seconds)
+            ),
+        )
+
+
+@dataclass
+class _SessionLog:
+    events: Deque[Tuple[int, Any]]
+    last_active: float
+    last_seq: int = 0
+    epoch: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    level: Any = None
+
+
+@dataclass
+class _Evictions:
+    ring: int = 0  # Oldest event of a full session dropped
+    ttl: int = 0  # Idle sessions removed by the sweeper
+    lru: int = 0  # Sessions removed to stay under the global cap
+    events: int = 0  # Events dropped by any of the above
+
+    def to_dict(self) -> Dict[str, int]:
+        return {"ring": self.ring, "ttl": self.ttl, "lru": self.lru, "events": self.events}
+
+
+class SessionEventStore:
+    """Per-session ring buffers with idle TTL and a global LRU cap; thread-safe"""
+
+    def __init__(self, config: Optional[EventStoreConfig] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.config = config or EventStoreConfig()
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Least recently used session first
+        self._sessions: "OrderedDict[str, _SessionLog]" = OrderedDict()
+        self._resident = 0
+        self._evictions = _Evictions()
+        self._sweeper: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def append(self, session_id: str, event: Any, seq: Optional[int] = None, retain: bool = True) -> int:
+        """
+        Store an event under ``seq``, or the session's next number; returns the
+        number. With ``retain=False`` the event is only numbered, not kept.
+        """
+        with self._lock:
+            log = self._sessions.get(session_id)
+            if log is None:
+                log = _SessionLog(deque(maxlen=self.config.max_events_per_session), self._clock())
+                self._sessions[session_id] = log
+            else:
+                self._sessions.move_to_end(session_id)
+            if seq is None:
+                seq = log.last_seq + 1
+            log.last_seq = max(log.last_seq, seq)
+            log.last_active = self._clock()
+            if not retain:
+                return seq
+            if len(log.events) == log.events.maxlen:
+                self._evictions.ring += 1
+                self._evictions.events += 1
+                self._resident -= 1
+            log.events.append((seq, event))
+            self._resident += 1
+            # Never evict the session that is being written to
+            while self._resident > self.config.max_total_events and len(self._sessions) > 1:
+                oldest = next(iter(self._sessions))
+                self._drop(oldest)
+                self._evictions.lru += 1
+            return seq
+
+    def next_seq(self, session_id: str) -> int:
+        """The number ``append`` would give the session's next event"""
+        with self._lock:
+            log = self._sessions.get(session_id)
+            return log.last_seq + 1 if log else 1
+
+    def cursor(self, session_id: str) -> Tuple[str, int]:
+        """The epoch of the session's numbering and the number of its next event; starts one if needed"""
+        with self._lock:
+            log = self._sessions.get(session_id)
+            if log is None:
+                log = _SessionLog(deque(maxlen=self.config.max_events_per_session), self._clock())
+                self._sessions[session_id] = log
+            return log.epoch, log.last_seq + 1
+
+    def set_level(self, session_id: str, level: Any) -> None:
+        """Override the session's emission level; None removes the override"""
+        with self._lock:
+            log = self._sessions.get(session_id)
+            if log is None:
+                if level is None:
+                    return
+                log = _SessionLog(deque(maxlen=self.config.max_events_per_session), self._clock())
+                self._sessions[session_id] = log
+            else:
+                self._sessions.move_to_end(session_id)
+            log.level = level
+            log.last_active = self._clock()
+
+    def level(self, session_id: str) -> Any:
+        """The session's emission level override, or None"""
+        # Read without the lock: called for every event built, and a dict lookup is atomic
+        log = self._sessions.get(session_id)
+        return log.level if log is not None else None
+
+    def get(self, session_id: str) -> List[Any]:
+        """Events of a session, oldest first (empty if unknown or evicted)"""
+        with self._lock:
+            log = self._sessions.get(session_id)
+            if log is None:
+                return []
+            self._sessions.move_to_end(session_id)
+            return [event for _, event in log.events]
+
+    def since(self, session_id: str, seq: int) -> List[Any]:
+        """
+        Events numbered after ``seq``, oldest first. A ``seq`` ahead of the
+        session's last number predates a restart of the numbering, so all
+        events are returned.
+        """
+        return self.resume(session_id, seq)[1]
+
+    def resume(self, session_id: str, seq: int, epoch: Optional[str] = None) -> Tuple[bool, List[Any]]:
+        """
+        Whether the cursor (``epoch``, ``seq``) belongs to an earlier numbering
+        of the session, and the events after it. For such a stale cursor, or
+        one ahead of the session's last number, all events are returned and
+        the client must drop the ones it has.
+        """
+        with self._lock:
+            log = self._sessions.get(session_id)
+            if log is None:
+                return seq > 0, []
+            self._sessions.move_to_end(session_id)
+            stale = (epoch is not None and epoch != log.epoch) or seq > log.last_seq
+            if stale:
+                seq = 0
+            return stale, [event for number, event in log.events if number > seq]
+
+    def remove(self, session_id: str) -> None:
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+
+    def sessions(self) -> List[str]:
+        with self._lock:
+            return list(self._sessions)
+
+    def _drop(self, session_id: str) -> int:
+        count = len(self._sessions.pop(session_id).events)
+        self._resident -= count
+        self._evictions.events += count
+        return count
+
+    def sweep(self, keep: Collection[str] = ()) -> int:
+        """Evict sessions idle for longer than the TTL, except those in ``keep``; returns how many"""
+        deadline = self._clock() - self.config.session_ttl_seconds
+        with self._lock:
+            expired = [
+                session_id for session_id, log in self._sessions.items()
+                if log.last_active < deadline and session_id not in keep
+            ]
+            for session_id in expired:
+                self._drop(session_id)
+            self._evictions.ttl += len(expired)
+        if expired:
+            logger.debug(f"Evicted {len(expired)} idle visualization sessions")
+        return len(expired)
+
+    def start_sweeper(self, keep: Callable[[], Collection[str]] = lambda: ()) -> None:
+        """Sweep every ``sweep_interval_seconds`` in a background thread; ``keep`` names watched sessions"""
+        if self._sweeper is not None:
+            return
+        self._stopped.clear()
+
+        def run() -> None:
+            while not self._stopped.wait(self.config.sweep_interval_seconds):
+                try:
+                    self.sweep(keep())
+                except Exception as e:
+                    logger.warning(f"Visualization event sweep failed: {e}")
+
+        self._sweeper = threading.Thread(target=run, name="visualization-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        self._stopped.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=5)
+            self._sweeper = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "level_overrides": sum(log.level is not None for log in self._sessions.values()),
+                "resident_events": self._resident,
+                "max_total_events": self.config.max_total_events,
+                "max_events_per_session": self.config.max_events_per_session,
+                "session_ttl_seconds": self.config.session_ttl_seconds,
+                "evictions": self._evictions.to_dict(),
+            }
@@ -0,0 +1,391 @@
+"""
+Cross-process transports for process events.
+
+With several server workers (``uvicorn --workers N``) each process has its own
+``ProcessVisualizationManager``. The transport relays what one worker's
+manager stores (events, and sessions being cleared) to the managers of all
+other workers. Every worker therefore keeps a copy of every session's
+history, within the store's limits, and any worker can serve a WebSocket or
+``/visualization/events`` for any session. Each worker numbers the events it
+stores, relayed ones included, so a client that reconnects to another worker
+is reset and replays the session (see store.py).
+
+- ``inprocess``: a single worker; nothing is relayed (the default)
+- ``unix``: workers on one host, through a broker on a Unix domain socket.
+  The first worker to start hosts the broker and the others connect to it;
+  if that worker exits, the remaining ones elect a new host.
+- ``redis``: workers on any number of hosts, through Redis pub/sub (or a
+  Redis-compatible server); needs the ``redis`` package
+
+Messages are JSON-serializable dicts. ``publish`` never blocks the caller: a
+writer thread sends them, and when its queue is full new messages are
+dropped and counted. A process never receives its own messages.
+"""
+
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+Receiver = Callable[[Dict[str, Any]], None]
+
+# Seconds to wait before reconnecting to the broker or Redis
+RECONNECT_DELAY_SECONDS = 1.0
+
+
+class EventTransport:
+    """In-process transport: a single worker has no one to relay to"""
+
+    name = "inprocess"
+    remote = False
+
+    def start(self, receive: Receiver) -> None:
+        """Start calling ``receive`` with messages published by other processes"""
+
+    def publish(self, message: Dict[str, Any]) -> bool:
+        return True
+
+    def stop(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"transport": self.name}
+
+
+class _RemoteTransport(EventTransport, ABC):
+    """Outbound queue and writer thread, inbound reader thread with reconnects"""
+
+    remote = True
+
+    def __init__(self, max_queued: int = 10000):
+        self.max_queued = max_queued
+        self.origin = uuid.uuid4().hex
+        self.published = 0
+        self.received = 0
+        self.dropped = 0
+        self.errors = 0
+
+        self._receive: Optional[Receiver] = None
+        self._outbound: Deque[bytes] = deque()
+        self._pending = threading.Condition()
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.connected = threading.Event()
+
+    def start(self, receive: Receiver) -> None:
+        if self._threads:
+            return
+        self._receive = receive
+        self._stopped.clear()
+        for target, name in ((self._read_loop, "reader"), (self._write_loop, "writer")):
+            thread = threading.Thread(target=target, name=f"visualization-{self.name}-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def publish(self, message: Dict[str, Any]) -> bool:
+        frame = json.dumps({"origin": self.origin, "message": message}, separators=(",", ":"))
+        with self._pending:
+            if len(self._outbound) >= self.max_queued:
+                self.dropped += 1
+                return False
+            self._outbound.append(frame.encode("utf-8"))
+            self._pending.notify()
+        return True
+
+    def stop(self) -> None:
+        self._stopped.set()
+        with self._pending:
+            self._pending.notify_all()
+        self._disconnect()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        self.connected.clear()
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._pending:
+                while not self._outbound and not self._stopped.is_set():
+                    self._pending.wait()
+                if self._stopped.is_set():
+                    return
+                frames = list(self._outbound)
+                self._outbound.clear()
+            if not self.connected.is_set():
+                # Other workers cannot receive them until we reconnect
+                self.dropped += len(frames)
+                continue
+            try:
+                self._send(frames)
+                self.published += len(frames)
+            except Exception as e:
+                self.errors += 1
+                self.dropped += len(frames)
+                logger.warning(f"Relaying {len(frames)} process events failed: {e}")
+
+    def _read_loop(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._connect()
+                self.connected.set()
+                self._listen()
+            except Exception as e:
+                if not self._stopped.is_set():
+                    self.errors += 1
+                    logger.warning(f"Process event transport {self.name} disconnected: {e}")
+            finally:
+                self.connected.clear()
+                self._disconnect()
+            self._stopped.wait(RECONNECT_DELAY_SECONDS)
+
+    def _on_frame(self, frame: bytes) -> None:
+        try:
+            envelope = json.loads(frame)
+        except ValueError:
+            logger.warning("Ignoring malformed process event frame")
+            return
+        if envelope.get("origin") == self.origin:
+            return
+        self.received += 1
+        try:
+            self._receive(envelope["message"])
+        except Exception as e:
+            logger.error(f"Applying a relayed process event failed: {e}")
+
+    @abstractmethod
+    def _connect(self) -> None:
+        """Open the connection, raising when the other side is unreachable"""
+
+    @abstractmethod
+    def _listen(self) -> None:
+        """Block, passing each inbound frame to ``_on_frame``, until disconnected"""
+
+    @abstractmethod
+    def _send(self, frames: List[bytes]) -> None:
+        """Write the frames in order, raising when the connection is lost"""
+
+    @abstractmethod
+    def _disconnect(self) -> None:
+        """Close the connection, unblocking ``_listen``"""
+
+    def stats(self) -> Dict[str, Any]:
+        with self._pending:
+            queued = len(self._outbound)
+        return {
+            "transport": self.name,
+            "connected": self.connected.is_set(),
+            "queued": queued,
+            "published": self.published,
+            "received": self.received,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+class _SocketBroker:
+    """Relays each newline-delimited frame from one client to all the others"""
+
+    def __init__(self, server: socket.socket):
+        self._server = server
+        self._clients: List[socket.socket] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        threading.Thread(target=self._accept_loop, name="visualization-broker", daemon=True).start()
+
+    def _accept_loop(self) -> None:
+        while True:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return
+            with self._lock:
+                if self._closed:
+                    # Accepted while closing; the client reconnects elsewhere
+                    client.close()
+                    return
+                self._clients.append(client)
+            threading.Thread(target=self._relay, args=(client,), name="visualization-broker-client",
+                             daemon=True).start()
+
+    def _relay(self, client: socket.socket) -> None:
+        try:
+            for line in client.makefile("rb"):
+                with self._lock:
+                    others = [other for other in self._clients if other is not client]
+                for other in others:
+                    try:
+                        other.sendall(line)
+                    except OSError:
+                        self._drop(other)
+        except OSError:
+            pass
+        self._drop(client)
+
+    def _drop(self, client: socket.socket) -> None:
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+        try:
+            client.close()
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        try:
+            self._server.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._server.close()
+        with self._lock:
+            self._closed = True
+            clients, self._clients = self._clients, []
+        for client in clients:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+                client.close()
+            except OSError:
+                pass
+
+
+class UnixSocketTransport(_RemoteTransport):
+    """Workers on one host, relayed by a broker one of them hosts"""
+
+    name = "unix"
+
+    def __init__(self, path: str, max_queued: int = 10000):
+        super().__init__(max_queued)
+        self.path = path
+        self.hosting = False
+        self._socket: Optional[socket.socket] = None
+        self._broker: Optional[_SocketBroker] = None
+        self._send_lock = threading.Lock()
+
+    def _connect(self) -> None:
+        import fcntl
+
+        # Only one worker at a time decides whether to host the broker
+        with open(f"{self.path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._socket = self._open_client()
+            except (FileNotFoundError, ConnectionRefusedError):
+                # No broker, or a stale socket file left by a worker that exited
+                if os.path.exists(self.path):
+                    os.unlink(self.path)
+                server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                server.bind(self.path)
+                server.listen()
+                self._broker = _SocketBroker(server)
+                self.hosting = True
+                logger.info(f"Hosting the process event broker on {self.path}")
+                self._socket = self._open_client()
+
+    def _open_client(self) -> socket.socket:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.connect(self.path)
+        except OSError:
+            client.close()
+            raise
+        return client
+
+    def _listen(self) -> None:
+        for line in self._socket.makefile("rb"):
+            self._on_frame(line)
+
+    def _send(self, frames: List[bytes]) -> None:
+        client = self._socket
+        if client is None:
+            raise ConnectionError("not connected to the broker")
+        with self._send_lock:
+            client.sendall(b"".join(frame + b"\n" for frame in frames))
+
+    def _disconnect(self) -> None:
+        # Called by the reader thread and by stop()
+        client, self._socket = self._socket, None
+        if client is not None:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            client.close()
+        broker, self._broker = self._broker, None
+        if broker is not None:
+            broker.close()
+            self.hosting = False
+            if self._stopped.is_set() and os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "path": self.path, "hosting_broker": self.hosting}
+
+
+class RedisTransport(_RemoteTransport):
+    """Workers on any host, relayed by Redis pub/sub"""
+
+    name = "redis"
+
+    def __init__(self, url: str, channel: str, max_queued: int = 10000):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError(
+                "VISUALIZATION_TRANSPORT=redis requires the redis package (pip install redis)"
+            ) from e
+        super().__init__(max_queued)
+        self.channel = channel
+        self._client = redis.Redis.from_url(url)
+        self._pubsub = None
+
+    def _connect(self) -> None:
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self.channel)
+
+    def _listen(self) -> None:
+        for message in self._pubsub.listen():
+            if self._stopped.is_set():
+                return
+            self._on_frame(message["data"])
+
+    def _send(self, frames: List[bytes]) -> None:
+        pipeline = self._client.pipeline(transaction=False)
+        for frame in frames:
+            pipeline.publish(self.channel, frame)
+        pipeline.execute()
+
+    def _disconnect(self) -> None:
+        if self._pubsub is not None:
+            try:
+                self._pubsub.close()
+            except Exception:
+                pass
+            self._pubsub = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "channel": self.channel}
+
+
+def transport_from_env() -> EventTransport:
+    """The transport named by ``VISUALIZATION_TRANSPORT``: inprocess (default), unix or redis"""
+    name = os.getenv("VISUALIZATION_TRANSPORT", "inprocess").lower()
+    max_queued = int(os.getenv("VISUALIZATION_TRANSPORT_MAX_QUEUED", 10000))
+    if name == "inprocess":
+        return EventTransport()
+    if name == "unix":
+        return UnixSocketTransport(
+            os.getenv("VISUALIZATION_SOCKET_PATH", "/tmp/adaptive-rag-events.sock"), max_queued
+        )
+    if name == "redis":
+        return RedisTransport(
+            os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            os.getenv("VISUALIZATION_REDIS_CHANNEL", "adaptive-rag:process-events"),
+            max_queued,
+        )
+    raise ValueError(f"Unknown VISUALIZATION_TRANSPORT: {name}")
@@ -0,0 +1,54 @@
+"""
+How much process detail is emitted and kept.
+
+- ``full``: every event with its previews: document grades, generation
+  preview, routing reasoning (the default)
+- ``summary``: only step outcomes (no ``started`` events) and none of the
+  previews
+- ``off``: nothing
+
+The level is set globally and can be overridden per session. Independently,
+history is retained for a sample of sessions: ``history_sample_rate`` of
+them, chosen by a hash of the session id, so every worker makes the same
+choice and a session's history is kept whole or not at all. When a session
+is not sampled and nobody is watching it, its events are not even built.
+"""
+
+from dataclasses import dataclass
+from enum import Enum
+import hashlib
+import os
+
+
+class EventLevel(str, Enum):
+    OFF = "off"
+    SUMMARY = "summary"
+    FULL = "full"
+
+
+@dataclass
+class EmissionConfig:
+    level: EventLevel = EventLevel.FULL
+    # Fraction of sessions whose events are kept for replay: 1 keeps all, 0 none
+    history_sample_rate: float = 1.0
+
+    @classmethod
+    def from_env(cls) -> "EmissionConfig":
+        """Read ``VISUALIZATION_LEVEL`` and ``VISUALIZATION_HISTORY_SAMPLE_RATE``"""
+        defaults = cls()
+        return cls(
+            level=EventLevel(os.getenv("VISUALIZATION_LEVEL", defaults.level.value).lower()),
+            history_sample_rate=float(
+                os.getenv("VISUALIZATION_HISTORY_SAMPLE_RATE", defaults.history_sample_rate)
+            ),
+        )
+
+
+def session_sampled(session_id: str, rate: float) -> bool:
+    """Whether a session falls in the sampled fraction ``rate``, the same in every process"""
+    if rate >= 1:
+        return True
+    if rate <= 0:
+        return False
+    digest = hashlib.blake2b(session_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") < rate * (1 << 64)
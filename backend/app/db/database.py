@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 import os
 from typing import Generator
@@ -7,6 +8,15 @@ from contextlib import contextmanager
 from .models import Base
 
 
+def async_database_url(url: str) -> str:
+    """The asyncio driver URL for a sync database URL (asyncpg for PostgreSQL, aiosqlite for SQLite)"""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+
 class Database:
     def __init__(self):
         # Get PostgreSQL database URL from environment
@@ -45,6 +55,19 @@ class Database:
             bind=self.engine
         )
     
+    def create_async_engine(self) -> AsyncEngine:
+        """
+        New asyncio engine for the same database. Its connections belong to the
+        event loop that uses them, so each loop creates its own engine.
+        """
+        return create_async_engine(
+            async_database_url(self.database_url),
+            pool_pre_ping=True,
+            pool_recycle=300,
+            pool_size=5,
+            max_overflow=5,
+        )
+    
     def create_tables(self):
         """Create all tables in the database"""
         Base.metadata.create_all(bind=self.engine)
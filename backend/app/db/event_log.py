@@ -0,0 +1,350 @@
+"""
+Persisted log of process events for offline latency analytics.
+
+Process events live in memory and are gone when a worker restarts. With
+``PROCESS_EVENT_LOG=true`` the application lifespan attaches
+``process_event_log`` to ``process_manager``, which hands it every event it
+delivers. Each worker logs only the events of its own requests, not the ones
+relayed from other workers, so every event is written once. ``started``
+events carry no duration and are not kept. A writer thread inserts the rows
+in batches of up to ``max_batch_size``, when that many are waiting or
+``flush_interval`` seconds after the first one. Failed batches stay queued
+and are retried; beyond ``max_queued`` rows the oldest are dropped and
+counted. A batch the database rejects (``DataError``, ``IntegrityError``) is
+inserted row by row instead, and the rows rejected again go to
+``dead_letter_path`` rather than blocking the queue. This is analytics data,
+so ``close()`` makes one last attempt and does not spill what it cannot
+write.
+
+``event_log_report`` reads the log back for a time window: latency
+percentiles per step, how often generation was retried, and how often a
+question routed to the vector store fell back to web search. A run is one
+question's pass through the graph: the events stamped with one ``run_id``
+(see ``process_run``). PostgreSQL computes the percentiles itself; other
+databases (SQLite in tests and development) return the durations to Python.
+"""
+
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+import logging
+import math
+import os
+import threading
+import uuid
+
+from sqlalchemy import case, func, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .models import ProcessEventRecord
+from .write_buffer import PERMANENT_ERRORS, append_jsonl
+
+logger = logging.getLogger(__name__)
+
+_events = ProcessEventRecord.__table__
+
+# Percentiles reported per step
+PERCENTILES = {"p50_ms": 0.5, "p95_ms": 0.95, "p99_ms": 0.99}
+
+
+def event_row(event) -> Optional[Dict[str, Any]]:
+    """The ``process_events`` row for a ``ProcessEvent``, or None for events that are not kept"""
+    if event.status.value == "started":
+        return None
+    return {
+        "id": str(uuid.uuid4()),
+        "session_id": event.session_id,
+        "seq": event.seq,
+        "run_id": event.run_id,
+        "step_type": event.step_type.value,
+        "status": event.status.value,
+        "timestamp": event.timestamp,
+        "duration_ms": event.duration_ms,
+        "generation_attempt": event.generation_attempt,
+        "routing_decision": event.routing_decision,
+    }
+
+
+class ProcessEventLog:
+    """Queues process events and inserts them in batches from a background thread"""
+
+    def __init__(self, engine_factory: Callable[[], Engine], max_batch_size: int = 500,
+                 flush_interval: float = 2.0, max_queued: int = 50000,
+                 dead_letter_path: Optional[str] = None):
+        self.engine_factory = engine_factory
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_queued = max_queued
+        self.dead_letter_path = dead_letter_path
+        self.events_written = 0
+        self.batches_written = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.dead_lettered = 0
+        self.last_error: Optional[str] = None
+
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        # The application's engine; the writer only borrows connections from its pool
+        self._engine: Optional[Engine] = None
+
+    def start(self) -> None:
+        """Start the writer thread"""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("ProcessEventLog is closed")
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="process-event-log", daemon=True)
+            self._thread.start()
+
+    def add(self, event) -> None:
+        """Queue a delivered ``ProcessEvent``; never blocks on the database"""
+        row = event_row(event)
+        if row is None:
+            return
+        with self._condition:
+            if self._closed:
+                return
+            if len(self._pending) >= self.max_queued:
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append(row)
+            # The first event starts the flush interval, a full batch ends it
+            if len(self._pending) in (1, self.max_batch_size):
+                self._condition.notify()
+
+    def close(self, timeout: Optional[float] = 30.0) -> None:
+        """Write the remaining events and stop the writer"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "pending": len(self._pending),
+                "events_written": self.events_written,
+                "batches_written": self.batches_written,
+                "failed_flushes": self.failed_flushes,
+                "dropped": self.dropped,
+                "dead_lettered": self.dead_lettered,
+                "last_error": self.last_error,
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._closed and len(self._pending) < self.max_batch_size:
+                    # Give the batch time to fill; a full batch or close() wakes us early
+                    self._condition.wait(self.flush_interval)
+                closed = self._closed
+            if not self._flush() and not closed:
+                # Back off until the next interval before retrying
+                with self._condition:
+                    self._condition.wait(self.flush_interval)
+                continue
+            if closed:
+                with self._condition:
+                    if self._pending:
+                        logger.warning(f"Discarding {len(self._pending)} unwritten process events")
+                        self.dropped += len(self._pending)
+                        self._pending.clear()
+                return
+
+    def _flush(self) -> bool:
+        """Write the queued rows in batches; False if a batch failed (it stays queued)"""
+        while True:
+            with self._condition:
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch_size, len(self._pending)))]
+            if not batch:
+                return True
+            try:
+                try:
+                    self._insert(batch)
+                except PERMANENT_ERRORS as e:
+                    logger.warning(f"Database rejected a batch of {len(batch)} process events, writing them one by one: {e}")
+                    self._insert_each(batch)
+                    continue
+            except Exception as e:
+                # Rows inserted one by one before the failure are no longer in the batch
+                with self._condition:
+                    self._pending.extendleft(reversed(batch))
+                    while len(self._pending) > self.max_queued:
+                        self._pending.popleft()
+                        self.dropped += 1
+                    self.failed_flushes += 1
+                    self.last_error = str(e)
+                logger.warning(f"Writing {len(batch)} process events failed: {e}")
+                return False
+            with self._condition:
+                self.events_written += len(batch)
+                self.batches_written += 1
+
+    def _insert(self, rows: List[Dict[str, Any]]) -> None:
+        if self._engine is None:
+            self._engine = self.engine_factory()
+        with self._engine.begin() as connection:
+            connection.execute(insert(_events), rows)
+
+    def _insert_each(self, batch: List[Dict[str, Any]]) -> None:
+        """
+        Insert rows one at a time, dead-lettering those the database rejects.
+        Each row leaves ``batch`` once handled, so a transient error propagates
+        with only the unwritten rest in it.
+        """
+        while batch:
+            try:
+                self._insert(batch[:1])
+                with self._condition:
+                    self.events_written += 1
+            except PERMANENT_ERRORS as e:
+                with self._condition:
+                    self.last_error = str(e)
+                logger.error(f"Database rejected a process event of session {batch[0]['session_id']}: {e}")
+                self._dead_letter(batch[0])
+            batch.pop(0)
+
+    def _dead_letter(self, row: Dict[str, Any]) -> None:
+        with self._condition:
+            self.dead_lettered += 1
+        if not self.dead_letter_path:
+            return
+        try:
+            append_jsonl(self.dead_letter_path, [row])
+        except OSError as e:
+            logger.error(f"Writing a rejected process event to {self.dead_letter_path} failed: {e}")
+
+
+def _percentile(ordered: List[int], q: float) -> Optional[int]:
+    """Nearest-rank percentile, as PostgreSQL's ``percentile_disc`` computes it"""
+    if not ordered:
+        return None
+    return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+
+def _step_latencies(session: Session, scoped) -> Dict[str, Dict[str, int]]:
+    """Percentiles and maximum of the completed durations per step"""
+    record = ProcessEventRecord
+    completed = (record.status == "completed", record.duration_ms.isnot(None))
+    if session.get_bind().dialect.name == "postgresql":
+        # Aggregated in the database; only one row per step comes back
+        rows = scoped(session.query(
+            record.step_type,
+            *(func.percentile_disc(q).within_group(record.duration_ms).label(name) for name, q in PERCENTILES.items()),
+            func.max(record.duration_ms).label("max_ms"),
+        )).filter(*completed).group_by(record.step_type)
+        return {row.step_type: {name: row._mapping[name] for name in (*PERCENTILES, "max_ms")} for row in rows}
+
+    # Durations arrive sorted per step, so the percentiles are read off directly
+    durations: Dict[str, List[int]] = {}
+    rows = scoped(session.query(record.step_type, record.duration_ms)).filter(*completed).order_by(
+        record.step_type, record.duration_ms
+    )
+    for step_type, duration_ms in rows:
+        durations.setdefault(step_type, []).append(duration_ms)
+    return {
+        step_type: {**{name: _percentile(ordered, q) for name, q in PERCENTILES.items()}, "max_ms": ordered[-1]}
+        for step_type, ordered in durations.items()
+    }
+
+
+def _rate(part: int, whole: int) -> Optional[float]:
+    return round(part / whole, 4) if whole else None
+
+
+def event_log_report(session: Session, start: Optional[datetime] = None,
+                     end: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Latency percentiles per step, retry-loop frequency and web-search fallback
+    rate of the events logged in [``start``, ``end``)
+    """
+    record = ProcessEventRecord
+
+    def scoped(query):
+        if start:
+            query = query.filter(record.timestamp >= start)
+        if end:
+            query = query.filter(record.timestamp < end)
+        return query
+
+    by_step: Dict[str, Dict[str, Any]] = {}
+    counts = scoped(session.query(record.step_type, record.status, func.count(record.id))).group_by(
+        record.step_type, record.status
+    )
+    events = 0
+    for step_type, status, count in counts:
+        events += count
+        by_step.setdefault(step_type, {"count": 0})
+        by_step[step_type][status] = count
+        by_step[step_type]["count"] += count
+
+    for step_type, latencies in _step_latencies(session, scoped).items():
+        by_step[step_type].update(latencies)
+
+    runs = scoped(session.query(
+        func.max(record.generation_attempt).label("attempts"),
+        func.max(case((record.routing_decision == "websearch", 1), else_=0)).label("routed_to_web"),
+        func.max(case((record.step_type == "websearch", 1), else_=0)).label("searched_web"),
+    )).filter(record.run_id.isnot(None)).group_by(record.run_id).subquery()
+    generated = runs.c.attempts.isnot(None)
+    from_vectorstore = runs.c.routed_to_web == 0
+    totals = session.query(
+        func.count(),
+        func.coalesce(func.sum(case((generated, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((runs.c.attempts > 1, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((generated, runs.c.attempts - 1), else_=0)), 0),
+        func.coalesce(func.sum(case((from_vectorstore, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((from_vectorstore & (runs.c.searched_web == 1), 1), else_=0)), 0),
+    ).one()
+    run_count, generated_runs, retried_runs, extra_generations, vectorstore_runs, fell_back = (
+        int(value) for value in totals
+    )
+
+    return {
+        "start": start,
+        "end": end,
+        "events": events,
+        "runs": run_count,
+        "by_step": by_step,
+        "retry_loops": {
+            "runs": generated_runs,
+            "retried": retried_runs,
+            "rate": _rate(retried_runs, generated_runs),
+            "extra_generations": extra_generations,
+        },
+        "web_search_fallback": {
+            "runs": vectorstore_runs,
+            "fell_back": fell_back,
+            "rate": _rate(fell_back, vectorstore_runs),
+        },
+    }
+
+
+def event_log_enabled() -> bool:
+    return os.getenv("PROCESS_EVENT_LOG", "false").lower() in ("1", "true", "yes")
+
+
+def _engine() -> Engine:
+    from .database import db
+
+    return db.engine
+
+
+# Global instance, attached to process_manager by the application lifespan when enabled
+process_event_log = ProcessEventLog(
+    _engine,
+    max_batch_size=int(os.getenv("PROCESS_EVENT_LOG_MAX_BATCH", 500)),
+    flush_interval=int(os.getenv("PROCESS_EVENT_LOG_FLUSH_MS", 2000)) / 1000.0,
+    max_queued=int(os.getenv("PROCESS_EVENT_LOG_MAX_QUEUED", 50000)),
+    dead_letter_path=os.getenv("PROCESS_EVENT_LOG_DEAD_LETTER_PATH", "./.process_event_dead_letter.jsonl"),
+)
@@ -0,0 +1,134 @@
+"""
+Keyset pagination of session history.
+
+Messages are ordered by (``timestamp``, ``id``) within a session, which the
+``ix_chat_messages_session_timestamp_id`` index serves directly. A page
+continues after the key of the last message of the previous one, passed back
+as an opaque cursor, so reading page N costs the same as reading page 1.
+Only the columns that are returned are selected; ``sources`` is opt-in and
+hydrated from the referenced source chunks with one lookup per batch.
+Messages still waiting in the write buffer are merged in by key.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from datetime import datetime
+from itertools import islice
+import base64
+import json
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from .models import ChatMessage, SourceChunk
+
+HISTORY_COLUMNS = ("id", "timestamp", "question", "answer", "used_web_search")
+
+Key = Tuple[datetime, str]
+
+
+def encode_cursor(key: Key) -> str:
+    timestamp, message_id = key
+    raw = json.dumps([timestamp.isoformat(), message_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Key:
+    """Inverse of ``encode_cursor``; raises ValueError for malformed cursors"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, message_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), str(message_id)
+    except Exception as e:
+        raise ValueError(f"Invalid history cursor: {cursor}") from e
+
+
+def _key(message: Dict[str, Any]) -> Key:
+    return message["timestamp"], message["id"]
+
+
+def _project(message: Dict[str, Any], sources: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    row = {column: message[column] for column in HISTORY_COLUMNS}
+    if sources is not None:
+        row["sources"] = sources
+    return row
+
+
+def hydrate_sources(session: Session, messages: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    The sources of each message, resolved from its ``source_ids`` with one
+    query for all referenced chunks. Unwritten messages carry their chunks;
+    messages stored before chunks were normalized keep their inline sources.
+    """
+    known = {chunk["id"]: chunk for message in messages for chunk in message.get("chunks") or ()}
+    missing = {
+        source_id
+        for message in messages
+        for source_id in message.get("source_ids") or ()
+        if source_id not in known
+    }
+    if missing:
+        rows = session.query(SourceChunk.id, SourceChunk.content, SourceChunk.chunk_metadata).filter(
+            SourceChunk.id.in_(missing)
+        )
+        known.update({row.id: {"content": row.content, "metadata": row.chunk_metadata or {}} for row in rows})
+    return [
+        [
+            {"content": known[source_id]["content"], "metadata": known[source_id]["metadata"]}
+            for source_id in message["source_ids"]
+            if source_id in known
+        ]
+        if message.get("source_ids") else message.get("sources") or []
+        for message in messages
+    ]
+
+
+def iter_history(
+    session: Session,
+    session_id: str,
+    after: Optional[Key] = None,
+    limit: Optional[int] = None,
+    include_sources: bool = False,
+    pending: Iterable[Dict[str, Any]] = (),
+    batch_size: int = 100,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield up to ``limit`` messages of a session after the ``after`` key, oldest
+    first, streaming rows from the database ``batch_size`` at a time. ``pending``
+    are unwritten message rows of the session, merged in unless already stored.
+    """
+    columns = [getattr(ChatMessage, column) for column in HISTORY_COLUMNS]
+    if include_sources:
+        columns += [ChatMessage.source_ids, ChatMessage.sources]
+    query = session.query(*columns).filter(ChatMessage.session_id == session_id)
+    if after is not None:
+        query = query.filter(tuple_(ChatMessage.timestamp, ChatMessage.id) > tuple_(*after))
+    query = query.order_by(ChatMessage.timestamp, ChatMessage.id)
+    if limit is not None:
+        query = query.limit(limit)
+
+    unwritten: List[Dict[str, Any]] = sorted(
+        (m for m in pending if after is None or _key(m) > after), key=_key
+    )
+    stored = set()
+
+    def merged() -> Iterator[Dict[str, Any]]:
+        for row in query.yield_per(batch_size):
+            message = row._asdict()
+            stored.add(message["id"])
+            # Unwritten messages that sort before this row come first
+            while unwritten and _key(unwritten[0]) <= _key(message):
+                candidate = unwritten.pop(0)
+                if candidate["id"] not in stored:
+                    yield candidate
+            yield message
+        yield from (m for m in unwritten if m["id"] not in stored)
+
+    messages = islice(merged(), limit)
+    if not include_sources:
+        yield from (_project(message) for message in messages)
+        return
+    while True:
+        batch = list(islice(messages, batch_size))
+        if not batch:
+            return
+        yield from map(_project, batch, hydrate_sources(session, batch))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, DateTime, Boolean, ForeignKey, JSON, Integer
+from sqlalchemy import Column, String, Text, DateTime, Boolean, ForeignKey, JSON, Integer, Float, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -15,11 +15,20 @@ class ChatSession(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
     # Relationship to messages
-    messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan")
+    messages = relationship(
+        "ChatMessage",
+        back_populates="session",
+        cascade="all, delete-orphan",
+        order_by="(ChatMessage.timestamp, ChatMessage.id)"
+    )
 
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Keyset pagination of session history
+        Index("ix_chat_messages_session_timestamp_id", "session_id", "timestamp", "id"),
+    )
     
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     session_id = Column(String(36), ForeignKey("chat_sessions.id"), nullable=False)
@@ -31,9 +40,49 @@ class ChatMessage(Base):
     
     # Metadata
     used_web_search = Column(Boolean, default=False)
-    sources = Column(JSON, default=list)  # Store source documents as JSON
+    source_ids = Column(JSON, default=list)  # Ids of the SourceChunk rows used for the answer
+    sources = Column(JSON, default=list)  # Source documents copied inline by older versions
     generation_attempts = Column(Integer, default=0)
     web_search_attempts = Column(Integer, default=0)
     
+    # Token usage and estimated cost of all LLM calls made for this message
+    llm_calls = Column(Integer, default=0)
+    input_tokens = Column(Integer, default=0)
+    output_tokens = Column(Integer, default=0)
+    total_tokens = Column(Integer, default=0)
+    cost_usd = Column(Float, default=0.0)
+    usage = Column(JSON, default=dict)  # Per-step and per-model breakdown
+    
     # Relationship to session
-    session = relationship("ChatSession", back_populates="messages")
\ No newline at end of file
+    session = relationship("ChatSession", back_populates="messages")
+
+
+class SourceChunk(Base):
+    """A retrieved chunk as shown with chat history, stored once and referenced by id from messages"""
+    __tablename__ = "source_chunks"
+    
+    id = Column(String(64), primary_key=True)  # Stable chunk id assigned at ingestion
+    content = Column(Text, nullable=False)  # Preview of the chunk text
+    chunk_metadata = Column("metadata", JSON, default=dict)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class ProcessEventRecord(Base):
+    """A process event kept for offline latency analytics (see app/db/event_log.py)"""
+    __tablename__ = "process_events"
+    __table_args__ = (
+        # Reports scan a time window
+        Index("ix_process_events_timestamp", "timestamp"),
+    )
+    
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    session_id = Column(String(36), nullable=False)
+    seq = Column(Integer, nullable=False)
+    # The graph run (one question) the event belongs to; the chat message id
+    run_id = Column(String(36))
+    step_type = Column(String(32), nullable=False)
+    status = Column(String(16), nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    duration_ms = Column(Integer)
+    generation_attempt = Column(Integer)
+    routing_decision = Column(String(32))
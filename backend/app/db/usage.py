@@ -0,0 +1,167 @@
+"""
+Token usage and cost report over stored chat messages.
+
+Messages still waiting in the write buffer are merged in, so a report
+includes the answers given just before it. ``pending`` is read before the
+database: a message flushed in between is then found in both and counted
+once, from the database.
+"""
+
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.models.usage import UsageTotals, aggregate_usage
+
+from .models import ChatMessage
+
+TOTAL_COLUMNS = ("calls", "input_tokens", "output_tokens", "total_tokens", "cost_usd")
+# Most recent messages whose per-step usage JSON a report reads, and rows fetched per round trip
+STEP_LIMIT = 10000
+STEP_BATCH_SIZE = 500
+
+
+def _totals(message: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "calls": message.get("llm_calls") or 0,
+        "input_tokens": message.get("input_tokens") or 0,
+        "output_tokens": message.get("output_tokens") or 0,
+        "total_tokens": message.get("total_tokens") or 0,
+        "cost_usd": message.get("cost_usd") or 0.0,
+    }
+
+
+def _top_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "message_id": message["id"],
+        "session_id": message["session_id"],
+        "timestamp": message["timestamp"],
+        "question": message["question"][:200],
+        "generation_attempts": message.get("generation_attempts") or 0,
+        "web_search_attempts": message.get("web_search_attempts") or 0,
+        **_totals(message),
+    }
+
+
+def usage_report(
+    session: Session,
+    session_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 10,
+    pending: Iterable[Dict[str, Any]] = (),
+    step_limit: int = STEP_LIMIT,
+) -> Dict[str, Any]:
+    """
+    Usage totals with a per-step breakdown and the sessions and messages that
+    used the most tokens. ``pending`` are unwritten message rows, merged in
+    unless already stored. Totals are summed by the database; the per-step
+    breakdown covers the ``step_limit`` most recent messages.
+    """
+    unwritten = [
+        message for message in pending
+        if (not session_id or message["session_id"] == session_id)
+        and (not start or message["timestamp"] >= start)
+        and (not end or message["timestamp"] < end)
+    ]
+
+    def scoped(query):
+        if session_id:
+            query = query.filter(ChatMessage.session_id == session_id)
+        if start:
+            query = query.filter(ChatMessage.timestamp >= start)
+        if end:
+            query = query.filter(ChatMessage.timestamp < end)
+        return query
+
+    if unwritten:
+        stored = {
+            row.id for row in
+            session.query(ChatMessage.id).filter(ChatMessage.id.in_([message["id"] for message in unwritten]))
+        }
+        unwritten = [message for message in unwritten if message["id"] not in stored]
+
+    stored_totals = scoped(session.query(
+        func.count(ChatMessage.id).label("messages"),
+        func.coalesce(func.sum(ChatMessage.llm_calls), 0).label("calls"),
+        func.coalesce(func.sum(ChatMessage.input_tokens), 0).label("input_tokens"),
+        func.coalesce(func.sum(ChatMessage.output_tokens), 0).label("output_tokens"),
+        func.coalesce(func.sum(ChatMessage.total_tokens), 0).label("total_tokens"),
+        func.coalesce(func.sum(ChatMessage.cost_usd), 0.0).label("cost_usd"),
+    )).one()
+    summary = UsageTotals()
+    summary.merge(stored_totals._mapping)
+    for message in unwritten:
+        summary.merge(_totals(message))
+
+    # The step breakdown sits in per-message JSON: only the most recent messages are read for it
+    usages = scoped(session.query(ChatMessage.usage)).order_by(ChatMessage.timestamp.desc())
+    usages = usages.limit(max(step_limit - len(unwritten), 0)).yield_per(STEP_BATCH_SIZE)
+    steps = aggregate_usage(
+        {"by_step": (usage or {}).get("by_step")}
+        for usage in chain((message.get("usage") for message in unwritten), (row.usage for row in usages))
+    )
+
+    by_session: List[Dict[str, Any]] = []
+    if not session_id:
+        total_tokens = func.coalesce(func.sum(ChatMessage.total_tokens), 0)
+        grouped = scoped(session.query(
+            ChatMessage.session_id,
+            func.count(ChatMessage.id).label("messages"),
+            func.coalesce(func.sum(ChatMessage.llm_calls), 0).label("calls"),
+            func.coalesce(func.sum(ChatMessage.input_tokens), 0).label("input_tokens"),
+            func.coalesce(func.sum(ChatMessage.output_tokens), 0).label("output_tokens"),
+            total_tokens.label("total_tokens"),
+            func.coalesce(func.sum(ChatMessage.cost_usd), 0.0).label("cost_usd"),
+        )).group_by(ChatMessage.session_id)
+        sessions = {row.session_id: dict(row._mapping) for row in grouped.order_by(total_tokens.desc()).limit(limit)}
+        # Sessions with unwritten messages can enter the top, so their stored totals are needed too
+        extra = {message["session_id"] for message in unwritten} - set(sessions)
+        if extra:
+            sessions.update(
+                (row.session_id, dict(row._mapping))
+                for row in grouped.filter(ChatMessage.session_id.in_(extra))
+            )
+        for message in unwritten:
+            totals = sessions.setdefault(
+                message["session_id"],
+                {"session_id": message["session_id"], "messages": 0, **dict.fromkeys(TOTAL_COLUMNS, 0)},
+            )
+            totals["messages"] += 1
+            for column, value in _totals(message).items():
+                totals[column] += value
+        by_session = sorted(sessions.values(), key=lambda totals: totals["total_tokens"], reverse=True)[:limit]
+
+    top = scoped(session.query(ChatMessage)).order_by(ChatMessage.total_tokens.desc()).limit(limit)
+    top_messages = [
+        _top_message({
+            "id": message.id,
+            "session_id": message.session_id,
+            "timestamp": message.timestamp,
+            "question": message.question,
+            "generation_attempts": message.generation_attempts,
+            "web_search_attempts": message.web_search_attempts,
+            "llm_calls": message.llm_calls,
+            "input_tokens": message.input_tokens,
+            "output_tokens": message.output_tokens,
+            "total_tokens": message.total_tokens,
+            "cost_usd": message.cost_usd,
+        })
+        for message in top
+    ] + [_top_message(message) for message in unwritten]
+    top_messages = sorted(top_messages, key=lambda message: message["total_tokens"], reverse=True)[:limit]
+
+    return {
+        "session_id": session_id,
+        "start": start,
+        "end": end,
+        "messages": stored_totals.messages + len(unwritten),
+        "totals": summary.to_dict(),
+        "by_step": steps["by_step"],
+        "step_messages": steps["messages"],
+        "by_session": by_session,
+        "top_messages": top_messages,
+    }
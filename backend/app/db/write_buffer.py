@@ -0,0 +1,383 @@
+"""
+Write-behind persistence of chat messages.
+
+``ChatService`` hands finished messages to ``message_buffer`` instead of
+writing them on the request path. A background thread runs its own event
+loop with an async engine and flushes the buffer as one transaction per
+batch: the sessions are upserted, and the source chunks and messages
+inserted with multi-row INSERTs. A flush happens when ``max_batch_size`` messages are waiting, or
+``flush_interval`` seconds after the last one. Failed batches stay buffered
+and are retried on the next flush. Inserts skip rows that already exist, so a
+retried or replayed batch is never written twice. ``close()`` flushes
+everything that is left. If the database is unreachable at shutdown, the
+messages are appended to a spill file, and ``start()`` loads that file back
+on the next run.
+
+Only transient failures are retried. When the database rejects a batch's
+data (``DataError`` or ``IntegrityError``, e.g. a value too long for its
+column), the messages are written one by one and those rejected again are
+appended to a dead-letter file instead of blocking the ones behind them.
+If that file cannot be written either, they are dropped and counted as
+``dropped``.
+At most ``max_pending`` messages wait in memory; beyond that the oldest are
+moved to the spill file and counted as ``overflowed``.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from datetime import datetime
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from .models import ChatMessage, ChatSession, SourceChunk
+
+logger = logging.getLogger(__name__)
+
+_sessions = ChatSession.__table__
+_messages = ChatMessage.__table__
+_chunks = SourceChunk.__table__
+_DATETIME_COLUMNS = ("timestamp",)
+
+# The database rejected the rows themselves; retrying the same rows cannot succeed
+PERMANENT_ERRORS = (DataError, IntegrityError)
+
+
+def _json_default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def append_jsonl(path: str, rows: Iterable[Dict[str, Any]]) -> None:
+    """Append rows to a JSON-lines file; datetimes as ISO 8601, other non-JSON values as strings"""
+    with open(path, "a") as f:
+        for row in rows:
+            f.write(json.dumps(row, default=_json_default) + "\n")
+
+
+def _insert_new(connection: AsyncConnection, table, rows: List[Dict[str, Any]]):
+    """Multi-row INSERT that skips rows whose id exists; None if the dialect has no such clause"""
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table).values(rows).on_conflict_do_nothing(index_elements=["id"])
+    if dialect == "sqlite":
+        return sqlite.insert(table).values(rows).on_conflict_do_nothing(index_elements=["id"])
+    return None
+
+
+async def _insert_missing(connection: AsyncConnection, table, rows: List[Dict[str, Any]]) -> None:
+    """Insert the rows whose id is not in the table yet"""
+    statement = _insert_new(connection, table, rows)
+    if statement is None:
+        ids = [row["id"] for row in rows]
+        existing = set((await connection.execute(select(table.c.id).where(table.c.id.in_(ids)))).scalars())
+        rows = [row for row in rows if row["id"] not in existing]
+        if not rows:
+            return
+        statement = insert(table).values(rows)
+    await connection.execute(statement)
+
+
+async def _ensure_sessions(connection: AsyncConnection, session_ids: Iterable[str], now: datetime) -> None:
+    """Create missing sessions and bump ``updated_at`` of the others"""
+    ids = sorted(set(session_ids))
+    await _insert_missing(connection, _sessions, [{"id": session_id, "created_at": now, "updated_at": now} for session_id in ids])
+    await connection.execute(update(_sessions).where(_sessions.c.id.in_(ids)).values(updated_at=now))
+
+
+class MessageWriteBuffer:
+    """Buffers ChatMessage rows and writes them in batches on a background event loop"""
+
+    def __init__(self, engine_factory: Callable[[], AsyncEngine], max_batch_size: int = 100,
+                 flush_interval: float = 0.5, spill_path: Optional[str] = None,
+                 dead_letter_path: Optional[str] = None, max_pending: int = 10000):
+        self.engine_factory = engine_factory
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.dead_letter_path = dead_letter_path
+        self.max_pending = max_pending
+        self.messages_written = 0
+        self.batches_written = 0
+        self.failed_flushes = 0
+        self.dead_lettered = 0
+        self.overflowed = 0
+        self.dropped = 0
+        self.last_error: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self._pending: List[Dict[str, Any]] = []
+        self._in_flight: List[Dict[str, Any]] = []
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready = threading.Event()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._engine: Optional[AsyncEngine] = None
+
+    # Caller side (any thread)
+
+    def start(self) -> None:
+        """Start the writer thread and re-queue messages spilled by an earlier shutdown"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MessageWriteBuffer is closed")
+            if self._thread is None:
+                self._pending[:0] = self._load_spill()
+                self._thread = threading.Thread(target=self._run_loop, name="message-writer", daemon=True)
+                self._thread.start()
+        # Also when another caller started it: the loop is usable once ready
+        self._ready.wait()
+
+    def add(self, message: Dict[str, Any]) -> None:
+        """
+        Queue a ChatMessage row (with ``id``, ``session_id`` and ``timestamp`` set).
+        Its ``chunks`` are SourceChunk rows, stored unless they exist already.
+        """
+        if self._thread is None:
+            self.start()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MessageWriteBuffer is closed")
+            self._pending.append(message)
+            overflow = self._pending[:max(0, len(self._pending) - self.max_pending)]
+            del self._pending[:len(overflow)]
+            self.overflowed += len(overflow)
+            full = len(self._pending) >= self.max_batch_size
+        if overflow:
+            # The database has been falling behind; keep the oldest messages on disk for the next start
+            self._spill(overflow)
+        if full:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def pending(self, session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Messages not yet committed, oldest first, so readers can see their own writes"""
+        with self._lock:
+            messages = self._in_flight + self._pending
+        return [m for m in messages if session_id is None or m["session_id"] == session_id]
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Write everything queued so far; raises if the database write fails"""
+        if self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._flush(raise_errors=True), self._loop).result(timeout)
+
+    def warm(self, connections: int, timeout: Optional[float] = 30.0) -> None:
+        """Open ``connections`` connections at once on the writer's engine, so its pool keeps them"""
+        if self._thread is None:
+            self.start()
+        asyncio.run_coroutine_threadsafe(self._warm(connections), self._loop).result(timeout)
+
+    def close(self, timeout: Optional[float] = 30.0) -> None:
+        """Flush the remaining messages (spilling them to disk if that fails) and stop the writer"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        if self._thread is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout)
+        except Exception as e:
+            logger.error(f"Could not flush chat messages on shutdown: {e}")
+        finally:
+            self._spill(self.pending())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending": len(self._pending) + len(self._in_flight),
+                "messages_written": self.messages_written,
+                "batches_written": self.batches_written,
+                "failed_flushes": self.failed_flushes,
+                "dead_lettered": self.dead_lettered,
+                "overflowed": self.overflowed,
+                "dropped": self.dropped,
+                "last_error": self.last_error,
+            }
+
+    # Writer side (background event loop)
+
+    def _run_loop(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._runner = loop.create_task(self._run())
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._flush()
+
+    async def _flush(self, raise_errors: bool = False) -> None:
+        async with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._pending[:self.max_batch_size]
+                    del self._pending[:self.max_batch_size]
+                    self._in_flight = batch
+                if not batch:
+                    return
+                try:
+                    try:
+                        await self._write(batch)
+                    except PERMANENT_ERRORS as e:
+                        logger.warning(f"Database rejected a batch of {len(batch)} chat messages, writing them one by one: {e}")
+                        await self._write_each(batch)
+                except BaseException as e:
+                    # Keep what is unwritten, in order, for the next flush (also when cancelled mid-write)
+                    with self._lock:
+                        self._pending[:0] = self._in_flight
+                        self._in_flight = []
+                    if not isinstance(e, Exception):
+                        raise
+                    with self._lock:
+                        self.failed_flushes += 1
+                        self.last_error = str(e)
+                    logger.warning(f"Flushing {len(batch)} chat messages failed, will retry: {e}")
+                    if raise_errors:
+                        raise
+                    return
+                with self._lock:
+                    self._in_flight = []
+
+    async def _write_each(self, batch: List[Dict[str, Any]]) -> None:
+        """
+        Write messages one at a time, dead-lettering those the database rejects.
+        A transient error propagates with the unwritten rest left in ``_in_flight``.
+        """
+        for index, message in enumerate(batch):
+            try:
+                await self._write([message])
+            except PERMANENT_ERRORS as e:
+                with self._lock:
+                    self.last_error = str(e)
+                logger.error(f"Database rejected chat message {message.get('id')}: {e}")
+                self._dead_letter([message])
+            with self._lock:
+                self._in_flight = batch[index + 1:]
+
+    async def _warm(self, connections: int) -> None:
+        if self._engine is None:
+            self._engine = self.engine_factory()
+        opened = [await self._engine.connect() for _ in range(connections)]
+        try:
+            for connection in opened:
+                await connection.execute(text("SELECT 1"))
+        finally:
+            for connection in opened:
+                await connection.close()
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        if self._engine is None:
+            self._engine = self.engine_factory()
+        start_time = time.time()
+        now = datetime.utcnow()
+        # Source chunks are stored once and referenced by id from the messages
+        chunks: Dict[str, Dict[str, Any]] = {}
+        rows = []
+        for message in batch:
+            for chunk in message.get("chunks", ()):
+                chunks.setdefault(chunk["id"], {**chunk, "created_at": now})
+            rows.append({key: value for key, value in message.items() if key != "chunks"})
+        async with self._engine.begin() as connection:
+            await _ensure_sessions(connection, (m["session_id"] for m in batch), now)
+            if chunks:
+                await _insert_missing(connection, _chunks, list(chunks.values()))
+            await _insert_missing(connection, _messages, rows)
+        with self._lock:
+            self.messages_written += len(batch)
+            self.batches_written += 1
+        logger.debug(f"Wrote {len(batch)} chat messages in {int((time.time() - start_time) * 1000)}ms")
+
+    async def _shutdown(self) -> None:
+        self._runner.cancel()
+        await asyncio.gather(self._runner, return_exceptions=True)
+        try:
+            await self._flush(raise_errors=True)
+        finally:
+            if self._engine is not None:
+                await self._engine.dispose()
+
+    # Spill and dead-letter files
+
+    def _dead_letter(self, messages: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self.dead_lettered += len(messages)
+        if not self.dead_letter_path:
+            logger.error(f"Dropping {len(messages)} rejected chat messages (no dead-letter path configured)")
+            return
+        try:
+            append_jsonl(self.dead_letter_path, messages)
+        except OSError as e:
+            # Raising here would retry the same rejected message forever
+            with self._lock:
+                self.dropped += len(messages)
+            logger.error(f"Dropping {len(messages)} rejected chat messages, writing {self.dead_letter_path} failed: {e}")
+            return
+        logger.error(f"Moved {len(messages)} rejected chat messages to {self.dead_letter_path}")
+
+    def _spill(self, messages: List[Dict[str, Any]]) -> None:
+        if not messages:
+            return
+        if not self.spill_path:
+            logger.error(f"Dropping {len(messages)} unwritten chat messages (no spill path configured)")
+            return
+        append_jsonl(self.spill_path, messages)
+        logger.warning(f"Spilled {len(messages)} unwritten chat messages to {self.spill_path}")
+
+    def _load_spill(self) -> List[Dict[str, Any]]:
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return []
+        messages = []
+        with open(self.spill_path) as f:
+            for line in f:
+                if line.strip():
+                    message = json.loads(line)
+                    for column in _DATETIME_COLUMNS:
+                        if isinstance(message.get(column), str):
+                            message[column] = datetime.fromisoformat(message[column])
+                    messages.append(message)
+        os.remove(self.spill_path)
+        logger.info(f"Re-queued {len(messages)} chat messages from {self.spill_path}")
+        return messages
+
+
+def _create_engine() -> AsyncEngine:
+    from .database import db
+
+    return db.create_async_engine()
+
+
+# Global instance, started and closed by the application lifespan
+message_buffer = MessageWriteBuffer(
+    _create_engine,
+    max_batch_size=int(os.getenv("MESSAGE_BUFFER_MAX_BATCH", 100)),
+    flush_interval=int(os.getenv("MESSAGE_BUFFER_FLUSH_MS", 500)) / 1000.0,
+    spill_path=os.getenv("MESSAGE_BUFFER_SPILL_PATH", "./.message_spill.jsonl"),
+    dead_letter_path=os.getenv("MESSAGE_BUFFER_DEAD_LETTER_PATH", "./.message_dead_letter.jsonl"),
+    max_pending=int(os.getenv("MESSAGE_BUFFER_MAX_PENDING", 10000)),
+)
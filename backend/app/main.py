@@ -1,10 +1,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 
-from app.api.v1 import chat, documents, health, visualization
-from app.core.ingestion.ingestion import ensure_vectorstore_exists
+from app.api.v1 import chat, documents, graph, health, usage, visualization
+from app.core.models.model import model_manager
+from app.core.visualization import event_bus, process_manager
+from app.db.event_log import event_log_enabled, process_event_log
+from app.db.write_buffer import message_buffer
+from app.services.warmup import warmup
+from app.utils.dependencies import get_document_service
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,10 +21,29 @@ async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     # Startup
     logger.info("Starting up...")
-    ensure_vectorstore_exists()
+    # Open the index, build clients and prime the DB pool in the background;
+    # /health/ready reports not ready until this finishes
+    warmup.start()
+    message_buffer.start()
+    if event_log_enabled():
+        # Persist process events for offline latency analytics
+        process_event_log.start()
+        process_manager.event_log = process_event_log
+    process_manager.start()
+    # Graph nodes publish process events from worker threads; drain them on this loop
+    event_bus.start()
     yield
     # Shutdown
     logger.info("Shutting down...")
+    warmup.stop()
+    # Drain queued events first so they still reach other workers
+    await event_bus.stop()
+    process_manager.stop()
+    # Write out buffered chat messages and process events before the process exits
+    await asyncio.to_thread(message_buffer.close)
+    await asyncio.to_thread(process_event_log.close)
+    get_document_service().jobs.shutdown()
+    model_manager.close()
 
 app = FastAPI(
     title="Adaptive RAG API",
@@ -41,6 +66,8 @@ app.include_router(health.router, prefix="/api/v1", tags=["health"])
 app.include_router(chat.router, prefix="/api/v1", tags=["chat"])
 app.include_router(documents.router, prefix="/api/v1", tags=["documents"])
 app.include_router(visualization.router, prefix="/api/v1", tags=["visualization"])
+app.include_router(usage.router, prefix="/api/v1", tags=["usage"])
+app.include_router(graph.router, prefix="/api/v1", tags=["graph"])
 
 @app.get("/")
 async def root():
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
 
@@ -16,12 +16,16 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     question: str = Field(..., description="The user's question")
     session_id: Optional[str] = Field(None, description="Session ID for conversation context")
+    latency_budget_ms: Optional[int] = Field(
+        None, ge=0, description="End-to-end latency budget; 0 disables it (default: LATENCY_BUDGET_MS)"
+    )
     
 class ChatResponse(BaseModel):
     answer: str = Field(..., description="The generated answer")
     sources: List[Dict[str, Any]] = Field(default_factory=list, description="Source documents used")
     used_web_search: bool = Field(False, description="Whether web search was used")
     session_id: Optional[str] = None
+    usage: Optional[Dict[str, Any]] = Field(None, description="Token usage and estimated cost, per step and model")
     
 class DocumentIngestionRequest(BaseModel):
     urls: Optional[List[str]] = Field(None, description="URLs to ingest")
@@ -31,6 +35,88 @@ class DocumentIngestionResponse(BaseModel):
     success: bool
     message: str
     documents_processed: int
+    duplicates_removed: int = Field(0, description="Near-duplicate chunks dropped during ingestion")
+
+class StageProgress(BaseModel):
+    done: int = 0
+    total: int = 0
+
+class IngestionJobResponse(BaseModel):
+    job_id: str
+    description: str
+    status: str = Field(..., description="queued, running, succeeded, failed or cancelled")
+    stage: str = Field(..., description="Current stage: loading, chunking, indexing or done")
+    progress: Dict[str, StageProgress] = Field(default_factory=dict, description="Progress per stage")
+    result: Dict[str, Any] = Field(default_factory=dict)
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+class UsageTotals(BaseModel):
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    total_tokens: int = 0
+    cost_usd: float = 0.0
+
+class SessionUsage(UsageTotals):
+    session_id: str
+    messages: int = 0
+
+class MessageUsage(UsageTotals):
+    message_id: str
+    session_id: str
+    timestamp: datetime
+    question: str
+    generation_attempts: int = 0
+    web_search_attempts: int = 0
+
+class UsageReport(BaseModel):
+    session_id: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    messages: int = 0
+    totals: UsageTotals
+    by_step: Dict[str, UsageTotals] = Field(default_factory=dict, description="Usage per graph step")
+    step_messages: int = Field(0, description="Most recent messages the per-step usage covers")
+    by_session: List[SessionUsage] = Field(default_factory=list, description="Sessions using the most tokens")
+    top_messages: List[MessageUsage] = Field(default_factory=list, description="Messages using the most tokens")
+    
+class StepLatency(BaseModel):
+    count: int = 0
+    completed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    p50_ms: Optional[int] = None
+    p95_ms: Optional[int] = None
+    p99_ms: Optional[int] = None
+    max_ms: Optional[int] = None
+
+class RetryLoopStats(BaseModel):
+    runs: int = Field(0, description="Runs that generated an answer")
+    retried: int = Field(0, description="Runs that generated more than once")
+    rate: Optional[float] = None
+    extra_generations: int = Field(0, description="Generations beyond the first, over all runs")
+
+class WebSearchFallbackStats(BaseModel):
+    runs: int = Field(0, description="Runs not routed to web search")
+    fell_back: int = Field(0, description="Runs among them that searched the web")
+    rate: Optional[float] = None
+
+class ProcessAnalyticsReport(BaseModel):
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    events: int = 0
+    runs: int = Field(0, description="Questions answered: passes through the graph")
+    by_step: Dict[str, StepLatency] = Field(default_factory=dict, description="Latency and outcomes per process step")
+    retry_loops: RetryLoopStats
+    web_search_fallback: WebSearchFallbackStats
+    
+class VisualizationLevelRequest(BaseModel):
+    level: Optional[Literal["off", "summary", "full"]] = Field(
+        None, description="Process event detail for the session; null restores VISUALIZATION_LEVEL"
+    )
     
 class ErrorResponse(BaseModel):
     error: str
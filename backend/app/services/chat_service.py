@@ -1,12 +1,20 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 import logging
+import uuid
 from datetime import datetime
 from sqlalchemy.orm import Session
 
-from app.core.graph.graph import app as graph_app
+from app.core.graph.graph import get_graph_app
 from app.core.graph.state import GraphState
+from app.core.ingestion.chunk_ids import chunk_id
+from app.core.models.usage import track_usage
+from app.core.resilience.deadline import new_deadline
+from app.core.visualization import process_run
 from app.db.database import db
-from app.db.models import ChatSession, ChatMessage
+from app.db.event_log import event_log_report
+from app.db.history import decode_cursor, iter_history
+from app.db.usage import usage_report
+from app.db.write_buffer import message_buffer
 
 logger = logging.getLogger(__name__)
 
@@ -15,9 +23,14 @@ class ChatService:
         # Initialize database tables
         db.create_tables()
     
-    def process_question(self, question: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+    def process_question(
+        self,
+        question: str,
+        session_id: Optional[str] = None,
+        latency_budget_ms: Optional[int] = None
+    ) -> Dict[str, Any]:
         """
-        Process a question through the RAG graph
+        Process a question through the RAG graph, answering within the latency budget
         """
         try:
             # Create initial state
@@ -28,20 +41,29 @@ class ChatService:
                 "documents": [],
                 "generation_attempts": 0,
                 "web_search_attempts": 0,
-                "session_id": session_id or "default"
+                "session_id": session_id or "default",
+                "deadline": new_deadline(latency_budget_ms),
+                "generation_ms": 0
             }
             
-            # Run the graph
-            result = graph_app.invoke(initial_state)
+            # Run the graph, recording token usage of every LLM call; its process
+            # events carry the message id as their run id
+            message_id = str(uuid.uuid4())
+            with track_usage() as run_usage, process_run(message_id):
+                result = get_graph_app().invoke(initial_state)
+            usage = run_usage.to_dict()
             
             # Extract source information
             sources = []
+            chunks = {}
             for doc in result.get("documents", []):
                 source = {
                     "content": doc.page_content[:200] + "...",  # First 200 chars
                     "metadata": getattr(doc, 'metadata', {})
                 }
                 sources.append(source)
+                source_id = chunk_id(doc.page_content, source["metadata"])
+                chunks.setdefault(source_id, {"id": source_id, **source})
             
             # Check if we hit max retries and provide a fallback message
             answer = result.get("generation", "")
@@ -53,55 +75,101 @@ class ChatService:
                         "Please try rephrasing your question or breaking it down into smaller parts."
                     )
             
-            # Store in database if session_id provided
+            # Store in database if session_id provided; written behind in batches,
+            # the session is created with the first flushed message
             if session_id:
-                with db.session_scope() as session:
-                    # Get or create session
-                    chat_session = session.query(ChatSession).filter_by(id=session_id).first()
-                    if not chat_session:
-                        chat_session = ChatSession(id=session_id)
-                        session.add(chat_session)
-                    
-                    # Create message record
-                    message = ChatMessage(
-                        session_id=session_id,
-                        question=question,
-                        answer=answer,
-                        used_web_search=result.get("web_search", False),
-                        sources=sources,
-                        generation_attempts=result.get("generation_attempts", 0),
-                        web_search_attempts=result.get("web_search_attempts", 0)
-                    )
-                    session.add(message)
+                message_buffer.add({
+                    "id": message_id,
+                    "session_id": session_id,
+                    "timestamp": datetime.utcnow(),
+                    "question": question,
+                    "answer": answer,
+                    "used_web_search": result.get("web_search", False),
+                    "source_ids": list(chunks),
+                    "chunks": list(chunks.values()),
+                    "generation_attempts": result.get("generation_attempts", 0),
+                    "web_search_attempts": result.get("web_search_attempts", 0),
+                    "llm_calls": usage["calls"],
+                    "input_tokens": usage["input_tokens"],
+                    "output_tokens": usage["output_tokens"],
+                    "total_tokens": usage["total_tokens"],
+                    "cost_usd": usage["cost_usd"],
+                    "usage": {"by_step": usage["by_step"], "by_model": usage["by_model"]}
+                })
             
             return {
                 "answer": answer,
                 "sources": sources,
                 "used_web_search": result.get("web_search", False),
-                "session_id": session_id
+                "session_id": session_id,
+                "usage": usage
             }
             
         except Exception as e:
             logger.error(f"Error in process_question: {str(e)}")
             raise
     
-    def get_session_history(self, session_id: str) -> List[Dict[str, Any]]:
+    def iter_session_history(
+        self,
+        session_id: str,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+        include_sources: bool = True
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream a session's messages oldest first, starting after the ``after`` cursor,
+        including messages not yet written. Raises ValueError for an invalid cursor.
+        """
+        key = decode_cursor(after) if after else None
+        # Read the buffer first: a message flushed in between is then found in the database
+        pending = message_buffer.pending(session_id)
+        
+        def messages() -> Iterator[Dict[str, Any]]:
+            with db.session_scope() as session:
+                yield from iter_history(session, session_id, key, limit, include_sources, pending)
+        
+        return messages()
+    
+    def get_session_history(
+        self,
+        session_id: str,
+        after: Optional[str] = None,
+        limit: Optional[int] = None,
+        include_sources: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Get chat history for a session from database, including messages not yet written
+        """
+        return [
+            {**message, "timestamp": message["timestamp"].isoformat()}
+            for message in self.iter_session_history(session_id, after, limit, include_sources)
+        ]
+    
+    def get_usage_report(
+        self,
+        session_id: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 10
+    ) -> Dict[str, Any]:
         """
-        Get chat history for a session from database
+        Token usage and cost totals for a session and/or time window, with a
+        per-step breakdown and the sessions and messages that used the most
+        tokens, including messages not yet written
         """
+        # Read the buffer first: a message flushed in between is then found in the database
+        pending = message_buffer.pending(session_id)
         with db.session_scope() as session:
-            chat_session = session.query(ChatSession).filter_by(id=session_id).first()
-            if not chat_session:
-                return []
-            
-            history = []
-            for message in chat_session.messages:
-                history.append({
-                    "timestamp": message.timestamp.isoformat(),
-                    "question": message.question,
-                    "answer": message.answer,
-                    "used_web_search": message.used_web_search,
-                    "sources": message.sources
-                })
-            
-            return history
\ No newline at end of file
+            return usage_report(session, session_id, start, end, limit, pending)
+
+    def get_process_analytics(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        Step latency percentiles, retry-loop frequency and web-search fallback
+        rate from the persisted process event log
+        """
+        with db.session_scope() as session:
+            return event_log_report(session, start, end)
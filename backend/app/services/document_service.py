@@ -1,48 +1,103 @@
 from typing import List, Optional, Dict, Any
 import asyncio
 import logging
-import shutil
 import os
-from concurrent.futures import ThreadPoolExecutor
+import shutil
+import threading
+
+from fastapi.concurrency import run_in_threadpool
 
-from app.core.ingestion.ingestion import ingest_urls, ingest_texts
+from app.core.ingestion.ingestion import (
+    clear_vectorstore,
+    ingest_paths,
+    ingest_urls,
+    ingest_texts,
+    ProgressCallback,
+)
+from app.services.ingestion_jobs import IngestionJob, IngestionJobManager, JobStatus
 
 logger = logging.getLogger(__name__)
 
 class DocumentService:
     def __init__(self):
-        self.vectorstore_path = "./.chroma"
-        self.executor = ThreadPoolExecutor(max_workers=2)
-    
+        self.jobs = IngestionJobManager(
+            max_concurrent_jobs=int(os.getenv("INGESTION_MAX_CONCURRENT_JOBS", "2"))
+        )
+
+    def submit_ingestion_job(
+        self,
+        urls: Optional[List[str]] = None,
+        texts: Optional[List[str]] = None
+    ) -> IngestionJob:
+        """
+        Queue a background job that ingests documents from URLs or raw texts
+        """
+        def run(progress: ProgressCallback, cancel_event: threading.Event) -> Dict[str, Any]:
+            result = {"documents_processed": 0, "chunks": 0, "duplicates_removed": 0}
+
+            def record(stats: Dict[str, int], documents: int) -> None:
+                result["documents_processed"] += documents
+                result["chunks"] += stats.get("chunks", 0)
+                result["duplicates_removed"] += stats.get("duplicates_removed", 0)
+
+            if urls:
+                record(ingest_urls(urls, progress=progress, cancel_event=cancel_event), len(urls))
+            if texts:
+                record(ingest_texts(texts, progress=progress, cancel_event=cancel_event), len(texts))
+            return result
+
+        description = f"{len(urls or [])} urls, {len(texts or [])} texts"
+        return self.jobs.submit(description, run)
+
+    def submit_path_ingestion_job(
+        self,
+        paths: List[str],
+        cleanup_dir: Optional[str] = None,
+        sources: Optional[Dict[str, str]] = None
+    ) -> IngestionJob:
+        """
+        Queue a background job that ingests local files and directories.
+        ``sources`` maps file paths to the source recorded for them (e.g. the
+        uploaded file name). If ``cleanup_dir`` is given it is deleted once the
+        job ends, also when it is cancelled before it starts.
+        """
+        def run(progress: ProgressCallback, cancel_event: threading.Event) -> Dict[str, Any]:
+            stats = ingest_paths(paths, progress=progress, cancel_event=cancel_event, sources=sources)
+            return {"documents_processed": stats["documents"], **stats}
+
+        def cleanup(job: IngestionJob) -> None:
+            shutil.rmtree(cleanup_dir, ignore_errors=True)
+
+        return self.jobs.submit(f"{len(paths)} paths", run, on_finish=cleanup if cleanup_dir else None)
+
     async def ingest_documents(
-        self, 
-        urls: Optional[List[str]] = None, 
+        self,
+        urls: Optional[List[str]] = None,
         texts: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """
-        Ingest documents from URLs or raw texts
+        Ingest documents from URLs or raw texts and wait for completion
         """
         try:
-            documents_processed = 0
-            
-            loop = asyncio.get_event_loop()
-            
-            if urls:
-                # Run URL ingestion in thread pool
-                await loop.run_in_executor(self.executor, ingest_urls, urls)
-                documents_processed += len(urls)
-            
-            if texts:
-                # Run text ingestion in thread pool
-                await loop.run_in_executor(self.executor, ingest_texts, texts)
-                documents_processed += len(texts)
-            
+            job = self.submit_ingestion_job(urls=urls, texts=texts)
+            # asyncio.wait does not raise if the job is cancelled while queued
+            await asyncio.wait([asyncio.wrap_future(job.future)])
+
+            if job.status != JobStatus.SUCCEEDED:
+                raise RuntimeError(job.error or f"Ingestion job {job.status.value}")
+
+            documents_processed = job.result.get("documents_processed", 0)
+            duplicates_removed = job.result.get("duplicates_removed", 0)
             return {
                 "success": True,
-                "message": f"Successfully ingested {documents_processed} documents",
-                "documents_processed": documents_processed
+                "message": (
+                    f"Successfully ingested {documents_processed} documents "
+                    f"({duplicates_removed} near-duplicate chunks removed)"
+                ),
+                "documents_processed": documents_processed,
+                "duplicates_removed": duplicates_removed
             }
-            
+
         except Exception as e:
             logger.error(f"Error ingesting documents: {str(e)}")
             return {
@@ -50,16 +105,14 @@ class DocumentService:
                 "message": f"Error ingesting documents: {str(e)}",
                 "documents_processed": 0
             }
-    
+
     async def clear_vectorstore(self) -> None:
         """
-        Clear the vector store
+        Clear the vector store by swapping in an empty index generation
         """
         try:
-            if os.path.exists(self.vectorstore_path):
-                loop = asyncio.get_event_loop()
-                await loop.run_in_executor(self.executor, shutil.rmtree, self.vectorstore_path)
-                logger.info("Vector store cleared successfully")
+            await run_in_threadpool(clear_vectorstore)
+            logger.info("Vector store cleared successfully")
         except Exception as e:
             logger.error(f"Error clearing vector store: {str(e)}")
-            raise
\ No newline at end of file
+            raise
@@ -0,0 +1,179 @@
+from typing import Any, Callable, Dict, List, Optional
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+import logging
+import threading
+import uuid
+
+from app.core.ingestion.ingestion import IngestionCancelled, ProgressCallback
+
+logger = logging.getLogger(__name__)
+
+# Signature of the work a job runs: (progress, cancel_event) -> result dict
+JobRunner = Callable[[ProgressCallback, threading.Event], Dict[str, Any]]
+
+
+class JobStatus(str, Enum):
+    """Lifecycle status of an ingestion job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+FINISHED_STATUSES = {JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED}
+
+
+@dataclass
+class IngestionJob:
+    """State of a single background ingestion job"""
+    id: str
+    description: str
+    status: JobStatus = JobStatus.QUEUED
+    stage: str = "queued"
+    progress: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    result: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # Incremented on every change so subscribers can detect updates cheaply
+    version: int = 0
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    future: Optional[Future] = field(default=None, repr=False)
+    # Called once the job succeeds, fails or is cancelled, even if it never started
+    on_finish: Optional[Callable[["IngestionJob"], None]] = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "description": self.description,
+            "status": self.status.value,
+            "stage": self.stage,
+            "progress": {stage: dict(counts) for stage, counts in self.progress.items()},
+            "result": dict(self.result),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestionJobManager:
+    """Runs ingestion jobs in the background under a concurrency limit"""
+
+    def __init__(self, max_concurrent_jobs: int = 2, max_finished_jobs: int = 100):
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.max_finished_jobs = max_finished_jobs
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_jobs,
+            thread_name_prefix="ingestion-job",
+        )
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, description: str, runner: JobRunner,
+               on_finish: Optional[Callable[[IngestionJob], None]] = None) -> IngestionJob:
+        """
+        Queue a job and return immediately; it starts when a worker is free.
+        ``on_finish`` runs when the job ends in any way, e.g. to remove its input.
+        """
+        job = IngestionJob(id=str(uuid.uuid4()), description=description, on_finish=on_finish)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune_finished()
+        job.future = self.executor.submit(self._run, job, runner)
+        logger.info(f"Queued ingestion job {job.id}: {description}")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[IngestionJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def snapshot(self, job: IngestionJob) -> Dict[str, Any]:
+        """Consistent copy of a job's state, safe to serialize while it runs"""
+        with self._lock:
+            return job.to_dict()
+
+    def cancel(self, job_id: str) -> Optional[IngestionJob]:
+        """
+        Request cancellation of a job. Queued jobs never start; running jobs
+        stop at the next progress checkpoint.
+        """
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, JobStatus.CANCELLED)
+        return job
+
+    def shutdown(self) -> None:
+        """Cancel outstanding jobs and stop the worker pool"""
+        for job in self.list_jobs():
+            if not job.finished:
+                self.cancel(job.id)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: IngestionJob, runner: JobRunner) -> None:
+        if job.cancel_event.is_set():
+            self._finish(job, JobStatus.CANCELLED)
+            return
+
+        with self._lock:
+            job.status = JobStatus.RUNNING
+            job.stage = "starting"
+            job.started_at = datetime.utcnow()
+            job.version += 1
+
+        def progress(stage: str, done: int, total: int) -> None:
+            with self._lock:
+                job.stage = stage
+                job.progress[stage] = {"done": done, "total": total}
+                job.version += 1
+
+        try:
+            result = runner(progress, job.cancel_event)
+            with self._lock:
+                job.result = result or {}
+            self._finish(job, JobStatus.SUCCEEDED)
+        except IngestionCancelled:
+            logger.info(f"Ingestion job {job.id} cancelled")
+            self._finish(job, JobStatus.CANCELLED)
+        except Exception as e:
+            logger.error(f"Ingestion job {job.id} failed: {str(e)}")
+            self._finish(job, JobStatus.FAILED, error=str(e))
+
+    def _finish(self, job: IngestionJob, status: JobStatus, error: Optional[str] = None) -> None:
+        with self._lock:
+            if job.finished:
+                return
+            job.status = status
+            job.stage = "done"
+            job.error = error
+            job.finished_at = datetime.utcnow()
+            job.version += 1
+        if job.on_finish is not None:
+            try:
+                job.on_finish(job)
+            except Exception as e:
+                logger.error(f"Finishing ingestion job {job.id} failed: {str(e)}")
+
+    def _prune_finished(self) -> None:
+        """Forget the oldest finished jobs beyond the retention limit (lock held)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
@@ -0,0 +1,229 @@
+"""
+Eager warmup of a worker before it takes traffic.
+
+The lifespan hook starts ``warmup`` in a background thread. It opens the
+index, builds the model clients and the graph, runs a test embedding and
+retrieval, primes the database connection pool and optionally replays a few
+sample queries. ``/health/ready`` reports not-ready until it has finished, so
+the first real question does not pay for cold clients and connections.
+Required steps must succeed for the worker to become ready and are retried
+until they do. Failures of the others are reported but do not block readiness.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+WARMUP_QUERY = "What is an AI agent?"
+
+
+class WarmupStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+@dataclass
+class WarmupStep:
+    name: str
+    run: Callable[[], Optional[Dict[str, Any]]]
+    required: bool = True
+    status: WarmupStatus = WarmupStatus.PENDING
+    duration_ms: Optional[int] = None
+    detail: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status.value,
+            "required": self.required,
+            "duration_ms": self.duration_ms,
+            **({"detail": self.detail} if self.detail else {}),
+            **({"error": self.error} if self.error else {}),
+        }
+
+
+# Default steps
+
+def _open_index() -> Dict[str, Any]:
+    from app.core.ingestion.ingestion import ensure_vectorstore_exists, index_generations
+
+    ensure_vectorstore_exists()
+    return {"generation": index_generations.active()}
+
+
+def _build_models() -> None:
+    from app.core.graph.chains.answer_grader import get_answer_grader
+    from app.core.graph.chains.generation import get_generation_chain
+    from app.core.graph.chains.hallucination_grader import get_hallucination_grader
+    from app.core.graph.chains.retrieval_grader import get_retrieval_grader
+    from app.core.graph.chains.router import get_question_router
+    from app.core.graph.graph import get_graph_app
+
+    for factory in (get_question_router, get_retrieval_grader, get_generation_chain,
+                    get_hallucination_grader, get_answer_grader, get_graph_app):
+        factory()
+
+
+def _test_embedding() -> Dict[str, Any]:
+    from app.core.models.model import get_embedding_model
+
+    vector = get_embedding_model().embed_query(WARMUP_QUERY)
+    return {"dimensions": len(vector)}
+
+
+def _test_retrieval() -> Dict[str, Any]:
+    from app.core.ingestion.ingestion import active_retriever
+
+    with active_retriever() as retriever:
+        documents = retriever.invoke(WARMUP_QUERY) if retriever else []
+    return {"documents": len(documents)}
+
+
+def _prime_database(connections: int) -> Dict[str, Any]:
+    """Open connections in the sync read pool and in the message writer's async pool"""
+    from app.db.database import db
+    from app.db.write_buffer import message_buffer
+    from app.utils.dependencies import get_chat_service
+
+    # Creates the tables on first use
+    get_chat_service()
+    # Hold several connections at once so the pool keeps that many open
+    opened = [db.engine.connect() for _ in range(connections)]
+    try:
+        for connection in opened:
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            connection.close()
+    # Chat messages are written through the write buffer's own engine
+    message_buffer.warm(connections)
+    return {"connections": connections}
+
+
+def _replay_sample_queries(count: int) -> Dict[str, Any]:
+    from app.core.ingestion.healthcare_data import get_sample_queries
+    from app.utils.dependencies import get_chat_service
+
+    queries = get_sample_queries()[:count]
+    for question in queries:
+        get_chat_service().process_question(question)
+    return {"queries": len(queries)}
+
+
+def default_steps() -> List[WarmupStep]:
+    """Warmup steps configured by ``WARMUP_DB_CONNECTIONS`` and ``WARMUP_SAMPLE_QUERIES``"""
+    connections = int(os.getenv("WARMUP_DB_CONNECTIONS", 4))
+    sample_queries = int(os.getenv("WARMUP_SAMPLE_QUERIES", 0))
+    steps = [
+        WarmupStep("index", _open_index),
+        WarmupStep("models", _build_models),
+        WarmupStep("database", lambda: _prime_database(connections)),
+        # A provider outage must not keep every worker out of rotation
+        WarmupStep("embedding", _test_embedding, required=False),
+        WarmupStep("retrieval", _test_retrieval, required=False),
+    ]
+    if sample_queries > 0:
+        steps.append(WarmupStep("sample_queries", lambda: _replay_sample_queries(sample_queries), required=False))
+    return steps
+
+
+class Warmup:
+    """Runs the warmup steps once and reports readiness"""
+
+    def __init__(self, steps: Optional[List[WarmupStep]] = None, retry_seconds: Optional[float] = None):
+        self._steps = steps
+        self.retry_seconds = (
+            retry_seconds if retry_seconds is not None else float(os.getenv("WARMUP_RETRY_SECONDS", 10))
+        )
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+        self._stopped = threading.Event()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    @property
+    def steps(self) -> List[WarmupStep]:
+        if self._steps is None:
+            self._steps = default_steps()
+        return self._steps
+
+    def start(self) -> None:
+        """Run the warmup in a background thread (once)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop retrying failed steps (on shutdown)"""
+        self._stopped.set()
+
+    def _run_step(self, step: WarmupStep) -> None:
+        step.status = WarmupStatus.RUNNING
+        start_time = time.time()
+        try:
+            step.detail = step.run() or {}
+            step.status = WarmupStatus.SUCCEEDED
+            step.error = None
+        except Exception as e:
+            step.status = WarmupStatus.FAILED
+            step.error = str(e)
+            log = logger.error if step.required else logger.warning
+            log(f"Warmup step {step.name} failed: {e}")
+        step.duration_ms = int((time.time() - start_time) * 1000)
+
+    def _failed_required(self) -> List[WarmupStep]:
+        return [step for step in self.steps if step.required and step.status != WarmupStatus.SUCCEEDED]
+
+    def run(self) -> None:
+        self.started_at = datetime.utcnow()
+        logger.info("Warming up...")
+        for step in self.steps:
+            self._run_step(step)
+        while self._failed_required():
+            if self._stopped.wait(self.retry_seconds):
+                return
+            for step in self._failed_required():
+                self._run_step(step)
+        self.finished_at = datetime.utcnow()
+        self._done.set()
+        logger.info("Warmup finished, ready for traffic")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    @property
+    def ready(self) -> bool:
+        """True once every required step has succeeded"""
+        return self._done.is_set()
+
+    def snapshot(self) -> Dict[str, Any]:
+        if self.ready:
+            status = "ready"
+        elif self.started_at:
+            status = "warming_up"
+        else:
+            status = "pending"
+        return {
+            "status": status,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "steps": {step.name: step.to_dict() for step in self.steps},
+        }
+
+
+# Global instance, started by the application lifespan
+warmup = Warmup()
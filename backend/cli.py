@@ -1,9 +1,10 @@
+import argparse
+from datetime import datetime
+
 from dotenv import load_dotenv
 
 load_dotenv()
 
-from app.core.graph.graph import app
-
 def format_response(result):
     """Format the response from the graph for better readability"""
     if isinstance(result, dict) and "generation" in result:
@@ -15,7 +16,11 @@ def format_response(result):
         return str(result)
 
 
-def main():
+def chat():
+    from app.core.graph.graph import get_graph_app
+
+    app = get_graph_app()
+
     print("=" * 60)
     print("🤖 Advanced RAG Chatbot")
     print("=" * 60)
@@ -55,5 +60,138 @@ def main():
             print("Please try asking your question again.")
 
 
+def ingest(paths):
+    """Bulk-ingest local files and directories into the active index"""
+    from app.core.ingestion.ingestion import ingest_paths
+
+    def progress(stage, done, total):
+        print(f"\r📄 {stage}: {done}/{total} files", end="", flush=True)
+
+    stats = ingest_paths(paths, progress=progress)
+    print(
+        f"\n✅ Ingested {stats['files']} files as {stats['documents']} documents "
+        f"and {stats['chunks']} chunks ({stats['duplicates_removed']} near-duplicates removed)"
+    )
+
+
+def benchmark(reference, limit, roles):
+    """Compare each role's model tier against a reference model on the sample queries"""
+    from app.core.ingestion.healthcare_data import get_sample_queries
+    from app.core.models.benchmark import run_benchmark
+    from app.core.models.model import CHAT_ROLES
+
+    unknown = sorted(set(roles or ()) - set(CHAT_ROLES))
+    if unknown:
+        raise SystemExit(f"Unknown roles: {', '.join(unknown)} (choose from {', '.join(CHAT_ROLES)})")
+    roles = roles or list(CHAT_ROLES)
+    queries = get_sample_queries()[:limit]
+    print(f"⏱️  Benchmarking {len(queries)} sample queries...")
+    results = run_benchmark(queries, reference_model=reference, roles=roles)
+
+    print(f"\n{'role':<22}{'model':<26}{'p50 ms':>9}{'p95 ms':>9}{'ref p50':>9}{'ref p95':>9}{'agree':>8}{'n':>5}")
+    for result in results:
+        row = result.to_dict()
+        agreement = f"{row['agreement']:.0%}" if row["agreement"] is not None else "-"
+        print(
+            f"{row['role']:<22}{row['model']:<26}"
+            f"{row['p50_ms'] or '-':>9}{row['p95_ms'] or '-':>9}"
+            f"{row['reference_p50_ms'] or '-':>9}{row['reference_p95_ms'] or '-':>9}"
+            f"{agreement:>8}{row['samples']:>5}"
+        )
+    print(f"\nReference model: {results[0].reference if results else reference}")
+
+
+def analytics(start, end):
+    """Step latency percentiles, retry loops and web-search fallbacks from the process event log"""
+    from app.db.database import db
+    from app.db.event_log import event_log_report
+
+    with db.session_scope() as session:
+        report = event_log_report(session, start, end)
+
+    print(f"📈 {report['events']} events, {report['runs']} runs")
+    print(f"\n{'step':<22}{'n':>7}{'failed':>8}{'skipped':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for step, stats in sorted(report["by_step"].items()):
+        print(
+            f"{step:<22}{stats['count']:>7}{stats.get('failed', 0):>8}{stats.get('skipped', 0):>9}"
+            + "".join(f"{'-' if stats.get(key) is None else stats[key]:>9}"
+                      for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms"))
+        )
+    retries = report["retry_loops"]
+    fallback = report["web_search_fallback"]
+    retry_rate = f"{retries['rate']:.1%}" if retries["rate"] is not None else "-"
+    fallback_rate = f"{fallback['rate']:.1%}" if fallback["rate"] is not None else "-"
+    print(
+        f"\nRetry loops: {retries['retried']}/{retries['runs']} runs ({retry_rate}), "
+        f"{retries['extra_generations']} extra generations"
+    )
+    print(f"Web-search fallback: {fallback['fell_back']}/{fallback['runs']} runs ({fallback_rate})")
+
+
+def render_graph(output, mermaid):
+    from app.core.graph.graph import render_graph_mermaid, render_graph_png
+
+    if mermaid:
+        source = render_graph_mermaid()
+        if output:
+            with open(output, "w") as f:
+                f.write(source)
+            print(f"Wrote {output}")
+        else:
+            print(source)
+        return
+    render_graph_png(output_file_path=output)
+    print(f"Wrote {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive RAG command line tools")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("chat", help="Interactive chat (default)")
+
+    ingest_parser = subparsers.add_parser(
+        "ingest",
+        help="Ingest .txt, .md, .html and .jsonl files or directories"
+    )
+    ingest_parser.add_argument("paths", nargs="+", help="Files or directories to ingest")
+
+    benchmark_parser = subparsers.add_parser(
+        "benchmark",
+        help="Report latency and agreement of each role's model against a reference model"
+    )
+    benchmark_parser.add_argument("--reference", help="Reference model (default: the default chat model)")
+    benchmark_parser.add_argument("--limit", type=int, default=10, help="Number of sample queries")
+    # Validated by benchmark(), so other subcommands do not import the model stack
+    benchmark_parser.add_argument("--roles", nargs="+", help="Roles to benchmark (default: all)")
+
+    graph_parser = subparsers.add_parser(
+        "graph",
+        help="Render the graph as PNG (via the remote Mermaid renderer) or as Mermaid source"
+    )
+    graph_parser.add_argument("--output", "-o", help="Output file (default: graph.png, or stdout with --mermaid)")
+    graph_parser.add_argument("--mermaid", action="store_true", help="Write Mermaid source instead of PNG")
+
+    analytics_parser = subparsers.add_parser(
+        "analytics",
+        help="Report step latency percentiles, retry loops and web-search fallbacks from the process event log"
+    )
+    analytics_parser.add_argument("--start", type=datetime.fromisoformat, help="Window start, ISO 8601 (inclusive)")
+    analytics_parser.add_argument("--end", type=datetime.fromisoformat, help="Window end, ISO 8601 (exclusive)")
+
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        ingest(args.paths)
+    elif args.command == "benchmark":
+        benchmark(args.reference, args.limit, args.roles)
+    elif args.command == "analytics":
+        analytics(args.start, args.end)
+    elif args.command == "graph":
+        render_graph(args.output or (None if args.mermaid else "graph.png"), args.mermaid)
+    else:
+        chat()
+
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
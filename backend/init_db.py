@@ -20,6 +20,38 @@ from app.db.models import Base, ChatSession, ChatMessage
 from sqlalchemy import text
 
 
+# Columns added after the initial schema; create_all does not alter existing tables
+ADDED_COLUMNS = {
+    "chat_messages": [
+        ("llm_calls", "INTEGER DEFAULT 0"),
+        ("input_tokens", "INTEGER DEFAULT 0"),
+        ("output_tokens", "INTEGER DEFAULT 0"),
+        ("total_tokens", "INTEGER DEFAULT 0"),
+        ("cost_usd", "DOUBLE PRECISION DEFAULT 0"),
+        ("usage", "JSON"),
+        ("source_ids", "JSON"),
+    ],
+    "process_events": [
+        ("run_id", "VARCHAR(36)"),
+    ],
+}
+
+
+def upgrade_schema():
+    """Add columns and indexes introduced after the tables were first created"""
+    with db.engine.begin() as connection:
+        for table, columns in ADDED_COLUMNS.items():
+            for name, definition in columns:
+                connection.execute(text(
+                    f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {name} {definition}"
+                ))
+    # Indexes added since; create_all only creates them together with their table
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+    print("✅ Database schema is up to date!")
+
+
 def init_database():
     """Initialize the database with tables"""
     print("Initializing PostgreSQL database...")
@@ -41,6 +73,7 @@ def init_database():
         print("Creating tables...")
         Base.metadata.create_all(bind=db.engine)
         print("✅ Database tables created successfully!")
+        upgrade_schema()
         
         # Show table information
         with db.session_scope() as session:
@@ -1,12 +1,15 @@
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.services.warmup import warmup
 
 # Create TestClient instance for testing
 @pytest.fixture(scope="module")
 def client():
     """Create a test client for the FastAPI app"""
     with TestClient(app) as c:
+        # Readiness is reported once the background warmup has finished
+        warmup.wait(timeout=120)
         yield c
 
 @pytest.mark.integration
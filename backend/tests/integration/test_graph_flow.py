@@ -1,6 +1,8 @@
 from unittest.mock import patch
 
-from app.core.graph.graph import app as graph_app
+from app.core.graph.graph import get_graph_app
+
+graph_app = get_graph_app()
 
 
 class TestGraphIntegration:
@@ -3,9 +3,11 @@ Integration tests for healthcare AI queries in the RAG system.
 """
 import pytest
 from unittest.mock import patch
-from app.core.graph.graph import app as graph_app
+from app.core.graph.graph import get_graph_app
 from app.core.ingestion.healthcare_data import get_sample_queries
 
+graph_app = get_graph_app()
+
 
 class TestHealthcareQueries:
     """Test healthcare-specific query handling."""
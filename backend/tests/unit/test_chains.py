@@ -1,13 +1,13 @@
 import pytest
 
-from app.core.graph.chains.generation import generation_chain
+from app.core.graph.chains.generation import get_generation_chain
 from app.core.graph.chains.hallucination_grader import (
     GradeHallucinations,
-    hallucination_grader
+    get_hallucination_grader
 )
-from app.core.graph.chains.retrieval_grader import GradeDocuments, retrieval_grader
-from app.core.graph.chains.router import RouteQuery, question_router
-from app.core.graph.chains.answer_grader import GradeAnswer, answer_grader
+from app.core.graph.chains.retrieval_grader import GradeDocuments, get_retrieval_grader
+from app.core.graph.chains.router import RouteQuery, get_question_router
+from app.core.graph.chains.answer_grader import GradeAnswer, get_answer_grader
 
 
 class TestRetrievalGrader:
@@ -17,7 +17,7 @@ class TestRetrievalGrader:
         """Test that relevant documents are graded as 'yes'."""
         doc_text = sample_documents[0].page_content
 
-        result: GradeDocuments = retrieval_grader.invoke({
+        result: GradeDocuments = get_retrieval_grader().invoke({
             "question": sample_question,
             "document": doc_text
         })
@@ -28,7 +28,7 @@ class TestRetrievalGrader:
         """Test that irrelevant documents are graded as 'no'."""
         doc_text = irrelevant_documents[0].page_content
 
-        result: GradeDocuments = retrieval_grader.invoke({
+        result: GradeDocuments = get_retrieval_grader().invoke({
             "question": "agent memory",
             "document": doc_text
         })
@@ -37,7 +37,7 @@ class TestRetrievalGrader:
 
     def test_handles_empty_document(self, sample_question):
         """Test behavior with empty document."""
-        result: GradeDocuments = retrieval_grader.invoke({
+        result: GradeDocuments = get_retrieval_grader().invoke({
             "question": sample_question,
             "document": ""
         })
@@ -51,12 +51,12 @@ class TestHallucinationGrader:
     def test_grounded_generation_passes(self, sample_question, sample_documents):
         """Test that grounded generation is marked as not hallucinated."""
         # Generate an answer using the documents
-        generation = generation_chain.invoke({
+        generation = get_generation_chain().invoke({
             "context": sample_documents,
             "question": sample_question
         })
 
-        result: GradeHallucinations = hallucination_grader.invoke({
+        result: GradeHallucinations = get_hallucination_grader().invoke({
             "documents": sample_documents,
             "generation": generation
         })
@@ -67,7 +67,7 @@ class TestHallucinationGrader:
         """Test that hallucinated content is detected."""
         hallucinated_text = "In order to make pizza we need to first start with the dough"
 
-        result: GradeHallucinations = hallucination_grader.invoke({
+        result: GradeHallucinations = get_hallucination_grader().invoke({
             "documents": sample_documents,
             "generation": hallucinated_text
         })
@@ -76,7 +76,7 @@ class TestHallucinationGrader:
 
     def test_handles_empty_generation(self, sample_documents):
         """Test behavior with empty generation."""
-        result: GradeHallucinations = hallucination_grader.invoke({
+        result: GradeHallucinations = get_hallucination_grader().invoke({
             "documents": sample_documents,
             "generation": ""
         })
@@ -95,7 +95,7 @@ class TestQuestionRouter:
     ])
     def test_routes_ai_questions_to_vectorstore(self, question, expected_route):
         """Test that AI-related questions route to vectorstore."""
-        result: RouteQuery = question_router.invoke({"question": question})
+        result: RouteQuery = get_question_router().invoke({"question": question})
         assert result.datasource == expected_route
 
     @pytest.mark.parametrize("question,expected_route", [
@@ -106,7 +106,7 @@ class TestQuestionRouter:
     ])
     def test_routes_general_questions_to_websearch(self, question, expected_route):
         """Test that general questions route to web search."""
-        result: RouteQuery = question_router.invoke({"question": question})
+        result: RouteQuery = get_question_router().invoke({"question": question})
         assert result.datasource == expected_route
 
 
@@ -115,7 +115,7 @@ class TestGenerationChain:
 
     def test_generates_answer_from_context(self, sample_question, sample_documents):
         """Test that generation chain produces reasonable output."""
-        result = generation_chain.invoke({
+        result = get_generation_chain().invoke({
             "context": sample_documents,
             "question": sample_question
         })
@@ -126,7 +126,7 @@ class TestGenerationChain:
 
     def test_handles_empty_context(self, sample_question):
         """Test behavior with no context documents."""
-        result = generation_chain.invoke({
+        result = get_generation_chain().invoke({
             "context": [],
             "question": sample_question
         })
@@ -138,7 +138,7 @@ class TestGenerationChain:
         """Test that generated answer references provided context."""
         question = "What are the components of agent memory?"
 
-        result = generation_chain.invoke({
+        result = get_generation_chain().invoke({
             "context": sample_documents,
             "question": question
         })
@@ -154,12 +154,12 @@ class TestAnswerGrader:
     def test_relevant_answer_passes(self, sample_question, sample_documents):
         """Test that answers addressing the question are graded as relevant."""
         # Generate a contextual answer
-        generated_answer = generation_chain.invoke({
+        generated_answer = get_generation_chain().invoke({
             "context": sample_documents,
             "question": sample_question
         })
 
-        result: GradeAnswer = answer_grader.invoke({
+        result: GradeAnswer = get_answer_grader().invoke({
             "question": sample_question,
             "generation": generated_answer
         })
@@ -170,7 +170,7 @@ class TestAnswerGrader:
         """Test that answers not addressing the question are graded as irrelevant."""
         irrelevant_answer = "Pizza is made with flour, water, yeast, and tomato sauce."
 
-        result: GradeAnswer = answer_grader.invoke({
+        result: GradeAnswer = get_answer_grader().invoke({
             "question": sample_question,
             "generation": irrelevant_answer
         })
@@ -182,7 +182,7 @@ class TestAnswerGrader:
         question = "What are the key components of AI agent memory systems?"
         partial_answer = "Memory is important for AI systems to function properly."
 
-        result: GradeAnswer = answer_grader.invoke({
+        result: GradeAnswer = get_answer_grader().invoke({
             "question": question,
             "generation": partial_answer
         })
@@ -199,7 +199,7 @@ class TestAnswerGrader:
         3. Retrieval mechanisms to access relevant past information
         4. Memory management systems to organize and prioritize information"""
 
-        result: GradeAnswer = answer_grader.invoke({
+        result: GradeAnswer = get_answer_grader().invoke({
             "question": question,
             "generation": comprehensive_answer
         })
@@ -208,7 +208,7 @@ class TestAnswerGrader:
 
     def test_empty_answer_fails(self, sample_question):
         """Test that empty answers are graded as not addressing the question."""
-        result: GradeAnswer = answer_grader.invoke({
+        result: GradeAnswer = get_answer_grader().invoke({
             "question": sample_question,
             "generation": ""
         })
@@ -220,7 +220,7 @@ class TestAnswerGrader:
         question = "How does semantic chunking improve RAG performance?"
         vague_answer = "It makes things better by improving the system performance."
 
-        result: GradeAnswer = answer_grader.invoke({
+        result: GradeAnswer = get_answer_grader().invoke({
             "question": question,
             "generation": vague_answer
         })
@@ -0,0 +1,204 @@
+import pytest
+
+from app.core.models.batching import BatchingEmbeddings
+from app.core.models.local import LocalChatModel, LocalHashEmbeddings
+from app.core.resilience.circuit_breaker import (
+    BreakerConfig,
+    CircuitBreaker,
+    CircuitOpenError,
+    CircuitState,
+    is_dependency_failure,
+)
+from app.core.resilience.governor import GovernedRunnable, Governor, GovernorConfig, Priority
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """A clock the tests advance by hand."""
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    """A breaker that opens after 4 calls at 50% failures and cools down for 10s."""
+    config = BreakerConfig(failure_rate_threshold=0.5, minimum_calls=4, window_seconds=30, cooldown_seconds=10)
+    return CircuitBreaker("test", config, clock=clock)
+
+
+def _fail():
+    raise ConnectionError("provider down")
+
+
+class _StatusError(Exception):
+    """Provider error carrying an HTTP status."""
+
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def _trip(breaker):
+    for _ in range(breaker.config.minimum_calls):
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+
+
+class TestCircuitBreaker:
+    """Test the breaker state machine."""
+
+    def test_opens_at_failure_rate(self, breaker):
+        """Test that the breaker opens once enough calls fail and then fails fast."""
+        breaker.call(lambda: "ok")
+        breaker.call(lambda: "ok")
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+        assert breaker.state == CircuitState.CLOSED
+
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+        assert breaker.state == CircuitState.OPEN
+
+        calls = []
+        with pytest.raises(CircuitOpenError) as error:
+            breaker.call(lambda: calls.append(1))
+        assert calls == []
+        assert error.value.retry_after == pytest.approx(10)
+
+    def test_needs_minimum_calls(self, breaker):
+        """Test that a few early failures do not open the breaker."""
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                breaker.call(_fail)
+
+        assert breaker.state == CircuitState.CLOSED
+
+    def test_old_failures_leave_the_window(self, breaker, clock):
+        """Test that failures older than the window are forgotten."""
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                breaker.call(_fail)
+        clock.now = 31.0
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+
+        assert breaker.state == CircuitState.CLOSED
+        assert breaker.snapshot()["calls_in_window"] == 1
+
+    def test_half_open_probe_closes(self, breaker, clock):
+        """Test that a successful probe after the cooldown closes the breaker."""
+        _trip(breaker)
+        clock.now = 10.0
+
+        assert breaker.state == CircuitState.HALF_OPEN
+        assert breaker.call(lambda: "ok") == "ok"
+        assert breaker.state == CircuitState.CLOSED
+        assert breaker.snapshot()["failure_rate"] == 0.0
+
+    def test_half_open_failure_reopens(self, breaker, clock):
+        """Test that a failed probe re-opens the breaker for another cooldown."""
+        _trip(breaker)
+        clock.now = 10.0
+        with pytest.raises(ConnectionError):
+            breaker.call(_fail)
+
+        assert breaker.state == CircuitState.OPEN
+        assert breaker.times_opened == 2
+        clock.now = 15.0
+        assert breaker.snapshot()["retry_after_seconds"] == 5.0
+
+    def test_half_open_admits_limited_probes(self, breaker, clock):
+        """Test that only half_open_max_calls probes run while half-open."""
+        _trip(breaker)
+        clock.now = 10.0
+        breaker.before_call()
+
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+    def test_hung_probe_reopens(self, breaker, clock):
+        """Test that a probe still running after the probe timeout re-opens the breaker and frees the slot."""
+        breaker.config.probe_timeout_seconds = 5
+        _trip(breaker)
+        clock.now = 10.0
+        breaker.before_call()
+        clock.now = 15.0
+
+        assert breaker.state == CircuitState.OPEN
+        assert breaker.times_opened == 2
+        clock.now = 25.0
+        assert breaker.call(lambda: "ok") == "ok"
+        assert breaker.state == CircuitState.CLOSED
+
+    def test_caller_errors_are_not_failures(self, breaker):
+        """Test that errors other than transport, timeout, 5xx and 429 errors do not open the breaker."""
+        for _ in range(breaker.config.minimum_calls):
+            with pytest.raises(ValueError):
+                breaker.call(lambda: int("not a number"))
+
+        assert breaker.state == CircuitState.CLOSED
+        assert breaker.snapshot()["failure_rate"] == 0.0
+
+    @pytest.mark.parametrize("exc, expected", [
+        (ConnectionError("refused"), True),
+        (TimeoutError(), True),
+        (_StatusError(503), True),
+        (_StatusError(429), True),
+        (_StatusError(400), False),
+        (ValueError("bad json"), False),
+    ])
+    def test_dependency_failures(self, exc, expected):
+        """Test which errors count as the dependency being unavailable."""
+        assert is_dependency_failure(exc) is expected
+
+    def test_environment_config(self, monkeypatch):
+        """Test that <PREFIX>_BREAKER_* variables configure a breaker."""
+        monkeypatch.setenv("WEB_SEARCH_BREAKER_MIN_CALLS", "2")
+        monkeypatch.setenv("WEB_SEARCH_BREAKER_COOLDOWN_SECONDS", "60")
+
+        config = BreakerConfig.from_env("WEB_SEARCH")
+
+        assert config.minimum_calls == 2
+        assert config.cooldown_seconds == 60.0
+        assert config.failure_rate_threshold == 0.5
+
+
+class TestGuardedClients:
+    """Test breakers wrapped around the governed model clients."""
+
+    def test_governed_runnable_fails_fast(self, breaker):
+        """Test that an open breaker rejects calls before they reach the governor."""
+        governor = Governor(GovernorConfig())
+        runnable = GovernedRunnable(LocalChatModel(), governor, Priority.GRADING, breaker=breaker)
+        _trip(breaker)
+
+        with pytest.raises(CircuitOpenError):
+            runnable.invoke("hello")
+        assert governor.stats()["queue_wait"] == {}
+
+    def test_governed_runnable_records_success(self, breaker):
+        """Test that successful model calls are recorded by the breaker."""
+        runnable = GovernedRunnable(LocalChatModel(), Governor(GovernorConfig()), Priority.GRADING, breaker=breaker)
+
+        runnable.invoke("hello")
+
+        assert breaker.snapshot()["calls_in_window"] == 1
+
+    def test_batched_embeddings_fail_fast(self, breaker):
+        """Test that queued embedding calls fail fast while the breaker is open."""
+        embeddings = BatchingEmbeddings(LocalHashEmbeddings(dimensions=8), breaker=breaker)
+        _trip(breaker)
+        try:
+            with pytest.raises(CircuitOpenError):
+                embeddings.embed_query("sepsis")
+        finally:
+            embeddings.close()
@@ -0,0 +1,149 @@
+import threading
+import time
+from contextvars import ContextVar
+
+import pytest
+
+from app.core.resilience import deadline
+from app.core.resilience.deadline import (
+    BudgetConfig,
+    DeadlineExceeded,
+    StepExecutor,
+    can_afford,
+    cycle_estimate_ms,
+    new_deadline,
+    node_timeout,
+    remaining_ms,
+    run_with_timeout,
+)
+
+request_id: ContextVar[str] = ContextVar("request_id", default="none")
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    """A 10s default budget with short generation and grading timeouts."""
+    config = BudgetConfig(latency_budget_ms=10000, cycle_estimate_ms=4000)
+    config.node_timeouts["generate"] = 5.0
+    monkeypatch.setattr(deadline, "budget_config", config)
+    return config
+
+
+class TestLatencyBudget:
+    """Test deadlines and node timeouts."""
+
+    def test_default_and_explicit_budget(self, budget):
+        """Test that requests use their own budget, the default one, or none."""
+        assert remaining_ms({"deadline": new_deadline()}) == pytest.approx(10000, abs=100)
+        assert remaining_ms({"deadline": new_deadline(2000)}) == pytest.approx(2000, abs=100)
+        assert new_deadline(0) is None
+        assert remaining_ms({}) is None
+
+    def test_node_timeout_is_capped_by_budget(self, budget):
+        """Test that a step gets the smaller of its timeout and the remaining budget."""
+        state = {"deadline": time.time() + 2}
+
+        assert node_timeout(state, "generate") == pytest.approx(2, abs=0.1)
+        assert node_timeout({"deadline": time.time() + 60}, "generate") == 5.0
+        assert node_timeout({"deadline": time.time() - 1}, "retrieve") == 0.0
+
+    def test_first_generation_ignores_budget(self, budget):
+        """Test that required steps keep their own timeout when the budget is spent."""
+        state = {"deadline": time.time() - 1}
+
+        assert node_timeout(state, "generate", required=True) == 5.0
+
+    def test_cycle_affordability(self, budget):
+        """Test that another cycle is estimated from the last generation when measured."""
+        state = {"deadline": time.time() + 3}
+
+        assert cycle_estimate_ms(state) == 4000
+        assert not can_afford(state, cycle_estimate_ms(state))
+        measured = {**state, "generation_ms": 1500}
+        assert can_afford(measured, cycle_estimate_ms(measured, grading_ms=500))
+        assert can_afford({}, 10 ** 9)
+
+    def test_environment_config(self, monkeypatch):
+        """Test that LATENCY_BUDGET_MS and <STEP>_NODE_TIMEOUT configure the budget."""
+        monkeypatch.setenv("LATENCY_BUDGET_MS", "0")
+        monkeypatch.setenv("WEBSEARCH_NODE_TIMEOUT", "2.5")
+
+        config = BudgetConfig.from_env()
+
+        assert config.latency_budget_ms == 0
+        assert config.node_timeouts["websearch"] == 2.5
+        assert config.node_timeouts["routing"] == 10.0
+        assert config.step_workers == 32
+
+
+class TestRunWithTimeout:
+    """Test bounded step execution."""
+
+    def test_returns_result(self):
+        """Test that calls finishing in time return their result."""
+        assert run_with_timeout(lambda: 42, 1.0, "retrieve") == 42
+
+    def test_raises_when_slow(self):
+        """Test that slow calls raise DeadlineExceeded without waiting for them."""
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded) as error:
+            run_with_timeout(lambda: time.sleep(0.5), 0.05, "websearch")
+
+        assert time.monotonic() - start < 0.4
+        assert error.value.step == "websearch"
+
+    def test_spent_budget_skips_call(self):
+        """Test that no call is made once the timeout is used up."""
+        calls = []
+        with pytest.raises(DeadlineExceeded):
+            run_with_timeout(lambda: calls.append(1), 0.0, "routing")
+
+        assert calls == []
+
+    def test_propagates_errors_and_context(self):
+        """Test that errors surface unchanged and context variables reach the worker."""
+        token = request_id.set("abc")
+        try:
+            assert run_with_timeout(request_id.get, 1.0, "generate") == "abc"
+        finally:
+            request_id.reset(token)
+        with pytest.raises(ValueError):
+            run_with_timeout(lambda: int("x"), 1.0, "generate")
+
+
+class TestStepExecutor:
+    """Test saturation accounting of the step worker pool."""
+
+    def test_abandoned_calls_are_counted_until_they_finish(self):
+        """Test that a call running past its timeout counts as abandoned while it holds its worker."""
+        executor = StepExecutor(max_workers=2)
+        release = threading.Event()
+
+        with pytest.raises(DeadlineExceeded):
+            executor.run(release.wait, 0.05, "generate")
+
+        stats = executor.stats()
+        assert (stats["running"], stats["abandoned"], stats["abandoned_total"]) == (1, 1, 1)
+        release.set()
+        deadline = time.time() + 5
+        while executor.stats()["running"] and time.time() < deadline:
+            time.sleep(0.01)
+        assert (executor.stats()["abandoned"], executor.stats()["abandoned_total"]) == (0, 1)
+
+    def test_queued_calls_time_out_without_running(self):
+        """Test that a call still waiting for a worker at its timeout is cancelled and counted as saturated."""
+        executor = StepExecutor(max_workers=1)
+        release = threading.Event()
+        calls = []
+        with pytest.raises(DeadlineExceeded):
+            executor.run(release.wait, 0.05, "generate")
+
+        with pytest.raises(DeadlineExceeded):
+            executor.run(lambda: calls.append(1), 0.05, "routing")
+        release.set()
+        assert executor.run(lambda: "ok", 1.0, "routing") == "ok"
+
+        assert calls == []
+        stats = executor.stats()
+        assert (stats["saturated"], stats["queued"]) == (1, 0)
+
@@ -0,0 +1,76 @@
+from langchain.schema import Document
+
+from app.core.ingestion.dedup import ChunkDeduplicator
+
+
+BOILERPLATE = (
+    "This article is licensed under a Creative Commons Attribution 4.0 International "
+    "License, which permits use, sharing, adaptation, distribution and reproduction in "
+    "any medium or format, as long as you give appropriate credit to the original authors"
+)
+
+
+class TestChunkDeduplicator:
+    """Test MinHash near-duplicate chunk removal."""
+
+    def test_identical_and_near_identical_chunks_are_removed(self):
+        """Test that repeated boilerplate is kept once and counted."""
+        deduplicator = ChunkDeduplicator(threshold=0.8)
+        chunks = [
+            Document(page_content=BOILERPLATE, metadata={"source": "a"}),
+            Document(page_content=BOILERPLATE, metadata={"source": "b"}),
+            Document(page_content=BOILERPLATE + " and the source.", metadata={"source": "c"}),
+        ]
+
+        unique = deduplicator.filter(chunks)
+
+        assert len(unique) == 1
+        assert unique[0].metadata == {"source": "a", "duplicates": 2}
+        assert deduplicator.removed == 2
+
+    def test_distinct_chunks_are_kept(self, sample_documents, clinical_documents):
+        """Test that different healthcare passages are not merged."""
+        deduplicator = ChunkDeduplicator()
+
+        unique = deduplicator.filter(sample_documents + clinical_documents)
+
+        assert len(unique) == len(sample_documents) + len(clinical_documents)
+        assert deduplicator.removed == 0
+
+    def test_duplicates_detected_across_batches(self):
+        """Test that state carries over between calls in the same run."""
+        deduplicator = ChunkDeduplicator()
+
+        first = deduplicator.filter([Document(page_content=BOILERPLATE)])
+        second = deduplicator.filter([Document(page_content=BOILERPLATE)])
+
+        assert len(first) == 1
+        assert second == []
+        assert deduplicator.removed == 1
+
+    def test_indexed_chunks_are_not_changed_by_later_duplicates(self):
+        """Test that a later batch's duplicate is reported as an update instead of changing the returned chunk."""
+        deduplicator = ChunkDeduplicator()
+        chunk = Document(page_content=BOILERPLATE, metadata={"source": "a"})
+
+        first = deduplicator.filter([chunk])
+        first[0].metadata["chunk_id"] = "c1"
+        deduplicator.filter([Document(page_content=BOILERPLATE, metadata={"source": "b"})])
+        updates = deduplicator.take_updates()
+
+        assert chunk.metadata == {"source": "a"}
+        assert first[0].metadata == {"source": "a", "chunk_id": "c1"}
+        assert [update.metadata for update in updates] == [{"source": "a", "chunk_id": "c1", "duplicates": 1}]
+        assert deduplicator.take_updates() == []
+
+    def test_similarity_estimate_tracks_threshold(self):
+        """Test that chunks sharing only part of their text survive a strict threshold."""
+        deduplicator = ChunkDeduplicator(threshold=0.95)
+        half = " ".join(BOILERPLATE.split()[: len(BOILERPLATE.split()) // 2])
+
+        unique = deduplicator.filter([
+            Document(page_content=BOILERPLATE),
+            Document(page_content=half + " followed by entirely different closing words here"),
+        ])
+
+        assert len(unique) == 2
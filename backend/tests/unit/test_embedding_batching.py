@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.models.batching import BatchingEmbeddings
+from app.core.models.local import LocalHashEmbeddings
+from app.core.resilience.governor import Governor, GovernorConfig
+
+
+class RecordingEmbeddings(LocalHashEmbeddings):
+    """Hash embeddings that record every provider call."""
+
+    def __init__(self, delay=0.0, **kwargs):
+        super().__init__(dimensions=16, **kwargs)
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts, task_type=None):
+        with self.lock:
+            self.calls.append((list(texts), task_type))
+        time.sleep(self.delay)
+        return [self._embed(text) for text in texts]
+
+
+@pytest.fixture
+def provider():
+    """Embedding provider with a small per-call latency."""
+    return RecordingEmbeddings(delay=0.02)
+
+
+class TestBatchingEmbeddings:
+    """Test coalescing of concurrent embedding calls."""
+
+    def test_concurrent_queries_are_coalesced(self, provider):
+        """Test that simultaneous queries share provider calls and get their own vectors."""
+        embeddings = BatchingEmbeddings(provider, max_batch_size=32, max_wait_ms=20)
+        texts = [f"question {i}" for i in range(20)]
+        results = {}
+
+        def ask(text):
+            results[text] = embeddings.embed_query(text)
+
+        threads = [threading.Thread(target=ask, args=(text,)) for text in texts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        embeddings.close()
+
+        assert len(provider.calls) < len(texts)
+        for text in texts:
+            assert results[text] == provider._embed(text)
+
+    def test_queries_use_query_task_type(self, provider):
+        """Test that batched queries keep the retrieval-query embedding mode."""
+        embeddings = BatchingEmbeddings(provider)
+
+        embeddings.embed_query("what is sepsis?")
+        embeddings.embed_documents(["sepsis is an infection response"])
+        embeddings.close()
+
+        assert provider.calls == [
+            (["what is sepsis?"], "RETRIEVAL_QUERY"),
+            (["sepsis is an infection response"], None),
+        ]
+
+    def test_batch_size_is_bounded(self, provider):
+        """Test that no provider call exceeds max_batch_size texts."""
+        embeddings = BatchingEmbeddings(provider, max_batch_size=4, max_wait_ms=50)
+
+        async def main():
+            return await asyncio.gather(*(embeddings.aembed_query(f"q{i}") for i in range(10)))
+
+        vectors = asyncio.run(main())
+        embeddings.close()
+
+        assert len(vectors) == 10
+        assert max(len(texts) for texts, _ in provider.calls) <= 4
+
+    def test_large_document_calls_bypass_the_queue(self, provider):
+        """Test that calls filling a batch on their own are sent directly."""
+        embeddings = BatchingEmbeddings(provider, max_batch_size=4)
+
+        vectors = embeddings.embed_documents([f"chunk {i}" for i in range(10)])
+
+        assert len(vectors) == 10
+        assert len(provider.calls) == 1
+        assert embeddings._dispatcher is None
+
+    def test_lone_query_is_not_delayed(self, provider):
+        """Test that an idle dispatcher sends a single query without waiting."""
+        provider.delay = 0
+        embeddings = BatchingEmbeddings(provider, max_wait_ms=500)
+
+        start = time.monotonic()
+        embeddings.embed_query("single")
+        elapsed = time.monotonic() - start
+        embeddings.close()
+
+        assert elapsed < 0.25
+
+    def test_errors_reach_every_caller(self):
+        """Test that a failed batch raises in each waiting caller."""
+        class Failing(RecordingEmbeddings):
+            def embed_documents(self, texts, task_type=None):
+                raise RuntimeError("provider down")
+
+        embeddings = BatchingEmbeddings(Failing())
+
+        with pytest.raises(RuntimeError, match="provider down"):
+            embeddings.embed_query("q")
+        embeddings.close()
+
+    def test_batches_are_governed(self, provider):
+        """Test that each batch is admitted once by the governor."""
+        governor = Governor(GovernorConfig())
+        embeddings = BatchingEmbeddings(provider, governor=governor)
+
+        embeddings.embed_query("q")
+        embeddings.embed_documents(["d1", "d2"])
+        embeddings.close()
+
+        queue_wait = governor.stats()["queue_wait"]
+        assert queue_wait["interactive"]["admitted"] == 1
+        assert queue_wait["background"]["admitted"] == 1
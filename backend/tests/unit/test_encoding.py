@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import ormsgpack
+
+from app.core.visualization import DocumentGrade, ProcessEvent, ProcessStepStatus, ProcessStepType
+from app.core.visualization.encoding import WireFormat, encode_events_message
+from app.core.visualization.fanout import ConnectionSender
+
+
+class RecordingWebSocket:
+    """WebSocket that records text and binary frames."""
+
+    def __init__(self):
+        self.frames = []
+
+    async def send_text(self, text):
+        self.frames.append(text)
+
+    async def send_bytes(self, data):
+        self.frames.append(data)
+
+
+def _grading_event(seq, grades):
+    event = ProcessEvent(
+        session_id="s1",
+        step_type=ProcessStepType.GRADE_DOCUMENTS,
+        status=ProcessStepStatus.COMPLETED,
+        documents_graded=[DocumentGrade(content_preview=text, relevance_score="yes") for text in grades],
+    )
+    event.seq = seq
+    return event
+
+
+class TestEncodedEvent:
+    """Test the cached wire forms of an event."""
+
+    def test_forms_are_encoded_once(self):
+        """Test that each form is computed once and the JSON form is the full model."""
+        encoded = _grading_event(1, ["a"]).encoded()
+
+        assert encoded.encode(WireFormat.COMPACT) is encoded.encode(WireFormat.COMPACT)
+        assert encoded.encode(WireFormat.JSON) is encoded.json
+        assert json.loads(encoded.json)["error_message"] is None
+
+    def test_compact_forms_drop_empty_fields(self):
+        """Test that compact JSON and MessagePack carry the same fields without None values."""
+        encoded = _grading_event(1, ["a", "b"]).encoded()
+
+        compact = json.loads(encoded.encode(WireFormat.COMPACT))
+
+        assert "error_message" not in compact
+        assert compact["seq"] == 1
+        assert [grade["content_preview"] for grade in compact["documents_graded"]] == ["a", "b"]
+        assert all(grade["id"] for grade in compact["documents_graded"])
+        assert ormsgpack.unpackb(encoded.encode(WireFormat.MSGPACK)) == compact
+
+    def test_events_message(self):
+        """Test that a batch assembled from cached forms decodes like one serialized whole."""
+        for count in (3, 20):
+            events = [_grading_event(i, [str(i)]).encoded() for i in range(count)]
+            for wire_format, decode in ((WireFormat.COMPACT, json.loads), (WireFormat.MSGPACK, ormsgpack.unpackb),
+                                        (WireFormat.JSON, json.loads)):
+                message = decode(encode_events_message(events, wire_format))
+
+                assert message["type"] == "session_events"
+                assert [event["seq"] for event in message["events"]] == list(range(count))
+
+
+class TestGradeReferences:
+    """Test sending documents a connection has already sent by id only."""
+
+    def test_repeated_documents_are_sent_by_id(self):
+        """Test that a later event with only known documents omits their content."""
+        websocket = RecordingWebSocket()
+
+        async def scenario():
+            sender = ConnectionSender(websocket, wire_format=WireFormat.COMPACT)
+            await sender.send(_grading_event(1, ["a", "b"]).encoded())
+            await sender.send(_grading_event(2, ["b", "a"]).encoded())
+            await sender.send(_grading_event(3, ["a", "c"]).encoded())
+
+        asyncio.run(scenario())
+
+        first, second, third = (json.loads(frame)["documents_graded"] for frame in websocket.frames)
+        ids = {grade["content_preview"]: grade["id"] for grade in first}
+        assert second == [{"id": ids["b"]}, {"id": ids["a"]}]
+        assert [grade["content_preview"] for grade in third] == ["a", "c"]
+
+    def test_msgpack_uses_binary_frames(self):
+        """Test that MessagePack events go out as bytes and control messages as text."""
+        websocket = RecordingWebSocket()
+
+        async def scenario():
+            sender = ConnectionSender(websocket, wire_format=WireFormat.MSGPACK)
+            await sender.send(_grading_event(1, ["a"]).encoded())
+            await sender.send('{"type":"pong"}')
+
+        asyncio.run(scenario())
+
+        assert isinstance(websocket.frames[0], bytes)
+        assert websocket.frames[1] == '{"type":"pong"}'
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import uuid
+
+from app.core.visualization import (
+    EventBus,
+    ProcessStepType,
+    emit_retrieve_started,
+    process_manager,
+)
+
+
+class TestEventBus:
+    """Test the thread-safe process event bus."""
+
+    def test_delivers_inline_without_consumer(self):
+        """Test that events are delivered in the publishing thread before start()."""
+        batches = []
+        bus = EventBus(batches.append)
+
+        assert bus.publish("a")
+        assert batches == [["a"]]
+
+    def test_threads_publish_to_single_consumer_in_batches(self):
+        """Test that events from many threads reach the consumer on the loop in batches."""
+        batches = []
+        consumer_threads = set()
+
+        def deliver(batch):
+            consumer_threads.add(threading.get_ident())
+            batches.append(batch)
+
+        async def scenario():
+            bus = EventBus(deliver, batch_size=50)
+            bus.start()
+            workers = [
+                threading.Thread(target=lambda n=n: [bus.publish((n, i)) for i in range(100)])
+                for n in range(4)
+            ]
+            for worker in workers:
+                worker.start()
+            await asyncio.to_thread(lambda: [worker.join() for worker in workers])
+            await asyncio.sleep(0.05)
+            stats = bus.stats()
+            await bus.stop()
+            return stats, threading.get_ident()
+
+        stats, loop_thread = asyncio.run(scenario())
+
+        events = [event for batch in batches for event in batch]
+        assert len(events) == 400
+        for n in range(4):
+            assert [i for m, i in events if m == n] == list(range(100))
+        assert consumer_threads == {loop_thread}
+        assert max(len(batch) for batch in batches) <= 50
+        assert stats["delivered"] == 400 and stats["dropped"] == 0
+
+    def test_drops_when_full(self):
+        """Test that a full queue drops new events and counts them."""
+        delivered = []
+
+        async def scenario():
+            bus = EventBus(delivered.extend, max_queued=3)
+            bus.start()
+            # Published without yielding, so the consumer cannot drain in between
+            results = [bus.publish(i) for i in range(5)]
+            await asyncio.sleep(0.01)
+            await bus.stop()
+            return results, bus.stats()
+
+        results, stats = asyncio.run(scenario())
+
+        assert results == [True, True, True, False, False]
+        assert delivered == [0, 1, 2]
+        assert stats["dropped"] == 2
+
+    def test_stop_delivers_remaining_events(self):
+        """Test that events still queued at shutdown are delivered."""
+        delivered = []
+
+        async def scenario():
+            bus = EventBus(delivered.extend)
+            bus.start()
+            for i in range(3):
+                bus.publish(i)
+            await bus.stop()
+            return bus.running
+
+        assert asyncio.run(scenario()) is False
+        assert delivered == [0, 1, 2]
+
+    def test_failing_delivery_does_not_stop_consumer(self):
+        """Test that an exception in delivery is logged and later events still arrive."""
+        delivered = []
+
+        def deliver(batch):
+            if batch == ["bad"]:
+                raise ValueError("boom")
+            delivered.extend(batch)
+
+        async def scenario():
+            bus = EventBus(deliver)
+            bus.start()
+            bus.publish("bad")
+            await asyncio.sleep(0.01)
+            bus.publish("good")
+            await asyncio.sleep(0.01)
+            await bus.stop()
+
+        asyncio.run(scenario())
+
+        assert delivered == ["good"]
+
+
+class TestNodeEmission:
+    """Test that synchronous code emits events without an event loop."""
+
+    def test_emit_from_worker_thread(self):
+        """Test that an emitter called in a thread without a loop records the event."""
+        session_id = f"bus-{uuid.uuid4()}"
+        worker = threading.Thread(target=emit_retrieve_started, args=(session_id, "What is RAG?"))
+        worker.start()
+        worker.join()
+
+        try:
+            events = process_manager.get_session_events(session_id)
+            assert [event.step_type for event in events] == [ProcessStepType.RETRIEVE]
+        finally:
+            process_manager.clear_session_events(session_id)
@@ -0,0 +1,230 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.core.visualization import (
+    EmissionConfig,
+    EventLevel,
+    EventTransport,
+    ProcessEvent,
+    ProcessStepStatus,
+    ProcessStepType,
+    ProcessVisualizationManager,
+    process_run,
+)
+from app.db.event_log import ProcessEventLog, event_log_report
+from app.db.models import Base, ProcessEventRecord
+
+T0 = datetime(2026, 10, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """SQLite database with the process event table, standing in for PostgreSQL."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'events.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def make_log(engine):
+    """Factory for started event logs writing to the SQLite database; closes them after the test."""
+    logs = []
+
+    def make(engine_factory=None, **kwargs):
+        log = ProcessEventLog(engine_factory or (lambda: engine), **kwargs)
+        log.start()
+        logs.append(log)
+        return log
+
+    yield make
+    for log in logs:
+        log.close(timeout=5)
+
+
+def _event(session_id, step_type, status=ProcessStepStatus.COMPLETED, question="q", minutes=0, seq=1, **fields):
+    return ProcessEvent(
+        session_id=session_id, seq=seq, step_type=step_type, status=status,
+        timestamp=T0 + timedelta(minutes=minutes), question=question, **fields
+    )
+
+
+def _rows(engine):
+    with engine.connect() as connection:
+        return connection.execute(select(ProcessEventRecord.__table__)).all()
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def _failing_engine():
+    raise ConnectionError("database unreachable")
+
+
+class TestProcessEventLog:
+    """Test batched persistence of process events."""
+
+    def test_full_batches_flush_immediately(self, make_log, engine):
+        """Test that full batches are written without waiting for the timer, and started events are not kept."""
+        log = make_log(max_batch_size=5, flush_interval=60)
+        log.add(_event("s1", ProcessStepType.RETRIEVE, ProcessStepStatus.STARTED))
+        for i in range(10):
+            log.add(_event("s1", ProcessStepType.RETRIEVE, seq=i + 2, duration_ms=i))
+
+        _wait_for(lambda: log.stats()["events_written"] == 10)
+
+        assert log.stats()["batches_written"] == 2
+        rows = _rows(engine)
+        assert len(rows) == 10
+        assert {row.status for row in rows} == {"completed"}
+
+    def test_partial_batch_flushes_on_timer(self, make_log, engine):
+        """Test that a lone event is written after the flush interval."""
+        log = make_log(max_batch_size=100, flush_interval=0.05)
+        log.add(_event("s1", ProcessStepType.RETRIEVE, duration_ms=5))
+
+        _wait_for(lambda: log.stats()["events_written"] == 1)
+
+        assert len(_rows(engine)) == 1
+
+    def test_close_flushes_remaining(self, make_log, engine):
+        """Test that shutdown writes the events still queued."""
+        log = make_log(max_batch_size=100, flush_interval=60)
+        for i in range(3):
+            log.add(_event("s1", ProcessStepType.GENERATE, seq=i + 1, generation_attempt=i + 1))
+
+        log.close()
+
+        assert sorted(row.generation_attempt for row in _rows(engine)) == [1, 2, 3]
+
+    def test_failed_writes_are_retried_within_the_queue_bound(self, make_log):
+        """Test that unwritten events stay queued, and the oldest are dropped beyond max_queued."""
+        log = make_log(engine_factory=_failing_engine, max_batch_size=2, flush_interval=0.01, max_queued=3)
+        for i in range(5):
+            log.add(_event("s1", ProcessStepType.RETRIEVE, seq=i + 1))
+
+        _wait_for(lambda: log.stats()["failed_flushes"] >= 2)
+
+        stats = log.stats()
+        assert stats["pending"] == 3
+        assert stats["dropped"] == 2
+        assert stats["last_error"] == "database unreachable"
+
+    def test_rejected_event_is_dead_lettered(self, make_log, engine, tmp_path):
+        """Test that a row the database rejects is set aside and the rest of its batch is written."""
+        dead_letter = tmp_path / "dead_letter.jsonl"
+        log = make_log(max_batch_size=3, flush_interval=60, dead_letter_path=str(dead_letter))
+        rejected = ProcessEvent.model_construct(
+            session_id=None, seq=2, step_type=ProcessStepType.RETRIEVE,
+            status=ProcessStepStatus.COMPLETED, timestamp=T0,
+        )
+        for event in (_event("s1", ProcessStepType.ROUTING), rejected, _event("s1", ProcessStepType.GENERATE)):
+            log.add(event)
+
+        _wait_for(lambda: log.stats()["dead_lettered"] == 1)
+        log.close()
+
+        assert sorted(row.step_type for row in _rows(engine)) == ["generate", "routing"]
+        assert log.stats()["events_written"] == 2
+        assert [json.loads(line)["seq"] for line in dead_letter.read_text().splitlines()] == [2]
+
+    def test_events_carry_the_run_id(self, make_log, engine):
+        """Test that events emitted within a run are logged with its id."""
+        log = make_log(max_batch_size=100, flush_interval=60)
+        manager = ProcessVisualizationManager(transport=EventTransport())
+        manager.event_log = log
+
+        with process_run("message-1"):
+            manager.deliver([_event("s1", ProcessStepType.RETRIEVE)])
+        manager.deliver([_event("s1", ProcessStepType.GENERATE)])
+        log.close()
+
+        assert sorted((row.step_type, row.run_id) for row in _rows(engine)) == [
+            ("generate", None), ("retrieve", "message-1")
+        ]
+
+    def test_manager_logs_delivered_events(self, make_log, engine):
+        """Test that the manager logs its own events, and builds summaries for unwatched unsampled sessions."""
+        log = make_log(max_batch_size=100, flush_interval=60)
+        manager = ProcessVisualizationManager(
+            transport=EventTransport(), emission=EmissionConfig(history_sample_rate=0.0)
+        )
+        assert manager.emission_level("s1") == EventLevel.OFF
+        manager.event_log = log
+        assert manager.emission_level("s1") == EventLevel.SUMMARY
+
+        manager.deliver([_event("s1", ProcessStepType.RETRIEVE, seq=0, duration_ms=40)])
+        manager._receive({"op": "event", "event": _event("s1", ProcessStepType.GENERATE, seq=2).model_dump(mode="json")})
+        log.close()
+
+        assert [(row.step_type, row.seq) for row in _rows(engine)] == [("retrieve", 1)]
+        assert manager.get_session_events("s1") == []
+
+
+class TestEventLogReport:
+    """Test latency and retry analytics over the logged events."""
+
+    @pytest.fixture
+    def logged(self, make_log, engine):
+        """
+        Three runs of one question in one session: a clean vector store run, one
+        with a retried generation that fell back to the web, one routed to the web.
+        """
+        log = make_log(max_batch_size=1000, flush_interval=60)
+        events = [
+            _event("s1", ProcessStepType.ROUTING, run_id="a", routing_decision="vectorstore", duration_ms=10),
+            _event("s1", ProcessStepType.RETRIEVE, run_id="a", duration_ms=100),
+            _event("s1", ProcessStepType.GENERATE, run_id="a", generation_attempt=1, duration_ms=1000),
+            _event("s1", ProcessStepType.ROUTING, run_id="b", routing_decision="vectorstore", duration_ms=20, minutes=1),
+            _event("s1", ProcessStepType.RETRIEVE, run_id="b", duration_ms=200, minutes=1),
+            _event("s1", ProcessStepType.GENERATE, run_id="b", generation_attempt=1, duration_ms=2000, minutes=1),
+            _event("s1", ProcessStepType.GENERATE, run_id="b", generation_attempt=2, duration_ms=3000, minutes=1),
+            _event("s1", ProcessStepType.WEBSEARCH, run_id="b", duration_ms=500, minutes=1),
+            _event("s1", ProcessStepType.GENERATE, ProcessStepStatus.FAILED, run_id="b", generation_attempt=3, minutes=1),
+            _event("s1", ProcessStepType.ROUTING, run_id="c", routing_decision="websearch", duration_ms=30, minutes=2),
+            _event("s1", ProcessStepType.WEBSEARCH, run_id="c", duration_ms=700, minutes=2),
+            _event("s1", ProcessStepType.GENERATE, run_id="c", generation_attempt=1, duration_ms=4000, minutes=2),
+        ]
+        for event in events:
+            log.add(event)
+        log.close()
+        return engine
+
+    def test_step_percentiles(self, logged):
+        """Test per-step outcome counts and nearest-rank percentiles of completed durations."""
+        with Session(logged) as session:
+            report = event_log_report(session)
+
+        assert report["events"] == 12
+        assert report["runs"] == 3
+        generate = report["by_step"]["generate"]
+        assert (generate["count"], generate["completed"], generate["failed"]) == (5, 4, 1)
+        assert (generate["p50_ms"], generate["p95_ms"], generate["p99_ms"], generate["max_ms"]) == (2000, 4000, 4000, 4000)
+        assert report["by_step"]["routing"]["p50_ms"] == 20
+
+    def test_retry_and_fallback_rates(self, logged):
+        """Test that retries count per run, even of a repeated question, and fallbacks only among runs routed to the vector store."""
+        with Session(logged) as session:
+            report = event_log_report(session)
+
+        assert report["retry_loops"] == {"runs": 3, "retried": 1, "rate": 0.3333, "extra_generations": 2}
+        assert report["web_search_fallback"] == {"runs": 2, "fell_back": 1, "rate": 0.5}
+
+    def test_time_window(self, logged):
+        """Test that only events in [start, end) are reported."""
+        with Session(logged) as session:
+            report = event_log_report(session, start=T0 + timedelta(minutes=1), end=T0 + timedelta(minutes=2))
+            empty = event_log_report(session, start=T0 + timedelta(hours=1))
+
+        assert report["runs"] == 1
+        assert report["web_search_fallback"]["rate"] == 1.0
+        assert empty["events"] == 0
+        assert empty["retry_loops"]["rate"] is None
@@ -0,0 +1,185 @@
+import asyncio
+
+import pytest
+
+from app.core.visualization import (
+    EventStoreConfig,
+    ProcessEvent,
+    ProcessStepStatus,
+    ProcessStepType,
+    ProcessVisualizationManager,
+    SessionEventStore,
+)
+from app.core.visualization.events import RESET_MESSAGE
+from app.core.visualization.fanout import StreamChannel
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """Manually advanced monotonic clock."""
+    return FakeClock()
+
+
+@pytest.fixture
+def store(clock):
+    """Store keeping 3 events per session, 5 in total, for 60s of inactivity."""
+    config = EventStoreConfig(max_events_per_session=3, session_ttl_seconds=60, max_total_events=5)
+    return SessionEventStore(config, clock=clock)
+
+
+class TestSessionEventStore:
+    """Test bounded per-session event retention."""
+
+    def test_ring_buffer_keeps_latest_events(self, store):
+        """Test that a full session drops its oldest events."""
+        for i in range(5):
+            store.append("s1", i)
+
+        assert store.get("s1") == [2, 3, 4]
+        assert store.stats()["resident_events"] == 3
+        assert store.stats()["evictions"]["ring"] == 2
+
+    def test_idle_sessions_are_swept(self, store, clock):
+        """Test that sessions idle past the TTL are evicted unless kept."""
+        store.append("idle", 1)
+        store.append("watched", 1)
+        clock.now += 30
+        store.append("active", 1)
+        clock.now += 45
+
+        assert store.sweep(keep={"watched"}) == 1
+        assert store.sessions() == ["watched", "active"]
+        assert store.get("idle") == []
+        assert store.stats()["evictions"]["ttl"] == 1
+
+    def test_global_cap_evicts_least_recently_used(self, store):
+        """Test that exceeding the total evicts whole sessions, least recently used first."""
+        store.append("a", 1)
+        store.append("a", 2)
+        store.append("b", 1)
+        store.append("b", 2)
+        store.get("a")
+        store.append("c", 1)
+        store.append("c", 2)
+
+        assert store.sessions() == ["a", "c"]
+        stats = store.stats()
+        assert stats["resident_events"] == 4
+        assert stats["evictions"]["lru"] == 1
+        assert stats["evictions"]["events"] == 2
+
+    def test_session_being_written_is_kept(self, clock):
+        """Test that a single session is never evicted by the global cap."""
+        store = SessionEventStore(EventStoreConfig(max_events_per_session=10, max_total_events=2), clock=clock)
+        for i in range(4):
+            store.append("only", i)
+
+        assert store.get("only") == [0, 1, 2, 3]
+
+    def test_environment_config(self, monkeypatch):
+        """Test that VISUALIZATION_* variables configure the store."""
+        monkeypatch.setenv("VISUALIZATION_MAX_EVENTS_PER_SESSION", "7")
+        monkeypatch.setenv("VISUALIZATION_SESSION_TTL_SECONDS", "5")
+
+        config = EventStoreConfig.from_env()
+
+        assert config.max_events_per_session == 7
+        assert config.session_ttl_seconds == 5.0
+        assert config.max_total_events == 50000
+
+
+class TestManagerRetention:
+    """Test the visualization manager on top of the bounded store."""
+
+    def test_emitted_events_are_bounded(self, store):
+        """Test that emitted events go through the store and show up in stats."""
+        manager = ProcessVisualizationManager(store)
+        for _ in range(4):
+            asyncio.run(manager.emit_event(ProcessEvent(
+                session_id="s1",
+                event_id="e",
+                step_type=ProcessStepType.RETRIEVE,
+                status=ProcessStepStatus.STARTED,
+            )))
+
+        assert len(manager.get_session_events("s1")) == 3
+        assert manager.get_active_sessions() == ["s1"]
+        assert manager.stats()["evictions"]["ring"] == 1
+        manager.clear_session_events("s1")
+        assert manager.stats()["resident_events"] == 0
+
+
+class TestSequenceNumbers:
+    """Test per-session event numbering and resuming after a sequence number."""
+
+    def test_events_are_numbered_per_session(self, store):
+        """Test that each session numbers its events from 1 and resumes after a number."""
+        manager = ProcessVisualizationManager(store)
+        manager.deliver([
+            ProcessEvent(session_id=session_id, step_type=ProcessStepType.RETRIEVE, status=ProcessStepStatus.STARTED)
+            for session_id in ("s1", "s1", "s2", "s1")
+        ])
+
+        events = manager.get_session_events("s1")
+        assert [event.seq for event in events] == [1, 2, 3]
+        assert [event.event_id for event in events] == [f"s1-{events[0].epoch}-{n}" for n in (1, 2, 3)]
+        assert [event.seq for event in manager.get_session_events("s1", since=1)] == [2, 3]
+        assert manager.get_session_events("s2")[0].seq == 1
+
+    def test_numbering_survives_ring_eviction(self, store):
+        """Test that numbers keep increasing after old events are dropped."""
+        for i in range(5):
+            store.append("s1", i)
+
+        assert store.next_seq("s1") == 6
+        assert store.since("s1", 0) == [2, 3, 4]
+        assert store.since("s1", 4) == [4]
+
+    def test_cursor_ahead_of_session_replays_all(self, store):
+        """Test that a number from before the session was cleared returns every event."""
+        store.append("s1", "a")
+        store.append("s1", "b")
+
+        assert store.since("s1", 2) == []
+        assert store.since("s1", 40) == ["a", "b"]
+        assert store.since("unknown", 0) == []
+
+    def test_reconnect_after_restart_resets_the_client(self):
+        """Test that a cursor from before a restart is stale even once the new numbering has passed it."""
+        def started(session_id):
+            return ProcessEvent(session_id=session_id, step_type=ProcessStepType.RETRIEVE,
+                                status=ProcessStepStatus.STARTED)
+
+        before = ProcessVisualizationManager(SessionEventStore())
+        before.deliver([started("s1") for _ in range(3)])
+        last = before.get_session_events("s1")[-1]
+        restarted = ProcessVisualizationManager(SessionEventStore())
+        restarted.deliver([started("s1") for _ in range(5)])
+
+        renumbered, events = restarted.resume_session_events("s1", last.seq, last.epoch)
+        assert renumbered
+        assert [event.seq for event in events] == [1, 2, 3, 4, 5]
+        current = events[2]
+        assert restarted.resume_session_events("s1", current.seq, current.epoch) == (False, events[3:])
+        assert restarted.resume_session_events("gone", 4) == (True, [])
+
+    def test_clear_resets_connected_clients(self):
+        """Test that clearing a session tells its open connections to drop their events."""
+        async def scenario():
+            manager = ProcessVisualizationManager(SessionEventStore())
+            channel = StreamChannel()
+            manager.add_websocket_connection("s1", channel).start()
+            manager.clear_session_events("s1")
+            received = await channel.receive(1)
+            manager.remove_websocket_connection("s1", channel)
+            return received
+
+        assert asyncio.run(scenario()) == RESET_MESSAGE
@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.visualization import (
+    EventStoreConfig,
+    ProcessEvent,
+    ProcessStepStatus,
+    ProcessStepType,
+    ProcessVisualizationManager,
+    SessionEventStore,
+)
+from app.core.visualization.fanout import ConnectionSender, FanoutConfig, OverflowPolicy, StreamChannel
+
+
+class FakeWebSocket:
+    """WebSocket whose sends take ``delay`` seconds, or block until released."""
+
+    def __init__(self, delay: float = 0.0, blocked: bool = False):
+        self.delay = delay
+        self.sent = []
+        self.closed_with = None
+        self.release = asyncio.Event()
+        if not blocked:
+            self.release.set()
+
+    async def send_text(self, text):
+        await self.release.wait()
+        await asyncio.sleep(self.delay)
+        self.sent.append(text)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+def _event(step=ProcessStepType.RETRIEVE, status=ProcessStepStatus.STARTED):
+    return ProcessEvent(session_id="s1", event_id="e", step_type=step, status=status)
+
+
+async def _settle():
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+class TestConnectionSender:
+    """Test bounded per-connection send queues."""
+
+    def test_drop_oldest(self):
+        """Test that a full queue drops its oldest messages."""
+        async def scenario():
+            websocket = FakeWebSocket(blocked=True)
+            sender = ConnectionSender(websocket, FanoutConfig(max_queue_size=2))
+            sender.start()
+            sender.offer("0")
+            await _settle()
+            # The writer holds "0" while blocked, so the queue fills with the rest
+            for i in range(1, 5):
+                assert sender.offer(str(i))
+            websocket.release.set()
+            await _settle()
+            return websocket.sent, sender.stats()
+
+        sent, stats = asyncio.run(scenario())
+
+        assert sent == ["0", "3", "4"]
+        assert stats["dropped"] == 2
+
+    def test_coalesce_replaces_same_key(self):
+        """Test that coalescing replaces a queued message with the same key."""
+        async def scenario():
+            websocket = FakeWebSocket(blocked=True)
+            sender = ConnectionSender(websocket, FanoutConfig(2, OverflowPolicy.COALESCE))
+            sender.offer("retrieve started", key="retrieve")
+            sender.offer("generate started", key="generate")
+            sender.offer("retrieve completed", key="retrieve")
+            sender.start()
+            websocket.release.set()
+            await _settle()
+            return websocket.sent, sender.stats()
+
+        sent, stats = asyncio.run(scenario())
+
+        assert sent == ["generate started", "retrieve completed"]
+        assert stats["coalesced"] == 1
+
+    def test_disconnect_closes_slow_consumer(self):
+        """Test that the disconnect policy closes a connection that falls behind."""
+        async def scenario():
+            websocket = FakeWebSocket(blocked=True)
+            sender = ConnectionSender(websocket, FanoutConfig(1, OverflowPolicy.DISCONNECT))
+            assert sender.offer("a")
+            assert not sender.offer("b")
+            await _settle()
+            return websocket, sender
+
+        websocket, sender = asyncio.run(scenario())
+
+        assert websocket.closed_with == 1013
+        assert sender.overflowed and not sender.offer("c")
+
+    def test_offer_from_another_thread(self):
+        """Test that messages offered from a worker thread are sent on the socket's loop."""
+        async def scenario():
+            websocket = FakeWebSocket()
+            sender = ConnectionSender(websocket)
+            sender.start()
+            worker = threading.Thread(target=lambda: [sender.offer(str(i)) for i in range(3)])
+            worker.start()
+            await asyncio.to_thread(worker.join)
+            await asyncio.sleep(0.05)
+            return websocket.sent
+
+        assert asyncio.run(scenario()) == ["0", "1", "2"]
+
+    def test_environment_config(self, monkeypatch):
+        """Test that the queue size and policy are read from the environment."""
+        monkeypatch.setenv("VISUALIZATION_SEND_QUEUE_SIZE", "8")
+        monkeypatch.setenv("VISUALIZATION_OVERFLOW_POLICY", "coalesce")
+
+        assert FanoutConfig.from_env() == FanoutConfig(8, OverflowPolicy.COALESCE)
+
+
+    def test_render_and_stream_channel(self):
+        """Test that rendered messages reach a streaming response's channel in order."""
+        async def scenario():
+            channel = StreamChannel()
+            sender = ConnectionSender(channel, render=lambda message, cursor: f"{cursor}|{message}")
+            sender.start()
+            event = _event()
+            event.epoch, event.seq = "e1", 7
+            sender.offer(event.encoded())
+            sender.offer("pong")
+            received = [await channel.receive(1), await channel.receive(1), await channel.receive(0.01)]
+            sender.close()
+            return event, received
+
+        event, received = asyncio.run(scenario())
+
+        assert received == [f"e1:7|{event.model_dump_json()}", "None|pong", None]
+
+    def test_replayed_events_are_not_sent_again(self):
+        """Test that events queued while the session was replayed are skipped up to the last replayed one."""
+        async def scenario():
+            channel = StreamChannel()
+            sender = ConnectionSender(channel, render=lambda message, cursor: f"{cursor}")
+            events = []
+            for epoch, seq in (("e1", 1), ("e1", 2), ("e1", 3), ("e2", 1)):
+                event = _event()
+                event.epoch, event.seq = epoch, seq
+                events.append(event.encoded())
+                sender.offer(events[-1])
+            sender.offer("pong")
+            sender.start(replayed=events[1])
+            received = [await channel.receive(1) for _ in range(3)]
+            sender.close()
+            return received
+
+        assert asyncio.run(scenario()) == ["e1:3", "e2:1", "None"]
+
+
+class TestFanout:
+    """Test event fan-out to the connections of a session."""
+
+    def test_slow_client_does_not_delay_others(self):
+        """Test that emitting returns at once and a fast client is not held up by a slow one."""
+        async def scenario():
+            manager = ProcessVisualizationManager(SessionEventStore(EventStoreConfig()), FanoutConfig(10))
+            slow, fast = FakeWebSocket(delay=0.5), FakeWebSocket()
+            for websocket in (slow, fast):
+                manager.add_websocket_connection("s1", websocket).start()
+
+            start = time.monotonic()
+            for _ in range(3):
+                await manager.emit_event(_event())
+            emitted_in = time.monotonic() - start
+            await asyncio.sleep(0.05)
+            fast_received, slow_received = len(fast.sent), len(slow.sent)
+            manager.remove_websocket_connection("s1", slow)
+            manager.remove_websocket_connection("s1", fast)
+            return emitted_in, fast_received, slow_received, manager.stats()
+
+        emitted_in, fast_received, slow_received, stats = asyncio.run(scenario())
+
+        assert emitted_in < 0.1
+        assert fast_received == 3
+        assert slow_received == 0
+        assert stats["websocket_connections"] == 0
+
+    def test_overflowed_connection_is_removed(self):
+        """Test that connections closed for falling behind are dropped from the session."""
+        async def scenario():
+            manager = ProcessVisualizationManager(
+                SessionEventStore(EventStoreConfig()), FanoutConfig(1, OverflowPolicy.DISCONNECT)
+            )
+            manager.add_websocket_connection("s1", FakeWebSocket(blocked=True))
+            for _ in range(2):
+                await manager.emit_event(_event())
+            await _settle()
+            return manager.stats()
+
+        stats = asyncio.run(scenario())
+
+        assert stats["websocket_connections"] == 0
+        assert stats["send_queues"]["slow_disconnects"] == 1
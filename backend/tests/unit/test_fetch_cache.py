@@ -0,0 +1,140 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from app.core.ingestion.fetch_cache import FetchCache, html_to_document
+
+
+PAGE = (
+    '<html lang="en"><head><title>AI in Radiology</title>'
+    '<meta name="description" content="Overview"></head>'
+    "<body><p>Deep learning detects lung nodules.</p></body></html>"
+)
+LAST_MODIFIED = "Wed, 01 May 2024 10:00:00 GMT"
+
+
+class _ValidatingHandler(BaseHTTPRequestHandler):
+    """Serves a page with ETag and Last-Modified and honours conditional requests."""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        etag = f'"v{server.version}"'
+
+        use_etag = self.path.startswith("/etag")
+        if use_etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        if not use_etag and self.headers.get("If-Modified-Since") == LAST_MODIFIED and server.version == 1:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        body = server.body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if use_etag:
+            self.send_header("ETag", etag)
+        else:
+            self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    """Local HTTP server returning cache validators."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ValidatingHandler)
+    server.requests = []
+    server.version = 1
+    server.body = PAGE
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server, path):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+class TestFetchCache:
+    """Test conditional re-fetching with ETag and Last-Modified validators."""
+
+    def test_etag_revalidation_returns_cached_body(self, http_server, tmp_path):
+        """Test that a second fetch sends If-None-Match and reuses the body on 304."""
+        cache = FetchCache(str(tmp_path))
+        url = _url(http_server, "/etag/page")
+
+        first = cache.fetch(url)
+        second = cache.fetch(url)
+
+        assert first.not_modified is False
+        assert first.etag == '"v1"'
+        assert second.not_modified is True
+        assert second.body == PAGE
+        assert http_server.requests[1].get("If-None-Match") == '"v1"'
+
+    def test_changed_resource_is_refetched(self, http_server, tmp_path):
+        """Test that a new ETag results in a full response and an updated cache."""
+        cache = FetchCache(str(tmp_path))
+        url = _url(http_server, "/etag/page")
+        cache.fetch(url)
+
+        http_server.version = 2
+        http_server.body = PAGE.replace("lung nodules", "fractures")
+        changed = cache.fetch(url)
+        unchanged = cache.fetch(url)
+
+        assert changed.not_modified is False
+        assert "fractures" in changed.body
+        assert unchanged.not_modified is True
+        assert "fractures" in unchanged.body
+
+    def test_last_modified_revalidation(self, http_server, tmp_path):
+        """Test that If-Modified-Since is sent when only Last-Modified is available."""
+        cache = FetchCache(str(tmp_path))
+        url = _url(http_server, "/dated/page")
+
+        cache.fetch(url)
+        second = cache.fetch(url)
+
+        assert second.not_modified is True
+        assert http_server.requests[1].get("If-Modified-Since") == LAST_MODIFIED
+        assert "If-None-Match" not in http_server.requests[1]
+
+    def test_uncached_url_sends_no_validators(self, http_server, tmp_path):
+        """Test that a cold cache performs a plain GET."""
+        cache = FetchCache(str(tmp_path))
+
+        cache.fetch(_url(http_server, "/etag/page"))
+
+        assert "If-None-Match" not in http_server.requests[0]
+        assert "If-Modified-Since" not in http_server.requests[0]
+
+    def test_http_errors_raise(self, tmp_path):
+        """Test that connection failures surface as httpx errors."""
+        cache = FetchCache(str(tmp_path), timeout=1.0)
+
+        with pytest.raises(httpx.HTTPError):
+            cache.fetch("http://127.0.0.1:9/unreachable")
+
+    def test_html_to_document_metadata(self):
+        """Test that parsed pages carry WebBaseLoader-style metadata."""
+        doc = html_to_document("https://example.org/a", PAGE)
+
+        assert "Deep learning detects lung nodules." in doc.page_content
+        assert doc.metadata == {
+            "source": "https://example.org/a",
+            "title": "AI in Radiology",
+            "description": "Overview",
+            "language": "en",
+        }
@@ -0,0 +1,237 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.models.local import LocalChatModel, LocalHashEmbeddings
+from app.core.resilience.governor import (
+    GovernedEmbeddings,
+    GovernedRunnable,
+    Governor,
+    GovernorConfig,
+    Priority,
+    is_rate_limit_error,
+)
+
+
+class RateLimited(Exception):
+    """Stand-in for a provider 429 response."""
+    status_code = 429
+
+
+def _fast_retries(**overrides):
+    config = dict(max_retries=3, retry_base_delay=0.01, retry_max_delay=0.02)
+    config.update(overrides)
+    return GovernorConfig(**config)
+
+
+class TestGovernorAdmission:
+    """Test concurrency limits and priority ordering."""
+
+    def test_max_in_flight_is_enforced(self):
+        """Test that no more than max_in_flight calls run at once."""
+        governor = Governor(GovernorConfig(max_in_flight=2))
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def work():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+        threads = [threading.Thread(target=governor.call, args=(work,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert max(peak) == 2
+        assert governor.in_flight == 0
+
+    def test_generation_is_admitted_before_grading(self):
+        """Test that queued generation calls overtake earlier grading calls."""
+        governor = Governor(GovernorConfig(max_in_flight=1))
+        order = []
+        gate = threading.Event()
+
+        blocker = threading.Thread(target=governor.call, args=(gate.wait,))
+        blocker.start()
+        while governor.in_flight == 0:
+            time.sleep(0.001)
+
+        threads = []
+        for priority in (Priority.GRADING, Priority.GRADING, Priority.GENERATION):
+            thread = threading.Thread(
+                target=governor.call,
+                args=(lambda p=priority: order.append(p),),
+                kwargs={"priority": priority},
+            )
+            thread.start()
+            threads.append(thread)
+            while governor.queued < len(threads):
+                time.sleep(0.001)
+
+        gate.set()
+        for thread in [blocker] + threads:
+            thread.join()
+
+        assert order == [Priority.GENERATION, Priority.GRADING, Priority.GRADING]
+
+    def test_requests_per_minute_bucket_delays_bursts(self):
+        """Test that calls beyond the RPM burst wait for the bucket to refill."""
+        # 600 RPM = one request every 0.1s once the 600-request burst is spent
+        governor = Governor(GovernorConfig(requests_per_minute=600))
+        governor._requests.level = 1
+
+        start = time.monotonic()
+        governor.call(lambda: None)
+        governor.call(lambda: None)
+        elapsed = time.monotonic() - start
+
+        assert elapsed >= 0.08
+        assert governor.stats()["queue_wait"]["interactive"]["admitted"] == 2
+
+    def test_tokens_per_minute_corrected_by_actual_usage(self):
+        """Test that reported usage above the estimate is debited from the TPM bucket."""
+        governor = Governor(GovernorConfig(tokens_per_minute=6000))
+
+        governor.call(lambda: None, tokens=100, usage=lambda result: 1000)
+
+        assert governor._tokens.level == pytest.approx(5000, abs=5)
+
+    def test_async_callers_share_the_limit(self):
+        """Test that async calls respect the same in-flight limit as sync ones."""
+        governor = Governor(GovernorConfig(max_in_flight=1))
+        running = []
+        peak = []
+
+        async def work():
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.pop()
+
+        async def main():
+            await asyncio.gather(*(governor.acall(work) for _ in range(5)))
+
+        asyncio.run(main())
+
+        assert max(peak) == 1
+        assert governor.in_flight == 0
+
+    def test_cancelled_async_waiter_frees_its_place(self):
+        """Test that a cancelled waiter does not leak a slot."""
+        governor = Governor(GovernorConfig(max_in_flight=1))
+
+        async def main():
+            async with governor.aslot():
+                waiter = asyncio.create_task(governor.acall(asyncio.sleep, Priority.GRADING))
+                await asyncio.sleep(0.01)
+                waiter.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await waiter
+            return await governor.acall(lambda: asyncio.sleep(0, result="ok"))
+
+        assert asyncio.run(main()) == "ok"
+        assert governor.in_flight == 0
+
+
+class TestGovernorRetries:
+    """Test jittered retry on rate-limit errors."""
+
+    def test_rate_limited_calls_are_retried(self):
+        """Test that 429s are retried until the call succeeds."""
+        governor = Governor(_fast_retries())
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise RateLimited("429 rate limit exceeded")
+            return "done"
+
+        assert governor.call(flaky) == "done"
+        stats = governor.stats()
+        assert stats["retries"] == 2
+        assert stats["rate_limited"] == 2
+
+    def test_retries_are_bounded(self):
+        """Test that the 429 surfaces once max_retries is exhausted."""
+        governor = Governor(_fast_retries(max_retries=1))
+
+        def always_limited():
+            raise RateLimited("quota")
+
+        with pytest.raises(RateLimited):
+            governor.call(always_limited)
+        assert governor.stats()["retries"] == 1
+
+    def test_other_errors_are_not_retried(self):
+        """Test that non rate-limit failures propagate immediately."""
+        governor = Governor(_fast_retries())
+        attempts = []
+
+        def broken():
+            attempts.append(1)
+            raise ValueError("bad request")
+
+        with pytest.raises(ValueError):
+            governor.call(broken)
+        assert attempts == [1]
+
+    def test_async_retry(self):
+        """Test that async calls are retried the same way."""
+        governor = Governor(_fast_retries())
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RateLimited("429 rate limit exceeded")
+            return "done"
+
+        assert asyncio.run(governor.acall(flaky)) == "done"
+        assert len(attempts) == 2
+
+    @pytest.mark.parametrize("exc,expected", [
+        (RateLimited("x"), True),
+        (Exception("429 Resource has been exhausted (e.g. check quota)."), True),
+        (Exception("RESOURCE_EXHAUSTED"), True),
+        (Exception("500 internal error"), False),
+    ])
+    def test_rate_limit_detection(self, exc, expected):
+        """Test recognition of provider rate-limit errors."""
+        assert is_rate_limit_error(exc) is expected
+
+
+class TestGovernedClients:
+    """Test the runnable and embeddings wrappers."""
+
+    def test_governed_runnable_records_usage(self):
+        """Test that a wrapped chat model is admitted and reports token usage."""
+        governor = Governor(GovernorConfig(tokens_per_minute=100000))
+        model = GovernedRunnable(LocalChatModel(), governor, Priority.GENERATION)
+
+        message = model.invoke("What is agent memory?")
+        asyncio.run(model.ainvoke("What is agent memory?"))
+
+        assert message.content
+        assert governor.stats()["queue_wait"]["generation"]["admitted"] == 2
+        assert governor._tokens.level < 100000
+
+    def test_governed_embeddings_priorities(self):
+        """Test that queries and documents are admitted under their own classes."""
+        governor = Governor()
+        embeddings = GovernedEmbeddings(LocalHashEmbeddings(dimensions=32), governor)
+
+        embeddings.embed_query("query")
+        embeddings.embed_documents(["a", "b"])
+
+        queue_wait = governor.stats()["queue_wait"]
+        assert queue_wait["interactive"]["admitted"] == 1
+        assert queue_wait["background"]["admitted"] == 1
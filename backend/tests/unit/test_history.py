@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+from langchain.schema import Document
+
+from app.core.ingestion.chunk_ids import assign_chunk_ids, chunk_id
+from app.db.history import decode_cursor, encode_cursor, iter_history
+from app.db.models import Base, ChatMessage, ChatSession, SourceChunk
+
+START = datetime(2025, 1, 1, 12, 0, 0)
+
+
+def _row(index, session_id="s1", timestamp=None):
+    return {
+        "id": f"m{index:03d}",
+        "session_id": session_id,
+        "timestamp": timestamp or START + timedelta(seconds=index),
+        "question": f"Question {index}",
+        "answer": f"Answer {index}",
+        "used_web_search": False,
+        "sources": [{"content": "doc", "metadata": {}}],
+    }
+
+
+@pytest.fixture
+def engine():
+    """In-memory SQLite database with the chat tables."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    """Session on a database with 10 messages in s1 and one in s2."""
+    session = sessionmaker(bind=engine)()
+    session.add_all([ChatSession(id="s1"), ChatSession(id="s2")])
+    session.add_all(ChatMessage(**_row(i)) for i in range(10))
+    session.add(ChatMessage(**_row(99, session_id="s2")))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _ids(messages):
+    return [message["id"] for message in messages]
+
+
+class TestKeysetPagination:
+    """Test paging through session history by (timestamp, id)."""
+
+    def test_pages_cover_history_in_order(self, session):
+        """Test that following the last key of each page visits every message once."""
+        pages, after = [], None
+        while True:
+            page = list(iter_history(session, "s1", after=after, limit=4))
+            if not page:
+                break
+            pages.append(_ids(page))
+            after = (page[-1]["timestamp"], page[-1]["id"])
+
+        assert pages == [["m000", "m001", "m002", "m003"], ["m004", "m005", "m006", "m007"], ["m008", "m009"]]
+
+    def test_equal_timestamps_are_ordered_by_id(self, engine):
+        """Test that messages with the same timestamp are not skipped across pages."""
+        session = sessionmaker(bind=engine)()
+        session.add(ChatSession(id="s1"))
+        session.add_all(ChatMessage(**_row(i, timestamp=START)) for i in range(3))
+        session.commit()
+
+        first = list(iter_history(session, "s1", limit=2))
+        rest = list(iter_history(session, "s1", after=(START, first[-1]["id"])))
+
+        assert _ids(first) + _ids(rest) == ["m000", "m001", "m002"]
+        session.close()
+
+    def test_sources_are_optional(self, session):
+        """Test that sources are only returned when asked for."""
+        without = next(iter_history(session, "s1"))
+        with_sources = next(iter_history(session, "s1", include_sources=True))
+
+        assert "sources" not in without
+        assert with_sources["sources"] == [{"content": "doc", "metadata": {}}]
+
+    def test_unwritten_messages_are_merged(self, session):
+        """Test that buffered messages appear in key order and are not duplicated."""
+        pending = [_row(10), _row(9), dict(_row(5), id="m005b")]
+
+        messages = list(iter_history(session, "s1", after=(START + timedelta(seconds=3), "m003"), pending=pending))
+
+        assert _ids(messages) == ["m004", "m005", "m005b", "m006", "m007", "m008", "m009", "m010"]
+
+    def test_composite_index_exists(self, engine):
+        """Test that the history index covers session, timestamp and id."""
+        indexes = {index["name"]: index["column_names"] for index in inspect(engine).get_indexes("chat_messages")}
+
+        assert indexes["ix_chat_messages_session_timestamp_id"] == ["session_id", "timestamp", "id"]
+
+
+class TestSourceChunks:
+    """Test messages referencing shared source chunks by id."""
+
+    def test_chunk_ids_are_stable(self):
+        """Test that ids depend only on source and text, and exact repeats are dropped."""
+        chunks = [
+            Document(page_content="Agents plan.", metadata={"source": "a"}),
+            Document(page_content="Agents plan.", metadata={"source": "b"}),
+            Document(page_content="Agents plan.", metadata={"source": "a"}),
+        ]
+
+        unique = assign_chunk_ids(chunks)
+
+        assert len(unique) == 2
+        assert unique[0].metadata["chunk_id"] == chunk_id("Agents plan.", {"source": "a"})
+        assert chunk_id("x", {"chunk_id": "given", "source": "a"}) == "given"
+
+    def test_sources_are_hydrated_from_references(self, session):
+        """Test that referenced chunks are looked up and legacy inline sources still work."""
+        session.add_all([
+            SourceChunk(id="c1", content="Chunk one", chunk_metadata={"source": "a"}),
+            SourceChunk(id="c2", content="Chunk two", chunk_metadata={"source": "b"}),
+        ])
+        session.add(ChatMessage(**dict(_row(50), sources=[], source_ids=["c2", "c1", "gone"])))
+        session.commit()
+        unwritten = dict(_row(60), sources=[], source_ids=["c3"], chunks=[{"id": "c3", "content": "Chunk three", "metadata": {}}])
+        pending = [dict(unwritten)]
+
+        messages = list(iter_history(session, "s1", include_sources=True, pending=pending))
+
+        assert messages[0]["sources"] == [{"content": "doc", "metadata": {}}]
+        assert [s["content"] for s in messages[-2]["sources"]] == ["Chunk two", "Chunk one"]
+        assert messages[-1]["sources"] == [{"content": "Chunk three", "metadata": {}}]
+        assert pending[0] == unwritten
+
+
+class TestCursor:
+    """Test the opaque history cursor."""
+
+    def test_round_trip(self):
+        """Test that a cursor decodes to the key it was made from."""
+        key = (datetime(2025, 1, 1, 12, 0, 0, 123456), "abc-def")
+
+        assert decode_cursor(encode_cursor(key)) == key
+
+    def test_malformed_cursor(self):
+        """Test that garbage cursors raise ValueError."""
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
@@ -0,0 +1,81 @@
+import os
+
+from app.core.ingestion.generations import IndexGenerations, LEGACY_GENERATION
+
+
+class TestIndexGenerations:
+    """Test blue/green index generation switching and garbage collection."""
+
+    def test_no_active_generation_initially(self, tmp_path):
+        """Test that an empty root has no active generation."""
+        generations = IndexGenerations(str(tmp_path / "index"))
+
+        assert generations.active() is None
+        with generations.reader() as (generation, path):
+            assert generation is None
+            assert path is None
+
+    def test_activate_switches_pointer(self, tmp_path):
+        """Test that activation atomically moves readers to the new generation."""
+        generations = IndexGenerations(str(tmp_path))
+        first = generations.create()
+        generations.activate(first)
+        second = generations.create()
+
+        # Building a generation does not affect readers until activated
+        assert generations.active() == first
+
+        generations.activate(second)
+        assert generations.active() == second
+        assert generations.active_path() == os.path.join(str(tmp_path), "generations", second)
+
+    def test_garbage_collection_waits_for_readers(self, tmp_path):
+        """Test that a retired generation is kept while a reader still holds it."""
+        generations = IndexGenerations(str(tmp_path), grace_period_seconds=0)
+        first = generations.create()
+        generations.activate(first)
+
+        with generations.reader() as (generation, path):
+            assert generation == first
+            generations.activate(generations.create())
+
+            assert generations.collect_garbage() == []
+            assert os.path.isdir(path)
+
+        assert generations.collect_garbage() == [first]
+        assert not os.path.exists(generations.path(first))
+
+    def test_garbage_collection_respects_grace_period(self, tmp_path):
+        """Test that retired generations survive the grace period for other workers."""
+        generations = IndexGenerations(str(tmp_path), grace_period_seconds=3600)
+        first = generations.create()
+        generations.activate(first)
+        generations.activate(generations.create())
+
+        assert generations.collect_garbage() == []
+        assert os.path.isdir(generations.path(first))
+
+    def test_discard_removes_unactivated_generation(self, tmp_path):
+        """Test that failed builds can be thrown away."""
+        generations = IndexGenerations(str(tmp_path))
+        generation = generations.create()
+
+        generations.discard(generation)
+
+        assert not os.path.exists(generations.path(generation))
+
+    def test_legacy_layout_is_active_and_collectable(self, tmp_path):
+        """Test that an index stored directly in the root is served until replaced."""
+        (tmp_path / "chroma.sqlite3").write_text("")
+        (tmp_path / "segment").mkdir()
+        generations = IndexGenerations(str(tmp_path), grace_period_seconds=0)
+
+        assert generations.active() == LEGACY_GENERATION
+        assert generations.active_path() == str(tmp_path)
+
+        new = generations.create()
+        generations.activate(new)
+
+        assert generations.collect_garbage() == [LEGACY_GENERATION]
+        assert sorted(os.listdir(tmp_path)) == ["ACTIVE", "generations"]
+        assert generations.active() == new
@@ -0,0 +1,108 @@
+import threading
+
+from app.core.ingestion.ingestion import IngestionCancelled
+from app.services.ingestion_jobs import IngestionJobManager, JobStatus
+
+
+class TestIngestionJobManager:
+    """Test background ingestion job lifecycle."""
+
+    def test_job_reports_progress_and_result(self):
+        """Test that stage progress and the runner result are recorded."""
+        manager = IngestionJobManager(max_concurrent_jobs=1)
+
+        def runner(progress, cancel_event):
+            progress("loading", 1, 2)
+            progress("loading", 2, 2)
+            progress("indexing", 5, 5)
+            return {"documents_processed": 2}
+
+        job = manager.submit("2 urls", runner)
+        job.future.result(timeout=5)
+
+        snapshot = manager.snapshot(job)
+        assert snapshot["status"] == JobStatus.SUCCEEDED.value
+        assert snapshot["progress"]["loading"] == {"done": 2, "total": 2}
+        assert snapshot["progress"]["indexing"] == {"done": 5, "total": 5}
+        assert snapshot["result"] == {"documents_processed": 2}
+        assert snapshot["finished_at"] is not None
+
+    def test_failed_job_records_error(self):
+        """Test that runner exceptions mark the job as failed."""
+        manager = IngestionJobManager(max_concurrent_jobs=1)
+
+        def runner(progress, cancel_event):
+            raise ValueError("boom")
+
+        job = manager.submit("broken", runner)
+        job.future.result(timeout=5)
+
+        assert job.status == JobStatus.FAILED
+        assert job.error == "boom"
+
+    def test_cancel_running_and_queued_jobs(self):
+        """Test that running jobs stop cooperatively and queued jobs never start."""
+        manager = IngestionJobManager(max_concurrent_jobs=1)
+        started = threading.Event()
+        queued_ran = threading.Event()
+
+        def long_runner(progress, cancel_event):
+            started.set()
+            cancel_event.wait(timeout=5)
+            if cancel_event.is_set():
+                raise IngestionCancelled()
+            return {}
+
+        def queued_runner(progress, cancel_event):
+            queued_ran.set()
+            return {}
+
+        running = manager.submit("long", long_runner)
+        queued = manager.submit("queued", queued_runner)
+        assert started.wait(timeout=5)
+
+        # Concurrency limit of one keeps the second job queued
+        assert queued.status == JobStatus.QUEUED
+
+        manager.cancel(queued.id)
+        manager.cancel(running.id)
+        running.future.result(timeout=5)
+
+        assert running.status == JobStatus.CANCELLED
+        assert queued.status == JobStatus.CANCELLED
+        assert not queued_ran.is_set()
+
+    def test_on_finish_runs_for_every_outcome(self):
+        """Test that the completion hook runs once for jobs that succeed, fail or are cancelled before starting."""
+        manager = IngestionJobManager(max_concurrent_jobs=1)
+        release = threading.Event()
+        finished = []
+
+        def blocking_runner(progress, cancel_event):
+            release.wait(timeout=5)
+            return {}
+
+        def failing_runner(progress, cancel_event):
+            raise ValueError("boom")
+
+        running = manager.submit("running", blocking_runner, on_finish=lambda job: finished.append(job.description))
+        queued = manager.submit("queued", blocking_runner, on_finish=lambda job: finished.append(job.description))
+        manager.cancel(queued.id)
+        release.set()
+        running.future.result(timeout=5)
+        failed = manager.submit("failed", failing_runner, on_finish=lambda job: finished.append(job.description))
+        failed.future.result(timeout=5)
+
+        assert queued.status == JobStatus.CANCELLED
+        assert finished == ["queued", "running", "failed"]
+
+    def test_finished_jobs_are_pruned(self):
+        """Test that only a bounded number of finished jobs are retained."""
+        manager = IngestionJobManager(max_concurrent_jobs=1, max_finished_jobs=2)
+
+        for i in range(4):
+            job = manager.submit(f"job {i}", lambda progress, cancel_event: {})
+            job.future.result(timeout=5)
+        manager.submit("last", lambda progress, cancel_event: {}).future.result(timeout=5)
+
+        assert len(manager.list_jobs()) <= 3
@@ -0,0 +1,87 @@
+import io
+import json
+
+from app.core.ingestion.loaders import (
+    find_files,
+    iter_file_documents,
+    iter_html_documents,
+    iter_jsonl_documents,
+    iter_text_documents,
+)
+
+
+class TestStreamingLoaders:
+    """Test incremental parsing of local documents."""
+
+    def test_text_is_split_into_bounded_segments(self):
+        """Test that long text is emitted as several segments at paragraph breaks."""
+        paragraph = "Deep learning improves radiology workflows. " * 10
+        stream = io.StringIO("\n\n".join([paragraph] * 20))
+
+        docs = list(iter_text_documents(stream, "notes.txt", max_chars=1000))
+
+        assert len(docs) > 1
+        assert all(len(doc.page_content) < 2 * 1000 + len(paragraph) for doc in docs)
+        assert [doc.metadata["segment"] for doc in docs] == list(range(len(docs)))
+        assert all(doc.metadata["source"] == "notes.txt" for doc in docs)
+
+    def test_markdown_splits_before_headings(self):
+        """Test that Markdown segments start at section headings."""
+        section = "Text about clinical AI. " * 20
+        stream = io.StringIO(f"# Intro\n{section}\n# Methods\n{section}\n")
+
+        docs = list(iter_text_documents(stream, "doc.md", markdown=True, max_chars=400))
+
+        assert len(docs) == 2
+        assert docs[1].page_content.startswith("# Methods")
+        assert docs[0].metadata["format"] == "markdown"
+
+    def test_html_extracts_visible_text(self):
+        """Test that scripts and styles are dropped and the title is kept."""
+        html = (
+            "<html><head><title>AI Imaging</title><style>p {color: red}</style></head>"
+            "<body><script>var x = 1;</script><p>Convolutional networks detect "
+            "<b>tumours</b>.</p><p>Second paragraph.</p></body></html>"
+        )
+
+        docs = list(iter_html_documents(io.StringIO(html), "page.html"))
+
+        assert len(docs) == 1
+        text = docs[0].page_content
+        assert "Convolutional networks detect tumours." in text
+        assert "Second paragraph." in text
+        assert "var x" not in text
+        assert "color" not in text
+        assert docs[0].metadata["title"] == "AI Imaging"
+
+    def test_jsonl_records_become_documents(self):
+        """Test JSON Lines parsing, metadata and skipping of bad lines."""
+        lines = [
+            json.dumps({"text": "First record", "id": 7, "metadata": {"author": "a"}}),
+            "not json",
+            json.dumps({"content": "Second record", "tags": ["x"]}),
+            json.dumps({"other": "no text"}),
+        ]
+
+        docs = list(iter_jsonl_documents(io.StringIO("\n".join(lines)), "dump.jsonl"))
+
+        assert [doc.page_content for doc in docs] == ["First record", "Second record"]
+        assert docs[0].metadata["id"] == 7
+        assert docs[0].metadata["author"] == "a"
+        assert "tags" not in docs[1].metadata
+        assert docs[1].metadata["line"] == 3
+
+    def test_find_files_walks_directories(self, tmp_path):
+        """Test that directories are expanded to supported files only."""
+        (tmp_path / "a.txt").write_text("alpha")
+        (tmp_path / "nested").mkdir()
+        (tmp_path / "nested" / "b.md").write_text("# beta")
+        (tmp_path / "image.png").write_bytes(b"\x89PNG")
+        (tmp_path / ".hidden").mkdir()
+        (tmp_path / ".hidden" / "c.txt").write_text("hidden")
+
+        files = find_files([str(tmp_path)])
+
+        assert files == [str(tmp_path / "a.txt"), str(tmp_path / "nested" / "b.md")]
+        docs = [doc for path in files for doc in iter_file_documents(path)]
+        assert [doc.page_content for doc in docs] == ["alpha", "# beta"]
@@ -0,0 +1,131 @@
+import importlib
+import math
+import random
+
+import pytest
+
+from app.core.models import model as model_module
+from app.core.models.local import LatencyDistribution, LocalChatModel, LocalHashEmbeddings
+from app.core.models.model import ModelConfig, ModelManager, model_manager
+
+
+@pytest.fixture
+def local_models(monkeypatch):
+    """Switch the shared model manager to the offline provider."""
+    monkeypatch.setattr(model_manager, "config", ModelConfig(provider="local"))
+    monkeypatch.setattr(model_manager, "_chat_model", None)
+    monkeypatch.setattr(model_manager, "_role_models", {})
+    monkeypatch.setattr(model_manager, "_embedding_model", None)
+    return model_manager
+
+
+def _cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+class TestProviderRegistry:
+    """Test provider selection through ModelConfig."""
+
+    def test_local_provider_builds_offline_models(self):
+        """Test that the local provider returns the offline stand-ins."""
+        manager = ModelManager(ModelConfig(provider="local"))
+
+        assert isinstance(manager.chat_model, LocalChatModel)
+        assert isinstance(manager.embedding_model, LocalHashEmbeddings)
+
+    def test_unknown_provider_raises(self):
+        """Test that a misconfigured provider fails with a helpful message."""
+        manager = ModelManager(ModelConfig(provider="missing"))
+
+        with pytest.raises(ValueError, match="Available providers"):
+            manager.chat_model
+
+    def test_custom_provider_registration(self, monkeypatch):
+        """Test that additional providers can be plugged in."""
+        monkeypatch.setattr(model_module, "_providers", dict(model_module._providers))
+        chat = LocalChatModel()
+        model_module.register_provider("custom", lambda settings: chat, lambda config: None)
+
+        assert ModelManager(ModelConfig(provider="custom")).chat_model is chat
+
+
+class TestLocalChatModel:
+    """Test structured and free-text outputs of the offline chat model."""
+
+    @pytest.mark.parametrize("module_name,schema_name,inputs", [
+        ("router", "RouteQuery", {"question": "agent memory"}),
+        ("retrieval_grader", "GradeDocuments",
+         {"question": "agent memory", "document": "Agents store memories."}),
+        ("hallucination_grader", "GradeHallucinations",
+         {"documents": "Agents store memories.", "generation": "Agents remember."}),
+        ("answer_grader", "GradeAnswer",
+         {"question": "agent memory", "generation": "Agents remember."}),
+    ])
+    def test_chains_return_schema_instances(self, local_models, module_name, schema_name, inputs):
+        """Test that every structured chain yields a valid, deterministic result."""
+        module = importlib.import_module(f"app.core.graph.chains.{module_name}")
+        schema = getattr(module, schema_name)
+        structured = LocalChatModel().with_structured_output(schema)
+        prompt = next(
+            value for name, value in vars(module).items() if name.endswith("_prompt")
+        )
+
+        first = (prompt | structured).invoke(inputs)
+        second = (prompt | structured).invoke(inputs)
+
+        assert isinstance(first, schema)
+        assert first == second
+
+    def test_positive_rate_controls_decisions(self):
+        """Test that the share of positive grades follows the configuration."""
+        from app.core.graph.chains.answer_grader import GradeAnswer
+
+        always = LocalChatModel(positive_rate=1.0).with_structured_output(GradeAnswer)
+        never = LocalChatModel(positive_rate=0.0).with_structured_output(GradeAnswer)
+
+        assert always.invoke("question 1").binary_score is True
+        assert never.invoke("question 1").binary_score is False
+
+    def test_generation_reports_usage(self):
+        """Test that free-text answers carry token usage metadata."""
+        message = LocalChatModel().invoke("What is agent memory?")
+
+        assert isinstance(message.content, str) and message.content
+        assert message.usage_metadata["total_tokens"] > 0
+
+    def test_latency_distribution(self):
+        """Test latency sampling for the supported distributions."""
+        rng = random.Random(0)
+
+        assert LatencyDistribution.parse("fixed:250").sample(rng) == 0.25
+        uniform = LatencyDistribution.parse("uniform:100:50")
+        assert all(0.05 <= uniform.sample(rng) <= 0.15 for _ in range(100))
+        lognormal = LatencyDistribution.parse("lognormal:200:100")
+        samples = [lognormal.sample(rng) for _ in range(5000)]
+        assert 0.18 < sum(samples) / len(samples) < 0.22
+        assert min(samples) > 0
+
+
+class TestLocalHashEmbeddings:
+    """Test the deterministic hashing embeddings."""
+
+    def test_embeddings_are_deterministic_and_normalized(self):
+        """Test repeatability and unit length."""
+        embeddings = LocalHashEmbeddings(dimensions=256)
+
+        first = embeddings.embed_query("deep learning for radiology")
+        second = LocalHashEmbeddings(dimensions=256).embed_documents(["deep learning for radiology"])[0]
+
+        assert first == second
+        assert len(first) == 256
+        assert math.isclose(_cosine(first, first), 1.0)
+
+    def test_lexical_overlap_ranks_higher(self, sample_documents, irrelevant_documents):
+        """Test that related texts are closer than unrelated ones."""
+        embeddings = LocalHashEmbeddings()
+        query = embeddings.embed_query("medical image analysis with deep learning")
+
+        related = embeddings.embed_query(sample_documents[0].page_content)
+        unrelated = embeddings.embed_query(irrelevant_documents[0].page_content)
+
+        assert _cosine(query, related) > _cosine(query, unrelated)
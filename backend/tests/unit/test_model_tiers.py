@@ -0,0 +1,102 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.core.models.benchmark import run_benchmark
+from app.core.models.local import LocalChatModel
+from app.core.models.model import CHAT_ROLES, ModelConfig, ModelManager, RoleConfig, model_manager
+
+
+@pytest.fixture
+def local_models(monkeypatch):
+    """Switch the shared model manager to the offline provider."""
+    monkeypatch.setattr(model_manager, "config", ModelConfig(provider="local"))
+    monkeypatch.setattr(model_manager, "_chat_model", None)
+    monkeypatch.setattr(model_manager, "_role_models", {})
+    return model_manager
+
+
+class TestRoleConfig:
+    """Test per-role model settings."""
+
+    def test_graders_default_to_lite_tier(self):
+        """Test that routing and grading use the lite model and generation the default model."""
+        manager = ModelManager()
+
+        assert manager.role_config("retrieval_grader").model == "gemini-2.0-flash-lite"
+        assert manager.role_config("router").max_tokens == 256
+        generation = manager.role_config("generation")
+        assert generation.model == "gemini-2.0-flash"
+        assert generation.temperature == 0.0
+
+    def test_environment_overrides(self, monkeypatch):
+        """Test that <ROLE>_* variables override a role's settings."""
+        monkeypatch.setenv("ANSWER_GRADER_MODEL", "gemini-1.5-flash-8b")
+        monkeypatch.setenv("ANSWER_GRADER_TEMPERATURE", "0.2")
+        monkeypatch.setenv("GENERATION_MAX_TOKENS", "1024")
+
+        manager = ModelManager()
+
+        assert manager.role_config("answer_grader") == RoleConfig(
+            model="gemini-1.5-flash-8b", temperature=0.2, timeout=20.0, max_tokens=256
+        )
+        assert manager.role_config("generation").max_tokens == 1024
+
+    def test_unknown_role_raises(self):
+        """Test that a typo in a role name fails loudly."""
+        with pytest.raises(ValueError, match="Available roles"):
+            ModelManager().role_config("summarizer")
+
+    @patch('app.core.models.model.ChatGoogleGenerativeAI')
+    def test_role_models_are_lazy_and_shared(self, mock_chat_class):
+        """Test that role models are built on first use and shared between equal settings."""
+        manager = ModelManager()
+        mock_chat_class.assert_not_called()
+
+        router = manager.role_model("router")
+        grader = manager.role_model("answer_grader")
+        manager.role_model("generation")
+
+        assert router is grader
+        assert mock_chat_class.call_count == 2
+        mock_chat_class.assert_any_call(
+            model="gemini-2.0-flash-lite", temperature=0.0, timeout=20.0, max_output_tokens=256
+        )
+
+
+class TestTierBenchmark:
+    """Test the tier benchmark on the offline provider."""
+
+    def test_benchmark_reports_every_role(self, local_models, sample_documents):
+        """Test that latency and agreement are reported for each role."""
+        results = run_benchmark(
+            ["How does AI improve medical image analysis?", "What is sepsis prediction?"],
+            retrieve=lambda question: sample_documents,
+        )
+
+        by_role = {result.role: result.to_dict() for result in results}
+        assert set(by_role) == set(CHAT_ROLES)
+        assert by_role["router"]["samples"] == 2
+        assert by_role["retrieval_grader"]["samples"] == 4
+        # The offline model is deterministic, so every tier agrees with the reference
+        assert by_role["answer_grader"]["agreement"] == 1.0
+        assert by_role["generation"]["agreement"] is None
+        assert by_role["router"]["model"] == "gemini-2.0-flash-lite"
+        assert by_role["router"]["reference"] == "gemini-2.0-flash"
+
+    def test_graders_run_without_generation_role(self, local_models, sample_documents):
+        """Test that generation graders get reference answers when generation is not benchmarked."""
+        results = run_benchmark(
+            ["How does AI improve medical image analysis?"],
+            roles=["answer_grader"],
+            retrieve=lambda question: sample_documents,
+        )
+
+        assert results[0].to_dict()["samples"] == 1
+
+    def test_local_models_carry_tier_name(self, local_models):
+        """Test that offline role models report the configured model name."""
+        model = local_models.role_model("hallucination_grader")
+
+        assert isinstance(model, LocalChatModel)
+        assert model.invoke("hi").response_metadata["model_name"] == "gemini-2.0-flash-lite"
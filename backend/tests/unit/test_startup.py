@@ -0,0 +1,90 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.core.graph.chains import router
+from app.core.models.model import ModelConfig, model_manager
+
+BACKEND = Path(__file__).resolve().parents[2]
+
+# Generous bound for a cold interpreter importing the graph; catches work creeping back into import time
+IMPORT_BUDGET_SECONDS = float(os.getenv("STARTUP_IMPORT_BUDGET_SECONDS", "15"))
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.core.graph.graph
+import cli
+elapsed = time.perf_counter() - start
+from app.core.models.model import model_manager
+print(json.dumps({
+    "seconds": elapsed,
+    "chat_models": len(model_manager._role_models) + (model_manager._chat_model is not None),
+}))
+"""
+
+
+@pytest.fixture
+def offline_env(tmp_path):
+    """Environment without provider credentials, run from an empty directory."""
+    env = {key: value for key, value in os.environ.items()
+           if key not in ("GOOGLE_API_KEY", "TAVILY_API_KEY", "MODEL_PROVIDER")}
+    env["PYTHONPATH"] = str(BACKEND)
+    return env
+
+
+@pytest.fixture
+def local_models(monkeypatch):
+    """Offline models, with the cached router chain rebuilt around them."""
+    monkeypatch.setattr(model_manager, "config", ModelConfig(provider="local"))
+    monkeypatch.setattr(model_manager, "_chat_model", None)
+    monkeypatch.setattr(model_manager, "_role_models", {})
+    router.get_question_router.cache_clear()
+    router.get_structured_llm_router.cache_clear()
+    yield model_manager
+    router.get_question_router.cache_clear()
+    router.get_structured_llm_router.cache_clear()
+
+
+class TestImportTime:
+    """Guard the cold-start cost of importing the graph."""
+
+    def test_graph_import_is_cheap_and_offline(self, offline_env, tmp_path):
+        """Test that importing the graph builds no model clients and renders nothing."""
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=tmp_path, env=offline_env,
+            capture_output=True, text=True, timeout=120
+        )
+
+        assert result.returncode == 0, result.stderr
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        assert probe["chat_models"] == 0
+        assert not (tmp_path / "graph.png").exists()
+        assert probe["seconds"] < IMPORT_BUDGET_SECONDS
+
+
+class TestLazyGraph:
+    """Test that the graph and chains are built on first use."""
+
+    def test_chains_and_graph_are_built_once(self, local_models):
+        """Test that the factories build the chains and graph on first use and share them."""
+        from app.core.graph import graph
+
+        question_router = router.get_question_router()
+
+        assert question_router is router.get_question_router()
+        assert graph.get_graph_app() is graph.get_graph_app()
+        assert question_router.invoke({"question": "agent memory"}).datasource in ("vectorstore", "websearch")
+
+    def test_mermaid_rendering_is_local(self):
+        """Test that the Mermaid source is available without the remote renderer."""
+        from app.core.graph.graph import render_graph_mermaid
+
+        source = render_graph_mermaid()
+
+        assert "grade_documents" in source
+        assert "websearch" in source
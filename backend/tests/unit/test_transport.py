@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+from app.core.visualization import (
+    EventTransport,
+    ProcessEvent,
+    ProcessStepStatus,
+    ProcessStepType,
+    ProcessVisualizationManager,
+    UnixSocketTransport,
+)
+from app.core.visualization.transport import _RemoteTransport
+
+
+def _event(session_id, question="q"):
+    return ProcessEvent(
+        session_id=session_id,
+        event_id=f"event-{question}",
+        step_type=ProcessStepType.RETRIEVE,
+        status=ProcessStepStatus.STARTED,
+        question=question,
+    )
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Three managers relaying events over one Unix socket, as separate workers would."""
+    path = str(tmp_path / "events.sock")
+    managers = [ProcessVisualizationManager(transport=UnixSocketTransport(path)) for _ in range(3)]
+    for manager in managers:
+        manager.start()
+        assert manager.transport.connected.wait(5)
+    yield managers
+    for manager in managers:
+        manager.stop()
+
+
+class TestUnixSocketTransport:
+    """Test relaying process events between workers through the local broker."""
+
+    def test_one_worker_hosts_the_broker(self, workers):
+        """Test that exactly one worker hosts the broker and the others connect to it."""
+        assert [manager.transport.hosting for manager in workers].count(True) == 1
+
+    def test_events_reach_every_worker(self, workers):
+        """Test that an event stored by one worker can be read from the others."""
+        source = next(manager for manager in workers if not manager.transport.hosting)
+
+        source.deliver([_event("s1", "first"), _event("s1", "second")])
+
+        for manager in workers:
+            assert _wait_for(lambda: len(manager.get_session_events("s1")) == 2)
+            assert [event.question for event in manager.get_session_events("s1")] == ["first", "second"]
+        assert source.transport.stats()["received"] == 0
+
+    def test_clear_reaches_every_worker(self, workers):
+        """Test that clearing a session on one worker clears it everywhere."""
+        workers[0].deliver([_event("s1")])
+        assert _wait_for(lambda: all(manager.get_session_events("s1") for manager in workers))
+
+        workers[1].clear_session_events("s1")
+
+        assert _wait_for(lambda: not any(manager.get_session_events("s1") for manager in workers))
+
+    def test_concurrent_workers_number_without_duplicates(self, workers):
+        """Test that events of one session from several workers get unique numbers and ids on every worker."""
+        threads = [
+            threading.Thread(target=lambda m=manager: [m.deliver([_event("default")]) for _ in range(20)])
+            for manager in workers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        ids = None
+        for manager in workers:
+            assert _wait_for(lambda: len(manager.get_session_events("default")) == 60)
+            events = manager.get_session_events("default")
+            assert [event.seq for event in events] == list(range(1, 61))
+            assert len({event.epoch for event in events}) == 1
+            ids = ids or {event.event_id for event in events}
+            assert {event.event_id for event in events} == ids
+        assert len(ids) == 60
+
+    def test_new_host_after_broker_exits(self, workers):
+        """Test that the remaining workers elect a new broker when its host stops."""
+        host = next(manager for manager in workers if manager.transport.hosting)
+        rest = [manager for manager in workers if manager is not host]
+
+        host.stop()
+
+        assert _wait_for(lambda: sum(m.transport.hosting for m in rest) == 1 and all(m.transport.connected.is_set() for m in rest))
+        def relayed():
+            # Either worker may still be reconnecting; publish until one gets through
+            rest[0].deliver([_event("s2")])
+            return bool(rest[1].get_session_events("s2"))
+
+        assert _wait_for(relayed)
+
+
+    def test_remote_transport_requires_connection_methods(self):
+        """Test that a remote transport missing a connection method cannot be created."""
+        class Incomplete(_RemoteTransport):
+            def _connect(self):
+                pass
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+
+class TestInProcessTransport:
+    """Test the default single-worker transport."""
+
+    def test_relays_nothing(self):
+        """Test that the default manager keeps events local and reports its transport."""
+        manager = ProcessVisualizationManager(transport=EventTransport())
+        manager.deliver([_event("s1")])
+
+        assert len(manager.get_session_events("s1")) == 1
+        assert manager.stats()["transport"] == {"transport": "inprocess"}
@@ -0,0 +1,174 @@
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.models.local import LocalChatModel
+from app.core.models.usage import (
+    RunUsage,
+    aggregate_usage,
+    current_usage,
+    estimate_cost,
+    track_usage,
+    usage_metadata,
+)
+from app.core.resilience.governor import GovernedRunnable, Governor, Priority
+from app.db.models import Base, ChatMessage, ChatSession
+from app.db.usage import usage_report
+
+
+def _role_model(role, model_name="gemini-2.0-flash-lite"):
+    return GovernedRunnable(LocalChatModel(model_name=model_name), Governor(), Priority.GRADING, role)
+
+
+class TestUsageTracking:
+    """Test capture of LLM token usage through callbacks."""
+
+    def test_calls_are_recorded_per_step_and_model(self):
+        """Test that usage is grouped by model role and model name."""
+        with track_usage() as usage:
+            _role_model("router").invoke("route this question")
+            _role_model("answer_grader").invoke("grade this answer")
+            _role_model("answer_grader").invoke("grade another answer")
+            _role_model("generation", "gemini-2.0-flash").invoke("write an answer")
+
+        report = usage.to_dict()
+        assert report["calls"] == 4
+        assert report["by_step"]["answer_grader"]["calls"] == 2
+        assert report["by_model"]["gemini-2.0-flash-lite"]["calls"] == 3
+        assert report["total_tokens"] == sum(step["total_tokens"] for step in report["by_step"].values())
+        assert report["cost_usd"] > 0
+
+    def test_nothing_is_recorded_outside_tracking(self):
+        """Test that calls outside track_usage are not attributed to a run."""
+        with track_usage() as usage:
+            pass
+        _role_model("router").invoke("untracked")
+
+        assert usage.to_dict()["calls"] == 0
+        assert current_usage() is None
+        assert usage_metadata("router") is None
+
+    def test_usage_follows_worker_threads(self):
+        """Test that calls made from threads started in the tracked context are recorded."""
+        import contextvars
+
+        with track_usage() as usage:
+            context = contextvars.copy_context()
+            thread = threading.Thread(
+                target=context.run, args=(_role_model("generation").invoke, "threaded")
+            )
+            thread.start()
+            thread.join()
+
+        assert usage.to_dict()["by_step"]["generation"]["calls"] == 1
+
+    def test_usage_metadata_reports_step_and_run(self):
+        """Test the event metadata attached by graph nodes."""
+        with track_usage():
+            _role_model("router").invoke("route this question")
+            _role_model("generation").invoke("write an answer")
+            metadata = usage_metadata("router")
+
+        assert metadata["usage"]["step"] == "router"
+        assert metadata["usage"]["calls"] == 1
+        assert metadata["usage"]["run"]["calls"] == 2
+
+
+class TestCostAndAggregation:
+    """Test cost estimates and report aggregation."""
+
+    def test_estimate_cost(self):
+        """Test per-million pricing and unknown models."""
+        assert estimate_cost("gemini-2.0-flash", 1_000_000, 1_000_000) == pytest.approx(0.5)
+        assert estimate_cost("models/gemini-2.0-flash", 1_000_000, 0) == pytest.approx(0.1)
+        assert estimate_cost("local", 1000, 1000) == 0.0
+        assert estimate_cost(None, 1000, 1000) == 0.0
+
+    def test_aggregate_stored_usage(self):
+        """Test combining per-message usage into a report."""
+        run = RunUsage()
+        run.record("generation", "gemini-2.0-flash", 100, 50, 150)
+        run.record("router", "gemini-2.0-flash-lite", 20, 2, 22)
+        first = run.to_dict()
+        second = {"calls": 1, "input_tokens": 10, "output_tokens": 1, "total_tokens": 11,
+                  "cost_usd": 0.0, "by_step": {"router": {"calls": 1, "total_tokens": 11}}}
+
+        report = aggregate_usage([first, second, {}])
+
+        assert report["messages"] == 3
+        assert report["calls"] == 3
+        assert report["total_tokens"] == 183
+        assert report["by_step"]["router"]["calls"] == 2
+        assert report["by_step"]["router"]["total_tokens"] == 33
+
+
+class TestUsageReport:
+    """Test the usage report over stored and buffered chat messages."""
+
+    @pytest.fixture
+    def session(self):
+        """In-memory SQLite session with two stored messages of session a and one of b."""
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add_all([ChatSession(id="a"), ChatSession(id="b")])
+            for message_id, session_id, tokens in (("m1", "a", 100), ("m2", "a", 50), ("m3", "b", 120)):
+                session.add(ChatMessage(**_stored(message_id, session_id, tokens)))
+            session.commit()
+            yield session
+        engine.dispose()
+
+    def test_buffered_messages_are_included(self, session):
+        """Test that unwritten messages count once, also when already flushed, and can top the rankings."""
+        pending = [_stored("m4", "c", 500), _stored("m5", "a", 10), _stored("m1", "a", 100)]
+
+        report = usage_report(session, limit=2, pending=pending)
+
+        assert report["messages"] == 5
+        assert report["totals"]["total_tokens"] == 780
+        assert report["by_step"]["generation"]["total_tokens"] == 780
+        assert report["step_messages"] == 5
+        assert [(s["session_id"], s["total_tokens"], s["messages"]) for s in report["by_session"]] == [
+            ("c", 500, 1), ("a", 160, 3)
+        ]
+        assert [m["message_id"] for m in report["top_messages"]] == ["m4", "m3"]
+
+    def test_buffered_messages_are_scoped(self, session):
+        """Test that unwritten messages outside the session or window are left out."""
+        pending = [_stored("m4", "c", 500), _stored("m5", "a", 10, timestamp=datetime(2020, 1, 1))]
+
+        report = usage_report(session, session_id="a", start=datetime(2025, 1, 1), pending=pending)
+
+        assert report["messages"] == 2
+        assert report["by_session"] == []
+
+    def test_step_breakdown_is_capped(self, session):
+        """Test that totals cover every message while the per-step breakdown reads only the latest ones."""
+        pending = [_stored("m4", "c", 500)]
+
+        report = usage_report(session, pending=pending, step_limit=2)
+
+        assert report["messages"] == 4
+        assert report["totals"]["total_tokens"] == 770
+        assert report["step_messages"] == 2
+        assert report["by_step"]["generation"]["calls"] == 2
+
+
+def _stored(message_id, session_id, tokens, timestamp=None):
+    return {
+        "id": message_id,
+        "session_id": session_id,
+        "timestamp": timestamp or datetime(2026, 10, 1),
+        "question": f"question {message_id}",
+        "answer": "answer",
+        "llm_calls": 1,
+        "input_tokens": tokens,
+        "output_tokens": 0,
+        "total_tokens": tokens,
+        "cost_usd": 0.0,
+        "usage": {"by_step": {"generation": {"calls": 1, "input_tokens": tokens, "output_tokens": 0,
+                                             "total_tokens": tokens, "cost_usd": 0.0}}},
+    }
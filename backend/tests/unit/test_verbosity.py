@@ -0,0 +1,132 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.core.visualization import (
+    EmissionConfig,
+    EventLevel,
+    EventStoreConfig,
+    EventTransport,
+    ProcessEvent,
+    ProcessStepStatus,
+    ProcessStepType,
+    ProcessVisualizationManager,
+    SessionEventStore,
+    emit_generation_completed,
+    emit_routing_completed,
+    emit_routing_started,
+    emits_details,
+    process_manager,
+)
+from app.core.visualization.verbosity import session_sampled
+
+
+class NullWebSocket:
+    """WebSocket that discards what is sent."""
+
+    async def send_text(self, text):
+        pass
+
+
+@pytest.fixture
+def session_id():
+    """Fresh session on the global manager, cleared afterwards."""
+    session_id = f"verbosity-{uuid.uuid4()}"
+    yield session_id
+    process_manager.clear_session_events(session_id)
+
+
+class TestSampling:
+    """Test choosing the sessions whose history is kept."""
+
+    def test_sampling_is_deterministic(self):
+        """Test that a session is always sampled the same way and the rate is respected."""
+        ids = [f"session-{i}" for i in range(4000)]
+        sampled = [session_sampled(session_id, 0.25) for session_id in ids]
+
+        assert sampled == [session_sampled(session_id, 0.25) for session_id in ids]
+        assert 0.2 < sum(sampled) / len(ids) < 0.3
+        assert session_sampled("any", 1.0) and not session_sampled("any", 0.0)
+
+    def test_unsampled_sessions_are_numbered_but_not_kept(self):
+        """Test that events of an unsampled session reach watchers without being stored."""
+        manager = ProcessVisualizationManager(
+            transport=EventTransport(), emission=EmissionConfig(history_sample_rate=0.0)
+        )
+
+        async def scenario():
+            assert manager.emission_level("s1") == EventLevel.OFF
+            manager.add_websocket_connection("s1", NullWebSocket())
+            assert manager.emission_level("s1") == EventLevel.FULL
+            manager.deliver([
+                ProcessEvent(session_id="s1", step_type=ProcessStepType.RETRIEVE, status=ProcessStepStatus.STARTED)
+                for _ in range(2)
+            ])
+
+        asyncio.run(scenario())
+
+        assert manager.get_session_events("s1") == []
+        assert manager.events.next_seq("s1") == 3
+
+
+class TestLevels:
+    """Test global and per-session emission levels."""
+
+    def test_summary_drops_started_events_and_previews(self, session_id, monkeypatch):
+        """Test that the summary level keeps outcomes without their previews."""
+        monkeypatch.setattr(process_manager, "emission", EmissionConfig(level=EventLevel.SUMMARY))
+
+        emit_routing_started(session_id, "q")
+        emit_routing_completed(session_id, "q", "vectorstore", reasoning="because")
+        emit_generation_completed(session_id, "q", 1, "answer " * 200)
+
+        events = process_manager.get_session_events(session_id)
+        assert [event.status.value for event in events] == ["completed", "completed"]
+        assert events[0].routing_decision == "vectorstore"
+        assert events[0].routing_reasoning is None
+        assert events[1].generation_preview is None
+        assert not emits_details(session_id)
+
+    def test_session_override(self, session_id, monkeypatch):
+        """Test that a session level overrides the global one until it is reset."""
+        monkeypatch.setattr(process_manager, "emission", EmissionConfig(level=EventLevel.SUMMARY))
+
+        process_manager.set_session_level(session_id, EventLevel.FULL)
+        emit_routing_completed(session_id, "q", "websearch", reasoning="because")
+        process_manager.set_session_level(session_id, EventLevel.OFF)
+        emit_routing_completed(session_id, "q", "websearch", reasoning="ignored")
+        process_manager.set_session_level(session_id, None)
+
+        events = process_manager.get_session_events(session_id)
+        assert [event.routing_reasoning for event in events] == ["because"]
+        assert process_manager.session_level(session_id) == EventLevel.SUMMARY
+
+    def test_override_is_evicted_with_the_session(self):
+        """Test that idle sessions and cleared sessions take their level override with them."""
+        clock = [1000.0]
+        manager = ProcessVisualizationManager(
+            SessionEventStore(EventStoreConfig(session_ttl_seconds=60), clock=lambda: clock[0]),
+            transport=EventTransport(),
+        )
+        manager.set_session_level("idle", EventLevel.OFF)
+        manager.set_session_level("cleared", EventLevel.OFF)
+        assert manager.stats()["emission"]["session_overrides"] == 2
+
+        manager.clear_session_events("cleared")
+        clock[0] += 61
+        manager.events.sweep()
+
+        assert manager.session_level("idle") == manager.emission.level
+        assert manager.stats()["emission"]["session_overrides"] == 0
+        assert manager.get_active_sessions() == []
+
+    def test_environment_config(self, monkeypatch):
+        """Test that VISUALIZATION_LEVEL and VISUALIZATION_HISTORY_SAMPLE_RATE configure emission."""
+        monkeypatch.setenv("VISUALIZATION_LEVEL", "SUMMARY")
+        monkeypatch.setenv("VISUALIZATION_HISTORY_SAMPLE_RATE", "0.1")
+
+        config = EmissionConfig.from_env()
+
+        assert config.level == EventLevel.SUMMARY
+        assert config.history_sample_rate == 0.1
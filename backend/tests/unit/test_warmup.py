@@ -0,0 +1,100 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from app.api.v1 import health
+from app.services.warmup import Warmup, WarmupStatus, WarmupStep
+
+
+def _flaky(failures):
+    """A step that fails ``failures`` times before succeeding."""
+    calls = []
+
+    def run():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise ConnectionError("database not reachable")
+        return {"attempts": len(calls)}
+    return run
+
+
+class TestWarmup:
+    """Test warmup steps and readiness."""
+
+    def test_ready_after_all_steps(self):
+        """Test that the worker is ready once every step has run."""
+        order = []
+        warmup = Warmup([
+            WarmupStep("index", lambda: order.append("index")),
+            WarmupStep("models", lambda: order.append("models") or {"clients": 5}),
+        ])
+        assert not warmup.ready
+        assert warmup.snapshot()["status"] == "pending"
+
+        warmup.run()
+
+        assert warmup.ready
+        assert order == ["index", "models"]
+        snapshot = warmup.snapshot()
+        assert snapshot["status"] == "ready"
+        assert snapshot["steps"]["models"]["detail"] == {"clients": 5}
+
+    def test_optional_failures_do_not_block(self):
+        """Test that a failed optional step is reported but the worker becomes ready."""
+        warmup = Warmup([
+            WarmupStep("index", lambda: None),
+            WarmupStep("embedding", _flaky(99), required=False),
+        ])
+
+        warmup.run()
+
+        assert warmup.ready
+        step = warmup.snapshot()["steps"]["embedding"]
+        assert step["status"] == WarmupStatus.FAILED.value
+        assert "not reachable" in step["error"]
+
+    def test_required_failures_are_retried(self):
+        """Test that failed required steps are retried until they succeed."""
+        warmup = Warmup([WarmupStep("database", _flaky(2))], retry_seconds=0.01)
+
+        warmup.run()
+
+        assert warmup.ready
+        assert warmup.snapshot()["steps"]["database"]["detail"] == {"attempts": 3}
+
+    def test_stop_ends_retries(self):
+        """Test that stopping leaves a failing worker unready and ends the warmup thread."""
+        warmup = Warmup([WarmupStep("database", _flaky(99))], retry_seconds=0.01)
+        warmup.start()
+
+        assert not warmup.wait(timeout=0.1)
+        assert warmup.snapshot()["status"] == "warming_up"
+        warmup.stop()
+        warmup._thread.join(timeout=1)
+        assert not warmup._thread.is_alive()
+        assert not warmup.ready
+
+
+class TestReadinessProbe:
+    """Test the readiness endpoint."""
+
+    def test_not_ready_until_warm(self, monkeypatch):
+        """Test that readiness returns 503 while warming up and 200 afterwards."""
+        gate = threading.Event()
+        warmup = Warmup([WarmupStep("index", gate.wait)])
+        monkeypatch.setattr(health, "warmup", warmup)
+        warmup.start()
+
+        response = asyncio.run(health.readiness_check())
+        assert response.status_code == 503
+        assert json.loads(response.body)["status"] == "warming_up"
+
+        gate.set()
+        assert warmup.wait(timeout=1)
+        response = asyncio.run(health.readiness_check())
+        body = json.loads(response.body)
+        assert response.status_code == 200
+        assert body["status"] in ("ready", "degraded")
+        assert set(body["breakers"]) == {"chat", "embeddings", "web_search"}
@@ -0,0 +1,232 @@
+import json
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.db.models import Base, ChatMessage, ChatSession, SourceChunk
+from app.db.write_buffer import MessageWriteBuffer
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    """SQLite database with the chat tables, standing in for PostgreSQL."""
+    url = f"sqlite:///{tmp_path / 'chat.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def make_buffer(database_url, tmp_path):
+    """Factory for buffers writing to the SQLite database; closes them after the test."""
+    buffers = []
+
+    def make(engine_factory=None, **kwargs):
+        factory = engine_factory or (lambda: create_async_engine(database_url.replace("sqlite://", "sqlite+aiosqlite://")))
+        kwargs.setdefault("dead_letter_path", str(tmp_path / "dead_letter.jsonl"))
+        buffer = MessageWriteBuffer(factory, spill_path=str(tmp_path / "spill.jsonl"), **kwargs)
+        buffers.append(buffer)
+        return buffer
+
+    yield make
+    for buffer in buffers:
+        buffer.close(timeout=5)
+
+
+def _message(session_id="s1", question="What is RAG?", chunks=()):
+    return {
+        "id": str(uuid.uuid4()),
+        "session_id": session_id,
+        "timestamp": datetime.utcnow(),
+        "question": question,
+        "answer": "Retrieval-augmented generation.",
+        "used_web_search": False,
+        "source_ids": [chunk["id"] for chunk in chunks],
+        "chunks": list(chunks),
+        "generation_attempts": 1,
+        "web_search_attempts": 0,
+        "llm_calls": 4,
+        "input_tokens": 100,
+        "output_tokens": 20,
+        "total_tokens": 120,
+        "cost_usd": 0.0001,
+        "usage": {"by_step": {}, "by_model": {}},
+    }
+
+
+def _rows(database_url, model):
+    engine = create_engine(database_url)
+    try:
+        with engine.connect() as connection:
+            return connection.execute(select(model.__table__)).all()
+    finally:
+        engine.dispose()
+
+
+def _failing_engine():
+    raise ConnectionError("database unreachable")
+
+
+class TestMessageWriteBuffer:
+    """Test batched write-behind persistence of chat messages."""
+
+    def test_full_batches_flush_immediately(self, make_buffer, database_url):
+        """Test that a full batch is written as one multi-row insert without waiting for the timer."""
+        buffer = make_buffer(max_batch_size=5, flush_interval=60)
+        for i in range(10):
+            buffer.add(_message(session_id=f"s{i % 2}"))
+
+        deadline = time.time() + 5
+        while buffer.stats()["messages_written"] < 10 and time.time() < deadline:
+            time.sleep(0.01)
+
+        assert buffer.stats()["batches_written"] == 2
+        assert len(_rows(database_url, ChatMessage)) == 10
+        assert {row.id for row in _rows(database_url, ChatSession)} == {"s0", "s1"}
+
+    def test_partial_batch_flushes_on_timer(self, make_buffer, database_url):
+        """Test that a lone message is written after the flush interval."""
+        buffer = make_buffer(max_batch_size=100, flush_interval=0.05)
+        buffer.add(_message())
+
+        time.sleep(0.5)
+
+        assert len(_rows(database_url, ChatMessage)) == 1
+
+    def test_close_flushes_remaining(self, make_buffer, database_url):
+        """Test that shutdown writes everything still buffered."""
+        buffer = make_buffer(max_batch_size=100, flush_interval=60)
+        for _ in range(3):
+            buffer.add(_message())
+
+        buffer.close()
+
+        assert len(_rows(database_url, ChatMessage)) == 3
+        with pytest.raises(RuntimeError):
+            buffer.add(_message())
+
+    def test_pending_messages_are_readable(self, make_buffer):
+        """Test that unwritten messages are visible per session."""
+        buffer = make_buffer(engine_factory=_failing_engine, flush_interval=60)
+        buffer.add(_message(session_id="a"))
+        buffer.add(_message(session_id="b"))
+
+        assert [m["session_id"] for m in buffer.pending("a")] == ["a"]
+        assert len(buffer.pending()) == 2
+
+    def test_warm_opens_writer_connections(self, make_buffer, database_url):
+        """Test that warming leaves connections open in the writer's own pool."""
+        url = database_url.replace("sqlite://", "sqlite+aiosqlite://")
+        buffer = make_buffer(engine_factory=lambda: create_async_engine(url, poolclass=AsyncAdaptedQueuePool))
+
+        buffer.warm(3, timeout=5)
+
+        assert buffer._engine.pool.checkedin() == 3
+
+    def test_failed_flush_keeps_messages(self, make_buffer):
+        """Test that a failed write leaves the batch buffered and is reported."""
+        buffer = make_buffer(engine_factory=_failing_engine, flush_interval=60)
+        buffer.add(_message())
+
+        with pytest.raises(ConnectionError):
+            buffer.flush(timeout=5)
+
+        stats = buffer.stats()
+        assert stats["pending"] == 1
+        assert stats["failed_flushes"] == 1
+        assert "unreachable" in stats["last_error"]
+
+    def test_spill_and_replay(self, make_buffer, database_url, tmp_path):
+        """Test that messages unwritable at shutdown are spilled and written on the next start."""
+        down = make_buffer(engine_factory=_failing_engine, flush_interval=60)
+        messages = [_message(), _message()]
+        for message in messages:
+            down.add(message)
+        down.close(timeout=5)
+        assert (tmp_path / "spill.jsonl").exists()
+
+        up = make_buffer(flush_interval=60)
+        up.start()
+        up.flush(timeout=5)
+
+        assert not (tmp_path / "spill.jsonl").exists()
+        assert {row.id for row in _rows(database_url, ChatMessage)} == {m["id"] for m in messages}
+
+    def test_replayed_rows_are_not_duplicated(self, make_buffer, database_url):
+        """Test that writing a message twice keeps one row."""
+        buffer = make_buffer(flush_interval=60)
+        message = _message()
+        buffer.add(message)
+        buffer.flush(timeout=5)
+        buffer.add(dict(message))
+        buffer.flush(timeout=5)
+
+        assert len(_rows(database_url, ChatMessage)) == 1
+
+    def test_source_chunks_are_stored_once(self, make_buffer, database_url):
+        """Test that chunks shared by messages get one row and messages keep only their ids."""
+        shared = {"id": "c1", "content": "RAG...", "metadata": {"source": "doc"}}
+        other = {"id": "c2", "content": "Agents...", "metadata": {"source": "web"}}
+        buffer = make_buffer(flush_interval=60)
+        buffer.add(_message(chunks=[shared, other]))
+        buffer.add(_message(chunks=[shared]))
+        buffer.flush(timeout=5)
+        buffer.add(_message(chunks=[shared]))
+        buffer.flush(timeout=5)
+
+        assert sorted(row.id for row in _rows(database_url, SourceChunk)) == ["c1", "c2"]
+        assert sorted(row.source_ids for row in _rows(database_url, ChatMessage)) == [["c1"], ["c1"], ["c1", "c2"]]
+
+    def test_rejected_message_is_dead_lettered(self, make_buffer, database_url, tmp_path):
+        """Test that a message the database rejects is set aside and the rest of its batch is written."""
+        bad = {**_message(), "question": None}
+        good = [_message(), _message()]
+        buffer = make_buffer(flush_interval=60)
+        for message in (good[0], bad, good[1]):
+            buffer.add(message)
+
+        buffer.flush(timeout=5)
+        buffer.add(_message())
+        buffer.flush(timeout=5)
+
+        assert len(_rows(database_url, ChatMessage)) == 3
+        stats = buffer.stats()
+        assert (stats["pending"], stats["dead_lettered"]) == (0, 1)
+        lines = (tmp_path / "dead_letter.jsonl").read_text().splitlines()
+        assert [json.loads(line)["id"] for line in lines] == [bad["id"]]
+
+    def test_unwritable_dead_letter_file_drops_message(self, make_buffer, database_url, tmp_path):
+        """Test that a rejected message is dropped, not retried forever, when the dead-letter file cannot be written."""
+        bad = {**_message(), "question": None}
+        good = _message()
+        buffer = make_buffer(flush_interval=60, dead_letter_path=str(tmp_path))
+        buffer.add(bad)
+        buffer.add(good)
+
+        buffer.flush(timeout=5)
+
+        assert [row.id for row in _rows(database_url, ChatMessage)] == [good["id"]]
+        stats = buffer.stats()
+        assert (stats["pending"], stats["dead_lettered"], stats["dropped"]) == (0, 1, 1)
+
+    def test_overflow_spills_oldest_messages(self, make_buffer, tmp_path):
+        """Test that beyond max_pending the oldest messages go to the spill file, whatever their metadata."""
+        buffer = make_buffer(engine_factory=_failing_engine, flush_interval=60, max_pending=2)
+        chunk = {"id": "c1", "content": "RAG...", "metadata": {"score": Decimal("0.5"), "tags": {"a"}}}
+        messages = [_message(chunks=[chunk]), _message(), _message()]
+        for message in messages:
+            buffer.add(message)
+
+        assert buffer.stats()["overflowed"] == 1
+        assert [m["id"] for m in buffer.pending()] == [m["id"] for m in messages[1:]]
+        spilled = json.loads((tmp_path / "spill.jsonl").read_text())
+        assert spilled["id"] == messages[0]["id"]
+        assert spilled["chunks"][0]["metadata"]["score"] == "0.5"
+
@@ -20,7 +20,7 @@ import {
 } from '@mui/icons-material';
 
 import { ProcessFlowchart } from './ProcessFlowchart';
-import type { ProcessEvent } from '../../types/visualization';
+import type { DocumentGrade, ProcessEvent } from '../../types/visualization';
 
 interface ProcessVisualizationProps {
   sessionId: string;
@@ -40,16 +40,28 @@ export const ProcessVisualization: React.FC<ProcessVisualizationProps> = ({
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectTimeoutRef = useRef<NodeJS.Timeout | null>(null);
   const reconnectAttemptsRef = useRef(0);
+  // Cursor of the last event received (numbering epoch and sequence number), to resume after reconnecting
+  const lastSeqRef = useRef(0);
+  const epochRef = useRef('');
+  // Graded documents by id; the compact format sends a document in full only once
+  const gradesRef = useRef(new Map<string, DocumentGrade>());
 
   const MAX_RECONNECT_ATTEMPTS = 5;
   const RECONNECT_DELAY = 2000;
 
+  const resetCursor = useCallback(() => {
+    lastSeqRef.current = 0;
+    epochRef.current = '';
+  }, []);
+
   // WebSocket connection management
   const connectWebSocket = useCallback(() => {
     if (!enabled || !sessionId) return;
 
     try {
-      const wsUrl = `ws://localhost:8000/api/v1/visualization/ws/${sessionId}`;
+      // The server replays only the events after the last one we have
+      const cursor = epochRef.current ? `since=${lastSeqRef.current}&epoch=${epochRef.current}` : 'since=0';
+      const wsUrl = `ws://localhost:8000/api/v1/visualization/ws/${sessionId}?${cursor}&format=compact`;
       console.log('Connecting to WebSocket:', wsUrl);
       
       wsRef.current = new WebSocket(wsUrl);
@@ -59,9 +71,19 @@ export const ProcessVisualization: React.FC<ProcessVisualizationProps> = ({
         setIsConnected(true);
         setConnectionError(null);
         reconnectAttemptsRef.current = 0;
-        
-        // Request existing events
-        wsRef.current?.send(JSON.stringify({ type: 'get_events' }));
+      };
+
+      // Replace documents sent by id with the ones received earlier
+      const resolveGrades = (processEvent: ProcessEvent): ProcessEvent => {
+        if (!processEvent.documents_graded) return processEvent;
+        const grades = processEvent.documents_graded.map(grade => {
+          if (grade.id && grade.content_preview === undefined) {
+            return gradesRef.current.get(grade.id) ?? grade;
+          }
+          if (grade.id) gradesRef.current.set(grade.id, grade);
+          return grade;
+        });
+        return { ...processEvent, documents_graded: grades };
       };
 
       wsRef.current.onmessage = (event) => {
@@ -72,23 +94,29 @@ export const ProcessVisualization: React.FC<ProcessVisualizationProps> = ({
           if (data.type === 'pong') {
             // Heartbeat response
             return;
+          } else if (data.type === 'reset') {
+            // The session was cleared or evicted, or the server restarted: its numbering starts over
+            resetCursor();
+            setEvents([]);
           } else if (data.type === 'session_events') {
             // Bulk events response
-            setEvents(data.events);
+            const bulk = (data.events as ProcessEvent[]).map(resolveGrades);
+            lastSeqRef.current = bulk.reduce((max, e) => Math.max(max, e.seq), 0);
+            epochRef.current = bulk.length ? bulk[0].epoch : epochRef.current;
+            setEvents(bulk);
           } else {
-            // Single event
-            const processEvent = data as ProcessEvent;
-            setEvents(prev => {
-              // Check if event already exists
-              const exists = prev.some(e => e.event_id === processEvent.event_id);
-              if (exists) return prev;
-              
-              // Add new event and sort by timestamp
-              const newEvents = [...prev, processEvent];
-              return newEvents.sort((a, b) => 
-                new Date(a.timestamp).getTime() - new Date(b.timestamp).getTime()
-              );
-            });
+            // Single event; one we already have can repeat right after reconnecting
+            const processEvent = resolveGrades(data as ProcessEvent);
+            if (processEvent.epoch !== epochRef.current) {
+              // A new numbering: whatever we had belongs to the previous one
+              const renumbered = epochRef.current !== '';
+              resetCursor();
+              epochRef.current = processEvent.epoch;
+              if (renumbered) setEvents([]);
+            }
+            if (processEvent.seq <= lastSeqRef.current) return;
+            lastSeqRef.current = processEvent.seq;
+            setEvents(prev => [...prev, processEvent].sort((a, b) => a.seq - b.seq));
             setLastEventTime(new Date());
           }
         } catch (error) {
@@ -131,7 +159,7 @@ export const ProcessVisualization: React.FC<ProcessVisualizationProps> = ({
       console.error('Failed to create WebSocket:', error);
       setConnectionError('Failed to create WebSocket connection');
     }
-  }, [enabled, sessionId]);
+  }, [enabled, sessionId, resetCursor]);
 
   const disconnectWebSocket = useCallback(() => {
     if (reconnectTimeoutRef.current) {
@@ -148,6 +176,12 @@ export const ProcessVisualization: React.FC<ProcessVisualizationProps> = ({
     reconnectAttemptsRef.current = 0;
   }, []);
 
+  // Another session starts from its first event
+  useEffect(() => {
+    resetCursor();
+    setEvents([]);
+  }, [sessionId, resetCursor]);
+
   // Connect/disconnect based on enabled state
   useEffect(() => {
     if (enabled) {
@@ -184,6 +218,7 @@ export const ProcessVisualization: React.FC<ProcessVisualizationProps> = ({
       });
       
       if (response.ok) {
+        resetCursor();
         setEvents([]);
         setLastEventTime(null);
       } else {
@@ -59,8 +59,11 @@ export const apiService = {
   },
 
   // Session management
-  async getSessionHistory(sessionId: string): Promise<{ session_id: string; history: any[] }> {
-    const response = await api.get(`/chat/sessions/${sessionId}`);
+  async getSessionHistory(
+    sessionId: string,
+    params: { limit?: number; after?: string; include_sources?: boolean } = {}
+  ): Promise<{ session_id: string; history: any[]; next_cursor: string | null }> {
+    const response = await api.get(`/chat/sessions/${sessionId}`, { params });
     return response.data;
   },
 };
@@ -18,6 +18,7 @@ export type ProcessStepStatus =
   | 'skipped';
 
 export interface DocumentGrade {
+  id?: string; // compact format: a repeated document carries only its id
   content_preview: string;
   relevance_score: string; // "yes" or "no"
   reasoning?: string;
@@ -26,7 +27,10 @@ export interface DocumentGrade {
 
 export interface ProcessEvent {
   session_id: string;
+  seq: number; // numbered from 1 within the session
+  epoch: string; // changes when the session's numbering restarts
   event_id: string;
+  run_id?: string; // the question's pass through the graph (the chat message id)
   step_type: ProcessStepType;
   status: ProcessStepStatus;
   timestamp: string; // ISO string
@@ -71,8 +75,10 @@ export interface ProcessVisualizationState {
 
 // WebSocket message types
 export interface WebSocketMessage {
-  type: 'ping' | 'pong' | 'get_events' | 'session_events';
+  type: 'ping' | 'pong' | 'get_events' | 'session_events' | 'reset';
   events?: ProcessEvent[];
+  since?: number; // get_events: only events after this sequence number
+  epoch?: string; // get_events: the epoch of that sequence number
 }
 
 // Step configuration for UI